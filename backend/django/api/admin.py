@@ -1,6 +1,84 @@
 # admin.py - Este arquivo é responsável por registrar os modelos no Django Admin
 from django.contrib import admin    # Importando o módulo admin do Django
-from .models import Grupo, Idoso, Medicamento, ContatoParente, Prescricao, LogAdministracao # Importando os modelos necessários
+from django.core.paginator import Paginator     # Paginador padrão, base do paginador com contagem estimada
+from django.db import connections   # Conexões, para ler a estimativa de linhas do banco
+from django.db.models import Max, Q     # Agregação e condições usadas na contagem e na busca
+from django.urls import reverse     # Monta os links entre as listagens do admin
+from django.utils import timezone     # Horário do reenvio dos eventos
+from django.utils.functional import cached_property     # A contagem é calculada uma vez por página
+from django.utils.html import format_html   # Monta o link com escape dos valores
+from .models import Grupo, Idoso, Medicamento, ContatoParente, Prescricao, LogAdministracao, LogAdministracaoArquivado, AlertaEstoque, CatalogoMedicamento, FarmaciaParceira, EventoSaida, Membro, Relatorio # Importando os modelos necessários
+
+
+# Abaixo disso a contagem exata é barata; acima, as listagens usam a estimativa do banco
+LIMITE_CONTAGEM_EXATA = 10000
+
+
+def estimar_linhas(model, banco):
+    """
+    Estimativa do número de linhas da tabela sem COUNT(*): as estatísticas do planejador
+    no PostgreSQL, ou o maior ID nos demais bancos (chave inteira, lida pelo índice).
+    Retorna None se não houver estimativa.
+    """
+    connection = connections[banco]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            linha = cursor.fetchone()
+        return linha[0] if linha and linha[0] >= 0 else None     # -1: tabela ainda sem ANALYZE
+    if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'BigIntegerField'):
+        return model._default_manager.using(banco).aggregate(maior=Max('pk'))['maior'] or 0
+    return None
+
+
+class ContagemEstimadaPaginator(Paginator):
+    """
+    Paginador das tabelas grandes. Sem filtros, usa a estimativa do banco quando ela passa
+    de LIMITE_CONTAGEM_EXATA; com filtros ou busca, conta no máximo LIMITE_CONTAGEM_EXATA
+    linhas (COUNT sobre uma subconsulta com LIMIT), em vez de percorrer a tabela inteira.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimativa = estimar_linhas(queryset.model, queryset.db)
+            if estimativa is not None and estimativa > LIMITE_CONTAGEM_EXATA:
+                return estimativa
+        return queryset.order_by()[:LIMITE_CONTAGEM_EXATA].count()
+
+
+def busca_por_prefixo(termo, campo_catalogo=None, campos=()):
+    """
+    Condição de busca que usa índices: o nome normalizado do catálogo por prefixo
+    (índice api_catalogo_nome_busca_idx) e os demais campos também por prefixo.
+    """
+    condicao = Q()
+    if campo_catalogo:
+        condicao |= Q(**{f'{campo_catalogo}__startswith': CatalogoMedicamento.normalizar(termo)})
+    for campo in campos:
+        condicao |= Q(**{f'{campo}__istartswith': termo})
+    return condicao
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):     # Base das listagens com muitas linhas
+    paginator = ContagemEstimadaPaginator   # Sem COUNT(*) completo
+    show_full_result_count = False  # Evita a segunda contagem ("N no total") ao filtrar
+    busca_catalogo = None   # Caminho até CatalogoMedicamento.nome_busca, buscado por prefixo
+    busca_campos = ()   # Outros campos buscados por prefixo
+
+    def get_queryset(self, request):    # Também usado pelo autocompletar dos outros admins
+        queryset = super().get_queryset(request)
+        if self.list_select_related:
+            queryset = queryset.select_related(*self.list_select_related)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        if termo.isdigit():     # Busca direta pelo ID
+            return queryset.filter(pk=int(termo)), False
+        return queryset.filter(busca_por_prefixo(termo, self.busca_catalogo, self.busca_campos)), False
 
 
 class ContatoParenteInline(admin.TabularInline):    # Classe para exibir os contatos parentes de forma inline
@@ -11,18 +89,127 @@ class ContatoParenteInline(admin.TabularInline):    # Classe para exibir os cont
 class IdosoAdmin(admin.ModelAdmin):     # Classe para gerenciar o modelo Idoso no admin
     inlines = [ContatoParenteInline]    # Incluindo os contatos parentes como inline
     list_display = ('nome_completo', 'data_nascimento', 'genero', 'grupo')  # Campos a serem exibidos na lista
+    list_select_related = ('grupo',)    # Evita uma consulta por linha para exibir o grupo
     search_fields = ['nome_completo']   # Campos pesquisáveis
-    list_filter = ('grupo',)    # Filtro por grupo
+    autocomplete_fields = ('grupo',)    # Busca o grupo em vez de carregar todos em um <select>
+    # Sem list_filter por grupo (listaria todos os grupos): o filtro ?grupo__exact= vem do link em GrupoAdmin
+
+class MembroInline(admin.TabularInline):    # Membros do grupo e o papel de cada um
+    model = Membro
+    extra = 0
+    raw_id_fields = ('perfil',)     # Perfis não têm admin próprio para o autocompletar
 
 # Classe de Admin para o Grupo
 class GrupoAdmin(admin.ModelAdmin):   # Classe para gerenciar o modelo Grupo no admin
-    list_display = ('nome', 'cidade', 'admin')  # Campos a serem exibidos na lista
+    inlines = [MembroInline]
+    list_display = ('nome', 'cidade', 'admin', 'idosos')  # Campos a serem exibidos na lista
+    list_select_related = ('admin',)    # Evita uma consulta por linha para exibir o admin
     search_fields = ('nome', 'cidade')  # Campos pesquisáveis
     readonly_fields = ('codigo_acesso', 'data_criacao', 'data_atualizacao') # Campos somente leitura
 
+    @admin.display(description='Idosos')
+    def idosos(self, obj):  # Link para a listagem de idosos filtrada pelo grupo
+        url = reverse('admin:api_idoso_changelist')
+        return format_html('<a href="{}?grupo__exact={}">Ver idosos</a>', url, obj.pk)
+
+# Classe de Admin para o Catálogo de Medicamentos
+class CatalogoMedicamentoAdmin(TabelaGrandeAdmin):
+    list_display = ('nome_marca', 'principio_ativo', 'concentracao_valor', 'concentracao_unidade', 'forma_farmaceutica', 'fabricante')
+    search_fields = ('nome_busca',)     # Necessário para o autocompletar; a busca é por prefixo (ver TabelaGrandeAdmin)
+    busca_catalogo = 'nome_busca'
+    ordering = ('nome_busca',)
+
+# Classe de Admin para o Medicamento (estoque do grupo)
+class MedicamentoAdmin(TabelaGrandeAdmin):
+    list_display = ('id', '__str__', 'grupo', 'quantidade_estoque', 'estoque_minimo', 'abaixo_minimo')
+    list_select_related = ('catalogo', 'grupo')
+    list_filter = ('abaixo_minimo',)
+    search_fields = ('catalogo__nome_busca',)
+    busca_catalogo = 'catalogo__nome_busca'
+    autocomplete_fields = ('grupo', 'catalogo')
+
+# Classe de Admin para a Prescrição
+class PrescricaoAdmin(TabelaGrandeAdmin):
+    list_display = ('id', 'idoso', 'medicamento', 'horarios', 'frequencia', 'ativo')
+    list_select_related = ('idoso', 'medicamento__catalogo')
+    list_filter = ('ativo', 'frequencia')
+    search_fields = ('idoso__nome_completo', 'medicamento__catalogo__nome_busca')
+    busca_catalogo = 'medicamento__catalogo__nome_busca'
+    busca_campos = ('idoso__nome_completo',)
+    autocomplete_fields = ('idoso', 'medicamento')
+
+# Classe de Admin para os Registros de Administração (e os arquivados)
+class LogAdministracaoAdmin(TabelaGrandeAdmin):
+    list_display = ('id', 'data_hora_administracao', 'idoso', 'medicamento', 'status', 'usuario_responsavel')
+    list_select_related = ('prescricao__idoso', 'prescricao__medicamento__catalogo', 'usuario_responsavel')
+    list_filter = ('status',)
+    search_fields = ('prescricao__idoso__nome_completo', 'prescricao__medicamento__catalogo__nome_busca')
+    autocomplete_fields = ('prescricao',)
+    raw_id_fields = ('usuario_responsavel',)    # Usuários não têm admin próprio para o autocompletar
+    ordering = ('-id',)     # Ordem pela chave primária (índice), do mais recente para o mais antigo
+
+    @admin.display(description='Idoso')
+    def idoso(self, obj):
+        return obj.prescricao.idoso
+
+    @admin.display(description='Medicamento')
+    def medicamento(self, obj):
+        return obj.prescricao.medicamento
+
+    def get_search_results(self, request, queryset, search_term):
+        # Busca as prescrições que casam (tabela pequena) e filtra os logs pela chave estrangeira indexada
+        termo = search_term.strip()
+        if not termo or termo.isdigit():
+            return super().get_search_results(request, queryset, search_term)
+        prescricoes = Prescricao.objects.using(queryset.db).filter(
+            busca_por_prefixo(termo, PrescricaoAdmin.busca_catalogo, PrescricaoAdmin.busca_campos)
+        )
+        return queryset.filter(prescricao__in=prescricoes.values('pk')), False
+
+
+class AlertaEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('medicamento', 'motivo', 'quantidade_estoque', 'criado_em', 'resolvido_em')
+    list_select_related = ('medicamento__catalogo',)
+    raw_id_fields = ('medicamento',)
+
+
+class FarmaciaParceiraAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'grupo', 'url', 'ativo')
+    list_select_related = ('grupo',)
+    list_filter = ('ativo',)
+    search_fields = ('nome',)
+    autocomplete_fields = ('grupo',)
+
+
+class EventoSaidaAdmin(TabelaGrandeAdmin):
+    list_display = ('id', 'tipo', 'farmacia', 'situacao', 'tentativas', 'criado_em', 'proxima_tentativa', 'ultimo_erro')
+    list_select_related = ('farmacia',)
+    list_filter = ('situacao', 'tipo')
+    readonly_fields = ('grupo', 'farmacia', 'tipo', 'dados', 'criado_em', 'tentativas', 'entregue_em', 'ultimo_erro')
+    ordering = ('-id',)
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar os eventos selecionados')
+    def reenviar(self, request, queryset):   # Volta os eventos para a fila do worker (api/outbox.py)
+        queryset.update(situacao=EventoSaida.Situacao.PENDENTE, tentativas=0, proxima_tentativa=timezone.now())
+
+
+class RelatorioAdmin(admin.ModelAdmin):   # Relatórios em PDF pedidos pelos grupos (api/relatorios.py)
+    list_display = ('id', 'tipo', 'mes', 'idoso', 'situacao', 'progresso', 'tamanho', 'criado_em', 'concluido_em')
+    list_select_related = ('idoso',)
+    list_filter = ('situacao', 'tipo')
+    readonly_fields = ('grupo', 'idoso', 'tipo', 'mes', 'impressao_digital', 'arquivo', 'tamanho', 'solicitado_por', 'criado_em', 'atualizado_em', 'concluido_em', 'erro')
+    ordering = ('-id',)
+
 
 admin.site.register(Grupo, GrupoAdmin)  # Registrando o modelo Grupo com a classe de admin personalizada
 admin.site.register(Idoso, IdosoAdmin)  # Registrando o modelo Idoso com a classe de admin personalizada
-admin.site.register(Medicamento)        # Registrando o modelo Medicamento
-admin.site.register(Prescricao)     # Registrando o modelo Prescricao
-admin.site.register(LogAdministracao)       # Registrando o modelo LogAdministracao
\ No newline at end of file
+admin.site.register(Medicamento, MedicamentoAdmin)      # Registrando o modelo Medicamento
+admin.site.register(CatalogoMedicamento, CatalogoMedicamentoAdmin)  # Registrando o modelo CatalogoMedicamento (catálogo global)
+admin.site.register(Prescricao, PrescricaoAdmin)    # Registrando o modelo Prescricao
+admin.site.register(LogAdministracao, LogAdministracaoAdmin)    # Registrando o modelo LogAdministracao
+admin.site.register(LogAdministracaoArquivado, LogAdministracaoAdmin)  # Histórico arquivado, com a mesma listagem
+admin.site.register(AlertaEstoque, AlertaEstoqueAdmin)  # Registrando o modelo AlertaEstoque
+admin.site.register(FarmaciaParceira, FarmaciaParceiraAdmin)    # Registrando o modelo FarmaciaParceira (destinos dos webhooks)
+admin.site.register(EventoSaida, EventoSaidaAdmin)  # Registrando o modelo EventoSaida (caixa de saída)
+admin.site.register(Relatorio, RelatorioAdmin)  # Registrando o modelo Relatorio (PDFs gerados em segundo plano)
@@ -4,3 +4,6 @@ from django.apps import AppConfig   # Importando o AppConfig do Django para conf
 class ApiConfig(AppConfig):   # Classe de configuração do aplicativo API
     default_auto_field = 'django.db.models.BigAutoField'    # Campo padrão para auto incremento
     name = 'api'    # Nome do aplicativo, que deve corresponder ao diretório onde está localizado
+
+    def ready(self):
+        from . import checks  # noqa: F401  Registra as verificações da configuração (api/checks.py)
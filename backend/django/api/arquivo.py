@@ -0,0 +1,61 @@
+# api/arquivo.py - Arquivamento do histórico de administrações (tabela quente x fria).
+
+import datetime
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LogAdministracao, LogAdministracaoArquivado
+
+
+def data_de_corte():
+    """
+    Momento a partir do qual os logs são considerados antigos (e vão para o arquivo). As listagens
+    só consultam o arquivo para períodos que começam antes dele, então é o único corte usado.
+    """
+    return timezone.now() - datetime.timedelta(days=settings.LOG_ARQUIVO_DIAS)
+
+
+def arquivar_lote(banco, corte, tamanho_lote, grupo_id=None):
+    """
+    Move um lote de logs anteriores ao corte para LogAdministracaoArquivado, em uma transação.
+    Retorna quantos logs foram movidos (0 quando não há mais nada a arquivar).
+    """
+    antigos = LogAdministracao.objects.using(banco).filter(data_hora_administracao__lt=corte)
+    if grupo_id:
+        antigos = antigos.filter(prescricao__idoso__grupo_id=grupo_id)
+    with transaction.atomic(using=banco):
+        lote = list(antigos.order_by('pk')[:tamanho_lote])
+        if not lote:
+            return 0
+        LogAdministracaoArquivado.objects.using(banco).bulk_create(
+            [LogAdministracaoArquivado.de_log(log) for log in lote], ignore_conflicts=True,
+        )
+        LogAdministracao.objects.using(banco).filter(pk__in=[log.pk for log in lote]).delete()
+    return len(lote)
+
+
+class LogsCombinados:
+    """
+    Sequência paginável que junta os logs quentes e os arquivados, ordenados do mais
+    recente para o mais antigo. Para montar uma página, busca no máximo 'fim' linhas de
+    cada tabela (já ordenadas pelo banco) e as intercala, sem carregar o histórico inteiro.
+    """
+    def __init__(self, *querysets):
+        self.querysets = [qs.order_by('-data_hora_administracao', '-pk') for qs in querysets]
+
+    def count(self):
+        return sum(qs.count() for qs in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        inicio, fim = item.start or 0, item.stop
+        partes = [list(qs[:fim]) if fim is not None else list(qs) for qs in self.querysets]
+        juntos = heapq.merge(*partes, key=lambda log: (log.data_hora_administracao, log.pk), reverse=True)
+        return list(juntos)[inicio:fim]
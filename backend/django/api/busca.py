@@ -0,0 +1,98 @@
+# api/busca.py - Busca de texto completo nas anotações clínicas do grupo.
+#
+# Os textos (Idoso.doencas/condicoes, Prescricao.instrucoes e LogAdministracao.observacoes)
+# são copiados para DocumentoBusca pelos signals de api/models.py, e o banco mantém o índice:
+# - SQLite: tabela virtual FTS5 'api_documentobusca_fts' (atualizada por triggers), ranking bm25;
+# - PostgreSQL: índice GIN sobre to_tsvector('portuguese', titulo || ' ' || texto), ranking ts_rank.
+# Os demais bancos caem em uma busca simples por 'icontains', sem ranking.
+
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import DocumentoBusca
+
+LIMITE_RESULTADOS = 50
+
+# Os documentos de idosos e medicamentos apagados (exclusão lógica, à espera do expurgo) saem
+# já na consulta, antes do LIMIT. Os de idosos não têm prescrição: o LEFT JOIN deixa m.* nulo.
+SEM_APAGADOS = """
+    JOIN api_idoso i ON i.id = d.idoso_id
+    LEFT JOIN api_prescricao p ON p.id = d.prescricao_id
+    LEFT JOIN api_medicamento m ON m.id = p.medicamento_id
+"""
+
+SQL_SQLITE = """
+    SELECT d.id, -bm25(api_documentobusca_fts) AS relevancia,
+           snippet(api_documentobusca_fts, 1, '[', ']', '…', 16) AS trecho
+    FROM api_documentobusca_fts
+    JOIN api_documentobusca d ON d.id = api_documentobusca_fts.rowid
+""" + SEM_APAGADOS + """
+    WHERE api_documentobusca_fts MATCH %s AND d.grupo_id = %s AND i.apagado_em IS NULL AND m.apagado_em IS NULL
+    ORDER BY relevancia DESC
+    LIMIT %s
+"""
+
+# A expressão do to_tsvector deve ser idêntica à do índice (migração 0009) para que ele seja usado.
+SQL_POSTGRESQL = """
+    SELECT d.id, ts_rank(to_tsvector('portuguese', d.titulo || ' ' || d.texto), q.consulta) AS relevancia,
+           ts_headline('portuguese', d.texto, q.consulta, 'StartSel=[, StopSel=], MaxWords=24, MinWords=8') AS trecho
+    FROM websearch_to_tsquery('portuguese', %s) AS q(consulta), api_documentobusca d
+""" + SEM_APAGADOS + """
+    WHERE to_tsvector('portuguese', d.titulo || ' ' || d.texto) @@ q.consulta AND d.grupo_id = %s
+      AND i.apagado_em IS NULL AND m.apagado_em IS NULL
+    ORDER BY relevancia DESC
+    LIMIT %s
+"""
+
+
+def termos_da_consulta(consulta):
+    return re.findall(r'\w+', consulta)
+
+
+def consulta_fts5(termos):
+    """Consulta FTS5 segura: cada termo entre aspas (sem operadores do usuário) e por prefixo."""
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+
+def buscar(grupo_id, consulta, limite=LIMITE_RESULTADOS):
+    """
+    Documentos do grupo que contêm todos os termos da consulta, do mais relevante para o
+    menos relevante. Cada documento vem com os atributos 'relevancia' e 'trecho'.
+    """
+    termos = termos_da_consulta(consulta)
+    if not termos:
+        return []
+    banco = router.db_for_read(DocumentoBusca)
+    connection = connections[banco]
+    grupo = DocumentoBusca._meta.get_field('grupo').target_field.get_db_prep_value(grupo_id, connection)
+
+    if connection.vendor == 'sqlite':
+        sql, parametros = SQL_SQLITE, [consulta_fts5(termos), grupo, limite]
+    elif connection.vendor == 'postgresql':
+        sql, parametros = SQL_POSTGRESQL, [consulta, grupo, limite]
+    else:
+        documentos = DocumentoBusca.objects.using(banco).filter(
+            Q(prescricao__isnull=True) | Q(prescricao__medicamento__apagado_em__isnull=True),
+            grupo_id=grupo_id, idoso__apagado_em__isnull=True,
+        )
+        for termo in termos:
+            documentos = documentos.filter(texto__icontains=termo)
+        documentos = list(documentos.select_related('idoso')[:limite])
+        for documento in documentos:
+            documento.relevancia, documento.trecho = None, documento.texto
+        return documentos
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        linhas = cursor.fetchall()
+    documentos = DocumentoBusca.objects.using(banco).select_related('idoso').in_bulk([linha[0] for linha in linhas])
+    resultado = []
+    for pk, relevancia, trecho in linhas:
+        documento = documentos.get(pk)
+        if documento is None:   # Removido entre as duas consultas
+            continue
+        documento.relevancia, documento.trecho = relevancia, trecho
+        resultado.append(documento)
+    return resultado
@@ -0,0 +1,99 @@
+# api/cache.py - Cache das respostas já renderizadas, com chaves versionadas por grupo.
+#
+# Cada grupo tem um número de versão guardado no cache 'default'. Qualquer escrita
+# nos modelos do grupo (ver os receivers em models.py) troca essa versão, o que
+# torna inalcançáveis todas as respostas antigas do grupo sem precisar apagá-las:
+# elas simplesmente saem do cache pela política LRU do backend.
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from .db_routers import lendo_de_replica
+
+
+def _chave_versao(grupo_pk):
+    return f'grupo-versao:{grupo_pk}'
+
+
+def versao_grupo(grupo_pk):
+    """
+    Retorna a versão atual dos dados do grupo.
+    Se a versão ainda não existe (ou foi removida do cache), cria uma nova a partir
+    do relógio, para que nunca coincida com uma versão usada anteriormente.
+    """
+    cache = caches['default']
+    chave = _chave_versao(grupo_pk)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, time.time_ns(), timeout=None)
+        versao = cache.get(chave)
+    return versao
+
+
+def invalidar_grupo(grupo_pk):
+    """Troca a versão do grupo, invalidando todas as respostas em cache dele."""
+    if grupo_pk is None:
+        return
+    cache = caches['default']
+    chave = _chave_versao(grupo_pk)
+    try:
+        cache.incr(chave)
+    except ValueError:  # A chave não existe mais no cache
+        cache.set(chave, time.time_ns(), timeout=None)
+
+
+class CacheRespostaMixin:
+    """
+    Mixin para ViewSets aninhadas em /grupos/{grupo_pk}/ que guarda os bytes da
+    resposta renderizada das ações de leitura. Uma requisição repetida com a mesma
+    versão do grupo não toca no ORM nem nos serializers.
+
+    A chave inclui grupo, versão, ViewSet, ação, pk do objeto, formato de saída
+    (JSON, MessagePack...) e os parâmetros da query string.
+    As permissões continuam sendo verificadas em initial(), antes da leitura do cache.
+    """
+    acoes_em_cache = ('list', 'retrieve')
+
+    def _chave_resposta(self, request):
+        grupo_pk = self.kwargs.get('grupo_pk')
+        if not grupo_pk or self.action not in self.acoes_em_cache:
+            return None
+        parametros = '&'.join(f'{k}={v}' for k, valores in sorted(request.query_params.lists()) for v in valores)
+        resumo = hashlib.md5(parametros.encode(), usedforsecurity=False).hexdigest()
+        formato = getattr(request.accepted_renderer, 'format', '')
+        return ':'.join([
+            'resposta', str(grupo_pk), str(versao_grupo(grupo_pk)), self.basename, self.action,
+            str(self.kwargs.get('pk', '')), formato, resumo,
+        ])
+
+    def _resposta_em_cache(self, metodo, request, *args, **kwargs):
+        self._chave_cache_resposta = self._chave_resposta(request)
+        if self._chave_cache_resposta:
+            guardado = caches[settings.CACHE_RESPOSTAS].get(self._chave_cache_resposta)
+            if guardado is not None:
+                conteudo, tipo_conteudo = guardado
+                return HttpResponse(conteudo, content_type=tipo_conteudo)
+        return metodo(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self._resposta_em_cache(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._resposta_em_cache(super().retrieve, request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        chave = getattr(self, '_chave_cache_resposta', None)
+        if chave and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            # Uma réplica atrasada pode ter devolvido dados anteriores à versão atual;
+            # nesse caso a resposta fica em cache só pelo tempo de fixação no primário.
+            timeout = settings.REPLICA_FIXACAO_SEGUNDOS if lendo_de_replica() else DEFAULT_TIMEOUT
+            caches[settings.CACHE_RESPOSTAS].set(chave, (response.rendered_content, response['Content-Type']), timeout)
+        return response
@@ -0,0 +1,203 @@
+# api/carga.py - Ferramentas para gerar carga concorrente contra um servidor da API.
+# Usa apenas a biblioteca padrão (asyncio), para que o gerador possa rodar em
+# qualquer máquina que tenha o projeto instalado, sem dependências extras.
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+class ErroHTTP(Exception):
+    """Erro de protocolo ao conversar com o servidor (conexão caiu, resposta malformada, etc.)."""
+
+
+class Estatisticas:
+    """
+    Acumula as latências (em segundos) e os erros de cada endpoint exercitado.
+    O 'rotulo' agrupa URLs equivalentes (ex: todas as chamadas a /prescricoes/{id}/administrar/).
+    """
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.inicio = None
+        self.fim = None
+
+    def registrar(self, rotulo, duracao, sucesso):
+        self.latencias[rotulo].append(duracao)
+        if not sucesso:
+            self.erros[rotulo] += 1
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+
+    def finalizar(self):
+        self.fim = time.perf_counter()
+
+    @property
+    def duracao(self):
+        if self.inicio is None:
+            return 0.0
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    @staticmethod
+    def percentil(valores_ordenados, p):
+        """Percentil pelo método do 'nearest rank' sobre uma lista já ordenada."""
+        if not valores_ordenados:
+            return 0.0
+        indice = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1))
+        return valores_ordenados[indice]
+
+    def resumo(self):
+        """Retorna uma linha por endpoint com vazão (req/s) e percentis de latência em ms."""
+        duracao = self.duracao or 1e-9
+        linhas = []
+        for rotulo in sorted(self.latencias):
+            valores = sorted(self.latencias[rotulo])
+            linhas.append({
+                'endpoint': rotulo,
+                'requisicoes': len(valores),
+                'erros': self.erros[rotulo],
+                'req_s': len(valores) / duracao,
+                'p50': self.percentil(valores, 50) * 1000,
+                'p90': self.percentil(valores, 90) * 1000,
+                'p95': self.percentil(valores, 95) * 1000,
+                'p99': self.percentil(valores, 99) * 1000,
+                'max': valores[-1] * 1000,
+            })
+        return linhas
+
+    def tabela(self):
+        """Formata o resumo como uma tabela de texto para o terminal."""
+        cabecalho = f"{'endpoint':<38} {'n':>7} {'erros':>6} {'req/s':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+        linhas = [cabecalho, '-' * len(cabecalho)]
+        total = erros = 0
+        for linha in self.resumo():
+            total += linha['requisicoes']
+            erros += linha['erros']
+            linhas.append(
+                f"{linha['endpoint']:<38} {linha['requisicoes']:>7} {linha['erros']:>6} {linha['req_s']:>8.1f} "
+                f"{linha['p50']:>8.1f} {linha['p90']:>8.1f} {linha['p95']:>8.1f} {linha['p99']:>8.1f} {linha['max']:>8.1f}"
+            )
+        linhas.append('-' * len(cabecalho))
+        linhas.append(f"Total: {total} requisições, {erros} erros em {self.duracao:.1f}s ({total / (self.duracao or 1e-9):.1f} req/s). Latências em ms.")
+        return '\n'.join(linhas)
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP/1.1 mínimo sobre asyncio, com conexão persistente (keep-alive).
+    Cada cuidador simulado usa o seu próprio cliente, como faria um celular real.
+    """
+    def __init__(self, url_base, estatisticas=None, timeout=30):
+        partes = urlsplit(url_base)
+        if partes.scheme != 'http':
+            raise ValueError('O gerador de carga suporta apenas URLs http:// (servidor local).')
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.estatisticas = estatisticas
+        self.timeout = timeout
+        self.token = None
+        self._leitor = None
+        self._escritor = None
+
+    async def _conectar(self):
+        self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+
+    async def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            try:
+                await self._escritor.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._leitor = self._escritor = None
+
+    async def requisicao(self, metodo, caminho, rotulo=None, dados=None, cabecalhos=None):
+        """
+        Envia uma requisição e devolve (status, corpo decodificado).
+        Se a conexão persistente tiver sido fechada pelo servidor, reconecta uma vez.
+        """
+        corpo = json.dumps(dados).encode() if dados is not None else b''
+        linhas = [
+            f'{metodo} {caminho} HTTP/1.1',
+            f'Host: {self.host}:{self.porta}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+            f'Content-Length: {len(corpo)}',
+        ]
+        if dados is not None:
+            linhas.append('Content-Type: application/json')
+        if self.token:
+            linhas.append(f'Authorization: Token {self.token}')
+        for nome, valor in (cabecalhos or {}).items():
+            linhas.append(f'{nome}: {valor}')
+        bruto = ('\r\n'.join(linhas) + '\r\n\r\n').encode() + corpo
+
+        inicio = time.perf_counter()
+        status, conteudo = 0, b''
+        try:
+            for tentativa in range(2):
+                try:
+                    if self._escritor is None:
+                        await self._conectar()
+                    self._escritor.write(bruto)
+                    await self._escritor.drain()
+                    status, conteudo = await asyncio.wait_for(self._ler_resposta(), self.timeout)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError, ErroHTTP):
+                    await self.fechar()
+                    if tentativa:
+                        raise
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErroHTTP):
+            status = 0
+        duracao = time.perf_counter() - inicio
+
+        if self.estatisticas is not None and rotulo:
+            self.estatisticas.registrar(rotulo, duracao, 200 <= status < 400)
+        try:
+            return status, json.loads(conteudo) if conteudo else None
+        except ValueError:
+            return status, None
+
+    async def _ler_resposta(self):
+        linha_status = await self._leitor.readline()
+        if not linha_status:
+            raise ErroHTTP('Conexão fechada pelo servidor.')
+        try:
+            status = int(linha_status.split()[1])
+        except (IndexError, ValueError):
+            raise ErroHTTP(f'Linha de status inválida: {linha_status!r}')
+
+        cabecalhos = {}
+        while True:
+            linha = await self._leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        if 'content-length' in cabecalhos:
+            conteudo = await self._leitor.readexactly(int(cabecalhos['content-length']))
+        elif cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+            conteudo = await self._ler_chunked()
+        elif status in (204, 304):
+            conteudo = b''
+        else:
+            conteudo = await self._leitor.read()
+            cabecalhos['connection'] = 'close'
+
+        if cabecalhos.get('connection', '').lower() == 'close':
+            await self.fechar()
+        return status, conteudo
+
+    async def _ler_chunked(self):
+        partes = []
+        while True:
+            tamanho = int((await self._leitor.readline()).split(b';')[0], 16)
+            if tamanho == 0:
+                await self._leitor.readline()
+                return b''.join(partes)
+            partes.append(await self._leitor.readexactly(tamanho))
+            await self._leitor.readline()
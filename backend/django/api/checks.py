@@ -0,0 +1,26 @@
+# api/checks.py - Verificações da configuração ('python manage.py check', rodadas também ao subir o servidor).
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends de cache que guardam os dados só no processo atual (ou não guardam nada)
+CACHES_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def verificar_cache_das_replicas(app_configs, **kwargs):
+    """
+    O ReplicaLeituraMiddleware guarda no cache 'default' quais clientes escreveram há pouco
+    (leituras fixadas no primário). Com um cache por processo, a próxima requisição do cliente
+    pode cair em outro worker, ler da réplica atrasada e não enxergar a própria escrita.
+    """
+    if settings.DATABASE_REPLICAS and settings.CACHES['default']['BACKEND'] in CACHES_LOCAIS:
+        return [Error(
+            'DATABASE_REPLICA_URLS exige um cache compartilhado entre os workers.',
+            hint='Defina REDIS_URL: a fixação das leituras no primário após uma escrita fica no cache "default".',
+            id='api.E001',
+        )]
+    return []
@@ -0,0 +1,117 @@
+# api/db_routers.py - Roteadores de banco de dados (settings.DATABASE_ROUTERS).
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+# Banco (shard) dos dados do grupo da requisição atual. É definido pelo
+# api.middleware.ShardMiddleware a partir do 'grupo_pk' da URL, ou por
+# api.shards.no_banco_do_grupo() fora de requisições (comandos, workers).
+_banco_do_grupo = ContextVar('banco_do_grupo', default=None)
+
+# Indica se a requisição atual pode ler das réplicas. É definido pelo
+# api.middleware.ReplicaLeituraMiddleware apenas para métodos seguros (GET/HEAD/OPTIONS)
+# de clientes que não escreveram nada recentemente.
+_leitura_em_replica = ContextVar('leitura_em_replica', default=False)
+
+
+def permitir_leitura_em_replica(permitido):
+    """Define se o contexto atual pode ler das réplicas. Retorna o token para ContextVar.reset()."""
+    return _leitura_em_replica.set(permitido)
+
+
+def restaurar_leitura_em_replica(token):
+    _leitura_em_replica.reset(token)
+
+
+def definir_banco_do_grupo(alias):
+    """Define o shard do contexto atual. Retorna o token para ContextVar.reset()."""
+    return _banco_do_grupo.set(alias)
+
+
+def restaurar_banco_do_grupo(token):
+    _banco_do_grupo.reset(token)
+
+
+def banco_atual():
+    """Alias do banco onde estão os dados do grupo do contexto atual ('default' se não houver)."""
+    return _banco_do_grupo.get() or 'default'
+
+
+def eh_modelo_do_grupo(model):
+    """
+    True para os modelos particionados por grupo (atributo DADOS_DO_GRUPO no modelo).
+    Tabelas intermediárias automáticas de M2M seguem o modelo particionado que referenciam
+    (ex: PerfilUsuario.responsaveis fica junto dos Idosos).
+    """
+    if getattr(model, 'DADOS_DO_GRUPO', False):
+        return True
+    if model._meta.auto_created:
+        return any(
+            getattr(campo.related_model, 'DADOS_DO_GRUPO', False)
+            for campo in model._meta.fields if campo.is_relation
+        )
+    return False
+
+
+def lendo_de_replica():
+    """True se as leituras do contexto atual estão sendo enviadas às réplicas."""
+    return bool(settings.DATABASE_REPLICAS) and _leitura_em_replica.get() and not connections['default'].in_atomic_block
+
+
+class ShardRouter:
+    """
+    Envia os dados particionados por grupo (Idoso, Medicamento, Prescricao, logs...)
+    para o banco do grupo definido em Grupo.banco. Usuários, autenticação e o
+    próprio Grupo continuam no banco global ('default').
+
+    Retorna None para os modelos globais e para grupos que estão no 'default',
+    deixando a decisão para o próximo roteador (ReplicaRouter).
+    """
+    def _banco(self, model, **hints):
+        if not settings.DATABASE_SHARDS or not eh_modelo_do_grupo(model):
+            return None
+        instancia = hints.get('instance')
+        if instancia is not None and eh_modelo_do_grupo(type(instancia)) and instancia._state.db:
+            banco = instancia._state.db     # Mantém objetos relacionados no banco de onde vieram
+        else:
+            banco = _banco_do_grupo.get()
+        return banco if banco in settings.DATABASE_SHARDS else None
+
+    def db_for_read(self, model, **hints):
+        return self._banco(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._banco(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Objetos globais (Grupo, Usuario) são espelhados nos shards, então a relação é válida.
+        bancos = {'default', *settings.DATABASE_REPLICAS, *settings.DATABASE_SHARDS}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+
+class ReplicaRouter:
+    """
+    Envia as leituras de requisições seguras para uma das réplicas configuradas em
+    DATABASE_REPLICA_URLS e todas as escritas para o banco primário ('default').
+
+    Leituras feitas dentro de um bloco transaction.atomic (ex: 'administrar' e 'destroy')
+    permanecem no primário, para enxergar as próprias escritas e manter os locks.
+    """
+    def db_for_read(self, model, **hints):
+        if lendo_de_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {'default', *settings.DATABASE_REPLICAS, *settings.DATABASE_SHARDS}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
@@ -0,0 +1,89 @@
+# api/exclusao.py - Expurgo dos grupos, idosos e medicamentos apagados (exclusão lógica).
+#
+# Apagar pela API só marca 'apagado_em' (ver apagar() em Grupo, Idoso e Medicamento): a
+# resposta é imediata, o histórico de administração continua no banco e os gerenciadores
+# padrão (SemApagadosManager) escondem as linhas marcadas. Passados EXCLUSAO_RETENCAO_DIAS,
+# o comando 'expurgar_apagados' remove os dados em lotes pequenos, cada um em uma transação
+# curta, dos dependentes para o dono: o CASCADE final não encontra quase nada para apagar.
+
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    AlertaEstoque, DocumentoBusca, Grupo, Idoso, LogAdministracao, LogAdministracaoArquivado, Medicamento,
+    Prescricao, Relatorio,
+)
+from .shards import no_banco_do_grupo, tabelas_do_grupo
+
+
+def data_de_corte(dias=None):
+    """Momento até o qual os dados apagados já podem ser expurgados."""
+    return timezone.now() - datetime.timedelta(days=settings.EXCLUSAO_RETENCAO_DIAS if dias is None else dias)
+
+
+def apagar_em_lotes(queryset, banco, tamanho_lote):
+    """Apaga as linhas do queryset em lotes, uma transação por lote. Retorna quantas foram apagadas."""
+    total = 0
+    while True:
+        with transaction.atomic(using=banco):
+            ids = list(queryset.using(banco).values_list('pk', flat=True)[:tamanho_lote])
+            if not ids:
+                return total
+            queryset.model._base_manager.using(banco).filter(pk__in=ids).delete()
+        total += len(ids)
+
+
+def expurgar_idoso(idoso, tamanho_lote):
+    """Remove de vez um idoso apagado: histórico, documentos, relatórios, prescrições e, por fim, o idoso."""
+    banco = idoso._state.db
+    with no_banco_do_grupo(idoso.grupo_id):     # Os signals das prescrições consultam o banco do grupo
+        removidos = sum(apagar_em_lotes(queryset, banco, tamanho_lote) for queryset in (
+            LogAdministracao.objects.filter(prescricao__idoso=idoso),
+            LogAdministracaoArquivado.objects.filter(prescricao__idoso=idoso),
+            DocumentoBusca.objects.filter(idoso=idoso),
+            Relatorio.objects.filter(idoso=idoso),
+            Prescricao.objects.filter(idoso=idoso),
+        ))
+        return removidos + idoso.delete(using=banco)[0]
+
+
+def expurgar_medicamento(medicamento, tamanho_lote):
+    """Remove de vez um medicamento apagado: histórico, documentos, prescrições, alertas e o medicamento."""
+    banco = medicamento._state.db
+    with no_banco_do_grupo(medicamento.grupo_id):
+        removidos = sum(apagar_em_lotes(queryset, banco, tamanho_lote) for queryset in (
+            LogAdministracao.objects.filter(prescricao__medicamento=medicamento),
+            LogAdministracaoArquivado.objects.filter(prescricao__medicamento=medicamento),
+            DocumentoBusca.objects.filter(prescricao__medicamento=medicamento),
+            Prescricao.objects.filter(medicamento=medicamento),
+            AlertaEstoque.objects.filter(medicamento=medicamento),
+        ))
+        return removidos + medicamento.delete(using=banco)[0]
+
+
+def expurgar_grupo(grupo, tamanho_lote):
+    """
+    Remove de vez um grupo apagado: os dados no seu banco, na ordem inversa das dependências
+    (como na limpeza da origem do 'mover_grupo'), e depois o grupo, os vínculos e a cópia no shard.
+    """
+    removidos = 0
+    with no_banco_do_grupo(grupo.pk):
+        for queryset in reversed(tabelas_do_grupo(grupo)):
+            removidos += apagar_em_lotes(queryset, grupo.banco, tamanho_lote)
+    return removidos + grupo.delete()[0]
+
+
+def grupos_vencidos(corte):
+    """Grupos apagados antes do corte (índice parcial grupo_apagado_idx). Os em migração ficam para depois."""
+    return Grupo.todos.using('default').filter(apagado_em__lt=corte, em_migracao=False).order_by('apagado_em')
+
+
+def vencidos(modelo, banco, corte):
+    """Idosos ou medicamentos do banco apagados antes do corte (índices parciais *_apagado_idx)."""
+    return modelo.todos.using(banco).filter(apagado_em__lt=corte).order_by('apagado_em')
+
+
+EXPURGOS = [(Idoso, expurgar_idoso), (Medicamento, expurgar_medicamento)]
@@ -0,0 +1,443 @@
+# api/exportacao.py - Exportação e importação de um grupo inteiro, para levá-lo a outra instalação.
+#
+# O arquivo é um JSON Lines comprimido com gzip, versionado pelo cabeçalho:
+# - 1ª linha: {"formato", "versao", "exportado_em", "grupo": {...}, "admin": ID do usuário};
+# - uma seção por tabela: {"tabela": nome, "campos": [...]} seguida de uma linha (lista de
+#   valores, na ordem de "campos") por registro, em ordem de dependência das chaves;
+# - última linha: {"fim": total de registros}, que denuncia um arquivo truncado.
+# A exportação lê cada tabela com iterator() e comprime aos poucos; a importação lê uma linha
+# por vez e grava em lotes com bulk_create, trocando os IDs antigos pelos novos. Em memória
+# ficam apenas os mapas de IDs das tabelas referenciadas por outras (usuários, idosos,
+# medicamentos, prescrições e os logs com observação, que têm documento de busca), nunca o
+# histórico de administrações. Os usuários são reconhecidos pelo e-mail; a caixa de saída
+# (EventoSaida) e os relatórios em PDF não são levados.
+
+import datetime
+import decimal
+import functools
+import gzip
+import json
+import uuid
+import zlib
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .models import (
+    AlertaEstoque, CatalogoMedicamento, ContatoParente, DocumentoBusca, FarmaciaParceira, Grupo, Idoso, LogAdministracao,
+    LogAdministracaoArquivado, Medicamento, Membro, PerfilUsuario, Prescricao, Usuario,
+)
+from .shards import espelhar_grupo, espelhar_usuario
+
+Responsaveis = PerfilUsuario.responsaveis.through
+
+FORMATO = 'dev_wm.grupo'
+VERSAO = 1
+TAMANHO_LOTE = 2000
+
+# Campos do grupo levados no cabeçalho; ID, código de acesso e banco são novos na importação
+CAMPOS_DO_GRUPO = ('nome', 'senha_hash', 'endereco', 'telefone', 'cidade', 'estado', 'cep', 'nome_responsavel')
+
+# Tabelas do grupo e o caminho até ele, na ordem em que são gravadas na importação
+TABELAS = [
+    (Idoso, 'grupo'),
+    (ContatoParente, 'idoso__grupo'),
+    (Medicamento, 'grupo'),
+    (AlertaEstoque, 'medicamento__grupo'),
+    (Prescricao, 'idoso__grupo'),
+    (Responsaveis, 'idoso__grupo'),     # Gravado como (idoso, usuário): o perfil é outro na nova instalação
+    (LogAdministracaoArquivado, 'prescricao__idoso__grupo'),     # Antes dos quentes (ver Importacao._gravar_logs)
+    (LogAdministracao, 'prescricao__idoso__grupo'),
+    (DocumentoBusca, 'grupo'),
+    (FarmaciaParceira, 'grupo'),
+]
+
+# Nome da seção no arquivo -> modelo
+MODELOS_POR_TABELA = {
+    'responsaveis': Responsaveis,
+    **{modelo._meta.label_lower: modelo for modelo in [CatalogoMedicamento, *(modelo for modelo, _ in TABELAS if modelo is not Responsaveis)]},
+}
+
+# Tipos que não existem em JSON e voltam do texto com Field.to_python na importação
+CAMPOS_CONVERTIDOS = (models.DateTimeField, models.DateField, models.TimeField, models.DecimalField, models.UUIDField)
+# Tipos que o driver do banco não grava direto: passam por get_db_prep_save em _inserir
+CAMPOS_PREPARADOS = (*CAMPOS_CONVERTIDOS, models.JSONField)
+
+
+class ArquivoInvalido(ValueError):
+    """O arquivo não é uma exportação de grupo, está truncado ou é de uma versão mais nova."""
+
+
+def _inserir(banco, modelo, linhas):
+    """
+    INSERT em lote (executemany) sem montar objetos do ORM, para as tabelas cujos IDs novos não são
+    citados depois. 'linhas': dicionários {attname: valor}, todos com as mesmas chaves.
+    """
+    if not linhas:
+        return
+    conexao = connections[banco]
+    por_nome = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+    nomes = list(linhas[0])
+    preparos = []
+    for nome in nomes:
+        campo = por_nome[nome]
+        tipo = campo.target_field if campo.is_relation else campo
+        preparos.append(functools.partial(campo.get_db_prep_save, connection=conexao) if isinstance(tipo, CAMPOS_PREPARADOS) else None)
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        conexao.ops.quote_name(modelo._meta.db_table),
+        ', '.join(conexao.ops.quote_name(por_nome[nome].column) for nome in nomes),
+        ', '.join(['%s'] * len(nomes)),
+    )
+    with conexao.cursor() as cursor:
+        cursor.executemany(sql, [
+            [valor if preparo is None or valor is None else preparo(valor) for valor, preparo in zip(map(linha.get, nomes), preparos)]
+            for linha in linhas
+        ])
+
+
+def _inserir_consulta(banco, modelo, campos, queryset):
+    """INSERT INTO ... SELECT: grava na tabela do modelo as linhas da consulta (values_list dos mesmos campos), sem trazê-las ao Python."""
+    conexao = connections[banco]
+    select, parametros = queryset.query.get_compiler(using=banco).as_sql()
+    colunas = ', '.join(conexao.ops.quote_name(modelo._meta.get_field(nome).column) for nome in campos)
+    with conexao.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {conexao.ops.quote_name(modelo._meta.db_table)} ({colunas}) {select}', parametros)
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime.date, datetime.time)):   # Inclui datetime, com o fuso e os microssegundos
+        return valor.isoformat()
+    if isinstance(valor, (decimal.Decimal, uuid.UUID)):
+        return str(valor)
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável.')
+
+
+def _usuarios(grupo, banco):
+    """Membros do grupo (com o papel) e os demais usuários citados nos dados dele: responsáveis e autores dos logs."""
+    vinculos = {
+        perfil__user_id: (papel, entrou_em)
+        for perfil__user_id, papel, entrou_em in Membro.objects.using('default').filter(grupo_id=grupo.pk)
+        .values_list('perfil__user_id', 'papel', 'entrou_em')
+    }
+    ids = {grupo.admin_id, *vinculos}
+    ids.update(
+        Responsaveis.objects.using(banco).filter(idoso__grupo_id=grupo.pk).values_list('perfilusuario__user_id', flat=True)
+    )
+    for modelo in (LogAdministracao, LogAdministracaoArquivado):
+        ids.update(
+            modelo.objects.using(banco).filter(prescricao__idoso__grupo_id=grupo.pk, usuario_responsavel__isnull=False)
+            .values_list('usuario_responsavel_id', flat=True).distinct()
+        )
+    for pk, email, nome_completo in Usuario.objects.using('default').filter(pk__in=ids).order_by('pk').values_list('pk', 'email', 'nome_completo'):
+        yield [pk, email, nome_completo, *vinculos.get(pk, (None, None))]
+
+
+def _secoes(grupo, banco):
+    """(nome da tabela, campos, linhas) de cada seção do arquivo."""
+    yield 'usuarios', ['id', 'email', 'nome_completo', 'papel', 'entrou_em'], _usuarios(grupo, banco)
+    # Só os itens do catálogo global usados pelo estoque do grupo
+    catalogo = CatalogoMedicamento.objects.using(banco).filter(
+        pk__in=Medicamento.todos.using(banco).filter(grupo_id=grupo.pk).values('catalogo_id'),
+    )
+    # _base_manager: os idosos e medicamentos apagados (e ainda não expurgados) também vão no arquivo
+    querysets = [(CatalogoMedicamento, catalogo)]
+    querysets += [(modelo, modelo._base_manager.using(banco).filter(**{caminho: grupo.pk})) for modelo, caminho in TABELAS]
+    for modelo, queryset in querysets:
+        if modelo is Responsaveis:
+            campos, colunas, tabela = ['idoso_id', 'user_id'], ['idoso_id', 'perfilusuario__user_id'], 'responsaveis'
+        else:
+            campos = colunas = [campo.attname for campo in modelo._meta.concrete_fields]
+            tabela = modelo._meta.label_lower
+        yield tabela, campos, queryset.order_by('pk').values_list(*colunas).iterator(chunk_size=TAMANHO_LOTE)
+
+
+def _linhas(grupo, banco):
+    yield {
+        'formato': FORMATO, 'versao': VERSAO, 'exportado_em': timezone.now(),
+        'grupo': {campo: getattr(grupo, campo) for campo in CAMPOS_DO_GRUPO}, 'admin': grupo.admin_id,
+    }
+    total = 0
+    for tabela, campos, linhas in _secoes(grupo, banco):
+        yield {'tabela': tabela, 'campos': campos}
+        for linha in linhas:
+            total += 1
+            yield linha
+    yield {'fim': total}
+
+
+def exportar(grupo, banco=None):
+    """
+    Gera, aos poucos, os bytes do arquivo comprimido do grupo. Os dados são lidos do banco
+    informado (padrão: o do grupo), e não do contexto da requisição: o gerador continua sendo
+    consumido pela resposta em streaming depois que a view retorna.
+    """
+    banco = banco or grupo.banco
+    compressor = zlib.compressobj(wbits=31)     # 16 + 15: cabeçalho gzip
+    codificar = json.JSONEncoder(default=_valor_json, ensure_ascii=False, separators=(',', ':')).encode
+    pendentes = []
+    for linha in _linhas(grupo, banco):
+        pendentes.append(codificar(linha))
+        if len(pendentes) >= TAMANHO_LOTE:
+            pendentes.append('')
+            dados = compressor.compress('\n'.join(pendentes).encode())
+            pendentes = []
+            if dados:
+                yield dados
+    pendentes.append('')
+    yield compressor.compress('\n'.join(pendentes).encode()) + compressor.flush()
+
+
+def _ler_linhas(arquivo):
+    """Linhas (já decodificadas) do arquivo comprimido, aberto em modo binário."""
+    try:
+        with gzip.GzipFile(fileobj=arquivo, mode='rb') as descomprimido:
+            for linha in descomprimido:
+                yield json.loads(linha)
+    except (OSError, EOFError, zlib.error, ValueError) as exc:    # gzip.BadGzipFile é um OSError; JSONDecodeError, um ValueError
+        raise ArquivoInvalido(f'Arquivo ilegível: {exc}') from exc
+
+
+class Importacao:
+    """
+    Cria um grupo novo a partir de um arquivo de exportar(). Uso: Importacao(arquivo, admin).executar().
+    'admin': usuário que administrará o grupo (None: o admin do arquivo, achado pelo e-mail).
+    'criar_usuarios': cria, sem senha utilizável, as contas que não existem nesta instalação;
+    sem isso, os vínculos delas são descartados e os logs ficam sem autor.
+    """
+    def __init__(self, arquivo, admin=None, criar_usuarios=False, banco=None):
+        self.arquivo = arquivo
+        self.admin = admin
+        self.criar_usuarios = criar_usuarios
+        self.banco = banco
+        self.grupo = None
+        self.usuarios = {}      # ID antigo do usuário -> ID nesta instalação
+        self.mapas = {CatalogoMedicamento: {}, Idoso: {}, Medicamento: {}, Prescricao: {}, LogAdministracao: {}}    # ID antigo -> novo
+        self.contagens = Counter()
+        self.ignorados = 0          # Registros cujo "pai" não veio no arquivo (criados durante a exportação)
+        self.nao_encontrados = []   # E-mails sem conta nesta instalação
+
+    def executar(self):
+        """Importa o arquivo e retorna o grupo criado. Em caso de erro, nada fica gravado."""
+        linhas = _ler_linhas(self.arquivo)
+        cabecalho = next(linhas, None)
+        if not isinstance(cabecalho, dict) or cabecalho.get('formato') != FORMATO:
+            raise ArquivoInvalido('O arquivo não é uma exportação de grupo.')
+        if not isinstance(cabecalho.get('versao'), int) or cabecalho['versao'] > VERSAO:
+            raise ArquivoInvalido(f"Versão {cabecalho.get('versao')} do arquivo não suportada (até {VERSAO}).")
+
+        secao = next(linhas, None)
+        if not isinstance(secao, dict) or secao.get('tabela') != 'usuarios':
+            raise ArquivoInvalido('Seção de usuários ausente.')
+        linhas_de_usuarios, campos, secao = [], secao['campos'], None
+        for linha in linhas:
+            if isinstance(linha, dict):
+                secao = linha
+                break
+            linhas_de_usuarios.append(dict(zip(campos, linha)))
+        membros = self._mapear_usuarios(linhas_de_usuarios)
+        admin = self.admin or Usuario.objects.filter(pk=self.usuarios.get(cabecalho.get('admin'))).first()
+        if admin is None:
+            raise ArquivoInvalido('O administrador do grupo não tem conta nesta instalação.')
+
+        grupo = Grupo(admin=admin, **{campo: valor for campo, valor in cabecalho['grupo'].items() if campo in CAMPOS_DO_GRUPO})
+        if self.banco:
+            grupo.banco = self.banco
+        grupo.save()
+        self.grupo = grupo
+        try:
+            Membro.objects.create(perfil=admin.perfil, grupo=grupo, papel=Membro.Papel.ADMIN)
+            Membro.objects.bulk_create([
+                Membro(perfil_id=perfil_id, grupo=grupo, papel=papel or Membro.Papel.MEMBRO, entrou_em=entrou_em or timezone.now())
+                for perfil_id, papel, entrou_em in membros if perfil_id != admin.perfil.pk
+            ])
+            espelhar_grupo(grupo, com_membros=False)
+            for usuario in Usuario.objects.filter(pk__in={admin.pk, *self.usuarios.values()}):
+                espelhar_usuario(usuario, grupo.banco)   # Membros e autores dos logs, referenciados no shard
+            with transaction.atomic(using=grupo.banco):
+                self._importar_secoes(secao, linhas, len(linhas_de_usuarios))
+        except BaseException:
+            grupo.delete()
+            raise
+        return grupo
+
+    def resumo(self):
+        return {
+            'registros': dict(self.contagens),
+            'ignorados': self.ignorados,
+            'usuarios_nao_encontrados': self.nao_encontrados,
+        }
+
+    def _mapear_usuarios(self, linhas):
+        """Preenche self.usuarios pelos e-mails e retorna os vínculos (perfil_id, papel, entrou_em) dos membros."""
+        por_email = {linha['email']: linha for linha in linhas}
+        existentes = dict(Usuario.objects.filter(email__in=list(por_email)).values_list('email', 'pk'))
+        for email, linha in por_email.items():
+            if email not in existentes and self.criar_usuarios:
+                existentes[email] = Usuario.objects.create_user(email, None, nome_completo=linha['nome_completo']).pk
+            if email in existentes:
+                self.usuarios[linha['id']] = existentes[email]
+            else:
+                self.nao_encontrados.append(email)
+        perfis = dict(PerfilUsuario.objects.filter(user_id__in=list(self.usuarios.values())).values_list('user_id', 'pk'))
+        entrou_em = models.DateTimeField()
+        return [
+            (perfis[self.usuarios[linha['id']]], linha['papel'], entrou_em.to_python(linha['entrou_em']))
+            for linha in linhas if linha.get('papel') and linha['id'] in self.usuarios
+        ]
+
+    def _importar_secoes(self, secao, linhas, total):
+        while secao is not None:
+            if 'fim' in secao:
+                if secao['fim'] != total:
+                    raise ArquivoInvalido(f"O arquivo tem {total} registros, mas deveria ter {secao['fim']}.")
+                return
+            if 'tabela' not in secao:
+                raise ArquivoInvalido('Seção sem nome de tabela.')
+            secao, lidos = self._importar_tabela(secao['tabela'], secao['campos'], linhas)
+            total += lidos
+        raise ArquivoInvalido('Arquivo incompleto: falta o final.')
+
+    def _importar_tabela(self, tabela, campos, linhas):
+        """Grava os registros de uma seção, em lotes. Retorna (próxima seção ou None, registros lidos)."""
+        modelo = MODELOS_POR_TABELA.get(tabela)
+        if modelo is None:
+            raise ArquivoInvalido(f'Tabela desconhecida: {tabela}.')
+        converter = self._conversor(modelo, campos)
+        lote, lidos = [], 0
+        for linha in linhas:
+            if isinstance(linha, dict):
+                self._gravar(modelo, lote)
+                return linha, lidos
+            lidos += 1
+            lote.append(converter(linha))
+            if len(lote) >= TAMANHO_LOTE:
+                self._gravar(modelo, lote)
+                lote = []
+        self._gravar(modelo, lote)
+        return None, lidos
+
+    @staticmethod
+    def _conversor(modelo, campos):
+        """
+        Função que transforma uma linha do arquivo em {attname: valor} do modelo. Campos desconhecidos
+        são ignorados; os que faltam (arquivo de uma versão anterior) recebem o valor padrão.
+        """
+        if modelo is Responsaveis:
+            return lambda linha: dict(zip(campos, linha))
+        por_nome = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+        colunas = [
+            (indice, nome, por_nome[nome].to_python if isinstance(por_nome[nome], CAMPOS_CONVERTIDOS) else None)
+            for indice, nome in enumerate(campos) if nome in por_nome
+        ]
+        ausentes = [(nome, campo.get_default) for nome, campo in por_nome.items() if nome not in campos and not campo.primary_key]
+
+        def converter(linha):
+            valores = {
+                nome: linha[indice] if conversao is None or linha[indice] is None else conversao(linha[indice])
+                for indice, nome, conversao in colunas
+            }
+            for nome, padrao in ausentes:
+                valores[nome] = padrao()
+            return valores
+        return converter
+
+    def _traduzir(self, modelo, valores):
+        """Troca as chaves estrangeiras pelos IDs novos; retorna False se o registro deve ser ignorado."""
+        if 'grupo_id' in valores:
+            valores['grupo_id'] = self.grupo.pk
+        if 'usuario_responsavel_id' in valores:
+            valores['usuario_responsavel_id'] = self.usuarios.get(valores['usuario_responsavel_id'])
+        if modelo is DocumentoBusca:
+            referenciado = {DocumentoBusca.Tipo.IDOSO: Idoso, DocumentoBusca.Tipo.PRESCRICAO: Prescricao}.get(valores['tipo'], LogAdministracao)
+            valores['objeto_id'] = self.mapas[referenciado].get(valores['objeto_id'])
+            if valores['objeto_id'] is None:
+                return False
+        if 'catalogo_id' in valores:
+            valores['catalogo_id'] = self.mapas[CatalogoMedicamento].get(str(valores['catalogo_id']))
+            if valores['catalogo_id'] is None:
+                return False
+        for nome, referenciado, obrigatorio in (
+            ('idoso_id', Idoso, True), ('medicamento_id', Medicamento, True), ('prescricao_id', Prescricao, modelo is not DocumentoBusca),
+        ):
+            if nome in valores and valores[nome] is not None:
+                valores[nome] = self.mapas[referenciado].get(valores[nome])
+                if valores[nome] is None and obrigatorio:
+                    return False
+        return True
+
+    def _gravar(self, modelo, lote):
+        if not lote:
+            return
+        banco = self.grupo.banco
+        if modelo is Responsaveis:
+            self._gravar_responsaveis(lote)
+            return
+        if modelo is CatalogoMedicamento:
+            # O catálogo é de todos os grupos: o ID e o nome de busca são recalculados dos dados
+            # (ver CatalogoMedicamento.id_para), nunca copiados do arquivo, que pode ter sido forjado
+            itens = []
+            for valores in lote:
+                item = CatalogoMedicamento(**{campo: valores.get(campo) for campo in CatalogoMedicamento.CAMPOS})
+                try:
+                    item.full_clean(exclude=['id', 'nome_busca'], validate_unique=False)
+                except ValidationError as exc:
+                    raise ArquivoInvalido(f'Item do catálogo inválido: {exc.messages[0]}')
+                item.pk = CatalogoMedicamento.id_para(**{campo: getattr(item, campo) for campo in CatalogoMedicamento.CAMPOS})
+                item.nome_busca = CatalogoMedicamento.normalizar(item.nome_marca)
+                self.mapas[CatalogoMedicamento][str(valores.get('id'))] = item.pk
+                itens.append(item)
+            for alias in {'default', banco}:
+                CatalogoMedicamento.objects.using(alias).bulk_create(itens, ignore_conflicts=True)
+            self.contagens[modelo._meta.label_lower] += len(itens)
+            return
+        antigos, validos = [], []
+        for valores in lote:
+            antigo = valores.pop('id', None)
+            if self._traduzir(modelo, valores):
+                antigos.append(antigo)
+                validos.append(valores)
+            else:
+                self.ignorados += 1
+        if modelo in (Idoso, Medicamento, Prescricao):
+            # Tabelas pequenas, citadas pelas seguintes: o bulk_create devolve os IDs novos
+            objetos = modelo.objects.using(banco).bulk_create([modelo(**valores) for valores in validos])
+            self.mapas[modelo].update(zip(antigos, (objeto.pk for objeto in objetos)))
+        elif modelo in (LogAdministracao, LogAdministracaoArquivado):
+            self._gravar_logs(modelo, antigos, validos)
+        else:
+            _inserir(banco, modelo, validos)
+        self.contagens[modelo._meta.label_lower] += len(validos)
+
+    def _gravar_logs(self, modelo, antigos, lote):
+        """
+        Os logs sem observação (quase todos) vão direto por _inserir; os com observação, citados pelos
+        documentos de busca, por bulk_create, que devolve os IDs novos. Os arquivados passam pela tabela
+        quente para receber IDs da mesma sequência (o arquivo mantém o ID do log) e são movidos logo
+        depois, sem sair do banco; por isso a seção deles vem antes da dos logs quentes.
+        """
+        banco = self.grupo.banco
+        _inserir(banco, LogAdministracao, [valores for valores in lote if not valores['observacoes'].strip()])
+        citados = [(antigo, valores) for antigo, valores in zip(antigos, lote) if valores['observacoes'].strip()]
+        if citados:
+            objetos = LogAdministracao.objects.using(banco).bulk_create([LogAdministracao(**valores) for _, valores in citados])
+            self.mapas[LogAdministracao].update(zip((antigo for antigo, _ in citados), (objeto.pk for objeto in objetos)))
+        if modelo is LogAdministracaoArquivado:
+            quentes = LogAdministracao.objects.using(banco).filter(prescricao__idoso__grupo_id=self.grupo.pk)
+            campos = [campo.attname for campo in LogAdministracaoArquivado._meta.concrete_fields]
+            _inserir_consulta(banco, LogAdministracaoArquivado, campos, quentes.values_list(*campos))
+            quentes.delete()
+
+    def _gravar_responsaveis(self, lote):
+        perfis = dict(PerfilUsuario.objects.filter(user_id__in=list(self.usuarios.values())).values_list('user_id', 'pk'))
+        vinculos = []
+        for valores in lote:
+            idoso_id = self.mapas[Idoso].get(valores['idoso_id'])
+            perfil_id = perfis.get(self.usuarios.get(valores['user_id']))
+            if idoso_id is None or perfil_id is None:
+                self.ignorados += 1
+                continue
+            vinculos.append({'idoso_id': idoso_id, 'perfilusuario_id': perfil_id})
+        _inserir(self.grupo.banco, Responsaveis, vinculos)
+        self.contagens['responsaveis'] += len(vinculos)
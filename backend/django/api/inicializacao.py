@@ -0,0 +1,90 @@
+# api/inicializacao.py - Aquecimento do processo logo após a carga da aplicação.
+#
+# Depois de django.setup(), ainda sobra trabalho preguiçoso que o Django e o DRF só fazem
+# na primeira requisição: montar o URLconf (com o roteador aninhado de api/urls.py),
+# importar as classes de renderers/parsers/autenticação do DRF, carregar as traduções,
+# preencher os caches de _meta dos modelos usados pelos serializers e abrir as conexões
+# com o banco. aquecer() faz tudo isso na inicialização do worker (ver config/wsgi.py e
+# config/asgi.py), para que a primeira requisição depois de o serviço acordar não pague por isso.
+# Desative com AQUECER_NA_INICIALIZACAO=0. 'python manage.py startup_report' mede o efeito.
+
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+from django.utils import translation
+
+# Serializers das listagens mais usadas pelo app (os demais são montados sob demanda)
+SERIALIZADORES_AQUECIDOS = (
+    'GrupoSerializer', 'IdosoListSerializer', 'IdosoDetailSerializer', 'MedicamentoSerializer',
+    'PrescricaoSerializer', 'LogAdministracaoSerializer', 'PerfilUsuarioSerializer', 'CustomLoginSerializer',
+)
+
+
+def _urlconf():
+    resolver = get_resolver()
+    resolver.url_patterns       # Importa as views e monta o roteador
+    resolver.reverse_dict       # Preenche as tabelas de resolução/reverse de todos os padrões
+
+
+def _drf():
+    from rest_framework.settings import api_settings
+    # Cada atributo importa as classes configuradas (import_from_string) e guarda o resultado
+    for nome in (
+        'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_PAGINATION_CLASS', 'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+        'EXCEPTION_HANDLER',
+    ):
+        getattr(api_settings, nome)
+
+
+def _traducoes():
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('Not found.')   # Carrega os catálogos do idioma
+    translation.deactivate()
+
+
+def _serializers():
+    from . import serializers
+    for nome in SERIALIZADORES_AQUECIDOS:
+        getattr(serializers, nome)().fields
+
+
+def _interacoes():
+    from .interacoes import indice_de_interacoes
+    indice_de_interacoes()
+
+
+def _conexoes():
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            pass    # Banco fora do ar não impede o worker de subir: a requisição tenta de novo
+
+
+ETAPAS = (
+    ('urlconf', _urlconf),
+    ('drf', _drf),
+    ('traducoes', _traducoes),
+    ('serializers', _serializers),
+    ('interacoes', _interacoes),
+    ('conexoes', _conexoes),
+)
+
+
+def aquecer(conexoes=True):
+    """
+    Executa as etapas de ETAPAS e devolve {etapa: segundos}. Com conexoes=False, não abre
+    as conexões com o banco (sob ASGI as views síncronas rodam em outras threads, e as
+    conexões do Django são por thread).
+    """
+    tempos = {}
+    for nome, etapa in ETAPAS:
+        if nome == 'conexoes' and not conexoes:
+            continue
+        inicio = time.perf_counter()
+        etapa()
+        tempos[nome] = time.perf_counter() - inicio
+    return tempos
@@ -0,0 +1,149 @@
+# api/interacoes.py - Verificação de interações medicamentosas e de duplicidade terapêutica.
+#
+# A base de interações (settings.INTERACOES_ARQUIVO, por padrão api/dados/interacoes.json)
+# é carregada uma única vez por processo em um índice {princípio: {outro princípio: interação}}.
+# Verificar uma prescrição contra as k prescrições ativas do idoso custa k consultas ao
+# dicionário, sem nenhuma consulta extra ao banco além da que carrega as k prescrições.
+# Os alertas não bloqueiam a gravação: são devolvidos para a equipe avaliar.
+
+import functools
+import json
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Prescricao
+
+# Sais e formas que não mudam o princípio ativo ('cloridrato de sertralina' -> 'sertralina',
+# 'carbonato de lítio' -> 'litio'). Os nitratos ficam de fora: mono e dinitrato de isossorbida
+# são princípios diferentes na base; 'sulfato ferroso' não tem o 'de' e continua inteiro.
+SAIS = (
+    'cloridrato', 'dicloridrato', 'bromidrato', 'maleato', 'besilato', 'mesilato', 'succinato',
+    'tartarato', 'hemitartarato', 'fumarato', 'hemifumarato', 'valerato', 'hiclato',
+    'carbonato', 'sulfato', 'acetato', 'citrato', 'fosfato', 'cloreto', 'gluconato', 'lactato',
+    'propionato', 'dipropionato', 'estolato', 'pamoato', 'oxalato',
+)
+FORMAS = (
+    'sodica', 'sodico', 'potassica', 'potassico', 'calcica', 'calcico', 'magnesica', 'magnesico',
+    'monoidratada', 'monoidratado', 'di-hidratada', 'di-hidratado', 'anidra', 'anidro',
+)
+PREFIXO_SAL = re.compile(r'^(?:%s) de ' % '|'.join(SAIS))
+SUFIXO_FORMA = re.compile(r'(?: (?:%s))+$' % '|'.join(re.escape(forma) for forma in FORMAS))
+# Associações: 'losartana potássica + hidroclorotiazida', 'amoxicilina/clavulanato'
+SEPARADORES = re.compile(r'\s*(?:\+|/|,|;| e )\s*')
+
+
+@functools.lru_cache(maxsize=4096)
+def normalizar_principio(texto):
+    """Forma canônica de um princípio ativo: minúsculas, sem acentos, sem sal nem forma."""
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode().lower()
+    texto = ' '.join(re.sub(r'[^a-z0-9+/,;\- ]', ' ', texto).split())
+    return SUFIXO_FORMA.sub('', PREFIXO_SAL.sub('', texto))
+
+
+@functools.lru_cache(maxsize=4096)
+def principios_de(principio_ativo):
+    """Conjunto de princípios normalizados do campo Medicamento.principio_ativo."""
+    partes = SEPARADORES.split(unicodedata.normalize('NFKD', principio_ativo or '').lower())
+    return frozenset(filter(None, (normalizar_principio(parte) for parte in partes)))
+
+
+@functools.lru_cache(maxsize=1)
+def indice_de_interacoes():
+    """Índice {princípio: {outro princípio: interação}} da base local, carregado uma vez."""
+    with open(settings.INTERACOES_ARQUIVO, encoding='utf-8') as arquivo:
+        base = json.load(arquivo)
+    indice = defaultdict(dict)
+    for interacao in base['interacoes']:
+        primeiro, segundo = (normalizar_principio(principio) for principio in interacao['principios'])
+        dados = {'gravidade': interacao['gravidade'], 'descricao': interacao['descricao']}
+        indice[primeiro][segundo] = dados
+        indice[segundo][primeiro] = dados
+    return dict(indice)
+
+
+class VerificadorDoIdoso:
+    """
+    Acumula os medicamentos ativos de um idoso e aponta os conflitos de cada novo
+    medicamento com os já vistos. Várias prescrições do mesmo medicamento (horários
+    diferentes do mesmo tratamento) não são conflito.
+    """
+    def __init__(self):
+        self.indice = indice_de_interacoes()
+        self.vistos = defaultdict(dict)     # princípio -> {medicamento_id: medicamento}
+        self.medicamentos = set()
+
+    def conflitos(self, medicamento):
+        alertas = {}
+        for principio in principios_de(medicamento.principio_ativo):
+            for outro in self.vistos.get(principio, {}).values():
+                if outro.pk != medicamento.pk:
+                    alertas[('duplicidade', outro.pk)] = self._alerta(
+                        'duplicidade', outro, [principio],
+                        gravidade='moderada', descricao='Mesmo princípio ativo em outra prescrição ativa.',
+                    )
+            for outro_principio, interacao in self.indice.get(principio, {}).items():
+                for outro in self.vistos.get(outro_principio, {}).values():
+                    if outro.pk != medicamento.pk:
+                        alertas.setdefault(
+                            ('interacao', outro.pk, outro_principio),
+                            self._alerta('interacao', outro, [principio, outro_principio], **interacao),
+                        )
+        return list(alertas.values())
+
+    def adicionar(self, medicamento):
+        self.medicamentos.add(medicamento.pk)
+        for principio in principios_de(medicamento.principio_ativo):
+            self.vistos[principio][medicamento.pk] = medicamento
+
+    @staticmethod
+    def _alerta(tipo, outro, principios, gravidade, descricao):
+        return {
+            'tipo': tipo,
+            'gravidade': gravidade,
+            'descricao': descricao,
+            'principios': principios,
+            'medicamento_id': outro.pk,
+            'medicamento': outro.nome_marca,
+        }
+
+
+def verificar_prescricao(prescricao):
+    """Alertas da prescrição contra as demais prescrições ativas do mesmo idoso."""
+    if not prescricao.ativo:
+        return []
+    verificador = VerificadorDoIdoso()
+    outras = Prescricao.objects.visiveis().filter(idoso_id=prescricao.idoso_id, ativo=True).exclude(pk=prescricao.pk)
+    for outra in outras.select_related('medicamento__catalogo'):
+        verificador.adicionar(outra.medicamento)
+    return verificador.conflitos(prescricao.medicamento)
+
+
+def verificar_grupo(grupo_id):
+    """
+    Reverifica todos os idosos do grupo em uma passada: uma consulta carrega as
+    prescrições ativas e cada medicamento é comparado só com os já vistos do idoso.
+    Retorna apenas os idosos com algum alerta.
+    """
+    prescricoes = (
+        Prescricao.objects.visiveis().filter(idoso__grupo_id=grupo_id, ativo=True)
+        .select_related('medicamento__catalogo', 'idoso').order_by('idoso_id', 'medicamento_id')
+    )
+    resultado = {}
+    idoso_atual = verificador = None
+    for prescricao in prescricoes.iterator():
+        if prescricao.idoso_id != idoso_atual:     # Prescrições vêm agrupadas por idoso
+            idoso_atual, verificador = prescricao.idoso_id, VerificadorDoIdoso()
+        medicamento = prescricao.medicamento
+        if medicamento.pk in verificador.medicamentos:
+            continue    # Outro horário de um medicamento já verificado
+        alertas = verificador.conflitos(medicamento)
+        verificador.adicionar(medicamento)
+        if alertas:
+            idoso = resultado.setdefault(prescricao.idoso_id, {
+                'idoso_id': prescricao.idoso_id, 'idoso': prescricao.idoso.nome_completo, 'alertas': [],
+            })
+            idoso['alertas'].extend({**alerta, 'em_conflito_com': medicamento.nome_marca} for alerta in alertas)
+    return list(resultado.values())
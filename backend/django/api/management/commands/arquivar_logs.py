@@ -0,0 +1,39 @@
+# api/management/commands/arquivar_logs.py
+"""
+Move os registros de administração mais antigos que settings.LOG_ARQUIVO_DIAS
+para a tabela de arquivo (LogAdministracaoArquivado), em lotes pequenos para não
+segurar locks. Pode ser agendado (cron do Render) para rodar diariamente.
+A idade vem só da configuração: a listagem de /logs/ usa o mesmo corte para decidir
+quando consultar o arquivo, e logs mais novos que ele sumiriam dela.
+
+Exemplo:
+    python manage.py arquivar_logs --lote 5000
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.arquivo import arquivar_lote, data_de_corte
+
+
+class Command(BaseCommand):
+    help = 'Arquiva os registros de administração antigos (tabela quente -> tabela de arquivo).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Logs movidos por transação.')
+        parser.add_argument('--grupo', default=None, help='Arquiva apenas os logs deste grupo (UUID).')
+
+    def handle(self, *args, **options):
+        corte = data_de_corte()
+        total = 0
+        for banco in ['default', *settings.DATABASE_SHARDS]:
+            movidos_banco = 0
+            while True:
+                movidos = arquivar_lote(banco, corte, options['lote'], options['grupo'])
+                if not movidos:
+                    break
+                movidos_banco += movidos
+            if movidos_banco:
+                self.stdout.write(f'{banco}: {movidos_banco} logs arquivados')
+            total += movidos_banco
+        self.stdout.write(self.style.SUCCESS(f'{total} logs anteriores a {corte:%d/%m/%Y %H:%M} arquivados.'))
@@ -0,0 +1,132 @@
+# api/management/commands/benchmark_asgi.py
+"""
+Compara a capacidade de conexões simultâneas dos endpoints de leitura servidos
+sob WSGI (ViewSets do DRF) e sob ASGI (views assíncronas de api/views_async.py).
+
+Os dois servidores devem apontar para o mesmo banco. Um lar sintético é criado
+pelo servidor WSGI e, para cada nível de concorrência, N conexões persistentes
+leem idosos, medicamentos, prescrições e logs em laço durante '--duracao' segundos.
+
+Exemplo (com os limites de taxa desligados, como em 'teste_carga'):
+    LIMITES_DE_TAXA=0 gunicorn config.wsgi:application --workers 4 --bind 127.0.0.1:8000
+    LIMITES_DE_TAXA=0 uvicorn config.asgi:application --workers 4 --port 8001
+    python manage.py benchmark_asgi --url-wsgi http://127.0.0.1:8000 --url-asgi http://127.0.0.1:8001 --conexoes 10,50,200
+"""
+
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.carga import ClienteHTTP, Estatisticas
+from api.management.commands.teste_carga import Command as TesteCarga
+
+RECURSOS = ('idosos/', 'medicamentos/', 'prescricoes/', 'logs/')
+
+
+class Command(BaseCommand):
+    help = 'Compara a capacidade de conexões simultâneas dos endpoints de leitura sob WSGI e ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url-wsgi', default='http://127.0.0.1:8000', help='URL base do servidor WSGI (http).')
+        parser.add_argument('--url-asgi', default='http://127.0.0.1:8001', help='URL base do servidor ASGI (http).')
+        parser.add_argument('--conexoes', default='10,50,200', help='Níveis de conexões simultâneas, separados por vírgula.')
+        parser.add_argument('--duracao', type=float, default=10, help='Segundos de carga em cada nível.')
+        parser.add_argument('--idosos', type=int, default=30, help='Idosos do lar sintético.')
+        parser.add_argument('--timeout', type=float, default=30, help='Tempo máximo de cada requisição, em segundos.')
+
+    def handle(self, *args, **options):
+        try:
+            niveis = [int(nivel) for nivel in options['conexoes'].split(',')]
+        except ValueError:
+            raise CommandError('--conexoes deve ser uma lista de inteiros (ex: 10,50,200).')
+        if not niveis or min(niveis) < 1:
+            raise CommandError('Os níveis de conexões devem ser maiores que zero.')
+        linhas = asyncio.run(self.executar(options, niveis))
+
+        self.stdout.write('')
+        cabecalho = f"{'servidor':<9} {'conexões':>9} {'n':>8} {'erros':>7} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>9}"
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+        for linha in linhas:
+            self.stdout.write(
+                f"{linha['servidor']:<9} {linha['conexoes']:>9} {linha['requisicoes']:>8} {linha['erros']:>7} "
+                f"{linha['req_s']:>9.1f} {linha['p50']:>8.1f} {linha['p95']:>8.1f} {linha['p99']:>8.1f} {linha['max']:>9.1f}"
+            )
+        self.stdout.write('Latências em ms. Erros incluem timeouts e conexões recusadas.')
+
+    async def executar(self, options, niveis):
+        lar, token = await self.preparar(options)
+        servidores = [
+            ('wsgi', options['url_wsgi'], f'/api/grupos/{lar.grupo_id}/'),
+            ('asgi', options['url_asgi'], f'/api/async/grupos/{lar.grupo_id}/'),
+        ]
+        linhas = []
+        for conexoes in niveis:
+            for nome, url, base in servidores:
+                self.stdout.write(f'{nome}: {conexoes} conexões por {options["duracao"]:.0f}s...')
+                estatisticas = await self.medir(url, base, token, conexoes, options)
+                linhas.append({'servidor': nome, 'conexoes': conexoes, **self._consolidar(estatisticas)})
+        return linhas
+
+    async def preparar(self, options):
+        """Cria o lar sintético (com alguns logs) pelo servidor WSGI e devolve (lar, token)."""
+        execucao = uuid.uuid4().hex[:8]
+        self.stdout.write(f'Preparando o lar sintético (execução {execucao})...')
+        lar = await TesteCarga().preparar_lar(
+            {'url': options['url_wsgi'], 'cuidadores': 1, 'idosos': options['idosos'], 'medicamentos': 5},
+            execucao, 0,
+        )
+        admin = lar.cuidadores[0]
+        base = f'/api/grupos/{lar.grupo_id}'
+        _, prescricoes = await admin.requisicao('GET', f'{base}/prescricoes/')
+        for prescricao in prescricoes or []:
+            await admin.requisicao('POST', f'{base}/prescricoes/{prescricao["id"]}/administrar/', dados={})
+        await admin.fechar()
+
+        # Confere se o servidor ASGI enxerga o mesmo banco antes de medir
+        cliente = ClienteHTTP(options['url_asgi'])
+        cliente.token = admin.token
+        status, _ = await cliente.requisicao('GET', f'/api/async/grupos/{lar.grupo_id}/idosos/')
+        await cliente.fechar()
+        if status != 200:
+            raise CommandError(f'O servidor ASGI respondeu {status}: ele está no ar e usa o mesmo banco?')
+        return lar, admin.token
+
+    async def medir(self, url, base, token, conexoes, options):
+        estatisticas = Estatisticas()
+        clientes = [ClienteHTTP(url, estatisticas, timeout=options['timeout']) for _ in range(conexoes)]
+        for cliente in clientes:
+            cliente.token = token
+        limite = time.perf_counter() + options['duracao']
+
+        async def conexao(posicao, cliente):
+            indice = posicao    # Cada conexão começa em um recurso diferente
+            while time.perf_counter() < limite:
+                recurso = RECURSOS[indice % len(RECURSOS)]
+                await cliente.requisicao('GET', base + recurso, rotulo=recurso)
+                indice += 1
+
+        estatisticas.iniciar()
+        try:
+            await asyncio.gather(*[conexao(posicao, cliente) for posicao, cliente in enumerate(clientes)])
+        finally:
+            estatisticas.finalizar()
+            await asyncio.gather(*[cliente.fechar() for cliente in clientes])
+        return estatisticas
+
+    @staticmethod
+    def _consolidar(estatisticas):
+        """Junta as latências de todos os recursos em uma única linha."""
+        valores = sorted(valor for latencias in estatisticas.latencias.values() for valor in latencias)
+        duracao = estatisticas.duracao or 1e-9
+        return {
+            'requisicoes': len(valores),
+            'erros': sum(estatisticas.erros.values()),
+            'req_s': len(valores) / duracao,
+            'p50': Estatisticas.percentil(valores, 50) * 1000,
+            'p95': Estatisticas.percentil(valores, 95) * 1000,
+            'p99': Estatisticas.percentil(valores, 99) * 1000,
+            'max': (valores[-1] if valores else 0.0) * 1000,
+        }
@@ -0,0 +1,94 @@
+# api/management/commands/benchmark_renderers.py
+"""
+Compara o tempo de codificação e o tamanho do payload dos renderers da API
+em respostas realistas (lista de logs com prescrição e medicamento aninhados).
+
+Os dados são montados em memória, sem acesso ao banco, e serializados uma única
+vez; o benchmark mede apenas a etapa de renderização.
+
+Exemplo:
+    python manage.py benchmark_renderers --logs 2000 --repeticoes 20
+"""
+
+import datetime
+import decimal
+import gzip
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import CatalogoMedicamento, Idoso, LogAdministracao, Medicamento, Prescricao, Usuario
+from api.renderers import JSONRapidoRenderer, MessagePackRenderer, msgpack, orjson
+from api.serializers import LogAdministracaoSerializer, MedicamentoSerializer
+
+
+def montar_logs(quantidade):
+    """Cria instâncias (não salvas) que imitam o histórico de um lar."""
+    grupo_id = uuid.uuid4()
+    usuarios = [Usuario(id=i, email=f'cuidador{i}@lar.com', nome_completo=f'Cuidador {i}') for i in range(1, 6)]
+    medicamentos = [
+        Medicamento(
+            id=i, grupo_id=grupo_id, quantidade_estoque=decimal.Decimal(120), catalogo=CatalogoMedicamento(
+                id=uuid.uuid4(), nome_marca=f'Medicamento {i}', principio_ativo=f'Princípio ativo {i}',
+                fabricante='Laboratório Exemplo', concentracao_valor=decimal.Decimal('500.00'),
+                concentracao_unidade='mg/ml', forma_farmaceutica='COMP',
+            ),
+        )
+        for i in range(1, 31)
+    ]
+    idosos = [Idoso(id=i, grupo_id=grupo_id, nome_completo=f'Idoso da Silva {i}') for i in range(1, 41)]
+    prescricoes = [
+        Prescricao(
+            id=i, idoso=idosos[i % len(idosos)], medicamento=medicamentos[i % len(medicamentos)],
+            horario_previsto=datetime.time(8 + (i % 3) * 6), horarios=[f'{8 + (i % 3) * 6:02d}:00'], dose_valor=decimal.Decimal('1.50'),
+            dose_unidade='comprimido(s)', instrucoes='Administrar após as refeições.',
+        )
+        for i in range(1, 121)
+    ]
+    inicio = timezone.now()
+    return [
+        LogAdministracao(
+            id=i, prescricao=prescricoes[i % len(prescricoes)], usuario_responsavel=usuarios[i % len(usuarios)],
+            data_hora_administracao=inicio - datetime.timedelta(minutes=37 * i),
+            status=LogAdministracao.StatusDose.ADMINISTRADO, observacoes='Sem intercorrências.',
+        )
+        for i in range(1, quantidade + 1)
+    ], medicamentos
+
+
+class Command(BaseCommand):
+    help = 'Compara tempo de codificação e tamanho do payload dos renderers JSON/MessagePack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logs', type=int, default=1000, help='Quantidade de logs na resposta simulada.')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Repetições de cada codificação.')
+
+    def handle(self, *args, **options):
+        logs, medicamentos = montar_logs(options['logs'])
+        respostas = {
+            f'logs ({len(logs)})': LogAdministracaoSerializer(logs, many=True).data,
+            f'medicamentos ({len(medicamentos)})': MedicamentoSerializer(medicamentos, many=True).data,
+        }
+        renderers = [('DRF JSONRenderer', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('JSONRapidoRenderer (orjson)', JSONRapidoRenderer()))
+        if msgpack is not None:
+            renderers.append(('MessagePackRenderer', MessagePackRenderer()))
+
+        cabecalho = f"{'resposta':<20} {'renderer':<30} {'ms/render':>10} {'bytes':>10} {'gzip':>10}"
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+        for nome_resposta, dados in respostas.items():
+            for nome_renderer, renderer in renderers:
+                inicio = time.perf_counter()
+                for _ in range(options['repeticoes']):
+                    conteudo = renderer.render(dados, renderer.media_type, {})
+                tempo = (time.perf_counter() - inicio) / options['repeticoes'] * 1000
+                self.stdout.write(
+                    f'{nome_resposta:<20} {nome_renderer:<30} {tempo:>10.2f} {len(conteudo):>10} {len(gzip.compress(conteudo)):>10}'
+                )
+        if orjson is None or msgpack is None:
+            self.stdout.write(self.style.WARNING('orjson e/ou msgpack não estão instalados; os renderers correspondentes foram omitidos.'))
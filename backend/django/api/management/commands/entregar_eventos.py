@@ -0,0 +1,55 @@
+# api/management/commands/entregar_eventos.py
+"""
+Worker da caixa de saída: entrega às farmácias parceiras os eventos gravados pelas
+views (movimentações de estoque, novas prescrições), em lotes por farmácia, com novas
+tentativas e assinatura HMAC (ver api/outbox.py). Percorre o banco padrão e todos os
+shards a cada rodada; vários workers podem rodar ao mesmo tempo.
+
+Exemplo:
+    python manage.py entregar_eventos
+    python manage.py entregar_eventos --uma-vez
+"""
+
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.outbox import entregar_pendentes, remover_entregues
+
+LIMPEZA_INTERVALO = 60 * 60     # Segundos entre as remoções dos eventos entregues antigos
+
+
+class Command(BaseCommand):
+    help = 'Entrega os eventos pendentes da caixa de saída às farmácias parceiras.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Executa uma única rodada e sai.')
+        parser.add_argument('--intervalo', type=float, default=None, help='Segundos entre as rodadas sem eventos (padrão: OUTBOX_INTERVALO).')
+
+    def handle(self, *args, **options):
+        intervalo = settings.OUTBOX_INTERVALO if options['intervalo'] is None else options['intervalo']
+        bancos = ['default', *settings.DATABASE_SHARDS]
+        ultima_limpeza = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - ultima_limpeza > LIMPEZA_INTERVALO:
+                    removidos = sum(remover_entregues(banco) for banco in bancos)
+                    if removidos:
+                        self.stdout.write(f'{removidos} eventos entregues antigos removidos')
+                    ultima_limpeza = time.monotonic()
+                rodada = Counter()
+                for banco in bancos:
+                    resultado = entregar_pendentes(banco)
+                    if resultado:
+                        self.stdout.write(f"{banco}: {resultado['entregues']} entregues, {resultado['falhas']} com falha, {resultado['adiados']} adiados")
+                    rodada += resultado
+                if options['uma_vez']:
+                    break
+                if not rodada:
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido.')
@@ -0,0 +1,34 @@
+# api/management/commands/exportar_grupo.py
+"""
+Exporta um grupo inteiro (idosos, estoque, prescrições, histórico de administrações,
+membros) para um arquivo comprimido, que 'importar_grupo' recria em outra instalação
+(ver api/exportacao.py). A leitura é feita em lotes, com memória constante.
+
+Exemplo:
+    python manage.py exportar_grupo 7f579f8f-e138-4e2d-b04a-3b3ff7b4ab27 lar.jsonl.gz
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exportacao import exportar
+from api.models import Grupo
+
+
+class Command(BaseCommand):
+    help = 'Exporta os dados de um grupo para um arquivo (migração entre instalações).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('grupo_id', help='ID (UUID) do grupo.')
+        parser.add_argument('arquivo', help='Arquivo de saída (.jsonl.gz).')
+
+    def handle(self, *args, **options):
+        try:
+            grupo = Grupo.objects.using('default').get(pk=options['grupo_id'])
+        except (Grupo.DoesNotExist, ValueError):
+            raise CommandError('Grupo não encontrado.')
+        tamanho = 0
+        with open(options['arquivo'], 'wb') as arquivo:
+            for dados in exportar(grupo):
+                arquivo.write(dados)
+                tamanho += len(dados)
+        self.stdout.write(self.style.SUCCESS(f'Grupo "{grupo}" exportado para {options["arquivo"]} ({tamanho} bytes).'))
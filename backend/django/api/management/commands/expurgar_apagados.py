@@ -0,0 +1,40 @@
+# api/management/commands/expurgar_apagados.py
+"""
+Remove de vez os grupos, idosos e medicamentos apagados pela API (exclusão lógica)
+há mais de settings.EXCLUSAO_RETENCAO_DIAS, em lotes pequenos para não segurar locks.
+Pode ser agendado (cron do Render) para rodar diariamente.
+
+Exemplo:
+    python manage.py expurgar_apagados --dias 30 --lote 1000
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.exclusao import EXPURGOS, data_de_corte, expurgar_grupo, grupos_vencidos, vencidos
+
+
+class Command(BaseCommand):
+    help = 'Expurga os grupos, idosos e medicamentos apagados há mais tempo que a retenção.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Dias desde a exclusão lógica (padrão: EXCLUSAO_RETENCAO_DIAS).')
+        parser.add_argument('--lote', type=int, default=settings.EXCLUSAO_LOTE, help='Linhas apagadas por transação.')
+
+    def handle(self, *args, **options):
+        corte = data_de_corte(options['dias'])
+        lote = options['lote']
+        total = 0
+        # Primeiro os grupos inteiros: os idosos e medicamentos deles saem junto
+        for grupo in grupos_vencidos(corte):
+            removidos = expurgar_grupo(grupo, lote)
+            self.stdout.write(f'grupo "{grupo}": {removidos} linhas')
+            total += removidos
+        for banco in ['default', *settings.DATABASE_SHARDS]:
+            for modelo, expurgar in EXPURGOS:
+                objetos = list(vencidos(modelo, banco, corte))
+                removidos = sum(expurgar(objeto, lote) for objeto in objetos)
+                if objetos:
+                    self.stdout.write(f'{banco}: {len(objetos)} {modelo._meta.verbose_name_plural.lower()} ({removidos} linhas)')
+                total += removidos
+        self.stdout.write(self.style.SUCCESS(f'{total} linhas apagadas antes de {corte:%d/%m/%Y %H:%M} expurgadas.'))
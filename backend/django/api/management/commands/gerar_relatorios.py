@@ -0,0 +1,54 @@
+# api/management/commands/gerar_relatorios.py
+"""
+Worker dos relatórios em PDF: gera os relatórios pedidos pela API (MAR do mês, ficha
+do idoso), um de cada vez, gravando o arquivo em RELATORIOS_DIR (ver api/relatorios.py).
+Percorre o banco padrão e todos os shards a cada rodada; vários workers podem rodar ao
+mesmo tempo. Também apaga os relatórios concluídos há mais de RELATORIOS_RETENCAO_DIAS.
+
+Exemplo:
+    python manage.py gerar_relatorios
+    python manage.py gerar_relatorios --uma-vez
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.relatorios import gerar_pendentes, remover_antigos
+
+LIMPEZA_INTERVALO = 60 * 60     # Segundos entre as remoções dos relatórios antigos
+
+
+class Command(BaseCommand):
+    help = 'Gera os relatórios em PDF pendentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Executa uma única rodada e sai.')
+        parser.add_argument('--intervalo', type=float, default=None, help='Segundos entre as rodadas sem relatórios (padrão: RELATORIOS_INTERVALO).')
+
+    def handle(self, *args, **options):
+        intervalo = settings.RELATORIOS_INTERVALO if options['intervalo'] is None else options['intervalo']
+        bancos = ['default', *settings.DATABASE_SHARDS]
+        ultima_limpeza = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - ultima_limpeza > LIMPEZA_INTERVALO:
+                    removidos = sum(remover_antigos(banco) for banco in bancos)
+                    if removidos:
+                        self.stdout.write(f'{removidos} relatórios antigos removidos')
+                    ultima_limpeza = time.monotonic()
+                gerados = 0
+                for banco in bancos:
+                    prontos, falhas = gerar_pendentes(banco)
+                    if prontos or falhas:
+                        self.stdout.write(f'{banco}: {prontos} relatórios prontos, {falhas} com falha')
+                    gerados += prontos + falhas
+                if options['uma_vez']:
+                    break
+                if not gerados:
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido.')
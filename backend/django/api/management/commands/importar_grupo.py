@@ -0,0 +1,51 @@
+# api/management/commands/importar_grupo.py
+"""
+Cria um grupo a partir de um arquivo de 'exportar_grupo', com IDs novos para todos os
+registros (ver api/exportacao.py). Os usuários são reconhecidos pelo e-mail; com
+--criar-usuarios, as contas que não existem aqui são criadas sem senha (o acesso é
+liberado pela recuperação de senha). Em caso de erro, nada fica gravado.
+
+Exemplo:
+    python manage.py importar_grupo lar.jsonl.gz
+    python manage.py importar_grupo lar.jsonl.gz --admin admin@lar.com --criar-usuarios --banco shard_1
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exportacao import ArquivoInvalido, Importacao
+from api.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Importa um grupo exportado por exportar_grupo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo gerado por exportar_grupo (.jsonl.gz).')
+        parser.add_argument('--admin', default=None, help='E-mail do administrador do novo grupo (padrão: o admin do arquivo).')
+        parser.add_argument('--criar-usuarios', action='store_true', help='Cria as contas dos membros que não existem nesta instalação.')
+        parser.add_argument('--banco', default=None, help="Banco do novo grupo ('default' ou um de DATABASE_SHARD_URLS; padrão: SHARD_NOVOS_GRUPOS).")
+
+    def handle(self, *args, **options):
+        banco = options['banco']
+        if banco and banco != 'default' and banco not in settings.DATABASE_SHARDS:
+            raise CommandError(f"O banco '{banco}' não está configurado em DATABASE_SHARD_URLS.")
+        admin = None
+        if options['admin']:
+            admin = Usuario.objects.filter(email=options['admin']).first()
+            if admin is None:
+                raise CommandError(f"Usuário {options['admin']} não encontrado.")
+        with open(options['arquivo'], 'rb') as arquivo:
+            importacao = Importacao(arquivo, admin=admin, criar_usuarios=options['criar_usuarios'], banco=banco)
+            try:
+                grupo = importacao.executar()
+            except ArquivoInvalido as exc:
+                raise CommandError(str(exc))
+        resumo = importacao.resumo()
+        for tabela, total in resumo['registros'].items():
+            self.stdout.write(f'  {tabela}: {total}')
+        if resumo['ignorados']:
+            self.stdout.write(f"  {resumo['ignorados']} registros ignorados (sem o registro a que se referem)")
+        if resumo['usuarios_nao_encontrados']:
+            self.stdout.write(f"  usuários sem conta aqui: {', '.join(resumo['usuarios_nao_encontrados'])}")
+        self.stdout.write(self.style.SUCCESS(f'Grupo "{grupo}" importado: {grupo.pk} (banco {grupo.banco}).'))
@@ -0,0 +1,238 @@
+# api/management/commands/mover_grupo.py
+"""
+Move os dados de um grupo para outro banco (shard) com o sistema no ar.
+
+1. Espelha o grupo, o admin e os membros no banco de destino.
+2. Copia todos os dados do grupo em lotes, sem bloquear nada.
+3. Bloqueia as escritas no grupo (Grupo.em_migracao), espera o cache do mapa
+   de shards expirar e sincroniza o que mudou desde a cópia inicial.
+4. Aponta o grupo para o novo banco, libera as escritas e, por fim,
+   apaga os dados do banco de origem.
+
+Cada banco tem a sua própria sequência de IDs, então as linhas recebem IDs
+novos no destino: os IDs de idosos, prescrições etc. mudam com a mudança de banco.
+
+Exemplo:
+    python manage.py mover_grupo 7f579f8f-e138-4e2d-b04a-3b3ff7b4ab27 shard_1
+"""
+
+import functools
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.db_routers import eh_modelo_do_grupo
+from api.models import (
+    CatalogoMedicamento, DocumentoBusca, EventoSaida, Grupo, Idoso, LogAdministracao, LogAdministracaoArquivado,
+    Medicamento, Prescricao, Relatorio,
+)
+from api.shards import espelhar_grupo, esquecer_grupo, tabelas_do_grupo
+
+TAMANHO_LOTE = 2000
+
+# Chaves do conteúdo dos eventos (EventoSaida.dados) que citam linhas do grupo
+CITADOS_NOS_EVENTOS = {'idoso_id': Idoso, 'medicamento_id': Medicamento, 'prescricao_id': Prescricao}
+
+
+@functools.cache
+def relacoes_do_grupo(modelo):
+    """Chaves estrangeiras do modelo para outros dados do grupo (as para Grupo, usuários e catálogo não mudam de ID)."""
+    return [campo for campo in modelo._meta.concrete_fields if campo.is_relation and eh_modelo_do_grupo(campo.related_model)]
+
+
+class Command(BaseCommand):
+    help = 'Move os dados de um grupo para outro banco (shard) com o sistema no ar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('grupo_id', help='ID (UUID) do grupo.')
+        parser.add_argument('destino', help="Alias do banco de destino ('default' ou um de DATABASE_SHARD_URLS).")
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por lote de cópia.')
+
+    def handle(self, *args, **options):
+        destino = options['destino']
+        if destino != 'default' and destino not in settings.DATABASE_SHARDS:
+            raise CommandError(f"O banco '{destino}' não está configurado em DATABASE_SHARD_URLS.")
+        try:
+            grupo = Grupo.objects.using('default').select_related('admin').get(pk=options['grupo_id'])
+        except (Grupo.DoesNotExist, ValueError):
+            raise CommandError('Grupo não encontrado.')
+        origem = grupo.banco
+        if origem == destino:
+            raise CommandError(f'O grupo já está no banco {destino}.')
+        self.lote = options['lote']
+        self.mapas = defaultdict(dict)      # Modelo -> {ID na origem: ID no destino}
+
+        self.stdout.write(f'Movendo "{grupo}" de {origem} para {destino}...')
+        espelhar_grupo(grupo, banco=destino)
+        # O grupo ainda é da origem: o que houver dele no destino sobrou de uma tentativa interrompida
+        self.limpar(grupo, destino)
+
+        # Fase 1: cópia inicial, com o grupo recebendo escritas normalmente.
+        copiados = self.copiar(grupo, origem, destino)
+        self.stdout.write(f'  cópia inicial: {copiados} linhas')
+
+        # Fase 2: bloqueia as escritas e sincroniza a diferença.
+        Grupo.objects.using('default').filter(pk=grupo.pk).update(em_migracao=True)
+        esquecer_grupo(grupo.pk)
+        try:
+            time.sleep(settings.SHARD_MAPA_TTL)    # Os workers passam a enxergar o bloqueio
+            with transaction.atomic(using=destino):
+                copiados = self.copiar(grupo, origem, destino, final=True)
+            self.stdout.write(f'  sincronização final: {copiados} linhas')
+            Grupo.objects.using('default').filter(pk=grupo.pk).update(banco=destino, em_migracao=False)
+        except BaseException:
+            Grupo.objects.using('default').filter(pk=grupo.pk).update(em_migracao=False)
+            raise
+        finally:
+            esquecer_grupo(grupo.pk)
+
+        # Fase 3: espera os workers enxergarem o novo banco e limpa a origem.
+        time.sleep(settings.SHARD_MAPA_TTL)
+        self.limpar_origem(grupo, origem)
+        self.stdout.write(self.style.SUCCESS(f'Grupo movido para {destino}.'))
+
+    def copiar(self, grupo, origem, destino, final=False):
+        """
+        Copia as linhas do grupo da origem para o destino, em lotes. Cada banco tem a sua própria
+        sequência de IDs: as linhas recebem IDs novos no destino (como na importação, ver
+        api/exportacao.py) e as chaves estrangeiras são traduzidas pelos mapas em self.mapas.
+        As linhas já copiadas são atualizadas (upsert) no ID que receberam; as que citam uma linha
+        ainda não copiada ficam para a sincronização final (final=True), que antes de copiar
+        apaga do destino as linhas que não existem mais na origem.
+        """
+        if final:
+            self.remover_ausentes(grupo, origem, destino)
+        total = self.espelhar_catalogo(grupo, origem, destino)
+        for queryset in tabelas_do_grupo(grupo):
+            lote = []
+            for objeto in queryset.using(origem).order_by('pk').iterator(chunk_size=self.lote):
+                lote.append(objeto)
+                if len(lote) >= self.lote:
+                    total += self._gravar(lote, destino)
+                    lote = []
+            if lote:
+                total += self._gravar(lote, destino)
+        return total
+
+    def remover_ausentes(self, grupo, origem, destino):
+        """Apaga do destino as cópias das linhas que foram apagadas na origem desde a cópia inicial."""
+        for queryset in reversed(tabelas_do_grupo(grupo)):
+            mapa = self.mapas[queryset.model]
+            na_origem = set(queryset.using(origem).values_list('pk', flat=True))
+            ausentes = [mapa.pop(pk) for pk in [pk for pk in mapa if pk not in na_origem]]
+            for inicio in range(0, len(ausentes), self.lote):
+                queryset.model._base_manager.using(destino).filter(pk__in=ausentes[inicio:inicio + self.lote]).delete()
+
+    def espelhar_catalogo(self, grupo, origem, destino):
+        """
+        Copia para o destino os itens do catálogo global usados pelo estoque do grupo (o ID de
+        cada item é o mesmo em todos os bancos). O catálogo é compartilhado: nunca é apagado da
+        origem por limpar_origem().
+        """
+        ids = Medicamento.todos.using(origem).filter(grupo=grupo).values_list('catalogo_id', flat=True)
+        itens = list(CatalogoMedicamento.objects.using(origem).filter(pk__in=list(ids)))
+        campos = [campo.attname for campo in CatalogoMedicamento._meta.concrete_fields if not campo.primary_key]
+        for inicio in range(0, len(itens), self.lote):
+            self._sobrescrever(CatalogoMedicamento, itens[inicio:inicio + self.lote], destino, campos)
+        return len(itens)
+
+    def _gravar(self, objetos, destino):
+        """Grava um lote de linhas da origem no destino, com os IDs e as chaves traduzidos. Retorna quantas."""
+        modelo = type(objetos[0])
+        mapa = self.mapas[modelo]
+        existentes, novos, ids_na_origem = [], [], []
+        for objeto in objetos:
+            if not self._traduzir(objeto):
+                continue
+            pk = mapa.get(objeto.pk)
+            if pk is None and modelo is LogAdministracaoArquivado:
+                pk = self.mapas[LogAdministracao].get(objeto.pk)    # Arquivado depois de copiado: mantém o ID no destino
+            if pk is not None:
+                mapa[objeto.pk] = pk
+                objeto.pk = pk
+                existentes.append(objeto)
+            else:
+                ids_na_origem.append(objeto.pk)
+                objeto.pk = None
+                novos.append(objeto)
+        campos = [campo.attname for campo in modelo._meta.concrete_fields if not campo.primary_key]
+        if existentes:
+            self._sobrescrever(modelo, existentes, destino, campos)
+        if novos:
+            if modelo is LogAdministracaoArquivado:
+                for objeto, pk in zip(novos, self._reservar_ids_de_log(novos, destino)):
+                    objeto.pk = pk
+            modelo._base_manager.using(destino).bulk_create(novos)   # Devolve os IDs novos (RETURNING)
+            mapa.update(zip(ids_na_origem, (objeto.pk for objeto in novos)))
+        return len(existentes) + len(novos)
+
+    def _traduzir(self, objeto):
+        """
+        Troca, no objeto, as chaves para os dados do grupo pelos IDs no destino. Retorna False se
+        alguma linha citada ainda não foi copiada (ela vem na sincronização final).
+        """
+        for campo in relacoes_do_grupo(type(objeto)):
+            valor = getattr(objeto, campo.attname)
+            if valor is not None:
+                valor = self.mapas[campo.related_model].get(valor)
+                if valor is None:
+                    return False
+                setattr(objeto, campo.attname, valor)
+        if isinstance(objeto, DocumentoBusca):
+            objeto.objeto_id = self._id_citado(objeto.tipo, objeto.objeto_id)
+            return objeto.objeto_id is not None
+        if isinstance(objeto, EventoSaida):
+            # O conteúdo do evento cita idoso, medicamento e prescrição pelo ID
+            objeto.dados = {
+                chave: self.mapas[CITADOS_NOS_EVENTOS[chave]].get(valor) if chave in CITADOS_NOS_EVENTOS else valor
+                for chave, valor in objeto.dados.items()
+            }
+        return True
+
+    def _id_citado(self, tipo, objeto_id):
+        if tipo == DocumentoBusca.Tipo.IDOSO:
+            return self.mapas[Idoso].get(objeto_id)
+        if tipo == DocumentoBusca.Tipo.PRESCRICAO:
+            return self.mapas[Prescricao].get(objeto_id)
+        return self.mapas[LogAdministracao].get(objeto_id) or self.mapas[LogAdministracaoArquivado].get(objeto_id)
+
+    @staticmethod
+    def _reservar_ids_de_log(arquivados, destino):
+        """
+        O arquivo mantém o ID que o log tinha na tabela quente (ver LogAdministracaoArquivado):
+        os IDs dos arquivados novos saem da sequência de LogAdministracao do destino.
+        """
+        campos = [campo.attname for campo in LogAdministracao._meta.concrete_fields if not campo.primary_key]
+        temporarios = LogAdministracao.objects.using(destino).bulk_create(
+            [LogAdministracao(**{campo: getattr(objeto, campo) for campo in campos}) for objeto in arquivados]
+        )
+        ids = [log.pk for log in temporarios]
+        LogAdministracao.objects.using(destino).filter(pk__in=ids).delete()
+        return ids
+
+    @staticmethod
+    def _sobrescrever(modelo, objetos, destino, campos):
+        modelo._base_manager.using(destino).bulk_create(
+            objetos, update_conflicts=True, unique_fields=[modelo._meta.pk.name], update_fields=campos,
+        )
+
+    def limpar(self, grupo, banco):
+        """Apaga os dados do grupo no banco, em lotes e na ordem inversa das dependências."""
+        # Os PDFs dos relatórios são os mesmos nos dois bancos: só a linha é apagada, não o arquivo
+        Relatorio.objects.using(banco).filter(grupo=grupo).update(arquivo='')
+        for queryset in reversed(tabelas_do_grupo(grupo)):
+            modelo = queryset.model
+            while True:
+                ids = list(queryset.using(banco).values_list('pk', flat=True)[:self.lote])
+                if not ids:
+                    break
+                modelo._base_manager.using(banco).filter(pk__in=ids).delete()
+
+    def limpar_origem(self, grupo, origem):
+        """Apaga os dados do grupo no banco de origem e, se for um shard, a cópia do grupo."""
+        self.limpar(grupo, origem)
+        if origem != 'default':
+            Grupo.todos.using(origem).filter(pk=grupo.pk).delete()
@@ -0,0 +1,39 @@
+# api/management/commands/sincronizar_replica_sqlite.py
+"""
+Copia o banco SQLite primário para as réplicas SQLite configuradas em
+DATABASE_REPLICA_URLS, usando a API de backup do SQLite (cópia consistente
+mesmo com o servidor rodando). Serve para testar o ReplicaRouter localmente,
+simulando a replicação que um PostgreSQL faria sozinho.
+"""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copia o banco SQLite primário para as réplicas SQLite configuradas (apenas para testes locais).'
+
+    def handle(self, *args, **options):
+        primario = settings.DATABASES['default']
+        if 'sqlite3' not in primario['ENGINE']:
+            raise CommandError('Este comando só funciona quando o banco primário é SQLite.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Nenhuma réplica configurada em DATABASE_REPLICA_URLS.')
+
+        origem = sqlite3.connect(primario['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = settings.DATABASES[alias]
+                if 'sqlite3' not in replica['ENGINE']:
+                    self.stdout.write(self.style.WARNING(f'{alias} não é SQLite; ignorada.'))
+                    continue
+                destino = sqlite3.connect(replica['NAME'])
+                try:
+                    origem.backup(destino)
+                finally:
+                    destino.close()
+                self.stdout.write(self.style.SUCCESS(f'{alias} sincronizada a partir de {primario["NAME"]}.'))
+        finally:
+            origem.close()
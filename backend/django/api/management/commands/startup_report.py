@@ -0,0 +1,150 @@
+# api/management/commands/startup_report.py
+"""
+Mede a inicialização a frio de um worker: cada cenário roda em um processo Python novo
+(com '-X importtime'), que importa as configurações, executa django.setup(), monta a
+aplicação WSGI (middlewares), opcionalmente executa o aquecimento de api/inicializacao.py
+e atende duas requisições pela própria aplicação WSGI, sem servidor HTTP.
+
+Mostra o tempo de cada fase com e sem aquecimento, os imports mais caros (tempo
+acumulado dos imports de primeiro nível) e o tempo próprio de import por pacote.
+
+Exemplo:
+    python manage.py startup_report
+    python manage.py startup_report --url /api/grupos/ --token <token> --top 25
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Executado no processo filho: imprime as fases (em segundos) como JSON na última linha
+SCRIPT_FILHO = r'''
+import io, json, os, sys, time
+fases = {}
+marco = time.perf_counter()
+def fase(nome):
+    global marco
+    agora = time.perf_counter()
+    fases[nome] = agora - marco
+    marco = agora
+
+from django.conf import settings
+settings.INSTALLED_APPS
+if '*' not in settings.ALLOWED_HOSTS:
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'localhost']
+fase('configuracoes')
+import django
+django.setup(set_prefix=False)
+fase('django_setup')
+from django.core.handlers.wsgi import WSGIHandler
+aplicacao = WSGIHandler()
+fase('aplicacao_wsgi')
+if os.environ['AQUECER_NA_INICIALIZACAO'] != '0':
+    from api.inicializacao import aquecer
+    aquecer()
+    fase('aquecimento')
+
+url, token = sys.argv[1], sys.argv[2]
+def requisicao():
+    ambiente = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': url, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'HTTP_ACCEPT': 'application/json',
+    }
+    if token:
+        ambiente['HTTP_AUTHORIZATION'] = 'Token ' + token
+    status = []
+    resposta = aplicacao(ambiente, lambda linha, cabecalhos, *_: status.append(linha))
+    b''.join(resposta)
+    resposta.close()
+    return status[0]
+status = requisicao()
+fase('primeira_requisicao')
+requisicao()
+fase('segunda_requisicao')
+print(json.dumps({'fases': fases, 'status': status}))
+'''
+
+FASES = (
+    'configuracoes', 'django_setup', 'aplicacao_wsgi', 'aquecimento',
+    'primeira_requisicao', 'segunda_requisicao',
+)
+
+
+class Command(BaseCommand):
+    help = 'Mede a inicialização a frio (fases e imports) com e sem o aquecimento dos workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/grupos/', help='Caminho das requisições de teste.')
+        parser.add_argument('--token', default='', help='Token de autenticação (sem ele, a resposta é 401).')
+        parser.add_argument('--top', type=int, default=15, help='Quantidade de imports e pacotes listados.')
+        parser.add_argument('--repeticoes', type=int, default=3, help='Execuções de cada cenário (vale a mediana).')
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser maior que zero.')
+        cenarios = {}
+        for nome, aquecer in (('sem aquecimento', '0'), ('com aquecimento', '1')):
+            execucoes = [self.executar(options, aquecer) for _ in range(options['repeticoes'])]
+            execucoes.sort(key=lambda execucao: execucao['total'])
+            cenarios[nome] = execucoes[len(execucoes) // 2]
+
+        self.stdout.write(f"Requisições: GET {options['url']} -> {cenarios['sem aquecimento']['status']}")
+        self.stdout.write('')
+        cabecalho = f"{'fase':<22}" + ''.join(f'{nome:>18}' for nome in cenarios)
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+        for fase in (*FASES, 'processo'):
+            valores = [
+                cenario['total'] if fase == 'processo' else cenario['fases'].get(fase)
+                for cenario in cenarios.values()
+            ]
+            self.stdout.write(f'{fase:<22}' + ''.join(
+                f'{"-":>18}' if valor is None else f'{valor * 1000:>16.1f}ms' for valor in valores
+            ))
+        self.stdout.write("'processo' inclui a partida do interpretador; mediana de "
+                          f"{options['repeticoes']} execução(ões) por cenário.")
+
+        imports = cenarios['sem aquecimento']['imports']
+        self.stdout.write('')
+        self.stdout.write("Imports de primeiro nível mais caros (acumulado, sem aquecimento):")
+        for modulo, acumulado in sorted(imports['raizes'].items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {acumulado / 1000:>8.1f}ms  {modulo}')
+        self.stdout.write('')
+        self.stdout.write('Tempo próprio de import por pacote:')
+        for pacote, proprio in imports['pacotes'].most_common(options['top']):
+            self.stdout.write(f'  {proprio / 1000:>8.1f}ms  {pacote}')
+
+    def executar(self, options, aquecer):
+        ambiente = {**os.environ, 'AQUECER_NA_INICIALIZACAO': aquecer}
+        ambiente.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT_FILHO, options['url'], options['token']],
+            capture_output=True, text=True, env=ambiente,
+        )
+        total = time.perf_counter() - inicio
+        if processo.returncode != 0:
+            erro = [linha for linha in processo.stderr.splitlines() if not linha.startswith('import time:')]
+            raise CommandError('O processo de medição falhou:\n' + '\n'.join(erro[-20:]))
+        resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+        return {**resultado, 'total': total, 'imports': self.ler_importtime(processo.stderr)}
+
+    @staticmethod
+    def ler_importtime(saida):
+        """Lê a saída de '-X importtime': acumulado dos imports de primeiro nível e tempo próprio por pacote (µs)."""
+        raizes, pacotes = {}, Counter()
+        for linha in saida.splitlines():
+            if not linha.startswith('import time:') or 'self [us]' in linha:
+                continue
+            proprio, acumulado, modulo = linha[len('import time:'):].split('|')
+            nome = modulo.strip()
+            pacotes[nome.split('.')[0]] += int(proprio)
+            if modulo[1:2] != ' ':     # Sem recuo: importado diretamente pelo script
+                raizes[nome] = int(acumulado)
+        return {'raizes': raizes, 'pacotes': pacotes}
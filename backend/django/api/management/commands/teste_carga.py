@@ -0,0 +1,192 @@
+# api/management/commands/teste_carga.py
+"""
+Gerador de carga que reproduz o tráfego de uma rodada de medicação.
+
+Cria lares, cuidadores, idosos, medicamentos e prescrições sintéticos através
+da própria API e depois reproduz sessões realistas de cada cuidador:
+seleciona o lar (meus-grupos), carrega as prescrições, dispara rajadas de
+'administrar' às 08:00, 12:00 e 20:00 (todos os cuidadores ao mesmo tempo)
+e navega pelos logs entre as rodadas.
+
+O servidor deve rodar com LIMITES_DE_TAXA=0: a preparação registra muitos
+cuidadores a partir do mesmo IP (ver api/throttling.py).
+
+Exemplo:
+    python manage.py teste_carga --url http://127.0.0.1:8000 --lares 5 --cuidadores 4 --idosos 20
+"""
+
+import asyncio
+import datetime
+import itertools
+import random
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.carga import ClienteHTTP, Estatisticas
+
+HORARIOS_RODADA = (8, 12, 20)   # Horas em que as rajadas de 'administrar' acontecem
+SENHA_SINTETICA = 'CargaSintetica#2024'
+
+
+class Lar:
+    """Estado de um lar sintético criado durante a preparação."""
+    def __init__(self, indice):
+        self.indice = indice
+        self.grupo_id = None
+        self.cuidadores = []    # Lista de ClienteHTTP já autenticados
+
+
+class Command(BaseCommand):
+    help = 'Gera carga concorrente contra um servidor local, reproduzindo rodadas de medicação.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base do servidor (http).')
+        parser.add_argument('--lares', type=int, default=3, help='Número de lares (grupos) sintéticos.')
+        parser.add_argument('--cuidadores', type=int, default=4, help='Cuidadores por lar.')
+        parser.add_argument('--idosos', type=int, default=15, help='Idosos por lar.')
+        parser.add_argument('--medicamentos', type=int, default=8, help='Medicamentos por lar.')
+        parser.add_argument('--dias', type=int, default=1, help='Dias simulados de rodadas.')
+        parser.add_argument('--paginas-log', type=int, default=2, help='Páginas de log navegadas após cada rodada.')
+        parser.add_argument('--semente', type=int, default=None, help='Semente do gerador aleatório.')
+
+    def handle(self, *args, **options):
+        if options['lares'] < 1 or options['cuidadores'] < 1 or options['idosos'] < 1 or options['medicamentos'] < 1:
+            raise CommandError('Lares, cuidadores, idosos e medicamentos devem ser maiores que zero.')
+        random.seed(options['semente'])
+        estatisticas = asyncio.run(self.executar(options))
+        self.stdout.write('')
+        self.stdout.write(estatisticas.tabela())
+
+    async def executar(self, options):
+        execucao = uuid.uuid4().hex[:8]
+        self.stdout.write(f'Preparando {options["lares"]} lares (execução {execucao})...')
+        lares = await asyncio.gather(*[
+            self.preparar_lar(options, execucao, indice) for indice in range(options['lares'])
+        ])
+
+        estatisticas = Estatisticas()
+        cuidadores = [(lar, posicao, cliente) for lar in lares for posicao, cliente in enumerate(lar.cuidadores)]
+        for _, _, cliente in cuidadores:
+            cliente.estatisticas = estatisticas
+
+        self.stdout.write(f'Reproduzindo {options["dias"]} dia(s) de rodadas com {len(cuidadores)} cuidadores...')
+        barreira = asyncio.Barrier(len(cuidadores))
+        estatisticas.iniciar()
+        try:
+            await asyncio.gather(*[
+                self.sessao_cuidador(options, lar, posicao, cliente, barreira)
+                for lar, posicao, cliente in cuidadores
+            ])
+        finally:
+            estatisticas.finalizar()
+            await asyncio.gather(*[cliente.fechar() for _, _, cliente in cuidadores])
+        return estatisticas
+
+    async def _autenticar(self, url, email, nome):
+        """Registra e autentica um cuidador sintético, devolvendo um cliente com token."""
+        cliente = ClienteHTTP(url)
+        status, corpo = await cliente.requisicao('POST', '/api/auth/register/', dados={
+            'email': email, 'nome_completo': nome, 'password': SENHA_SINTETICA,
+        })
+        if status != 201:
+            raise CommandError(f'Falha ao registrar {email}: {status} {corpo}')
+        status, corpo = await cliente.requisicao('POST', '/api/auth/login/', dados={
+            'email': email, 'password': SENHA_SINTETICA,
+        })
+        if status != 200 or not corpo or 'key' not in corpo:
+            raise CommandError(f'Falha no login de {email}: {status} {corpo}')
+        cliente.token = corpo['key']
+        return cliente
+
+    async def preparar_lar(self, options, execucao, indice):
+        url = options['url']
+        lar = Lar(indice)
+        prefixo = f'carga-{execucao}-{indice}'
+
+        admin = await self._autenticar(url, f'{prefixo}-0@carga.local', f'Cuidador {indice}.0')
+        status, grupo = await admin.requisicao('POST', '/api/grupos/', dados={
+            'nome': f'Lar Carga {execucao} #{indice}', 'senha': SENHA_SINTETICA,
+        })
+        if status != 201:
+            raise CommandError(f'Falha ao criar o lar {indice}: {status} {grupo}')
+        lar.grupo_id = grupo['id']
+        base = f'/api/grupos/{lar.grupo_id}'
+        _, codigo = await admin.requisicao('GET', f'{base}/codigo-de-acesso/')
+        lar.cuidadores.append(admin)
+
+        for c in range(1, options['cuidadores']):
+            cliente = await self._autenticar(url, f'{prefixo}-{c}@carga.local', f'Cuidador {indice}.{c}')
+            status, corpo = await cliente.requisicao('POST', '/api/grupos/entrar-com-codigo/', dados={
+                'codigo_acesso': codigo['codigo_acesso'],
+            })
+            if status != 200:
+                raise CommandError(f'Falha ao entrar no lar {indice}: {status} {corpo}')
+            lar.cuidadores.append(cliente)
+
+        medicamentos = []
+        for m in range(options['medicamentos']):
+            status, corpo = await admin.requisicao('POST', f'{base}/medicamentos/', dados={
+                'nome_marca': f'Med {prefixo}-{m}',
+                'principio_ativo': f'principio {m}',
+                'forma_farmaceutica': 'COMP',
+                'quantidade_estoque': '1000000',
+            })
+            if status != 201:
+                raise CommandError(f'Falha ao criar medicamento: {status} {corpo}')
+            medicamentos.append(corpo['id'])
+
+        for i in range(options['idosos']):
+            status, idoso = await admin.requisicao('POST', f'{base}/idosos/', dados={
+                'nome_completo': f'Idoso {indice}.{i}',
+                'data_nascimento': '1940-01-01',
+                'peso': '70.00',
+                'genero': random.choice('MF'),
+                'cpf': f'{indice:03d}{i:08d}',
+                'cartao_sus': f'{prefixo}-{i}',
+            })
+            if status != 201:
+                raise CommandError(f'Falha ao criar idoso: {status} {idoso}')
+            for hora in HORARIOS_RODADA:
+                status, corpo = await admin.requisicao('POST', f'{base}/prescricoes/', dados={
+                    'idoso_id': idoso['id'],
+                    'medicamento_id': random.choice(medicamentos),
+                    'horario_previsto': f'{hora:02d}:00:00',
+                    'dose_valor': '1.00',
+                })
+                if status != 201:
+                    raise CommandError(f'Falha ao criar prescrição: {status} {corpo}')
+        return lar
+
+    async def sessao_cuidador(self, options, lar, posicao, cliente, barreira):
+        """
+        Reproduz a sessão de um cuidador: seleciona o lar, carrega prescrições e,
+        a cada rodada, administra as doses dos idosos sob sua responsabilidade.
+        """
+        await cliente.requisicao('GET', '/api/grupos/meus-grupos/', rotulo='GET meus-grupos')
+        base = f'/api/grupos/{lar.grupo_id}'
+        _, prescricoes = await cliente.requisicao('GET', f'{base}/prescricoes/', rotulo='GET prescricoes')
+        prescricoes = prescricoes if isinstance(prescricoes, list) else []
+
+        # Os idosos são divididos entre os cuidadores do lar em rodízio.
+        idosos = sorted({p['idoso'] for p in prescricoes})
+        meus_idosos = set(idosos[posicao::len(lar.cuidadores)])
+        minhas = [p for p in prescricoes if p['idoso'] in meus_idosos]
+
+        data_inicial = datetime.date.today()
+        for dia, hora in itertools.product(range(options['dias']), HORARIOS_RODADA):
+            await barreira.wait()   # Todos os cuidadores começam a rodada juntos
+            momento = datetime.datetime.combine(data_inicial + datetime.timedelta(days=dia), datetime.time(hora))
+            for prescricao in minhas:
+                if int(prescricao['horario_previsto'][:2]) != hora:
+                    continue
+                await cliente.requisicao(
+                    'POST', f'{base}/prescricoes/{prescricao["id"]}/administrar/',
+                    rotulo='POST administrar',
+                    dados={'data_hora_administracao': momento.isoformat(), 'observacoes': 'carga'},
+                )
+            # Navega pelos logs seguindo a paginação, como a tela de histórico do app.
+            for pagina in range(1, options['paginas_log'] + 1):
+                _, logs = await cliente.requisicao('GET', f'{base}/logs/?page={pagina}', rotulo='GET logs')
+                if not isinstance(logs, dict) or not logs.get('next'):
+                    break
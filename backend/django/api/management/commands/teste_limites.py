@@ -0,0 +1,132 @@
+# api/management/commands/teste_limites.py
+"""
+Tráfego abusivo contra as rotas com limite de taxa (api/throttling.py), para
+conferir que o uso de CPU do servidor fica estável quando os limites entram em ação.
+
+Para cada cenário, N conexões disparam em laço durante '--duracao' segundos:
+- login: senhas erradas para um mesmo e-mail (cada tentativa aceita custa um PBKDF2);
+- entrar-com-codigo: códigos de acesso aleatórios (cada tentativa aceita custa uma consulta).
+A cada segundo são mostradas as requisições atendidas, as recusadas com 429 e, se
+'--pid' for informado (Linux), o uso de CPU desses processos do servidor.
+
+Exemplo:
+    gunicorn config.wsgi:application --workers 2 --bind 127.0.0.1:8000
+    python manage.py teste_limites --url http://127.0.0.1:8000 --conexoes 50 --pid $(pgrep -d, -f gunicorn)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.carga import ClienteHTTP
+
+SENHA_SINTETICA = 'LimiteSintetico#2024'
+
+
+def tempo_de_cpu(pids):
+    """Segundos de CPU (usuário + sistema) já consumidos pelos processos, lidos de /proc."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as arquivo:
+                campos = arquivo.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        total += int(campos[11]) + int(campos[12])     # utime e stime, em ticks do relógio
+    return total / os.sysconf('SC_CLK_TCK')
+
+
+class Command(BaseCommand):
+    help = 'Dispara tentativas abusivas de login e de código de acesso e mostra respostas 429 e CPU por segundo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base do servidor (http).')
+        parser.add_argument('--conexoes', type=int, default=50, help='Conexões simultâneas por cenário.')
+        parser.add_argument('--duracao', type=float, default=10, help='Segundos de tráfego em cada cenário.')
+        parser.add_argument('--pid', default='', help='PIDs do servidor, separados por vírgula, para medir a CPU (Linux).')
+
+    def handle(self, *args, **options):
+        if options['conexoes'] < 1 or options['duracao'] <= 0:
+            raise CommandError('--conexoes e --duracao devem ser maiores que zero.')
+        try:
+            pids = [int(pid) for pid in options['pid'].split(',') if pid.strip()]
+        except ValueError:
+            raise CommandError('--pid deve ser uma lista de inteiros separados por vírgula.')
+        asyncio.run(self.executar(options, pids))
+
+    async def executar(self, options, pids):
+        email = f'limites-{uuid.uuid4().hex[:8]}@carga.local'
+        cliente = ClienteHTTP(options['url'])
+        status, corpo = await cliente.requisicao('POST', '/api/auth/register/', dados={
+            'email': email, 'nome_completo': 'Teste de Limites', 'password': SENHA_SINTETICA,
+        })
+        if status != 201:
+            raise CommandError(f'Falha ao registrar o usuário de teste: {status} {corpo}')
+        status, corpo = await cliente.requisicao('POST', '/api/auth/login/', dados={'email': email, 'password': SENHA_SINTETICA})
+        if status != 200 or not corpo or 'key' not in corpo:
+            raise CommandError(f'Falha no login do usuário de teste: {status} {corpo}')
+        token = corpo['key']
+        await cliente.fechar()
+
+        cenarios = (
+            ('login', lambda: ('POST', '/api/auth/login/', {'email': email, 'password': uuid.uuid4().hex}), None),
+            ('entrar-com-codigo', lambda: ('POST', '/api/grupos/entrar-com-codigo/', {'codigo_acesso': str(uuid.uuid4())}), token),
+        )
+        for nome, requisicao, token_do_cenario in cenarios:
+            self.stdout.write('')
+            self.stdout.write(f'{nome}: {options["conexoes"]} conexões por {options["duracao"]:.0f}s')
+            await self.medir(options, pids, requisicao, token_do_cenario)
+
+    async def medir(self, options, pids, requisicao, token):
+        respostas = []      # (segundo, status)
+        clientes = [ClienteHTTP(options['url'], timeout=30) for _ in range(options['conexoes'])]
+        for cliente in clientes:
+            cliente.token = token
+        inicio = time.perf_counter()
+        limite = inicio + options['duracao']
+
+        async def conexao(cliente):
+            while time.perf_counter() < limite:
+                metodo, caminho, dados = requisicao()
+                status, _ = await cliente.requisicao(metodo, caminho, dados=dados)
+                respostas.append((int(time.perf_counter() - inicio), status))
+
+        cpu_por_segundo = []
+
+        async def amostrar_cpu():
+            anterior = tempo_de_cpu(pids)
+            while time.perf_counter() < limite:
+                await asyncio.sleep(1)
+                atual = tempo_de_cpu(pids)
+                cpu_por_segundo.append(atual - anterior)
+                anterior = atual
+
+        try:
+            await asyncio.gather(amostrar_cpu(), *[conexao(cliente) for cliente in clientes])
+        finally:
+            await asyncio.gather(*[cliente.fechar() for cliente in clientes])
+
+        por_segundo = {}
+        for segundo, status in respostas:
+            por_segundo.setdefault(segundo, Counter())[status] += 1
+        cabecalho = f"{'segundo':>8} {'atendidas':>10} {'429':>8} {'erros':>7} {'cpu':>8}"
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+        for segundo in sorted(por_segundo):
+            contagem = por_segundo[segundo]
+            recusadas = contagem[429]
+            erros = contagem[0] + sum(n for status, n in contagem.items() if status >= 500)
+            atendidas = sum(contagem.values()) - recusadas - erros
+            cpu = f'{cpu_por_segundo[segundo] * 100:>7.0f}%' if pids and segundo < len(cpu_por_segundo) else f'{"-":>8}'
+            self.stdout.write(f'{segundo:>8} {atendidas:>10} {recusadas:>8} {erros:>7} {cpu}')
+        total = Counter(status for _, status in respostas)
+        self.stdout.write(
+            f'Total: {len(respostas)} requisições ({len(respostas) / options["duracao"]:.0f}/s), '
+            f'{total[429]} recusadas com 429.'
+        )
+        if pids:
+            self.stdout.write(f'CPU do servidor: {sum(cpu_por_segundo):.2f}s no cenário.')
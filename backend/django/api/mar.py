@@ -0,0 +1,162 @@
+# api/mar.py - Registro mensal de administração de medicamentos (MAR) de um grupo.
+#
+# A grade do MAR tem uma linha por prescrição e horário e uma coluna por dia do mês. Em vez de
+# montar célula por célula, cada linha guarda máscaras de bits dos dias (bit 0 = dia 1):
+# - esperado: dias em que a dose está agendada. Nas diárias sem intervalo, é o OU das máscaras
+#   dos dias da semana do mês, recortado pela vigência; nas demais, as datas de datas_agendadas();
+# - administrado / recusado / pulado: dias com registro de cada status, lidos com uma consulta
+#   por período na tabela de logs (e outra no arquivo, se o mês for anterior ao corte).
+# Os totais saem de contagens de bits (int.bit_count) sobre as máscaras, sem percorrer os dias.
+
+import calendar
+import datetime
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .arquivo import data_de_corte
+from .models import LogAdministracao, LogAdministracaoArquivado, Prescricao
+from .recorrencia import datas_agendadas, dias_da_mascara, horario_mais_proximo
+
+# Status do log -> coluna de máscara da grade
+COLUNA_DO_STATUS = {
+    LogAdministracao.StatusDose.ADMINISTRADO: 'administrado',
+    LogAdministracao.StatusDose.RECUSADO: 'recusado',
+    LogAdministracao.StatusDose.PULADO: 'pulado',
+}
+
+
+def mascara_de_dias(primeiro_dia, ultimo_dia):
+    """Máscara com os dias do mês de primeiro_dia até ultimo_dia (números do dia, inclusive)."""
+    if ultimo_dia < primeiro_dia:
+        return 0
+    return (1 << ultimo_dia) - (1 << (primeiro_dia - 1))
+
+
+def mascara_dos_dias_passados(inicio, fim):
+    """Dias do mês anteriores a hoje, nos quais uma dose esperada e não registrada conta como sem registro."""
+    hoje = timezone.localdate()
+    if hoje > fim:
+        return mascara_de_dias(1, fim.day)
+    if hoje >= inicio:
+        return mascara_de_dias(1, hoje.day - 1)
+    return 0
+
+
+def mascaras_por_dia_da_semana(inicio, total_dias):
+    """Lista com a máscara dos dias do mês que caem em cada dia da semana (0 = segunda)."""
+    mascaras = [0] * 7
+    for dia in range(total_dias):
+        mascaras[(inicio.weekday() + dia) % 7] |= 1 << dia
+    return mascaras
+
+
+def mascara_esperada(prescricao, inicio, fim, por_dia_da_semana):
+    """Dias do mês (inicio a fim) em que a prescrição tem dose agendada."""
+    if not prescricao.ativo:
+        return 0
+    Frequencia = prescricao.FrequenciaChoices
+    if prescricao.frequencia == Frequencia.DIARIA and prescricao.intervalo <= 1:
+        mascara = 0
+        for dia_da_semana in dias_da_mascara(prescricao.dias_semana):
+            mascara |= por_dia_da_semana[dia_da_semana]
+        primeiro = max(prescricao.data_inicio, inicio)
+        ultimo = min(prescricao.data_fim, fim) if prescricao.data_fim else fim
+        if primeiro > ultimo:
+            return 0
+        return mascara & mascara_de_dias(primeiro.day, ultimo.day)
+    mascara = 0
+    for dia in datas_agendadas(prescricao, inicio, fim):
+        mascara |= 1 << (dia.day - 1)
+    return mascara
+
+
+def logs_do_mes(grupo_pk, inicio, fim, idosos=None):
+    """(prescricao_id, data_hora, horario_dose, status) dos registros do grupo no mês, quentes e arquivados."""
+    comeco = timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min))
+    termino = timezone.make_aware(datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min))
+    tabelas = [LogAdministracao]
+    if comeco < data_de_corte():
+        tabelas.append(LogAdministracaoArquivado)
+    campos = ('prescricao_id', 'data_hora_administracao', 'horario_dose', 'status')
+    logs = []
+    for tabela in tabelas:
+        registros = tabela.objects.filter(
+            prescricao__idoso__grupo_id=grupo_pk,
+            data_hora_administracao__gte=comeco, data_hora_administracao__lt=termino,
+        )
+        if idosos is not None:
+            registros = registros.filter(prescricao__idoso_id__in=idosos)
+        logs.extend(registros.values_list(*campos))
+    return logs
+
+
+def grade_do_mes(grupo_pk, mes, idosos=None):
+    """
+    Grade do MAR do grupo no mês (date do dia 1) em formato colunar: cada coluna de 'linhas'
+    é uma lista com um valor por linha (prescrição e horário), e as máscaras são inteiros.
+    'idosos' limita a grade a uma lista de IDs de idoso.
+    """
+    total_dias = calendar.monthrange(mes.year, mes.month)[1]
+    inicio, fim = mes, mes.replace(day=total_dias)
+    logs = logs_do_mes(grupo_pk, inicio, fim, idosos)
+
+    # Prescrições vigentes no mês e as que, mesmo encerradas, têm registros nele
+    prescricoes = Prescricao.objects.filter(idoso__grupo_id=grupo_pk, idoso__apagado_em__isnull=True).filter(
+        Q(data_inicio__lte=fim, ativo=True) & (Q(data_fim__isnull=True) | Q(data_fim__gte=inicio))
+        | Q(pk__in={log[0] for log in logs})
+    ).select_related('idoso', 'medicamento__catalogo')
+    if idosos is not None:
+        prescricoes = prescricoes.filter(idoso_id__in=idosos)
+    prescricoes = {prescricao.pk: prescricao for prescricao in prescricoes}
+
+    por_dia_da_semana = mascaras_por_dia_da_semana(inicio, total_dias)
+    linhas = {}     # (prescricao_id, horario) -> máscaras
+    for prescricao in prescricoes.values():
+        esperado = mascara_esperada(prescricao, inicio, fim, por_dia_da_semana)
+        for horario in prescricao.horarios:
+            linhas[(prescricao.pk, horario)] = defaultdict(int, esperado=esperado)
+    for prescricao_id, momento, horario, status in logs:
+        prescricao = prescricoes.get(prescricao_id)
+        if prescricao is None:
+            continue
+        horario = horario.strftime('%H:%M') if horario else horario_mais_proximo(prescricao.horarios, momento) or ''
+        linha = linhas.setdefault((prescricao_id, horario), defaultdict(int))    # Horário que saiu da agenda
+        linha[COLUNA_DO_STATUS.get(status, 'administrado')] |= 1 << (timezone.localtime(momento).day - 1)
+
+    ordem = sorted(linhas, key=lambda chave: (
+        prescricoes[chave[0]].idoso.nome_completo, prescricoes[chave[0]].idoso_id,
+        prescricoes[chave[0]].medicamento.nome_marca, chave[0], chave[1],
+    ))
+    colunas = defaultdict(list)
+    for prescricao_id, horario in ordem:
+        prescricao, mascaras = prescricoes[prescricao_id], linhas[(prescricao_id, horario)]
+        colunas['prescricao_id'].append(prescricao_id)
+        colunas['idoso_id'].append(prescricao.idoso_id)
+        colunas['medicamento'].append(prescricao.medicamento.nome_marca)
+        colunas['dose'].append(f'{prescricao.dose_valor} {prescricao.dose_unidade}')
+        colunas['horario'].append(horario)
+        for coluna in ('esperado', *COLUNA_DO_STATUS.values()):
+            colunas[coluna].append(mascaras[coluna])
+
+    passados = mascara_dos_dias_passados(inicio, fim)
+    registrados = [a | r | p for a, r, p in zip(colunas['administrado'], colunas['recusado'], colunas['pulado'])]
+    return {
+        'mes': inicio.strftime('%Y-%m'),
+        'dias': total_dias,
+        'idosos': {
+            prescricao.idoso_id: prescricao.idoso.nome_completo for prescricao in prescricoes.values()
+        },
+        'linhas': {coluna: colunas[coluna] for coluna in (
+            'prescricao_id', 'idoso_id', 'medicamento', 'dose', 'horario', 'esperado', *COLUNA_DO_STATUS.values(),
+        )},
+        'totais': {
+            'esperadas': sum(mascara.bit_count() for mascara in colunas['esperado']),
+            **{coluna: sum(mascara.bit_count() for mascara in colunas[coluna]) for coluna in COLUNA_DO_STATUS.values()},
+            'sem_registro': sum(
+                (esperado & ~registrado & passados).bit_count()
+                for esperado, registrado in zip(colunas['esperado'], registrados)
+            ),
+        },
+    }
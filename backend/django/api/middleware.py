@@ -0,0 +1,370 @@
+# api/middleware.py - Middlewares próprios da API.
+
+import hashlib
+import json
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .db_routers import (
+    definir_banco_do_grupo,
+    permitir_leitura_em_replica,
+    restaurar_banco_do_grupo,
+    restaurar_leitura_em_replica,
+)
+from .shards import localizar_grupo
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class HibridoMixin:
+    """
+    Base dos middlewares que funcionam sob WSGI e sob ASGI (como o MiddlewareMixin do Django).
+    Sob ASGI, __call__ delega para __acall__ e a cadeia continua assíncrona até a view,
+    sem que o Django precise adaptar a requisição para uma thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class ArquivosEstaticosMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que também roda sob ASGI. O WhiteNoise 6 só é síncrono e,
+    no meio da cadeia, forçaria todas as views assíncronas a rodarem em uma thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class AmostradorPilha:
+    """
+    Profiler por amostragem: uma thread auxiliar lê periodicamente a pilha da
+    thread da requisição e acumula as pilhas no formato 'collapsed' (uma linha
+    por pilha, frames separados por ';'), compatível com flamegraph.pl e speedscope.
+    """
+    def __init__(self, thread_id, intervalo):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            nomes = []
+            while frame is not None:
+                codigo = frame.f_code
+                nomes.append(f'{Path(codigo.co_filename).name}:{codigo.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            self.pilhas[';'.join(reversed(nomes))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{pilha} {contagem}' for pilha, contagem in self.pilhas.most_common())
+
+
+class ColetorSQL:
+    """
+    Wrapper de execução (connection.execute_wrapper) que registra cada comando SQL
+    com sua duração e o ponto do código do projeto que o originou.
+    """
+    def __init__(self, alias):
+        self.alias = alias
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.consultas.append({
+                'banco': self.alias,
+                'sql': sql,
+                'params': repr(params)[:500],
+                'duracao_ms': round(duracao, 3),
+                'origem': self._origem(),
+            })
+
+    @staticmethod
+    def _origem():
+        """Último frame da pilha que pertence ao código do projeto (fora de site-packages)."""
+        base = str(settings.BASE_DIR)
+        for frame in reversed(traceback.extract_stack()):
+            if frame.filename.startswith(base) and 'site-packages' not in frame.filename and not frame.filename.endswith('middleware.py'):
+                return f'{Path(frame.filename).relative_to(base)}:{frame.lineno} em {frame.name}'
+        return None
+
+
+class PerfilamentoMiddleware(HibridoMixin):
+    """
+    Perfila uma requisição sob demanda, apenas para usuários 'is_staff'.
+
+    Ativado pelo cabeçalho 'X-Perfilar' ou pelo parâmetro '?_perfilar=':
+    - '1': executa a requisição normalmente, grava o relatório em PERFILAMENTO_DIR
+      e devolve o ID no cabeçalho 'X-Perfilamento-Id'.
+    - 'resposta': devolve o relatório em JSON no lugar da resposta original.
+
+    Para os demais usuários e requisições o middleware não faz nada.
+    Sob ASGI as amostras de pilha vêm da thread do event loop; o SQL é coletado
+    na thread em que o ORM assíncrono executa as consultas da requisição.
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        modo = request.headers.get('X-Perfilar') or request.GET.get('_perfilar')
+        if not modo or not self._usuario_staff(request):
+            return self.get_response(request)
+
+        coletores, instrumentacao = self._instrumentar()
+        inicio = time.perf_counter()
+        with instrumentacao, AmostradorPilha(threading.get_ident(), settings.PERFILAMENTO_INTERVALO) as amostrador:
+            response = self.get_response(request)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()   # Inclui o tempo de serialização no perfil
+        duracao = (time.perf_counter() - inicio) * 1000
+        return self._concluir(modo, request, response, duracao, coletores, amostrador)
+
+    async def __acall__(self, request):
+        modo = request.headers.get('X-Perfilar') or request.GET.get('_perfilar')
+        if not modo or not await sync_to_async(self._usuario_staff)(request):
+            return await self.get_response(request)
+
+        # As conexões são por thread: instrumenta a thread usada pelo ORM assíncrono desta requisição
+        coletores, instrumentacao = await sync_to_async(self._instrumentar)()
+        inicio = time.perf_counter()
+        try:
+            with AmostradorPilha(threading.get_ident(), settings.PERFILAMENTO_INTERVALO) as amostrador:
+                response = await self.get_response(request)
+                if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                    response.render()
+        finally:
+            await sync_to_async(instrumentacao.close)()
+        duracao = (time.perf_counter() - inicio) * 1000
+        return await sync_to_async(self._concluir)(modo, request, response, duracao, coletores, amostrador)
+
+    @staticmethod
+    def _instrumentar():
+        """Registra um ColetorSQL em cada conexão da thread atual. Fechar o ExitStack remove os coletores."""
+        coletores = [ColetorSQL(conexao.alias) for conexao in connections.all()]
+        instrumentacao = ExitStack()
+        for conexao, coletor in zip(connections.all(), coletores):
+            instrumentacao.enter_context(conexao.execute_wrapper(coletor))
+        return coletores, instrumentacao
+
+    def _concluir(self, modo, request, response, duracao, coletores, amostrador):
+        relatorio = self._montar_relatorio(request, response, duracao, coletores, amostrador)
+        if modo == 'resposta':
+            return JsonResponse(relatorio, json_dumps_params={'ensure_ascii': False})
+
+        diretorio = Path(settings.PERFILAMENTO_DIR)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        (diretorio / f"{relatorio['id']}.json").write_text(json.dumps(relatorio, ensure_ascii=False, indent=2), encoding='utf-8')
+        (diretorio / f"{relatorio['id']}.folded").write_text(relatorio['flamegraph'], encoding='utf-8')
+        response['X-Perfilamento-Id'] = relatorio['id']
+        return response
+
+    @staticmethod
+    def _usuario_staff(request):
+        """Resolve o usuário pela sessão ou pelo Token do DRF (a autenticação do DRF só roda na view)."""
+        usuario = getattr(request, 'user', None)
+        if usuario is None or not usuario.is_authenticated:
+            try:
+                resultado = TokenAuthentication().authenticate(request)
+            except AuthenticationFailed:
+                return False
+            usuario = resultado[0] if resultado else None
+        return bool(usuario and usuario.is_staff)
+
+    @staticmethod
+    def _montar_relatorio(request, response, duracao, coletores, amostrador):
+        consultas = [consulta for coletor in coletores for consulta in coletor.consultas]
+        repeticoes_sql = Counter(consulta['sql'] for consulta in consultas)
+        repeticoes_exatas = Counter((consulta['sql'], consulta['params']) for consulta in consultas)
+        for consulta in consultas:
+            # 'repeticoes' > 1 indica um padrão N+1; 'duplicada' indica a mesma consulta com os mesmos parâmetros.
+            consulta['repeticoes'] = repeticoes_sql[consulta['sql']]
+            consulta['duplicada'] = repeticoes_exatas[(consulta['sql'], consulta['params'])] > 1
+
+        return {
+            'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            'metodo': request.method,
+            'caminho': request.get_full_path(),
+            'status': response.status_code,
+            'duracao_ms': round(duracao, 3),
+            'sql_total': len(consultas),
+            'sql_tempo_ms': round(sum(consulta['duracao_ms'] for consulta in consultas), 3),
+            'sql_duplicadas': sum(1 for consulta in consultas if consulta['duplicada']),
+            'sql_mais_repetidas': [
+                {'sql': sql, 'repeticoes': total} for sql, total in repeticoes_sql.most_common(10) if total > 1
+            ],
+            'consultas': consultas,
+            'amostras': sum(amostrador.pilhas.values()),
+            'flamegraph': amostrador.collapsed(),
+        }
+
+
+class ReplicaLeituraMiddleware(HibridoMixin):
+    """
+    Libera as leituras de requisições seguras para as réplicas (ver api.db_routers.ReplicaRouter).
+
+    Garante 'read-your-writes': depois que um cliente faz uma requisição de escrita,
+    as leituras dele ficam fixadas no primário por REPLICA_FIXACAO_SEGUNDOS,
+    tempo suficiente para a réplica alcançar o primário.
+    """
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        chave = f'replica-fixada:{self._identificar_cliente(request)}'
+        seguro = request.method in METODOS_SEGUROS
+        token = permitir_leitura_em_replica(seguro and not cache.get(chave))
+        try:
+            response = self.get_response(request)
+        finally:
+            restaurar_leitura_em_replica(token)
+
+        if not seguro:
+            cache.set(chave, True, settings.REPLICA_FIXACAO_SEGUNDOS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        chave = f'replica-fixada:{self._identificar_cliente(request)}'
+        seguro = request.method in METODOS_SEGUROS
+        token = permitir_leitura_em_replica(seguro and not await cache.aget(chave))
+        try:
+            response = await self.get_response(request)
+        finally:
+            restaurar_leitura_em_replica(token)
+
+        if not seguro:
+            await cache.aset(chave, True, settings.REPLICA_FIXACAO_SEGUNDOS)
+        return response
+
+    @staticmethod
+    def _identificar_cliente(request):
+        """Identifica o cliente pelo token (app), pela sessão (admin) ou, em último caso, pelo IP."""
+        credencial = (
+            request.headers.get('Authorization')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        return hashlib.sha256(credencial.encode()).hexdigest()
+
+
+class ShardMiddleware(HibridoMixin):
+    """
+    Roteia os dados do grupo da URL para o seu shard (ver api.db_routers.ShardRouter).
+    O grupo vem de 'grupo_pk' nas rotas aninhadas ou de 'pk' nas rotas de /grupos/{pk}/.
+    Enquanto o grupo está sendo movido entre shards, requisições de escrita recebem 503.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.async_mode:
+            # Sob ASGI o Django aguarda o process_view no mesmo contexto da view
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request._token_shard = None
+        try:
+            return self.get_response(request)
+        finally:
+            if request._token_shard is not None:
+                restaurar_banco_do_grupo(request._token_shard)
+
+    async def __acall__(self, request):
+        request._token_shard = None
+        try:
+            return await self.get_response(request)
+        finally:
+            if request._token_shard is not None:
+                restaurar_banco_do_grupo(request._token_shard)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        grupo_pk = self._grupo_da_url(request, view_kwargs)
+        if grupo_pk is None:
+            return None
+        return self._rotear(request, *localizar_grupo(grupo_pk))
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        grupo_pk = self._grupo_da_url(request, view_kwargs)
+        if grupo_pk is None:
+            return None
+        return self._rotear(request, *await sync_to_async(localizar_grupo)(grupo_pk))
+
+    @staticmethod
+    def _grupo_da_url(request, view_kwargs):
+        if not settings.DATABASE_SHARDS:
+            return None
+        grupo_pk = view_kwargs.get('grupo_pk')
+        if grupo_pk is None and (request.resolver_match.url_name or '').startswith('grupo-'):
+            grupo_pk = view_kwargs.get('pk')
+        return grupo_pk
+
+    @staticmethod
+    def _rotear(request, banco, em_migracao):
+        if em_migracao and request.method not in METODOS_SEGUROS:
+            response = JsonResponse(
+                {'detail': 'Os dados deste lar estão sendo migrados. Tente novamente em instantes.'}, status=503
+            )
+            response['Retry-After'] = str(settings.SHARD_MAPA_TTL)
+            return response
+        request._token_shard = definir_banco_do_grupo(banco)
+        return None
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:35
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_medicamento_concentracao_unidade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='banco',
+            field=models.CharField(default=api.models.banco_padrao_novos_grupos, max_length=50, verbose_name='Banco de Dados (Shard)'),
+        ),
+        migrations.AddField(
+            model_name='grupo',
+            name='em_migracao',
+            field=models.BooleanField(default=False, verbose_name='Em migração entre bancos'),
+        ),
+        migrations.AlterField(
+            model_name='medicamento',
+            name='quantidade_estoque',
+            field=models.DecimalField(decimal_places=0, default=0.0, help_text='Quantidade de embalagens disponíveis no estoque. Ex: 10 comprimidos, 5 frascos de 100ml, etc.', max_digits=10, verbose_name='Quantidade em Estoque (Embalagens)'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_grupo_banco'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogAdministracaoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data_hora_administracao', models.DateTimeField(verbose_name='Data e Hora da Administração')),
+                ('status', models.CharField(choices=[('OK', 'Administrado'), ('REC', 'Recusado pelo paciente'), ('PUL', 'Pulado/Esquecido')], max_length=3)),
+                ('observacoes', models.TextField(blank=True)),
+                ('prescricao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs_arquivados', to='api.prescricao')),
+                ('usuario_responsavel', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Registro de Administração Arquivado',
+                'verbose_name_plural': 'Registros de Administração Arquivados',
+                'indexes': [models.Index(fields=['data_hora_administracao'], name='log_arquivado_data_idx')],
+            },
+        ),
+    ]
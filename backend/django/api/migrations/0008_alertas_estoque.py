@@ -0,0 +1,86 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:52
+
+import decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DIAS = ('dia_domingo', 'dia_segunda', 'dia_terca', 'dia_quarta', 'dia_quinta', 'dia_sexta', 'dia_sabado')
+
+
+def calcular_consumo_diario(apps, schema_editor):
+    """Preenche Medicamento.consumo_diario a partir das prescrições ativas (ver Prescricao.consumo_diario)."""
+    Medicamento = apps.get_model('api', 'Medicamento')
+    Prescricao = apps.get_model('api', 'Prescricao')
+    banco = schema_editor.connection.alias
+    consumo = {}
+    for prescricao in Prescricao.objects.using(banco).filter(ativo=True).exclude(frequencia='EV').iterator():
+        dose = decimal.Decimal(prescricao.dose_valor)
+        if prescricao.frequencia == 'SE':
+            dose = dose * sum(getattr(prescricao, dia) for dia in DIAS) / 7
+        elif prescricao.frequencia == 'ME':
+            dose = dose / 30
+        consumo[prescricao.medicamento_id] = consumo.get(prescricao.medicamento_id, 0) + dose
+    for medicamento_id, valor in consumo.items():
+        Medicamento.objects.using(banco).filter(pk=medicamento_id).update(
+            consumo_diario=decimal.Decimal(valor).quantize(decimal.Decimal('0.01'))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_logadministracaoarquivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motivo', models.CharField(choices=[('EST', 'Abaixo do estoque mínimo'), ('COB', 'Abaixo da cobertura mínima em dias')], max_length=3)),
+                ('quantidade_estoque', models.DecimalField(decimal_places=0, max_digits=10, verbose_name='Estoque no Alerta')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('resolvido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Alerta de Estoque',
+                'verbose_name_plural': 'Alertas de Estoque',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='abaixo_minimo',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='consumo_diario',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='dias_cobertura_minimo',
+            field=models.PositiveIntegerField(blank=True, help_text='Gera um alerta quando o estoque não cobre este número de dias das prescrições ativas.', null=True, verbose_name='Cobertura Mínima (dias)'),
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='estoque_minimo',
+            field=models.DecimalField(blank=True, decimal_places=0, help_text='Gera um alerta quando o estoque fica abaixo desta quantidade.', max_digits=10, null=True, verbose_name='Estoque Mínimo'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(condition=models.Q(('abaixo_minimo', True)), fields=['grupo'], name='medicamento_abaixo_min_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertaestoque',
+            name='medicamento',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_estoque', to='api.medicamento'),
+        ),
+        migrations.AddConstraint(
+            model_name='alertaestoque',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolvido_em__isnull', True)), fields=('medicamento',), name='alerta_estoque_aberto_unico'),
+        ),
+        migrations.RunPython(calcular_consumo_diario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite: tabela FTS5 com conteúdo externo (lê de api_documentobusca), mantida por triggers.
+SQLITE_CRIAR = [
+    """CREATE VIRTUAL TABLE api_documentobusca_fts USING fts5(
+        titulo, texto, content='api_documentobusca', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER api_documentobusca_fts_ai AFTER INSERT ON api_documentobusca BEGIN
+        INSERT INTO api_documentobusca_fts(rowid, titulo, texto) VALUES (new.id, new.titulo, new.texto);
+    END""",
+    """CREATE TRIGGER api_documentobusca_fts_ad AFTER DELETE ON api_documentobusca BEGIN
+        INSERT INTO api_documentobusca_fts(api_documentobusca_fts, rowid, titulo, texto)
+        VALUES ('delete', old.id, old.titulo, old.texto);
+    END""",
+    """CREATE TRIGGER api_documentobusca_fts_au AFTER UPDATE ON api_documentobusca BEGIN
+        INSERT INTO api_documentobusca_fts(api_documentobusca_fts, rowid, titulo, texto)
+        VALUES ('delete', old.id, old.titulo, old.texto);
+        INSERT INTO api_documentobusca_fts(rowid, titulo, texto) VALUES (new.id, new.titulo, new.texto);
+    END""",
+]
+SQLITE_REMOVER = [
+    'DROP TRIGGER IF EXISTS api_documentobusca_fts_au',
+    'DROP TRIGGER IF EXISTS api_documentobusca_fts_ad',
+    'DROP TRIGGER IF EXISTS api_documentobusca_fts_ai',
+    'DROP TABLE IF EXISTS api_documentobusca_fts',
+]
+
+# PostgreSQL: índice GIN sobre o tsvector (mesma expressão usada em api/busca.py).
+POSTGRESQL_CRIAR = [
+    """CREATE INDEX api_documentobusca_fts_idx ON api_documentobusca
+        USING GIN (to_tsvector('portuguese', titulo || ' ' || texto))""",
+]
+POSTGRESQL_REMOVER = ['DROP INDEX IF EXISTS api_documentobusca_fts_idx']
+
+
+def _executar(schema_editor, comandos):
+    for sql in comandos.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def criar_indice_textual(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE_CRIAR, 'postgresql': POSTGRESQL_CRIAR})
+
+
+def remover_indice_textual(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE_REMOVER, 'postgresql': POSTGRESQL_REMOVER})
+
+
+def indexar_existentes(apps, schema_editor):
+    """Cria os documentos de busca dos idosos, prescrições e logs que já têm texto."""
+    DocumentoBusca = apps.get_model('api', 'DocumentoBusca')
+    Idoso = apps.get_model('api', 'Idoso')
+    Prescricao = apps.get_model('api', 'Prescricao')
+    LogAdministracao = apps.get_model('api', 'LogAdministracao')
+    LogAdministracaoArquivado = apps.get_model('api', 'LogAdministracaoArquivado')
+    banco = schema_editor.connection.alias
+    status = {'OK': 'Administrado', 'REC': 'Recusado pelo paciente', 'PUL': 'Pulado/Esquecido'}
+
+    documentos = []
+    for idoso in Idoso.objects.using(banco).iterator():
+        texto = '\n'.join(filter(None, [idoso.doencas, idoso.condicoes]))
+        if texto.strip():
+            documentos.append(DocumentoBusca(
+                grupo_id=idoso.grupo_id, tipo='IDO', objeto_id=idoso.pk, idoso_id=idoso.pk,
+                titulo=idoso.nome_completo, texto=texto,
+            ))
+    prescricoes = Prescricao.objects.using(banco).exclude(instrucoes='').select_related('idoso', 'medicamento')
+    for prescricao in prescricoes.iterator():
+        documentos.append(DocumentoBusca(
+            grupo_id=prescricao.idoso.grupo_id, tipo='PRE', objeto_id=prescricao.pk, idoso_id=prescricao.idoso_id,
+            prescricao_id=prescricao.pk, titulo=prescricao.medicamento.nome_marca, texto=prescricao.instrucoes,
+        ))
+    for modelo in (LogAdministracao, LogAdministracaoArquivado):
+        logs = modelo.objects.using(banco).exclude(observacoes='').select_related(
+            'prescricao__idoso', 'prescricao__medicamento',
+        )
+        for log in logs.iterator():
+            documentos.append(DocumentoBusca(
+                grupo_id=log.prescricao.idoso.grupo_id, tipo='LOG', objeto_id=log.pk, idoso_id=log.prescricao.idoso_id,
+                prescricao_id=log.prescricao_id, texto=log.observacoes,
+                titulo=f"{status.get(log.status, log.status)}: {log.prescricao.medicamento.nome_marca}",
+            ))
+    DocumentoBusca.objects.using(banco).bulk_create(
+        [documento for documento in documentos if documento.texto.strip()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alertas_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('IDO', 'Idoso'), ('PRE', 'Prescrição'), ('LOG', 'Registro de administração')], max_length=3)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('titulo', models.CharField(max_length=255)),
+                ('texto', models.TextField()),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.grupo')),
+                ('idoso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.idoso')),
+                ('prescricao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.prescricao')),
+            ],
+            options={
+                'verbose_name': 'Documento de Busca',
+                'verbose_name_plural': 'Documentos de Busca',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='documento_busca_unico')],
+            },
+        ),
+        migrations.RunPython(criar_indice_textual, remover_indice_textual),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+    ]
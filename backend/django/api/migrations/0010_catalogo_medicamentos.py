@@ -0,0 +1,164 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:40
+
+import decimal
+import unicodedata
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Cópia de CatalogoMedicamento.NAMESPACE_ID / normalizar() / id_para() no momento desta migração
+NAMESPACE_ID = uuid.UUID('6f1c8f43-6a52-4a8e-9d0c-3c8a4f0e2b7d')
+CAMPOS = (
+    'nome_marca', 'principio_ativo', 'generico', 'fabricante',
+    'concentracao_valor', 'concentracao_unidade', 'forma_farmaceutica',
+)
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(texto.lower().split())
+
+
+def id_para(nome_marca, forma_farmaceutica, principio_ativo='', fabricante='',
+            concentracao_valor=None, concentracao_unidade=None, **outros):
+    concentracao = '' if concentracao_valor is None else str(decimal.Decimal(concentracao_valor).quantize(decimal.Decimal('0.01')))
+    chave = '|'.join([
+        normalizar(nome_marca), normalizar(principio_ativo), concentracao,
+        concentracao_unidade or '', forma_farmaceutica, normalizar(fabricante),
+    ])
+    return uuid.uuid5(NAMESPACE_ID, chave)
+
+
+def preencher_catalogo(apps, schema_editor):
+    """
+    Cria um item do catálogo para cada produto distinto do banco e aponta o estoque para ele.
+    Medicamentos do mesmo grupo que viram o mesmo produto (ex: nomes que só diferiam em
+    maiúsculas ou acentos) são fundidos: o estoque é somado no de menor ID, e as prescrições
+    passam a apontar para ele.
+    """
+    CatalogoMedicamento = apps.get_model('api', 'CatalogoMedicamento')
+    Medicamento = apps.get_model('api', 'Medicamento')
+    Prescricao = apps.get_model('api', 'Prescricao')
+    AlertaEstoque = apps.get_model('api', 'AlertaEstoque')
+    banco = schema_editor.connection.alias
+
+    catalogo = {}
+    mantidos = {}   # (grupo_id, catalogo_id) -> medicamento mantido
+    for medicamento in Medicamento.objects.using(banco).order_by('pk').iterator():
+        dados = {campo: getattr(medicamento, campo) for campo in CAMPOS}
+        catalogo_id = id_para(**dados)
+        if catalogo_id not in catalogo:
+            catalogo[catalogo_id] = CatalogoMedicamento(id=catalogo_id, nome_busca=normalizar(dados['nome_marca']), **dados)
+        chave = (medicamento.grupo_id, catalogo_id)
+        mantido = mantidos.get(chave)
+        if mantido is None:
+            medicamento.catalogo_id = catalogo_id
+            mantidos[chave] = medicamento
+            continue
+        mantido.quantidade_estoque += medicamento.quantidade_estoque
+        mantido.consumo_diario += medicamento.consumo_diario
+        Prescricao.objects.using(banco).filter(medicamento_id=medicamento.pk).update(medicamento_id=mantido.pk)
+        AlertaEstoque.objects.using(banco).filter(medicamento_id=medicamento.pk).delete()
+        medicamento.delete()
+
+    CatalogoMedicamento.objects.using(banco).bulk_create(catalogo.values(), batch_size=500, ignore_conflicts=True)
+    Medicamento.objects.using(banco).bulk_update(
+        mantidos.values(), ['catalogo', 'quantidade_estoque', 'consumo_diario'], batch_size=500,
+    )
+
+
+# Índice de prefixo para o autocompletar (nome_busca LIKE 'prefixo%'):
+# no SQLite o LIKE só usa índices com COLLATE NOCASE; no PostgreSQL, varchar_pattern_ops.
+INDICE_PREFIXO = {
+    'sqlite': 'CREATE INDEX api_catalogo_nome_busca_idx ON api_catalogomedicamento (nome_busca COLLATE NOCASE)',
+    'postgresql': 'CREATE INDEX api_catalogo_nome_busca_idx ON api_catalogomedicamento (nome_busca varchar_pattern_ops)',
+}
+
+
+def criar_indice_prefixo(apps, schema_editor):
+    sql = INDICE_PREFIXO.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def remover_indice_prefixo(apps, schema_editor):
+    if schema_editor.connection.vendor in INDICE_PREFIXO:
+        schema_editor.execute('DROP INDEX IF EXISTS api_catalogo_nome_busca_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_busca_textual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogoMedicamento',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('nome_marca', models.CharField(help_text='Nome comercial do medicamento. Se for genérico, pode repetir o princípio ativo.', max_length=200, verbose_name='Nome')),
+                ('nome_busca', models.CharField(editable=False, max_length=200)),
+                ('principio_ativo', models.CharField(blank=True, max_length=200, verbose_name='Princípio Ativo')),
+                ('generico', models.BooleanField(default=False, verbose_name='É Genérico?')),
+                ('fabricante', models.CharField(blank=True, max_length=100, verbose_name='Fabricante/Laboratório')),
+                ('concentracao_valor', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Concentração (Valor)')),
+                ('concentracao_unidade', models.CharField(blank=True, choices=[('mcg/g', 'mcg/g'), ('mg/g', 'mg/g'), ('mg/ml', 'mg/ml'), ('OUT', 'Outro')], max_length=5, null=True, verbose_name='Unidade de Concentração')),
+                ('forma_farmaceutica', models.CharField(choices=[('COMP', 'Comprimido'), ('CAP', 'Cápsula'), ('LIQ_ML', 'Líquido (ml)'), ('CREME_G', 'Creme (g)'), ('GOTA', 'Gota'), ('OUT', 'Outro')], max_length=10, verbose_name='Forma Farmacêutica')),
+            ],
+            options={
+                'verbose_name': 'Medicamento do Catálogo',
+                'verbose_name_plural': 'Catálogo de Medicamentos',
+                'ordering': ['nome_busca'],
+            },
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='catalogo',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='estoques', to='api.catalogomedicamento'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='medicamento',
+            name='unique_medicamento_no_grupo',
+        ),
+        migrations.RunPython(preencher_catalogo, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='concentracao_unidade',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='concentracao_valor',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='fabricante',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='forma_farmaceutica',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='generico',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='nome_marca',
+        ),
+        migrations.RemoveField(
+            model_name='medicamento',
+            name='principio_ativo',
+        ),
+        migrations.AlterField(
+            model_name='medicamento',
+            name='catalogo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='estoques', to='api.catalogomedicamento'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicamento',
+            constraint=models.UniqueConstraint(fields=('grupo', 'catalogo'), name='unique_medicamento_no_grupo'),
+        ),
+        migrations.RunPython(criar_indice_prefixo, remover_indice_prefixo),
+    ]
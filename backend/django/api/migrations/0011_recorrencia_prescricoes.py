@@ -0,0 +1,157 @@
+# Generated by Django 5.2.3 on 2026-10-19 21:05
+
+import django.core.validators
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Min, OuterRef, Subquery
+from django.utils import timezone
+
+# Campos dia_* na ordem dos bits de Prescricao.dias_semana (segunda = bit 0)
+DIAS = ('dia_segunda', 'dia_terca', 'dia_quarta', 'dia_quinta', 'dia_sexta', 'dia_sabado', 'dia_domingo')
+
+
+def fundir_prescricoes(apps, schema_editor):
+    """
+    Converte os dia_* em máscara e funde as prescrições que só diferiam no horário
+    (mesmo idoso, medicamento, dose, frequência, dias, instruções e situação) em uma
+    única prescrição com vários horários. A de menor ID é mantida; os registros de
+    administração das demais passam para ela, guardando em horario_dose o horário
+    que a prescrição de origem tinha.
+
+    data_inicio recebe a data do primeiro registro de administração das prescrições
+    fundidas (ou, sem registros, a da criação do grupo), e não a data da migração: as
+    grades do MAR e os relatórios de meses passados mostram como agendadas as doses
+    anteriores a ela, e nas mensais o dia do mês vem dessa data.
+    """
+    Prescricao = apps.get_model('api', 'Prescricao')
+    LogAdministracao = apps.get_model('api', 'LogAdministracao')
+    LogAdministracaoArquivado = apps.get_model('api', 'LogAdministracaoArquivado')
+    DocumentoBusca = apps.get_model('api', 'DocumentoBusca')
+    banco = schema_editor.connection.alias
+
+    horario_da_prescricao = Subquery(
+        Prescricao.objects.using(banco).filter(pk=OuterRef('prescricao_id')).values('horario_previsto')[:1]
+    )
+    LogAdministracao.objects.using(banco).update(horario_dose=horario_da_prescricao)
+    LogAdministracaoArquivado.objects.using(banco).update(horario_dose=horario_da_prescricao)
+
+    primeiro_registro = {}  # ID da prescrição -> data do primeiro registro
+    for modelo in (LogAdministracao, LogAdministracaoArquivado):
+        registros = modelo.objects.using(banco).values('prescricao_id').annotate(primeiro=Min('data_hora_administracao'))
+        for linha in registros.values_list('prescricao_id', 'primeiro'):
+            dia = timezone.localdate(linha[1])
+            primeiro_registro[linha[0]] = min(dia, primeiro_registro.get(linha[0], dia))
+
+    mantidas = {}
+    fundidas = {}   # ID removido -> ID mantido
+    prescricoes = Prescricao.objects.using(banco).annotate(criacao_do_grupo=F('idoso__grupo__data_criacao'))
+    for prescricao in prescricoes.order_by('pk').iterator():
+        inicio = primeiro_registro.get(prescricao.pk) or timezone.localdate(prescricao.criacao_do_grupo)
+        prescricao.dias_semana = sum(1 << bit for bit, campo in enumerate(DIAS) if getattr(prescricao, campo))
+        horario = prescricao.horario_previsto.strftime('%H:%M')
+        chave = (
+            prescricao.idoso_id, prescricao.medicamento_id, prescricao.dose_valor, prescricao.dose_unidade,
+            prescricao.frequencia, prescricao.dias_semana, prescricao.instrucoes, prescricao.ativo,
+        )
+        mantida = mantidas.get(chave)
+        if mantida is None:
+            prescricao.horarios = [horario]
+            prescricao.data_inicio = inicio
+            mantidas[chave] = prescricao
+        else:
+            mantida.horarios = sorted({*mantida.horarios, horario})
+            mantida.data_inicio = min(mantida.data_inicio, inicio)
+            fundidas[prescricao.pk] = mantida.pk
+
+    for prescricao in mantidas.values():
+        prescricao.horario_previsto = prescricao.horarios[0]
+        prescricao.doses_por_dia = len(prescricao.horarios)
+    Prescricao.objects.using(banco).bulk_update(
+        mantidas.values(), ['dias_semana', 'horarios', 'horario_previsto', 'doses_por_dia', 'data_inicio'], batch_size=500,
+    )
+    for removida, mantida in fundidas.items():
+        for modelo in (LogAdministracao, LogAdministracaoArquivado):
+            modelo.objects.using(banco).filter(prescricao_id=removida).update(prescricao_id=mantida)
+        # O documento de busca das instruções é o da prescrição mantida; os dos logs a acompanham
+        DocumentoBusca.objects.using(banco).filter(tipo='PRE', objeto_id=removida).delete()
+        DocumentoBusca.objects.using(banco).filter(prescricao_id=removida).update(prescricao_id=mantida)
+    Prescricao.objects.using(banco).filter(pk__in=list(fundidas)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_catalogo_medicamentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logadministracao',
+            name='horario_dose',
+            field=models.TimeField(blank=True, null=True, verbose_name='Horário Agendado'),
+        ),
+        migrations.AddField(
+            model_name='logadministracaoarquivado',
+            name='horario_dose',
+            field=models.TimeField(blank=True, null=True, verbose_name='Horário Agendado'),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='data_fim',
+            field=models.DateField(blank=True, null=True, verbose_name='Término'),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='data_inicio',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='Início'),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='dias_semana',
+            field=models.PositiveSmallIntegerField(default=127, validators=[django.core.validators.MaxValueValidator(127)], verbose_name='Dias da Semana'),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='doses_por_dia',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='horarios',
+            field=models.JSONField(blank=True, default=list, verbose_name='Horários das Doses'),
+        ),
+        migrations.AddField(
+            model_name='prescricao',
+            name='intervalo',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Ex: 2 para semana sim, semana não.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Intervalo'),
+        ),
+        migrations.RunPython(fundir_prescricoes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_domingo',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_quarta',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_quinta',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_sabado',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_segunda',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_sexta',
+        ),
+        migrations.RemoveField(
+            model_name='prescricao',
+            name='dia_terca',
+        ),
+    ]
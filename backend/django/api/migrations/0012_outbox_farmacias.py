@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:20
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_recorrencia_prescricoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmaciaParceira',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, verbose_name='Nome da Farmácia')),
+                ('url', models.URLField(help_text='Recebe os eventos em lotes, via POST (JSON).', verbose_name='URL do Webhook')),
+                ('segredo', models.CharField(max_length=128, verbose_name='Segredo da Assinatura')),
+                ('eventos', models.JSONField(blank=True, default=list, verbose_name='Eventos Enviados')),
+                ('ativo', models.BooleanField(default=True, help_text='Desmarque para parar de gerar eventos para esta farmácia.')),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='farmacias_parceiras', to='api.grupo')),
+            ],
+            options={
+                'verbose_name': 'Farmácia Parceira',
+                'verbose_name_plural': 'Farmácias Parceiras',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoSaida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('estoque.movimentado', 'Movimentação de estoque'), ('prescricao.criada', 'Nova prescrição')], max_length=30)),
+                ('dados', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('situacao', models.CharField(choices=[('PEN', 'Pendente'), ('ENT', 'Entregue'), ('FAL', 'Falhou (tentativas esgotadas)')], default='PEN', max_length=3)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('entregue_em', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_erro', models.CharField(blank=True, max_length=255)),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.grupo')),
+                ('farmacia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_saida', to='api.farmaciaparceira')),
+            ],
+            options={
+                'verbose_name': 'Evento de Saída',
+                'verbose_name_plural': 'Eventos de Saída',
+                'indexes': [models.Index(condition=models.Q(('situacao', 'PEN')), fields=['proxima_tentativa'], name='evento_saida_pendente_idx')],
+            },
+        ),
+    ]
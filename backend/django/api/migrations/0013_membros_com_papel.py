@@ -0,0 +1,96 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copiar_membros(apps, schema_editor):
+    """
+    Copia os vínculos da antiga tabela automática (PerfilUsuario.grupos) para Membro.
+    O papel era global ao perfil (PerfilUsuario.permissao) e não dizia de qual grupo:
+    o papel ADMIN passa a ser o do administrador de cada grupo (Grupo.admin), que também
+    ganha o seu vínculo se ainda não tiver um.
+    """
+    Grupo = apps.get_model('api', 'Grupo')
+    PerfilUsuario = apps.get_model('api', 'PerfilUsuario')
+    Membro = apps.get_model('api', 'Membro')
+    Antigos = PerfilUsuario.grupos.through
+    banco = schema_editor.connection.alias
+
+    grupos = {
+        grupo['pk']: grupo
+        for grupo in Grupo.objects.using(banco).values('pk', 'admin_id', 'data_criacao')
+    }
+    perfil_do_usuario = dict(PerfilUsuario.objects.using(banco).values_list('user_id', 'pk'))
+    usuario_do_perfil = {perfil: usuario for usuario, perfil in perfil_do_usuario.items()}
+    vinculos = set(Antigos.objects.using(banco).values_list('perfilusuario_id', 'grupo_id'))
+    for grupo in grupos.values():
+        if grupo['admin_id'] in perfil_do_usuario:
+            vinculos.add((perfil_do_usuario[grupo['admin_id']], grupo['pk']))
+
+    Membro.objects.using(banco).bulk_create([
+        Membro(
+            perfil_id=perfil_id,
+            grupo_id=grupo_id,
+            papel='ADMIN' if grupos[grupo_id]['admin_id'] == usuario_do_perfil.get(perfil_id) else 'MEMBRO',
+            entrou_em=grupos[grupo_id]['data_criacao'],
+        )
+        for perfil_id, grupo_id in sorted(vinculos, key=str)
+        if grupo_id in grupos
+    ], batch_size=500)
+
+
+def restaurar_membros(apps, schema_editor):
+    PerfilUsuario = apps.get_model('api', 'PerfilUsuario')
+    Membro = apps.get_model('api', 'Membro')
+    Antigos = PerfilUsuario.grupos.through
+    banco = schema_editor.connection.alias
+    Antigos.objects.using(banco).bulk_create([
+        Antigos(perfilusuario_id=perfil_id, grupo_id=grupo_id)
+        for perfil_id, grupo_id in Membro.objects.using(banco).values_list('perfil_id', 'grupo_id')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_outbox_farmacias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Membro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('papel', models.CharField(choices=[('ADMIN', 'Administrador'), ('MEMBRO', 'Membro')], default='MEMBRO', max_length=10)),
+                ('entrou_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Entrou em')),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vinculos', to='api.grupo')),
+                ('perfil', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vinculos', to='api.perfilusuario')),
+            ],
+            options={
+                'verbose_name': 'Membro',
+                'verbose_name_plural': 'Membros',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='membro',
+            constraint=models.UniqueConstraint(fields=('perfil', 'grupo'), name='membro_unico_por_grupo'),
+        ),
+        migrations.RunPython(copiar_membros, restaurar_membros),
+        # Não é possível transformar um ManyToManyField existente em um com 'through':
+        # a tabela automática é removida e o campo volta apontando para Membro.
+        migrations.RemoveField(
+            model_name='perfilusuario',
+            name='grupos',
+        ),
+        migrations.AddField(
+            model_name='perfilusuario',
+            name='grupos',
+            field=models.ManyToManyField(blank=True, related_name='membros', through='api.Membro', to='api.grupo', verbose_name='Grupos do Usuário'),
+        ),
+        migrations.RemoveField(
+            model_name='perfilusuario',
+            name='permissao',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:36
+
+import api.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_membros_com_papel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Relatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('MAR', 'Registro mensal de administração (MAR)'), ('IDO', 'Ficha do idoso')], max_length=3)),
+                ('mes', models.DateField(verbose_name='Mês')),
+                ('situacao', models.CharField(choices=[('PEN', 'Pendente'), ('GER', 'Gerando'), ('PRO', 'Pronto'), ('FAL', 'Falhou')], default='PEN', max_length=3)),
+                ('progresso', models.PositiveSmallIntegerField(default=0)),
+                ('impressao_digital', models.CharField(blank=True, max_length=64)),
+                ('arquivo', models.FileField(blank=True, storage=api.models.armazenamento_relatorios, upload_to='%Y/%m/')),
+                ('tamanho', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('erro', models.CharField(blank=True, max_length=255)),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.grupo')),
+                ('idoso', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='relatorios', to='api.idoso')),
+                ('solicitado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Relatório',
+                'verbose_name_plural': 'Relatórios',
+                'indexes': [models.Index(fields=['grupo', 'tipo', 'mes', 'impressao_digital'], name='relatorio_cache_idx'), models.Index(condition=models.Q(('situacao__in', ['PEN', 'GER'])), fields=['criado_em'], name='relatorio_fila_idx')],
+            },
+        ),
+    ]
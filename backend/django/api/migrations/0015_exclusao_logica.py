@@ -0,0 +1,76 @@
+# Generated by Django 5.2.3 on 2026-10-19 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_relatorios_pdf'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='idoso',
+            name='unique_cpf_por_grupo',
+        ),
+        migrations.RemoveConstraint(
+            model_name='idoso',
+            name='unique_sus_por_grupo',
+        ),
+        migrations.RemoveConstraint(
+            model_name='medicamento',
+            name='unique_medicamento_no_grupo',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicamento',
+            name='medicamento_abaixo_min_idx',
+        ),
+        migrations.AddField(
+            model_name='grupo',
+            name='apagado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Apagado em'),
+        ),
+        migrations.AddField(
+            model_name='idoso',
+            name='apagado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Apagado em'),
+        ),
+        migrations.AddField(
+            model_name='medicamento',
+            name='apagado_em',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Apagado em'),
+        ),
+        migrations.AddIndex(
+            model_name='grupo',
+            index=models.Index(condition=models.Q(('apagado_em__isnull', False)), fields=['apagado_em'], name='grupo_apagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idoso',
+            index=models.Index(condition=models.Q(('apagado_em__isnull', True)), fields=['grupo', 'nome_completo'], name='idoso_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idoso',
+            index=models.Index(condition=models.Q(('apagado_em__isnull', False)), fields=['apagado_em'], name='idoso_apagado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(condition=models.Q(('abaixo_minimo', True), ('apagado_em__isnull', True)), fields=['grupo'], name='medicamento_abaixo_min_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicamento',
+            index=models.Index(condition=models.Q(('apagado_em__isnull', False)), fields=['apagado_em'], name='medicamento_apagado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='idoso',
+            constraint=models.UniqueConstraint(condition=models.Q(('apagado_em__isnull', True)), fields=('grupo', 'cpf'), name='unique_cpf_por_grupo'),
+        ),
+        migrations.AddConstraint(
+            model_name='idoso',
+            constraint=models.UniqueConstraint(condition=models.Q(('apagado_em__isnull', True)), fields=('grupo', 'cartao_sus'), name='unique_sus_por_grupo'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('apagado_em__isnull', True)), fields=('grupo', 'catalogo'), name='unique_medicamento_no_grupo'),
+        ),
+    ]
@@ -1,9 +1,15 @@
 # api/models.py - Este arquivo contém os modelos de dados do aplicativo API, que são usados para definir a estrutura do banco de dados e as relações entre os dados.
 
-from django.db import models        #módulo de modelos do Django para definir os modelos de dados
+from django.db import models, router, transaction        #módulo de modelos do Django para definir os modelos de dados
+import datetime             #módulo datetime, para os horários das prescrições
+import decimal              #módulo decimal, para os cálculos de consumo de estoque
+import unicodedata          #módulo unicodedata, para normalizar os nomes do catálogo
 import uuid                 #módulo uuid 
 from django.conf import settings    #importa as configurações do django
-from django.db.models.signals import post_save  #importa o sinal post_save 
+from django.core.validators import MaxValueValidator, MinValueValidator  #validadores dos campos numéricos
+from django.core.serializers.json import DjangoJSONEncoder  #serializa Decimal e datas nos dados dos eventos
+from django.core.files.storage import FileSystemStorage    #armazenamento dos PDFs dos relatórios
+from django.db.models.signals import post_save, post_delete  #importa os sinais post_save e post_delete
 from django.dispatch import receiver    #importa o receptor 
 
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin # Importa classes base para criar um modelo de usuário personalizado.
@@ -13,6 +19,10 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 
 from django.utils import timezone   # Importa timezone para manipulação de datas e horas no Django
 
+from .cache import invalidar_grupo  # Invalidação das respostas em cache por grupo
+from .recorrencia import TODOS_OS_DIAS, dias_da_mascara, normalizar_horarios  # Agenda compacta das prescrições
+from .shards import espelhar_catalogo, espelhar_grupo, espelhar_usuario  # Espelhamento dos dados globais nos shards
+
 class CustomUserManager(BaseUserManager):   
     """
     Gerenciador para o nosso modelo de usuário personalizado onde o email é o
@@ -39,6 +49,15 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)    # Cria o superusuário usando o método create_user definido acima
 
+
+class SemApagadosManager(models.Manager):
+    """
+    Gerenciador padrão dos modelos com exclusão lógica (Grupo, Idoso, Medicamento): esconde
+    as linhas marcadas em 'apagado_em'. O gerenciador 'todos' de cada modelo inclui os apagados.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(apagado_em__isnull=True)
+
 class Usuario(AbstractBaseUser, PermissionsMixin):
     """
     Nosso modelo de Usuário personalizado que usa e-mail para login.
@@ -59,6 +78,10 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
 
 
 
+def banco_padrao_novos_grupos():
+    # Shard onde os dados dos grupos novos são criados (settings.SHARD_NOVOS_GRUPOS)
+    return settings.SHARD_NOVOS_GRUPOS
+
 # 1. Modelo para o Grupo
 class Grupo(models.Model):  
     # Modelo para representar uma casa de idosos ou grupo de cuidadores
@@ -86,28 +109,52 @@ class Grupo(models.Model):
         verbose_name="Nome do Responsável",
         help_text="Nome do responsável pela casa de idosos"
     )
+    # Mapa de shards: alias do banco (settings.DATABASES) onde ficam os dados deste grupo
+    banco = models.CharField(max_length=50, default=banco_padrao_novos_grupos, verbose_name="Banco de Dados (Shard)")
+    # Marcado pelo comando 'mover_grupo' durante a troca de shard; bloqueia escritas no grupo
+    em_migracao = models.BooleanField(default=False, verbose_name="Em migração entre bancos")
+    # Exclusão lógica: preenchido ao apagar o grupo pela API (ver apagar()); os dados são removidos
+    # depois, em lotes, pelo comando 'expurgar_apagados' (api/exclusao.py)
+    apagado_em = models.DateTimeField(null=True, blank=True, verbose_name="Apagado em")
+
+    objects = SemApagadosManager()  # Apenas os grupos não apagados (padrão em toda a API)
+    todos = models.Manager()        # Inclui os apagados (mapa de shards, espelhamento, expurgo)
+
+    class Meta:
+        indexes = [
+            # Índice parcial: só contém os grupos apagados, na ordem em que vencem para o expurgo
+            models.Index(fields=['apagado_em'], condition=models.Q(apagado_em__isnull=False), name='grupo_apagado_idx'),
+        ]
 
     def __str__(self):  # Método para retornar uma representação em string do grupo
         return self.nome    # Retorna o nome do grupo como sua representação em string
 
+    def apagar(self):
+        """Exclusão lógica: o grupo some da API na hora; os dados ficam até o expurgo."""
+        self.apagado_em = timezone.now()
+        self.save(update_fields=['apagado_em'])
+        transaction.on_commit(lambda: invalidar_grupo(self.pk), using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        # Os dados de um grupo em outro shard não são alcançados pelo CASCADE do banco global:
+        # apaga primeiro a cópia espelhada do grupo no shard (o CASCADE de lá remove os dados).
+        if self.banco != 'default' and self.banco in settings.DATABASE_SHARDS:
+            Grupo.todos.using(self.banco).filter(pk=self.pk).delete()
+        return super().delete(*args, **kwargs)
+
 # 2. Modelo para o Perfil do Usuário
 class PerfilUsuario(models.Model):  
-    # Classe interna para definir as opções de permissão do usuário
-    class Permissao(models.TextChoices):
-        ADMIN = 'ADMIN', 'Administrador'
-        MEMBRO = 'MEMBRO', 'Membro'
-
     # Relacionamento um-para-um com o modelo de usuário do Django
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="perfil")
-    # Relacionamento muitos-para-muitos com o modelo Grupo, permitindo que um usuário pertença a vários grupos
+    # Relacionamento muitos-para-muitos com o modelo Grupo, permitindo que um usuário pertença a vários grupos.
+    # Cada vínculo é um Membro, com o papel do usuário naquele grupo
     grupos = models.ManyToManyField(
         Grupo,
+        through='Membro',
         related_name="membros", # Nome para o relacionamento reverso, de Grupo para PerfilUsuario
         blank=True,
         verbose_name="Grupos do Usuário"
     )
-    # Campo para definir o nível de permissão do usuário dentro de um grupo
-    permissao = models.CharField(max_length=10, choices=Permissao.choices, default=Permissao.MEMBRO)
     # Relacionamento muitos-para-muitos com o modelo Idoso, indicando de quais idosos este usuário é responsável
     responsaveis = models.ManyToManyField(
         "Idoso",
@@ -118,8 +165,32 @@ class PerfilUsuario(models.Model):
     def __str__(self): # Método para retornar uma representação em string do perfil
         return str(self.user) # Retorna a representação em string do usuário associado
 
+# 2.1 Modelo para o vínculo entre um usuário e um grupo, com o papel dele naquele grupo
+class Membro(models.Model):
+    # Classe interna para definir os papéis do usuário dentro de um grupo
+    class Papel(models.TextChoices):
+        ADMIN = 'ADMIN', 'Administrador'
+        MEMBRO = 'MEMBRO', 'Membro'
+
+    perfil = models.ForeignKey(PerfilUsuario, on_delete=models.CASCADE, related_name='vinculos')
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='vinculos')
+    papel = models.CharField(max_length=10, choices=Papel.choices, default=Papel.MEMBRO)
+    entrou_em = models.DateTimeField(default=timezone.now, verbose_name="Entrou em")
+
+    class Meta:
+        verbose_name = "Membro"
+        verbose_name_plural = "Membros"
+        constraints = [
+            # Um vínculo por usuário e grupo; o índice também resolve "qual o papel do usuário no grupo" (ver api/permissions.py)
+            models.UniqueConstraint(fields=['perfil', 'grupo'], name='membro_unico_por_grupo'),
+        ]
+
+    def __str__(self): # Método para retornar uma representação em string do vínculo
+        return f"{self.perfil} em {self.grupo} ({self.get_papel_display()})"
+
 # 3. Modelo para o Idoso
 class Idoso(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
     # Chave estrangeira para o Grupo, indicando a qual casa de idosos este idoso pertence
     grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='idosos_da_casa')
     
@@ -153,22 +224,44 @@ class Idoso(models.Model):
     
     doencas = models.TextField(verbose_name="Doenças", blank=True, help_text="Doenças pré-existentes") # Campo de texto para doenças pré-existentes
     condicoes = models.TextField(verbose_name="Condições", blank=True, help_text="Condições especiais ou alergias") # Campo de texto para condições especiais e alergias
+    # Exclusão lógica: preenchido ao apagar o idoso pela API (ver apagar()); removido de vez pelo expurgo
+    apagado_em = models.DateTimeField(null=True, blank=True, verbose_name="Apagado em")
+
+    objects = SemApagadosManager()  # Apenas os idosos não apagados
+    todos = models.Manager()        # Inclui os apagados
 
     class Meta:
         verbose_name = "Idoso"
         verbose_name_plural = "Idosos"
         ordering = ['nome_completo']
-        # Restrições para garantir que CPF, RG e Cartão SUS sejam únicos dentro de cada grupo
+        # Restrições para garantir que CPF, RG e Cartão SUS sejam únicos dentro de cada grupo, entre
+        # os idosos não apagados (um idoso apagado pode ser cadastrado de novo antes do expurgo)
         constraints = [
-            models.UniqueConstraint(fields=['grupo', 'cpf'], name='unique_cpf_por_grupo'),
-            models.UniqueConstraint(fields=['grupo', 'cartao_sus'], name='unique_sus_por_grupo'),
+            models.UniqueConstraint(fields=['grupo', 'cpf'], condition=models.Q(apagado_em__isnull=True), name='unique_cpf_por_grupo'),
+            models.UniqueConstraint(fields=['grupo', 'cartao_sus'], condition=models.Q(apagado_em__isnull=True), name='unique_sus_por_grupo'),
+        ]
+        indexes = [
+            # Índices parciais: a listagem do grupo (só os não apagados, por nome) e a fila do expurgo
+            models.Index(fields=['grupo', 'nome_completo'], condition=models.Q(apagado_em__isnull=True), name='idoso_ativo_idx'),
+            models.Index(fields=['apagado_em'], condition=models.Q(apagado_em__isnull=False), name='idoso_apagado_idx'),
         ]
 
     def __str__(self): # Método para retornar uma representação em string do idoso
         return self.nome_completo # Retorna o nome completo do idoso
 
+    def apagar(self):
+        """
+        Exclusão lógica: o idoso some da API na hora e as prescrições dele deixam de valer.
+        O histórico de administração fica no banco até o expurgo.
+        """
+        with transaction.atomic(using=self._state.db):
+            self.apagado_em = timezone.now()
+            self.save(update_fields=['apagado_em'])
+            desativar_prescricoes(self.prescricoes.all())
+
 # 4. Modelo para Contato de Parente 
 class ContatoParente(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
     
     # Chave estrangeira para o Idoso, associando o contato a um idoso específico
     idoso = models.ForeignKey(Idoso, on_delete=models.CASCADE, related_name='contatos')
@@ -194,9 +287,13 @@ class ContatoParente(models.Model):
     def __str__(self): # Método para retornar uma representação em string do contato
         return f"{self.nome} ({self.get_parentesco_display()}) - Contato de {self.idoso.nome_completo}"
 
-# 5. Modelo para Medicamento
-class Medicamento(models.Model):
-   
+# 5. Modelo para o Catálogo de Medicamentos (global, compartilhado por todos os grupos)
+class CatalogoMedicamento(models.Model):
+    # Os dados do produto ficam aqui uma única vez; cada grupo guarda apenas o seu estoque
+    # (Medicamento). O ID é derivado dos dados normalizados (ver id_para), então o mesmo
+    # produto tem o mesmo ID em qualquer banco, e as cópias nos shards nunca divergem.
+    NAMESPACE_ID = uuid.UUID('6f1c8f43-6a52-4a8e-9d0c-3c8a4f0e2b7d')
+
     # Classe interna para definir as opções de forma farmacêutica
     class OpcoesFormaFarmaceutica(models.TextChoices):
         COMPRIMIDO = 'COMP', 'Comprimido'
@@ -213,16 +310,15 @@ class Medicamento(models.Model):
         MG_POR_ML = 'mg/ml', 'mg/ml'
         OUTRO = 'OUT', 'Outro'
 
-    # Chave estrangeira para o Grupo, indicando a qual grupo este medicamento pertence
-    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='medicamentos')
-    
+    id = models.UUIDField(primary_key=True, editable=False)
     # Campo para o nome comercial do medicamento
     nome_marca = models.CharField(
         verbose_name="Nome", 
         max_length=200, 
-        unique=True,
         help_text="Nome comercial do medicamento. Se for genérico, pode repetir o princípio ativo."
     )
+    # Nome normalizado (minúsculas, sem acentos) para o autocompletar por prefixo (índice na migração 0010)
+    nome_busca = models.CharField(max_length=200, editable=False)
     # Campo para o princípio ativo (ex: Paracetamol, Cloridrato de Paroxetina)
     principio_ativo = models.CharField(
         verbose_name="Princípio Ativo", 
@@ -260,6 +356,80 @@ class Medicamento(models.Model):
         max_length=10,
         choices=OpcoesFormaFarmaceutica.choices
     )
+
+    CAMPOS = (
+        'nome_marca', 'principio_ativo', 'generico', 'fabricante',
+        'concentracao_valor', 'concentracao_unidade', 'forma_farmaceutica',
+    )
+
+    class Meta:
+        verbose_name = "Medicamento do Catálogo"
+        verbose_name_plural = "Catálogo de Medicamentos"
+        ordering = ['nome_busca']
+
+    @staticmethod
+    def normalizar(texto):
+        """Minúsculas, sem acentos e com os espaços colapsados."""
+        texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+        return ' '.join(texto.lower().split())
+
+    @classmethod
+    def id_para(cls, nome_marca, forma_farmaceutica, principio_ativo='', fabricante='',
+                concentracao_valor=None, concentracao_unidade=None, **outros):
+        """ID do produto: o mesmo para os mesmos dados, a menos de maiúsculas, acentos e espaços."""
+        concentracao = '' if concentracao_valor is None else str(decimal.Decimal(concentracao_valor).quantize(decimal.Decimal('0.01')))
+        chave = '|'.join([
+            cls.normalizar(nome_marca), cls.normalizar(principio_ativo), concentracao,
+            concentracao_unidade or '', forma_farmaceutica, cls.normalizar(fabricante),
+        ])
+        return uuid.uuid5(cls.NAMESPACE_ID, chave)
+
+    @classmethod
+    def obter(cls, **dados):
+        """Retorna o item do catálogo com esses dados, criando-o se ainda não existir."""
+        catalogo, _ = cls.objects.get_or_create(pk=cls.id_para(**dados), defaults=dados)
+        return catalogo
+
+    def save(self, *args, **kwargs):
+        self.nome_busca = self.normalizar(self.nome_marca)
+        if self.pk is None:
+            self.pk = self.id_para(**{campo: getattr(self, campo) for campo in self.CAMPOS})
+        super().save(*args, **kwargs)
+
+    def __str__(self): # Método para retornar uma representação em string do medicamento
+        concentracao = ""
+        if self.concentracao_valor and self.concentracao_unidade:
+            # Formata o valor da concentração para não exibir casas decimais se for um número inteiro
+            valor_str = int(self.concentracao_valor) if self.concentracao_valor.to_integral_value() == self.concentracao_valor else self.concentracao_valor
+            concentracao = f" {valor_str}{self.get_concentracao_unidade_display()}"
+        
+        return f"{self.nome_marca} ({self.principio_ativo}){concentracao}"
+
+
+def _do_catalogo(campo):
+    return property(lambda self: getattr(self.catalogo, campo))
+
+
+# 5.1 Modelo para Medicamento (estoque de um item do catálogo em um grupo)
+class Medicamento(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+    OpcoesFormaFarmaceutica = CatalogoMedicamento.OpcoesFormaFarmaceutica
+    OpcoesConcentracaoUnidade = CatalogoMedicamento.OpcoesConcentracaoUnidade
+
+    # Chave estrangeira para o Grupo, indicando a qual grupo este medicamento pertence
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='medicamentos')
+    # Produto do catálogo global (nome, princípio ativo, concentração, forma...)
+    catalogo = models.ForeignKey(CatalogoMedicamento, on_delete=models.PROTECT, related_name='estoques')
+
+    # Dados do produto, lidos do catálogo (use select_related('catalogo') nas listagens)
+    nome_marca = _do_catalogo('nome_marca')
+    principio_ativo = _do_catalogo('principio_ativo')
+    generico = _do_catalogo('generico')
+    fabricante = _do_catalogo('fabricante')
+    concentracao_valor = _do_catalogo('concentracao_valor')
+    concentracao_unidade = _do_catalogo('concentracao_unidade')
+    forma_farmaceutica = _do_catalogo('forma_farmaceutica')
+
     # Campo para a quantidade em estoque
     quantidade_estoque = models.DecimalField(
         verbose_name="Quantidade em Estoque (Embalagens)", 
@@ -268,31 +438,154 @@ class Medicamento(models.Model):
         default = 0.00,
         help_text = "Quantidade de embalagens disponíveis no estoque. Ex: 10 comprimidos, 5 frascos de 100ml, etc."
     )
-    
+    # Limites de estoque mínimo (opcionais): abaixo de qualquer um deles o medicamento gera um AlertaEstoque
+    estoque_minimo = models.DecimalField(
+        verbose_name="Estoque Mínimo",
+        max_digits=10,
+        decimal_places=0,
+        null=True, blank=True,
+        help_text="Gera um alerta quando o estoque fica abaixo desta quantidade."
+    )
+    dias_cobertura_minimo = models.PositiveIntegerField(
+        verbose_name="Cobertura Mínima (dias)",
+        null=True, blank=True,
+        help_text="Gera um alerta quando o estoque não cobre este número de dias das prescrições ativas."
+    )
+    # Consumo diário das prescrições ativas, mantido pelos signals de Prescricao (usado na cobertura em dias)
+    consumo_diario = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    # Indica se o estoque está abaixo de algum limite. Avaliado a cada gravação do medicamento (ver save())
+    abaixo_minimo = models.BooleanField(default=False, editable=False)
+    # Exclusão lógica: preenchido ao apagar o medicamento pela API (ver apagar()); removido de vez pelo expurgo
+    apagado_em = models.DateTimeField(null=True, blank=True, verbose_name="Apagado em")
+
+    objects = SemApagadosManager()  # Apenas os medicamentos não apagados
+    todos = models.Manager()        # Inclui os apagados
+
     class Meta:
         verbose_name = "Medicamento" # Nome singular do modelo no admin
         verbose_name_plural = "Medicamentos" # Nome plural do modelo no admin
         
-        # Restrição para garantir que a combinação de nome, princípio ativo e concentração seja única por grupo
+        # Restrição para garantir que cada item do catálogo apareça uma única vez no estoque do grupo
+        # (entre os não apagados; o índice parcial também serve a listagem do grupo)
         constraints = [
-            models.UniqueConstraint(
-                fields=['grupo', 'nome_marca', 'principio_ativo', 'concentracao_valor', 'concentracao_unidade'], 
-                name='unique_medicamento_no_grupo'
-            )
+            models.UniqueConstraint(fields=['grupo', 'catalogo'], condition=models.Q(apagado_em__isnull=True), name='unique_medicamento_no_grupo')
         ]
+        indexes = [
+            # Índice parcial: só contém os medicamentos abaixo do mínimo, por grupo
+            models.Index(fields=['grupo'], condition=models.Q(abaixo_minimo=True, apagado_em__isnull=True), name='medicamento_abaixo_min_idx'),
+            # Índice parcial: a fila do expurgo
+            models.Index(fields=['apagado_em'], condition=models.Q(apagado_em__isnull=False), name='medicamento_apagado_idx'),
+        ]
+
+    def avaliar_estoque(self):
+        """Retorna o motivo (AlertaEstoque.Motivo) se o estoque está abaixo de algum limite, ou None."""
+        if self.estoque_minimo is not None and self.quantidade_estoque < self.estoque_minimo:
+            return AlertaEstoque.Motivo.ESTOQUE
+        if self.dias_cobertura_minimo and self.consumo_diario > 0:
+            if self.quantidade_estoque < self.consumo_diario * self.dias_cobertura_minimo:
+                return AlertaEstoque.Motivo.COBERTURA
+        return None
+
+    def save(self, *args, **kwargs):
+        # Avalia os limites a cada atualização de estoque; só há trabalho extra quando o
+        # medicamento cruza o limite (abre um alerta) ou volta para cima dele (resolve o alerta).
+        motivo = self.avaliar_estoque()
+        cruzou = (motivo is not None) != self.abaixo_minimo
+        if cruzou:
+            self.abaixo_minimo = motivo is not None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'abaixo_minimo'}
+        if kwargs.get('update_fields') is None or 'catalogo' in kwargs['update_fields']:
+            # O item do catálogo (global) precisa existir no shard do grupo para a chave estrangeira
+            espelhar_catalogo(self.catalogo, kwargs.get('using') or router.db_for_write(Medicamento, instance=self))
+        # Estoque antes desta gravação (None: desconhecido, ou fora dos campos gravados)
+        anterior = 0 if self._state.adding else getattr(self, '_estoque_carregado', None)
+        if kwargs.get('update_fields') is not None and 'quantidade_estoque' not in kwargs['update_fields']:
+            anterior = None
+        super().save(*args, **kwargs)
+        if cruzou:
+            if motivo is not None:
+                AlertaEstoque.abrir(self, motivo)
+            else:
+                AlertaEstoque.resolver(self)
+        if anterior is not None and anterior != self.quantidade_estoque:
+            # Movimentação de estoque: evento na caixa de saída, na mesma transação da gravação
+            EventoSaida.registrar(self.grupo_id, EventoSaida.Tipo.ESTOQUE_MOVIMENTADO, lambda: {
+                'medicamento_id': self.pk,
+                'catalogo_id': self.catalogo_id,
+                'nome_marca': self.nome_marca,
+                'quantidade_anterior': decimal.Decimal(anterior),
+                'quantidade_atual': decimal.Decimal(self.quantidade_estoque),
+                'abaixo_minimo': self.abaixo_minimo,
+            }, using=self._state.db)
+        if anterior is not None:
+            self._estoque_carregado = self.quantidade_estoque
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda o estoque lido do banco, para save() saber se houve movimentação
+        instancia = super().from_db(db, field_names, values)
+        instancia._estoque_carregado = instancia.__dict__.get('quantidade_estoque')
+        return instancia
+
+    def atualizar_consumo_diario(self):
+        """Recalcula o consumo diário a partir das prescrições ativas e reavalia os limites."""
+        consumo = sum(
+            (prescricao.consumo_diario() for prescricao in self.prescricoes_relacionadas.filter(ativo=True)),
+            decimal.Decimal(0),
+        ).quantize(decimal.Decimal('0.01'))
+        if consumo != self.consumo_diario:
+            self.consumo_diario = consumo
+            self.save(update_fields=['consumo_diario'])
+
+    def apagar(self):
+        """
+        Exclusão lógica: o medicamento some da API na hora e as prescrições dele deixam de valer.
+        O histórico de administração fica no banco até o expurgo.
+        """
+        with transaction.atomic(using=self._state.db):
+            self.apagado_em = timezone.now()
+            self.save(update_fields=['apagado_em'])
+            desativar_prescricoes(self.prescricoes_relacionadas.all())
 
     def __str__(self): # Método para retornar uma representação em string do medicamento
-        concentracao = ""
-        if self.concentracao_valor and self.concentracao_unidade:
-            # Formata o valor da concentração para não exibir casas decimais se for um número inteiro
-            valor_str = int(self.concentracao_valor) if self.concentracao_valor.to_integral_value() == self.concentracao_valor else self.concentracao_valor
-            concentracao = f" {valor_str}{self.get_concentracao_unidade_display()}"
-        
-        return f"{self.nome_marca} ({self.principio_ativo}){concentracao}"
+        return str(self.catalogo)
     
     
+class PrescricaoQuerySet(models.QuerySet):
+    def visiveis(self):
+        """
+        Sem as prescrições de idosos ou medicamentos apagados (exclusão lógica). O gerenciador
+        padrão deles esconde os apagados, mas não os alcançados a partir da prescrição.
+        """
+        return self.filter(idoso__apagado_em__isnull=True, medicamento__apagado_em__isnull=True)
+
+
+def desativar_prescricoes(prescricoes):
+    """
+    Desativa as prescrições ativas do queryset com um único UPDATE e recalcula o consumo
+    diário dos medicamentos afetados (o UPDATE não dispara os signals de Prescricao).
+    """
+    prescricoes = prescricoes.filter(ativo=True)
+    medicamentos = set(prescricoes.values_list('medicamento_id', flat=True))
+    prescricoes.update(ativo=False)
+    for medicamento in Medicamento.objects.using(prescricoes.db).filter(pk__in=medicamentos):
+        medicamento.atualizar_consumo_diario()
+
+
+def _dia_da_semana(dia):
+    # Propriedade booleana sobre um bit de Prescricao.dias_semana
+    bit = 1 << dia
+    def ler(self):
+        return bool(self.dias_semana & bit)
+    def gravar(self, marcado):
+        self.dias_semana = self.dias_semana | bit if marcado else self.dias_semana & ~bit
+    return property(ler, gravar)
+
+
 # 6. Modelo para Prescricao de Medicamentos
 class Prescricao(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
     # Classe interna para definir as opções de frequência da prescrição
     class FrequenciaChoices(models.TextChoices):
         DIARIA = 'DI', 'Diária'
@@ -306,20 +599,32 @@ class Prescricao(models.Model):
         default=FrequenciaChoices.DIARIA,
         verbose_name="Frequência da Dose"
     )
-    # Campos booleanos para especificar os dias da semana para administração (se aplicável)
-    dia_domingo = models.BooleanField(default=True, verbose_name="Domingo")
-    dia_segunda = models.BooleanField(default=True, verbose_name="Segunda-feira")
-    dia_terca = models.BooleanField(default=True, verbose_name="Terça-feira")
-    dia_quarta = models.BooleanField(default=True, verbose_name="Quarta-feira")
-    dia_quinta = models.BooleanField(default=True, verbose_name="Quinta-feira")
-    dia_sexta = models.BooleanField(default=True, verbose_name="Sexta-feira")
-    dia_sabado = models.BooleanField(default=True, verbose_name="Sábado")
+    # Dias da semana da administração, como máscara de bits (segunda = bit 0 ... domingo = bit 6; ver api/recorrencia.py)
+    dias_semana = models.PositiveSmallIntegerField(
+        default=TODOS_OS_DIAS,
+        validators=[MaxValueValidator(TODOS_OS_DIAS)],
+        verbose_name="Dias da Semana"
+    )
+    # Intervalo da recorrência: a cada quantos dias (diária), semanas (semanal) ou meses (mensal)
+    intervalo = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        verbose_name="Intervalo",
+        help_text="Ex: 2 para semana sim, semana não."
+    )
+    # Vigência da prescrição. As mensais são administradas no dia do mês de data_inicio
+    data_inicio = models.DateField(default=timezone.localdate, verbose_name="Início")
+    data_fim = models.DateField(null=True, blank=True, verbose_name="Término")
     # Chave estrangeira para o Idoso a quem a prescrição se destina
     idoso = models.ForeignKey(Idoso, on_delete=models.CASCADE, related_name="prescricoes")
     # Chave estrangeira para o Medicamento prescrito. PROTECT evita que um medicamento seja deletado se houver prescrições ativas para ele
     medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='prescricoes_relacionadas')
-    # Campo para o horário previsto da administração da dose
+    # Horários das doses no dia ("HH:MM", em ordem), para várias doses diárias na mesma prescrição
+    horarios = models.JSONField(default=list, blank=True, verbose_name="Horários das Doses")
+    # Primeiro horário do dia (mantido por save() a partir de 'horarios'; usado na ordenação)
     horario_previsto = models.TimeField(verbose_name="Horário da Dose")
+    # Quantidade de horários (mantida por save(); usada nos contadores de doses do dia)
+    doses_por_dia = models.PositiveSmallIntegerField(default=1, editable=False)
     # Campo para a dosagem (ex: "1 comprimido", "5ml")
     dose_valor = models.DecimalField(
         max_digits=10, 
@@ -340,6 +645,8 @@ class Prescricao(models.Model):
     # Campo booleano para ativar ou desativar a prescrição
     ativo = models.BooleanField(default=True, help_text="Desmarque para suspender esta prescrição.")
 
+    objects = PrescricaoQuerySet.as_manager()   # Prescricao.objects.visiveis(): só as de idosos e medicamentos não apagados
+
     class Meta:
         verbose_name = "Prescrição" # Nome singular do modelo no admin
         verbose_name_plural = "Prescrições" # Nome plural do modelo no admin
@@ -348,8 +655,38 @@ class Prescricao(models.Model):
     def __str__(self): # Método para retornar uma representação em string da prescrição
         return f"{self.medicamento.nome_marca} para {self.idoso.nome_completo} às {self.horario_previsto.strftime('%H:%M')}"
 
+    # Dias da semana como booleanos, para compatibilidade com os clientes que usam os campos dia_*
+    dia_segunda = _dia_da_semana(0)
+    dia_terca = _dia_da_semana(1)
+    dia_quarta = _dia_da_semana(2)
+    dia_quinta = _dia_da_semana(3)
+    dia_sexta = _dia_da_semana(4)
+    dia_sabado = _dia_da_semana(5)
+    dia_domingo = _dia_da_semana(6)
+
+    def save(self, *args, **kwargs):
+        # 'horarios' é a fonte da agenda; sem ele, vale o horario_previsto informado
+        self.horarios = normalizar_horarios(self.horarios or [self.horario_previsto])
+        if self.horarios:
+            self.horario_previsto = datetime.time.fromisoformat(self.horarios[0])
+        self.doses_por_dia = len(self.horarios)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'horarios' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'horario_previsto', 'doses_por_dia'}
+        super().save(*args, **kwargs)
+
+    def consumo_diario(self):
+        """Quantidade média consumida por dia por esta prescrição (zero para as eventuais)."""
+        doses = decimal.Decimal(self.dose_valor) * self.doses_por_dia / max(self.intervalo, 1)
+        if self.frequencia in (self.FrequenciaChoices.DIARIA, self.FrequenciaChoices.SEMANAL):
+            return doses * len(dias_da_mascara(self.dias_semana)) / 7
+        if self.frequencia == self.FrequenciaChoices.MENSAL:
+            return doses / 30
+        return decimal.Decimal(0)
+
 # 7. Modelo para Registro de administração de Medicamento   
 class LogAdministracao(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
     # Classe interna para definir o status da administração da dose
     class StatusDose(models.TextChoices):
         ADMINISTRADO = 'OK', 'Administrado'
@@ -366,17 +703,273 @@ class LogAdministracao(models.Model):
     usuario_responsavel = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     # Campo de texto para observações adicionais
     observacoes = models.TextField(blank=True)
+    # Horário agendado (um dos Prescricao.horarios) a que esta dose corresponde
+    horario_dose = models.TimeField(null=True, blank=True, verbose_name="Horário Agendado")
 
     def __str__(self): # Método para retornar uma representação em string do log
         return f"Dose de {self.prescricao.medicamento.nome_marca} para {self.prescricao.idoso.nome_completo} em {self.data_hora_administracao.strftime('%d/%m/%y %H:%M')}"
-    
+
+# 8. Modelo para os Registros de administração arquivados (histórico frio)
+class LogAdministracaoArquivado(models.Model):
+    # Logs mais antigos que settings.LOG_ARQUIVO_DIAS são movidos para cá pelo comando 'arquivar_logs',
+    # mantendo o ID original, para que a tabela quente (LogAdministracao) fique pequena.
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    id = models.BigIntegerField(primary_key=True)   # Mesmo ID que o log tinha em LogAdministracao
+    prescricao = models.ForeignKey(Prescricao, on_delete=models.CASCADE, related_name="logs_arquivados")
+    data_hora_administracao = models.DateTimeField(verbose_name="Data e Hora da Administração")
+    status = models.CharField(max_length=3, choices=LogAdministracao.StatusDose.choices)
+    usuario_responsavel = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    observacoes = models.TextField(blank=True)
+    horario_dose = models.TimeField(null=True, blank=True, verbose_name="Horário Agendado")
+
+    class Meta:
+        verbose_name = "Registro de Administração Arquivado"
+        verbose_name_plural = "Registros de Administração Arquivados"
+        indexes = [
+            # Consultas por período (filtro de datas da listagem de logs)
+            models.Index(fields=['data_hora_administracao'], name='log_arquivado_data_idx'),
+        ]
+
+    @classmethod
+    def de_log(cls, log):
+        # Cria (sem salvar) a versão arquivada de um LogAdministracao
+        return cls(
+            id=log.id,
+            prescricao_id=log.prescricao_id,
+            data_hora_administracao=log.data_hora_administracao,
+            status=log.status,
+            usuario_responsavel_id=log.usuario_responsavel_id,
+            observacoes=log.observacoes,
+            horario_dose=log.horario_dose,
+        )
+
+    def __str__(self): # Método para retornar uma representação em string do log arquivado
+        return f"Dose arquivada de {self.prescricao.medicamento.nome_marca} para {self.prescricao.idoso.nome_completo} em {self.data_hora_administracao.strftime('%d/%m/%y %H:%M')}"
+
+
+# 9. Modelo para os Alertas de estoque baixo
+class AlertaEstoque(models.Model):
+    # Aberto quando um Medicamento cruza para baixo do seu limite mínimo (ver Medicamento.save())
+    # e resolvido automaticamente quando o estoque volta a ficar acima dele.
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    class Motivo(models.TextChoices):
+        ESTOQUE = 'EST', 'Abaixo do estoque mínimo'
+        COBERTURA = 'COB', 'Abaixo da cobertura mínima em dias'
+
+    medicamento = models.ForeignKey(Medicamento, on_delete=models.CASCADE, related_name='alertas_estoque')
+    motivo = models.CharField(max_length=3, choices=Motivo.choices)
+    quantidade_estoque = models.DecimalField(max_digits=10, decimal_places=0, verbose_name="Estoque no Alerta")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    resolvido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Alerta de Estoque"
+        verbose_name_plural = "Alertas de Estoque"
+        ordering = ['-criado_em']
+        constraints = [
+            # No máximo um alerta aberto por medicamento (deduplicação)
+            models.UniqueConstraint(
+                fields=['medicamento'], condition=models.Q(resolvido_em__isnull=True), name='alerta_estoque_aberto_unico'
+            ),
+        ]
+
+    @classmethod
+    def abrir(cls, medicamento, motivo):
+        """Abre um alerta para o medicamento, ou devolve o que já está aberto."""
+        alerta, _ = cls.objects.get_or_create(
+            medicamento=medicamento, resolvido_em=None,
+            defaults={'motivo': motivo, 'quantidade_estoque': medicamento.quantidade_estoque},
+        )
+        return alerta
+
+    @classmethod
+    def resolver(cls, medicamento):
+        """Resolve o alerta aberto do medicamento, se houver."""
+        return cls.objects.filter(medicamento=medicamento, resolvido_em__isnull=True).update(resolvido_em=timezone.now())
+
+    def __str__(self): # Método para retornar uma representação em string do alerta
+        return f"{self.get_motivo_display()}: {self.medicamento.nome_marca} ({self.quantidade_estoque})"
+
+# 10. Modelo para o índice de busca textual (anotações clínicas e observações)
+class DocumentoBusca(models.Model):
+    # Uma linha por Idoso, Prescricao ou LogAdministracao que tenha texto, mantida pelos signals abaixo.
+    # O índice de texto completo fica no banco (FTS5 no SQLite, tsvector + GIN no PostgreSQL,
+    # ver a migração 0009) e a consulta está em api/busca.py.
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    class Tipo(models.TextChoices):
+        IDOSO = 'IDO', 'Idoso'
+        PRESCRICAO = 'PRE', 'Prescrição'
+        LOG = 'LOG', 'Registro de administração'
+
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='+')
+    tipo = models.CharField(max_length=3, choices=Tipo.choices)
+    objeto_id = models.PositiveBigIntegerField()    # ID do Idoso, da Prescricao ou do log (quente ou arquivado)
+    # Apagar o idoso ou a prescrição apaga os documentos ligados a eles
+    idoso = models.ForeignKey(Idoso, on_delete=models.CASCADE, related_name='+')
+    prescricao = models.ForeignKey(Prescricao, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    titulo = models.CharField(max_length=255)
+    texto = models.TextField()
+
+    class Meta:
+        verbose_name = "Documento de Busca"
+        verbose_name_plural = "Documentos de Busca"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='documento_busca_unico'),
+        ]
+
+    @classmethod
+    def indexar(cls, tipo, objeto_id, texto, **campos):
+        """Cria ou atualiza o documento do objeto; sem texto, o documento é removido."""
+        if not texto.strip():
+            return cls.remover(tipo, objeto_id)
+        cls.objects.update_or_create(tipo=tipo, objeto_id=objeto_id, defaults={'texto': texto, **campos})
+
+    @classmethod
+    def remover(cls, tipo, objeto_id):
+        cls.objects.filter(tipo=tipo, objeto_id=objeto_id).delete()
+
+    def __str__(self): # Método para retornar uma representação em string do documento
+        return f"{self.get_tipo_display()} {self.objeto_id}: {self.titulo}"
+
+# 11. Modelo para as Farmácias parceiras (destinos dos webhooks do grupo)
+class FarmaciaParceira(models.Model):
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='farmacias_parceiras')
+    nome = models.CharField(max_length=100, verbose_name="Nome da Farmácia")
+    url = models.URLField(verbose_name="URL do Webhook", help_text="Recebe os eventos em lotes, via POST (JSON).")
+    # Chave do HMAC-SHA256 enviado em cada entrega (ver api/outbox.py)
+    segredo = models.CharField(max_length=128, verbose_name="Segredo da Assinatura")
+    # Tipos de evento enviados (EventoSaida.Tipo); vazio = todos
+    eventos = models.JSONField(default=list, blank=True, verbose_name="Eventos Enviados")
+    ativo = models.BooleanField(default=True, help_text="Desmarque para parar de gerar eventos para esta farmácia.")
+
+    class Meta:
+        verbose_name = "Farmácia Parceira"
+        verbose_name_plural = "Farmácias Parceiras"
+
+    def __str__(self): # Método para retornar uma representação em string da farmácia
+        return self.nome
+
+# 12. Modelo para a caixa de saída (outbox) dos eventos enviados às farmácias parceiras
+class EventoSaida(models.Model):
+    # Gravado na mesma transação da mudança que o originou (ver registrar()) e entregue depois,
+    # em lotes por farmácia, pelo worker 'python manage.py entregar_eventos' (api/outbox.py).
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    class Tipo(models.TextChoices):
+        ESTOQUE_MOVIMENTADO = 'estoque.movimentado', 'Movimentação de estoque'
+        PRESCRICAO_CRIADA = 'prescricao.criada', 'Nova prescrição'
+
+    class Situacao(models.TextChoices):
+        PENDENTE = 'PEN', 'Pendente'
+        ENTREGUE = 'ENT', 'Entregue'
+        FALHOU = 'FAL', 'Falhou (tentativas esgotadas)'
+
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='+')
+    farmacia = models.ForeignKey(FarmaciaParceira, on_delete=models.CASCADE, related_name='eventos_saida')
+    tipo = models.CharField(max_length=30, choices=Tipo.choices)
+    dados = models.JSONField(encoder=DjangoJSONEncoder)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    situacao = models.CharField(max_length=3, choices=Situacao.choices, default=Situacao.PENDENTE)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    entregue_em = models.DateTimeField(null=True, blank=True)
+    ultimo_erro = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = "Evento de Saída"
+        verbose_name_plural = "Eventos de Saída"
+        indexes = [
+            # Índice parcial: só contém os eventos ainda não entregues, na ordem em que o worker os busca
+            models.Index(fields=['proxima_tentativa'], condition=models.Q(situacao='PEN'), name='evento_saida_pendente_idx'),
+        ]
+
+    @classmethod
+    def registrar(cls, grupo_id, tipo, dados, using=None):
+        """
+        Grava o evento para cada farmácia ativa do grupo que o recebe. Deve ser chamado dentro
+        da transação da mudança: se ela for desfeita, o evento também é. 'dados' é uma função
+        que monta o conteúdo do evento, chamada só se alguma farmácia for recebê-lo.
+        """
+        farmacias = FarmaciaParceira.objects.using(using).filter(grupo_id=grupo_id, ativo=True).values_list('pk', 'eventos')
+        destinos = [farmacia_id for farmacia_id, tipos in farmacias if not tipos or tipo in tipos]
+        if not destinos:
+            return []
+        conteudo = dados()
+        return cls.objects.using(using).bulk_create(
+            [cls(grupo_id=grupo_id, farmacia_id=farmacia_id, tipo=tipo, dados=conteudo) for farmacia_id in destinos]
+        )
+
+    def __str__(self): # Método para retornar uma representação em string do evento
+        return f"{self.tipo} #{self.pk} para {self.farmacia_id} ({self.get_situacao_display()})"
+
+def armazenamento_relatorios():
+    # Diretório dos PDFs prontos (settings.RELATORIOS_DIR), lido em tempo de execução
+    return FileSystemStorage(location=settings.RELATORIOS_DIR)
+
+# 13. Modelo para os relatórios em PDF (MAR e ficha do idoso), gerados em segundo plano
+class Relatorio(models.Model):
+    # Criado pela API como 'Pendente' e gerado pelo worker 'python manage.py gerar_relatorios'
+    # (api/relatorios.py). A impressão digital resume os dados usados no PDF: um pedido igual
+    # com os mesmos dados devolve o relatório já pronto, sem gerar de novo.
+    DADOS_DO_GRUPO = True    # Particionado por grupo (ver api.db_routers.ShardRouter)
+
+    class Tipo(models.TextChoices):
+        MAR = 'MAR', 'Registro mensal de administração (MAR)'
+        IDOSO = 'IDO', 'Ficha do idoso'
+
+    class Situacao(models.TextChoices):
+        PENDENTE = 'PEN', 'Pendente'
+        GERANDO = 'GER', 'Gerando'
+        PRONTO = 'PRO', 'Pronto'
+        FALHOU = 'FAL', 'Falhou'
+
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='+')
+    tipo = models.CharField(max_length=3, choices=Tipo.choices)
+    idoso = models.ForeignKey(Idoso, on_delete=models.CASCADE, null=True, blank=True, related_name='relatorios')    # Vazio: MAR de todos os idosos
+    mes = models.DateField(verbose_name="Mês")     # Dia 1 do mês do relatório
+    situacao = models.CharField(max_length=3, choices=Situacao.choices, default=Situacao.PENDENTE)
+    progresso = models.PositiveSmallIntegerField(default=0)    # Percentual já gerado
+    impressao_digital = models.CharField(max_length=64, blank=True)
+    arquivo = models.FileField(upload_to='%Y/%m/', storage=armazenamento_relatorios, blank=True)
+    tamanho = models.PositiveIntegerField(default=0)   # Bytes do PDF
+    solicitado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)   # Renovado a cada avanço do progresso
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    erro = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = "Relatório"
+        verbose_name_plural = "Relatórios"
+        indexes = [
+            # Busca de um relatório igual já pronto (ou na fila) antes de criar outro
+            models.Index(fields=['grupo', 'tipo', 'mes', 'impressao_digital'], name='relatorio_cache_idx'),
+            # Fila do worker: só os relatórios ainda não concluídos
+            models.Index(fields=['criado_em'], condition=models.Q(situacao__in=['PEN', 'GER']), name='relatorio_fila_idx'),
+        ]
+
+    def nome_do_arquivo(self):   # Nome sugerido no download, ex: mar-2024-05.pdf, ficha-idoso-12-2024-05.pdf
+        prefixo = 'mar' if self.tipo == self.Tipo.MAR else 'ficha-idoso'
+        alvo = f'-{self.idoso_id}' if self.idoso_id else ''
+        return f'{prefixo}{alvo}-{self.mes:%Y-%m}.pdf'
+
+    def __str__(self): # Método para retornar uma representação em string do relatório
+        return f"{self.get_tipo_display()} de {self.mes:%m/%Y} ({self.get_situacao_display()})"
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def criar_perfil_usuario_apos_criar_usuario(sender, instance, created, **kwargs):
     """
     Cria um PerfilUsuario automaticamente sempre que um novo usuário (Usuario) é criado.
     Este é um 'signal receiver' que escuta o sinal 'post_save' do modelo de usuário.
     """
-    if created: # 'created' é um booleano que indica se a instância foi criada ou apenas atualizada
+    # 'created' é um booleano que indica se a instância foi criada ou apenas atualizada.
+    # 'raw' indica uma cópia exata (fixtures, espelhamento em shards), que já traz o perfil.
+    if created and not kwargs.get('raw'):
         PerfilUsuario.objects.create(user=instance)
 
 
@@ -386,5 +979,131 @@ def criar_grupo(sender, instance, created, **kwargs):
     Função de exemplo para executar uma ação após a criação de um Grupo.
     Este é um 'signal receiver' que escuta o sinal 'post_save' do modelo Grupo.
     """
-    if created: # Executa apenas na criação do objeto
-        print(f"Grupo criado: {instance.nome}")
\ No newline at end of file
+    if created and not kwargs.get('raw'): # Executa apenas na criação do objeto (não em cópias espelhadas)
+        print(f"Grupo criado: {instance.nome}")
+
+
+@receiver([post_save, post_delete], sender=Idoso)
+@receiver([post_save, post_delete], sender=Medicamento)
+def invalidar_cache_grupo(sender, instance, **kwargs):
+    """
+    Invalida as respostas em cache do grupo quando um Idoso ou Medicamento muda.
+    (O nome do idoso aparece nas prescrições e o medicamento é aninhado nelas.)
+    A versão só muda depois do commit: antes dele, outra requisição ainda lê os dados antigos
+    e os guardaria no cache já sob a versão nova.
+    """
+    grupo_id = instance.grupo_id
+    transaction.on_commit(lambda: invalidar_grupo(grupo_id), using=instance._state.db)
+
+
+@receiver([post_save, post_delete], sender=Prescricao)
+def invalidar_cache_grupo_prescricao(sender, instance, **kwargs):
+    """Invalida as respostas em cache do grupo ao qual a prescrição pertence."""
+    grupo_id = Idoso.todos.filter(pk=instance.idoso_id).values_list('grupo_id', flat=True).first()
+    transaction.on_commit(lambda: invalidar_grupo(grupo_id), using=instance._state.db)
+
+
+@receiver([post_save, post_delete], sender=Prescricao)
+def atualizar_consumo_medicamento(sender, instance, raw=False, **kwargs):
+    """Mantém Medicamento.consumo_diario em dia quando uma prescrição muda."""
+    if raw:
+        return
+    medicamento = Medicamento.objects.filter(pk=instance.medicamento_id).first()
+    if medicamento is not None:
+        medicamento.atualizar_consumo_diario()
+
+
+@receiver(post_save, sender=Idoso)
+def indexar_idoso(sender, instance, raw=False, **kwargs):
+    """Mantém o documento de busca com as doenças e condições do idoso."""
+    if raw:
+        return
+    DocumentoBusca.indexar(
+        DocumentoBusca.Tipo.IDOSO, instance.pk, '\n'.join(filter(None, [instance.doencas, instance.condicoes])),
+        grupo_id=instance.grupo_id, idoso_id=instance.pk, titulo=instance.nome_completo,
+    )
+
+
+@receiver(post_save, sender=Prescricao)
+def indexar_prescricao(sender, instance, raw=False, **kwargs):
+    """Mantém o documento de busca com as instruções da prescrição."""
+    if raw:
+        return
+    if not instance.instrucoes.strip():
+        DocumentoBusca.remover(DocumentoBusca.Tipo.PRESCRICAO, instance.pk)
+        return
+    DocumentoBusca.indexar(
+        DocumentoBusca.Tipo.PRESCRICAO, instance.pk, instance.instrucoes,
+        grupo_id=instance.idoso.grupo_id, idoso_id=instance.idoso_id, prescricao_id=instance.pk,
+        titulo=instance.medicamento.nome_marca,
+    )
+
+
+@receiver(post_save, sender=Prescricao)
+def registrar_prescricao_criada(sender, instance, created, raw=False, using=None, **kwargs):
+    """Avisa as farmácias parceiras do grupo sobre a nova prescrição (evento na caixa de saída)."""
+    if raw or not created:
+        return
+
+    def dados():
+        # O item do catálogo é lido do mesmo banco da prescrição (espelhado no shard do grupo)
+        catalogo = CatalogoMedicamento.objects.using(using).get(pk=instance.medicamento.catalogo_id)
+        return {
+            'prescricao_id': instance.pk,
+            'idoso_id': instance.idoso_id,
+            'medicamento_id': instance.medicamento_id,
+            'catalogo_id': catalogo.pk,
+            'nome_marca': catalogo.nome_marca,
+            'principio_ativo': catalogo.principio_ativo,
+            'dose_valor': instance.dose_valor,
+            'dose_unidade': instance.dose_unidade,
+            'frequencia': instance.frequencia,
+            'horarios': instance.horarios,
+            'data_inicio': instance.data_inicio,
+            'data_fim': instance.data_fim,
+        }
+    EventoSaida.registrar(instance.idoso.grupo_id, EventoSaida.Tipo.PRESCRICAO_CRIADA, dados, using=using)
+
+
+@receiver(post_save, sender=LogAdministracao)
+def indexar_log(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantém o documento de busca com as observações do log. A maioria das doses não tem
+    observação: nesse caso, na criação não há nada a fazer (nenhuma consulta extra).
+    O documento sobrevive ao arquivamento (o log arquivado mantém o ID).
+    """
+    if raw or (created and not instance.observacoes.strip()):
+        return
+    if not instance.observacoes.strip():
+        DocumentoBusca.remover(DocumentoBusca.Tipo.LOG, instance.pk)
+        return
+    prescricao = instance.prescricao
+    DocumentoBusca.indexar(
+        DocumentoBusca.Tipo.LOG, instance.pk, instance.observacoes,
+        grupo_id=prescricao.idoso.grupo_id, idoso_id=prescricao.idoso_id, prescricao_id=prescricao.pk,
+        titulo=f"{instance.get_status_display()}: {prescricao.medicamento.nome_marca}",
+    )
+
+
+@receiver(post_save, sender=Grupo)
+def espelhar_grupo_no_shard(sender, instance, created, raw=False, **kwargs):
+    """Mantém a cópia do grupo atualizada no shard onde estão os seus dados."""
+    if not raw and instance.banco != 'default':
+        espelhar_grupo(instance, com_membros=False)
+
+
+@receiver(post_save, sender=Membro)
+def espelhar_membro_no_shard(sender, instance, created, raw=False, **kwargs):
+    """Quando alguém entra em um grupo que está em um shard, espelha o usuário lá."""
+    if raw or not created:
+        return
+    banco = Grupo.todos.filter(pk=instance.grupo_id).values_list('banco', flat=True).first()
+    if banco and banco != 'default':
+        espelhar_usuario(instance.perfil.user, banco)
+
+
+@receiver(post_delete, sender=Relatorio)
+def apagar_pdf_do_relatorio(sender, instance, **kwargs):
+    """Apaga o PDF quando o relatório é removido (retenção, ou o grupo/idoso apagado)."""
+    if instance.arquivo:
+        instance.arquivo.delete(save=False)
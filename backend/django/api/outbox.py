@@ -0,0 +1,190 @@
+# api/outbox.py - Entrega dos eventos da caixa de saída (EventoSaida) às farmácias parceiras.
+#
+# As views não chamam as farmácias: a mudança (movimentação de estoque, nova prescrição)
+# grava um EventoSaida na mesma transação (ver EventoSaida.registrar) e o worker
+# 'python manage.py entregar_eventos' entrega os pendentes depois. A cada rodada, em cada banco:
+# 1. reserva os eventos vencidos (proxima_tentativa <= agora), adiando-os por OUTBOX_RESERVA
+#    segundos para que outro worker não os pegue enquanto este entrega;
+# 2. agrupa por farmácia e envia lotes de até OUTBOX_LOTE eventos por POST, em ordem de
+#    criação, assinados com HMAC-SHA256 do segredo da farmácia (ver assinar());
+# 3. marca os lotes aceitos (2xx) como entregues. Se um lote falha, ele ganha nova tentativa
+#    com espera exponencial (com jitter, respeitando Retry-After), num único horário para o lote
+#    e para os lotes seguintes da mesma farmácia, adiados junto, até esgotar OUTBOX_TENTATIVAS.
+# A entrega é "pelo menos uma vez": a farmácia deve ignorar IDs de evento já recebidos.
+
+import datetime
+import hashlib
+import hmac
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from itertools import groupby
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EventoSaida
+
+
+def assinar(segredo, timestamp, corpo):
+    """HMAC-SHA256 (hex) de '<timestamp>.<corpo>' com o segredo da farmácia."""
+    mensagem = f'{timestamp}.'.encode() + corpo
+    return hmac.new(segredo.encode(), mensagem, hashlib.sha256).hexdigest()
+
+
+def verificar_assinatura(segredo, cabecalho, corpo, tolerancia=300, agora=None):
+    """
+    Confere o cabeçalho X-Assinatura ('t=<timestamp>,v1=<hex>') de uma entrega. Para uso do
+    lado de quem recebe: rejeita assinaturas erradas e entregas mais velhas que 'tolerancia' segundos.
+    """
+    try:
+        partes = dict(item.split('=', 1) for item in cabecalho.split(','))
+        timestamp = int(partes['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs((time.time() if agora is None else agora) - timestamp) > tolerancia:
+        return False
+    return hmac.compare_digest(assinar(segredo, timestamp, corpo), partes.get('v1', ''))
+
+
+def corpo_do_lote(farmacia, eventos):
+    return json.dumps({
+        'farmacia_id': farmacia.pk,
+        'eventos': [
+            {
+                'id': evento.pk,
+                'tipo': evento.tipo,
+                'grupo_id': evento.grupo_id,
+                'criado_em': evento.criado_em,
+                'dados': evento.dados,
+            }
+            for evento in eventos
+        ],
+    }, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def _ler_retry_after(valor):
+    try:
+        return max(float(valor), 0)
+    except (TypeError, ValueError):
+        return None     # Ausente, ou no formato de data (tratado como ausente)
+
+
+def enviar_lote(farmacia, eventos):
+    """
+    Envia um lote de eventos para a farmácia. Retorna (erro, retry_after): erro é None
+    se a farmácia aceitou (2xx); retry_after, os segundos pedidos pela farmácia, se houver.
+    """
+    corpo = corpo_do_lote(farmacia, eventos)
+    timestamp = int(time.time())
+    requisicao = urllib.request.Request(farmacia.url, data=corpo, method='POST', headers={
+        'Content-Type': 'application/json',
+        'X-Assinatura': f't={timestamp},v1={assinar(farmacia.segredo, timestamp, corpo)}',
+    })
+    try:
+        with urllib.request.urlopen(requisicao, timeout=settings.OUTBOX_TIMEOUT):
+            return None, None
+    except urllib.error.HTTPError as exc:
+        return f'HTTP {exc.code}', _ler_retry_after(exc.headers.get('Retry-After'))
+    except (urllib.error.URLError, OSError) as exc:     # Conexão recusada, DNS, timeout...
+        return str(getattr(exc, 'reason', exc))[:255] or exc.__class__.__name__, None
+
+
+def espera(tentativas, retry_after=None):
+    """Segundos até a próxima tentativa: exponencial no número de tentativas, com jitter."""
+    base = min(settings.OUTBOX_ESPERA_BASE * 2 ** (tentativas - 1), settings.OUTBOX_ESPERA_MAXIMA)
+    segundos = random.uniform(base / 2, base)
+    if retry_after:
+        segundos = max(segundos, min(retry_after, settings.OUTBOX_ESPERA_MAXIMA))
+    return segundos
+
+
+def reservar(banco, agora):
+    """Reserva (adia por OUTBOX_RESERVA segundos) os eventos vencidos do banco e retorna os IDs."""
+    pendentes = EventoSaida.objects.using(banco).filter(situacao=EventoSaida.Situacao.PENDENTE, proxima_tentativa__lte=agora)
+    with transaction.atomic(using=banco):
+        ids = list(
+            pendentes.select_for_update(skip_locked=True)
+            .order_by('proxima_tentativa', 'pk')
+            .values_list('pk', flat=True)[:settings.OUTBOX_RODADA]
+        )
+        if ids:
+            EventoSaida.objects.using(banco).filter(pk__in=ids).update(
+                proxima_tentativa=agora + datetime.timedelta(seconds=settings.OUTBOX_RESERVA),
+            )
+    return ids
+
+
+def _registrar_falha(banco, lote, erro, retry_after, agora):
+    """
+    Agenda a próxima tentativa do lote (ou desiste dos eventos que esgotaram as tentativas) e
+    retorna o horário agendado. O horário é um só para o lote inteiro, calculado pelo evento mais
+    tentado: com um jitter por evento, o lote voltaria picado em vários POSTs pequenos.
+    """
+    for evento in lote:
+        evento.tentativas += 1
+        evento.ultimo_erro = erro
+    tentativas = max(evento.tentativas for evento in lote)
+    proxima = agora + datetime.timedelta(seconds=espera(tentativas, retry_after))
+    for evento in lote:
+        if evento.tentativas >= settings.OUTBOX_TENTATIVAS:
+            evento.situacao = EventoSaida.Situacao.FALHOU
+        else:
+            evento.proxima_tentativa = proxima
+    EventoSaida.objects.using(banco).bulk_update(lote, ['tentativas', 'ultimo_erro', 'situacao', 'proxima_tentativa'])
+    return proxima
+
+
+def entregar_pendentes(banco, agora=None):
+    """
+    Uma rodada do worker no banco: reserva os eventos vencidos e os entrega em lotes por
+    farmácia. Retorna um Counter com os eventos 'entregues', com 'falhas' e 'adiados'.
+    """
+    resultado = Counter()
+    ids = reservar(banco, agora or timezone.now())
+    if not ids:
+        return resultado
+    eventos = EventoSaida.objects.using(banco).filter(pk__in=ids).select_related('farmacia').order_by('farmacia_id', 'pk')
+    for _, do_destino in groupby(eventos, key=lambda evento: evento.farmacia_id):
+        do_destino = list(do_destino)
+        farmacia = do_destino[0].farmacia
+        if not farmacia.ativo:     # Desativada depois de o evento ser gravado: não há mais a quem entregar
+            EventoSaida.objects.using(banco).filter(pk__in=[evento.pk for evento in do_destino]).update(
+                situacao=EventoSaida.Situacao.FALHOU, ultimo_erro='Farmácia desativada.',
+            )
+            resultado['falhas'] += len(do_destino)
+            continue
+        adiar_ate = None    # Depois de uma falha, os lotes seguintes da farmácia esperam junto
+        for inicio in range(0, len(do_destino), settings.OUTBOX_LOTE):
+            lote = do_destino[inicio:inicio + settings.OUTBOX_LOTE]
+            pks = [evento.pk for evento in lote]
+            if adiar_ate is not None:
+                EventoSaida.objects.using(banco).filter(pk__in=pks).update(proxima_tentativa=adiar_ate)
+                resultado['adiados'] += len(lote)
+                continue
+            erro, retry_after = enviar_lote(farmacia, lote)
+            if erro is None:
+                EventoSaida.objects.using(banco).filter(pk__in=pks).update(
+                    situacao=EventoSaida.Situacao.ENTREGUE, entregue_em=timezone.now(),
+                    tentativas=F('tentativas') + 1, ultimo_erro='',
+                )
+                resultado['entregues'] += len(lote)
+                continue
+            resultado['falhas'] += len(lote)
+            adiar_ate = _registrar_falha(banco, lote, erro, retry_after, timezone.now())
+    return resultado
+
+
+def remover_entregues(banco, dias=None):
+    """Apaga os eventos entregues há mais de 'dias' (padrão: OUTBOX_RETENCAO_DIAS). Retorna quantos."""
+    corte = timezone.now() - datetime.timedelta(days=settings.OUTBOX_RETENCAO_DIAS if dias is None else dias)
+    removidos, _ = EventoSaida.objects.using(banco).filter(
+        situacao=EventoSaida.Situacao.ENTREGUE, entregue_em__lt=corte,
+    ).delete()
+    return removidos
@@ -0,0 +1,220 @@
+# api/pdf.py - Gravação de PDF página a página, sem bibliotecas externas.
+#
+# Cada página é comprimida e gravada no arquivo assim que termina: em memória ficam apenas os
+# comandos da página atual e a posição de cada objeto já gravado (para a tabela xref do final).
+# O texto usa as fontes padrão Helvetica (não embutidas) com a codificação WinAnsi, que cobre os
+# acentos do português. Escritor acrescenta o layout dos relatórios (api/relatorios.py): títulos,
+# pares rótulo/valor, parágrafos e tabelas, com quebra de página automática.
+
+import zlib
+
+LARGURA_PAGINA, ALTURA_PAGINA = 595, 842    # A4 em pontos
+MARGEM = 40
+LARGURA_MEDIA_CARACTERE = 0.52  # Largura média de um caractere da Helvetica, em frações do tamanho da fonte
+
+
+def _texto_pdf(texto):
+    dados = str(texto).encode('cp1252', errors='replace')
+    return dados.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'').replace(b'\n', b' ')
+
+
+def caracteres_que_cabem(largura, tamanho):
+    return max(int(largura / (tamanho * LARGURA_MEDIA_CARACTERE)), 1)
+
+
+def cortar(texto, largura, tamanho):
+    """Texto cortado (com reticências) para caber na largura, pela largura média dos caracteres."""
+    texto = str(texto)
+    limite = caracteres_que_cabem(largura, tamanho)
+    return texto if len(texto) <= limite else texto[:max(limite - 1, 0)] + '…'
+
+
+def quebrar_linhas(texto, largura, tamanho):
+    """Divide o texto em linhas que cabem na largura, quebrando nos espaços."""
+    limite = caracteres_que_cabem(largura, tamanho)
+    for paragrafo in str(texto).splitlines() or ['']:
+        linha = ''
+        for palavra in paragrafo.split():
+            while len(palavra) > limite:    # Palavra maior que a linha inteira
+                if linha:
+                    yield linha
+                    linha = ''
+                yield palavra[:limite]
+                palavra = palavra[limite:]
+            if linha and len(linha) + 1 + len(palavra) > limite:
+                yield linha
+                linha = palavra
+            else:
+                linha = f'{linha} {palavra}' if linha else palavra
+        yield linha
+
+
+class DocumentoPDF:
+    """
+    PDF gravado em streaming no arquivo (aberto em modo binário). Uso: nova_pagina(),
+    texto()/linha()/retangulo() na página atual e, no fim, fechar().
+    """
+    # Objetos de número fixo; as páginas e os conteúdos são numerados a partir de 5
+    CATALOGO, PAGINAS, FONTE, FONTE_NEGRITO = 1, 2, 3, 4
+
+    def __init__(self, arquivo, titulo=''):
+        self.arquivo = arquivo
+        self.titulo = titulo
+        self.posicoes = {}      # Número do objeto -> posição no arquivo
+        self.paginas = []       # Números dos objetos de página, em ordem
+        self._posicao = 0
+        self._proximo_numero = 5
+        self._comandos = None   # Comandos da página atual (None: nenhuma página aberta)
+        self._gravar(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _gravar(self, dados):
+        self.arquivo.write(dados)
+        self._posicao += len(dados)
+
+    def _numero(self):
+        numero = self._proximo_numero
+        self._proximo_numero += 1
+        return numero
+
+    def _objeto(self, numero, corpo):
+        self.posicoes[numero] = self._posicao
+        self._gravar(b'%d 0 obj\n%s\nendobj\n' % (numero, corpo))
+
+    def nova_pagina(self):
+        if self._comandos is not None:
+            self._fechar_pagina()
+        self._comandos = []
+
+    def _fechar_pagina(self):
+        conteudo = zlib.compress(b'\n'.join(self._comandos))
+        numero_conteudo = self._numero()
+        self._objeto(numero_conteudo, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(conteudo), conteudo))
+        numero_pagina = self._numero()
+        self._objeto(numero_pagina, (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+        ) % (self.PAGINAS, LARGURA_PAGINA, ALTURA_PAGINA, self.FONTE, self.FONTE_NEGRITO, numero_conteudo))
+        self.paginas.append(numero_pagina)
+        self._comandos = None
+
+    def texto(self, x, y, texto, tamanho=9, negrito=False):
+        fonte = b'F2' if negrito else b'F1'
+        self._comandos.append(b'BT /%s %.1f Tf %.2f %.2f Td (%s) Tj ET' % (fonte, tamanho, x, y, _texto_pdf(texto)))
+
+    def linha(self, x1, y1, x2, y2, espessura=0.5):
+        self._comandos.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (espessura, x1, y1, x2, y2))
+
+    def retangulo(self, x, y, largura, altura, cinza=0.9):
+        """Retângulo preenchido em tons de cinza (0 = preto, 1 = branco)."""
+        self._comandos.append(b'%.2f g %.2f %.2f %.2f %.2f re f 0 g' % (cinza, x, y, largura, altura))
+
+    def fechar(self):
+        """Grava as páginas pendentes, as fontes, a árvore de páginas e a tabela xref."""
+        if self._comandos is None and not self.paginas:
+            self._comandos = []     # Um PDF precisa de ao menos uma página
+        if self._comandos is not None:
+            self._fechar_pagina()
+        for numero, fonte in ((self.FONTE, b'Helvetica'), (self.FONTE_NEGRITO, b'Helvetica-Bold')):
+            self._objeto(numero, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % fonte)
+        filhas = b' '.join(b'%d 0 R' % numero for numero in self.paginas)
+        self._objeto(self.PAGINAS, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (filhas, len(self.paginas)))
+        self._objeto(self.CATALOGO, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGINAS)
+        numero_info = self._numero()
+        self._objeto(numero_info, b'<< /Title (%s) >>' % _texto_pdf(self.titulo))
+
+        inicio_xref = self._posicao
+        total = self._proximo_numero
+        self._gravar(b'xref\n0 %d\n0000000000 65535 f \n' % total)
+        for numero in range(1, total):
+            self._gravar(b'%010d 00000 n \n' % self.posicoes[numero])
+        self._gravar(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            total, self.CATALOGO, numero_info, inicio_xref,
+        ))
+
+
+class Escritor:
+    """
+    Layout sobre um DocumentoPDF: o conteúdo desce pela página e, quando não cabe mais,
+    uma nova página é aberta com o cabeçalho (texto e número da página).
+    """
+    largura_util = LARGURA_PAGINA - 2 * MARGEM
+
+    def __init__(self, documento, cabecalho=''):
+        self.documento = documento
+        self.cabecalho = cabecalho
+        self.numero_pagina = 0
+        self.y = None   # Posição vertical do cursor (None: nenhuma página aberta)
+
+    def quebrar_pagina(self):
+        self.documento.nova_pagina()
+        self.numero_pagina += 1
+        topo = ALTURA_PAGINA - MARGEM
+        self.documento.texto(MARGEM, topo, cortar(self.cabecalho, self.largura_util - 60, 8), tamanho=8)
+        self.documento.texto(LARGURA_PAGINA - MARGEM - 50, topo, f'Página {self.numero_pagina}', tamanho=8)
+        self.documento.linha(MARGEM, topo - 4, LARGURA_PAGINA - MARGEM, topo - 4)
+        self.y = topo - 20
+
+    def reservar(self, altura):
+        """Garante 'altura' pontos livres na página atual; retorna True se abriu uma nova página."""
+        if self.y is None or self.y - altura < MARGEM:
+            self.quebrar_pagina()
+            return True
+        return False
+
+    def titulo(self, texto, tamanho=13):
+        self.reservar(tamanho + 8)
+        self.documento.texto(MARGEM, self.y - tamanho, cortar(texto, self.largura_util, tamanho), tamanho=tamanho, negrito=True)
+        self.y -= tamanho + 8
+
+    def paragrafo(self, texto, tamanho=9):
+        for linha in quebrar_linhas(texto, self.largura_util, tamanho):
+            self.reservar(tamanho + 3)
+            self.documento.texto(MARGEM, self.y - tamanho, linha, tamanho=tamanho)
+            self.y -= tamanho + 3
+
+    def campos(self, pares, tamanho=9, largura_rotulo=150):
+        """Pares (rótulo, valor), um por linha."""
+        for rotulo, valor in pares:
+            linhas = list(quebrar_linhas(valor if valor not in (None, '') else '-', self.largura_util - largura_rotulo, tamanho))
+            for indice, linha in enumerate(linhas):
+                self.reservar(tamanho + 3)
+                if indice == 0:
+                    self.documento.texto(MARGEM, self.y - tamanho, cortar(rotulo, largura_rotulo - 6, tamanho), tamanho=tamanho, negrito=True)
+                self.documento.texto(MARGEM + largura_rotulo, self.y - tamanho, linha, tamanho=tamanho)
+                self.y -= tamanho + 3
+
+    def espaco(self, altura=8):
+        if self.y is not None:
+            self.y -= altura
+
+    def tabela(self, colunas, linhas, tamanho=8, alinhar_ao_centro=()):
+        """
+        Tabela com as colunas [(título, largura)] e as linhas (iterável de listas de valores,
+        consumido aos poucos). O cabeçalho é repetido em cada página; os valores são cortados
+        para caber na coluna. 'alinhar_ao_centro': índices das colunas centralizadas.
+        """
+        altura = tamanho + 5
+
+        def cabecalho():
+            self.documento.retangulo(MARGEM, self.y - altura, sum(largura for _, largura in colunas), altura)
+            self._linha_da_tabela([titulo for titulo, _ in colunas], colunas, tamanho, alinhar_ao_centro, negrito=True)
+
+        self.reservar(2 * altura)
+        cabecalho()
+        for valores in linhas:
+            if self.reservar(altura):
+                cabecalho()
+            self._linha_da_tabela(valores, colunas, tamanho, alinhar_ao_centro)
+            self.documento.linha(MARGEM, self.y, MARGEM + sum(largura for _, largura in colunas), self.y, espessura=0.2)
+
+    def _linha_da_tabela(self, valores, colunas, tamanho, alinhar_ao_centro, negrito=False):
+        altura = tamanho + 5
+        x = MARGEM
+        for indice, (valor, (_, largura)) in enumerate(zip(valores, colunas)):
+            texto = cortar('' if valor is None else valor, largura - 4, tamanho)
+            deslocamento = 2
+            if indice in alinhar_ao_centro:
+                deslocamento = max((largura - len(texto) * tamanho * LARGURA_MEDIA_CARACTERE) / 2, 0)
+            self.documento.texto(x + deslocamento, self.y - tamanho - 1, texto, tamanho=tamanho, negrito=negrito)
+            x += largura
+        self.y -= altura
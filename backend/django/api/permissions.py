@@ -1,10 +1,45 @@
 # api/permissions.py
+from django.core.exceptions import ValidationError
 from rest_framework import permissions
-from .models import Grupo, PerfilUsuario, LogAdministracao, Prescricao
+from .models import AlertaEstoque, Grupo, Membro, PerfilUsuario, LogAdministracao, LogAdministracaoArquivado, Prescricao
+
+
+def papel_no_grupo(request, grupo_id):
+    """
+    Papel (Membro.Papel) do usuário da requisição no grupo, ou None se ele não for membro
+    (ou se o grupo foi apagado).
+    Uma consulta pelo índice único de Membro, guardada na requisição: as permissões de
+    view e de objeto (e as views) perguntam pelo mesmo grupo sem repetir a consulta.
+    """
+    papeis = request.__dict__.setdefault('_papeis_por_grupo', {})
+    chave = str(grupo_id)
+    if chave not in papeis:
+        try:
+            papeis[chave] = Membro.objects.filter(
+                grupo_id=grupo_id, perfil__user_id=request.user.pk, grupo__apagado_em__isnull=True,
+            ).values_list('papel', flat=True).first()
+        except ValidationError:     # ID de grupo que nem é um UUID válido
+            papeis[chave] = None
+    return papeis[chave]
+
+
+def grupo_do_objeto(obj):
+    """ID do grupo ao qual o objeto pertence, lido pelas chaves estrangeiras (sem carregar o Grupo)."""
+    if isinstance(obj, Grupo):
+        return obj.pk
+    if isinstance(obj, Prescricao):
+        return obj.idoso.grupo_id
+    if isinstance(obj, (LogAdministracao, LogAdministracaoArquivado)):
+        return obj.prescricao.idoso.grupo_id
+    if isinstance(obj, AlertaEstoque):
+        return obj.medicamento.grupo_id
+    return getattr(obj, 'grupo_id', None)   # Para Idoso e Medicamento
+
 
 class IsGroupAdmin(permissions.BasePermission):
     """
-    Permissão customizada que verifica se o usuário é o admin de um grupo.
+    Permissão customizada que verifica se o usuário é administrador do grupo
+    (papel ADMIN no seu vínculo de Membro).
     """
     message = 'Apenas o administrador do grupo pode realizar esta ação.'
 
@@ -12,25 +47,8 @@ class IsGroupAdmin(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        target_group = None
-        
-        # Lógica centralizada para encontrar o grupo associado ao objeto
-        if isinstance(obj, Grupo):
-            target_group = obj
-        elif isinstance(obj, Prescricao):
-            if obj.idoso:
-                target_group = obj.idoso.grupo
-        elif isinstance(obj, LogAdministracao):
-            if obj.prescricao and obj.prescricao.idoso:
-                target_group = obj.prescricao.idoso.grupo
-        elif hasattr(obj, 'grupo'): # Para Idoso e Medicamento
-            target_group = obj.grupo
-        
-        # Se um grupo foi encontrado, verifica se o usuário é o admin
-        if target_group:
-            return target_group.admin == request.user
-        
-        return False
+        grupo_id = grupo_do_objeto(obj)
+        return grupo_id is not None and papel_no_grupo(request, grupo_id) == Membro.Papel.ADMIN
 
 
 class IsGroupMember(permissions.BasePermission):
@@ -39,36 +57,20 @@ class IsGroupMember(permissions.BasePermission):
     de um grupo específico.
     """
     message = 'Você não é membro deste grupo.'
-    
+
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
         if 'grupo_pk' in view.kwargs:
-            grupo_pk = view.kwargs['grupo_pk']
-            return request.user.perfil.grupos.filter(pk=grupo_pk).exists()
+            return papel_no_grupo(request, view.kwargs['grupo_pk']) is not None
         return True
 
     def has_object_permission(self, request, view, obj):
-        if not hasattr(request.user, 'perfil'):
-            return False
-            
-        user_groups = request.user.perfil.grupos.all()
-        target_group = None
-
-        if isinstance(obj, Grupo):
-            target_group = obj
-        elif isinstance(obj, PerfilUsuario):
-            return obj.grupos.filter(pk__in=[g.pk for g in user_groups]).exists()
-        elif isinstance(obj, Prescricao): # Verifica Prescricao primeiro
-            if obj.idoso:
-                target_group = obj.idoso.grupo
-        elif isinstance(obj, LogAdministracao): # Depois verifica LogAdministracao
-            if obj.prescricao and obj.prescricao.idoso:
-                target_group = obj.prescricao.idoso.grupo
-        elif hasattr(obj, 'grupo'): # Cobre Idoso e Medicamento
-            target_group = obj.grupo
-        
-        if not target_group:
-            return False
-
-        return target_group in user_groups
+        if isinstance(obj, PerfilUsuario):
+            if 'grupo_pk' in view.kwargs:   # Rotas aninhadas: o perfil precisa ser do mesmo grupo
+                return Membro.objects.filter(perfil=obj, grupo_id=view.kwargs['grupo_pk']).exists()
+            # Fora de um grupo: basta os dois usuários terem algum grupo em comum
+            grupos_do_usuario = Membro.objects.filter(perfil__user_id=request.user.pk).values('grupo_id')
+            return Membro.objects.filter(perfil=obj, grupo_id__in=grupos_do_usuario).exists()
+        grupo_id = grupo_do_objeto(obj)
+        return grupo_id is not None and papel_no_grupo(request, grupo_id) is not None
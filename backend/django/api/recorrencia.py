@@ -0,0 +1,170 @@
+# api/recorrencia.py - Recorrência das prescrições: expansão das doses em um período.
+#
+# Cada Prescricao descreve sua agenda de forma compacta:
+# - dias_semana: máscara de bits na ordem de date.weekday() (segunda = bit 0, domingo = bit 6);
+# - horarios: lista ordenada de "HH:MM" (várias doses no dia na mesma prescrição);
+# - intervalo: a cada quantos dias (diária), semanas (semanal) ou meses (mensal);
+# - data_inicio / data_fim: vigência. As mensais caem no dia do mês de data_inicio
+#   (no último dia do mês, nos meses mais curtos).
+# A expansão salta direto de uma data agendada para a próxima, sem percorrer o período dia a dia,
+# e agendadas_no_dia() aplica as mesmas regras no banco, para os contadores de api/resumo.py.
+
+import calendar
+import datetime
+
+from django.db.models import DateField, F, Func, IntegerField, Q, Value
+from django.db.models.functions import ExtractDay, ExtractIsoWeekDay, ExtractMonth, ExtractYear, Mod
+from django.utils import timezone
+
+TODOS_OS_DIAS = 0b1111111
+# Maior período aceito pela agenda da API (PrescricaoViewSet.agenda)
+AGENDA_MAX_DIAS = 31
+
+
+def dias_da_mascara(mascara):
+    """Dias da semana (0 = segunda) marcados na máscara."""
+    return [dia for dia in range(7) if mascara & (1 << dia)]
+
+
+def normalizar_horarios(valores):
+    """Horários como "HH:MM", sem repetição e em ordem (aceita datetime.time ou texto ISO)."""
+    horarios = set()
+    for valor in valores:
+        if valor in (None, ''):
+            continue
+        if isinstance(valor, str):
+            valor = datetime.time.fromisoformat(valor)
+        horarios.add(valor.strftime('%H:%M'))
+    return sorted(horarios)
+
+
+def _indice_do_mes(dia):
+    return dia.year * 12 + dia.month - 1
+
+
+def datas_agendadas(prescricao, inicio, fim):
+    """Datas entre inicio e fim (inclusive) em que a prescrição tem doses, em ordem."""
+    Frequencia = prescricao.FrequenciaChoices
+    inicio = max(inicio, prescricao.data_inicio)
+    if prescricao.data_fim:
+        fim = min(fim, prescricao.data_fim)
+    intervalo = max(prescricao.intervalo, 1)
+    if inicio > fim or prescricao.frequencia == Frequencia.EVENTUAL:
+        return
+
+    if prescricao.frequencia == Frequencia.MENSAL:
+        base = _indice_do_mes(prescricao.data_inicio)
+        mes = _indice_do_mes(inicio)
+        mes += (base - mes) % intervalo     # Primeiro mês do ciclo a partir do início do período
+        while True:
+            ano, mes_do_ano = divmod(mes, 12)
+            ultimo = calendar.monthrange(ano, mes_do_ano + 1)[1]
+            dia = datetime.date(ano, mes_do_ano + 1, min(prescricao.data_inicio.day, ultimo))
+            if dia > fim:
+                return
+            if dia >= inicio:
+                yield dia
+            mes += intervalo
+
+    dias = dias_da_mascara(prescricao.dias_semana)
+    if not dias:
+        return
+    if prescricao.frequencia == Frequencia.DIARIA and intervalo > 1:
+        dia = inicio + datetime.timedelta(days=-(inicio - prescricao.data_inicio).days % intervalo)
+        while dia <= fim:
+            if dia.weekday() in dias:
+                yield dia
+            dia += datetime.timedelta(days=intervalo)
+        return
+
+    # Semanal (e diária sem intervalo): semanas do ciclo, contadas a partir da semana de data_inicio
+    segunda_inicial = prescricao.data_inicio - datetime.timedelta(days=prescricao.data_inicio.weekday())
+    semana = (inicio - segunda_inicial).days // 7
+    semana += -semana % (intervalo if prescricao.frequencia == Frequencia.SEMANAL else 1)
+    segunda = segunda_inicial + datetime.timedelta(weeks=semana)
+    passo = datetime.timedelta(weeks=intervalo if prescricao.frequencia == Frequencia.SEMANAL else 1)
+    while segunda <= fim:
+        for dia_da_semana in dias:
+            dia = segunda + datetime.timedelta(days=dia_da_semana)
+            if inicio <= dia <= fim:
+                yield dia
+        segunda += passo
+
+
+def expandir(prescricao, inicio, fim):
+    """Horários das doses (datetime com fuso) da prescrição entre as datas inicio e fim, inclusive."""
+    horarios = [datetime.time.fromisoformat(horario) for horario in prescricao.horarios]
+    for dia in datas_agendadas(prescricao, inicio, fim):
+        for horario in horarios:
+            yield timezone.make_aware(datetime.datetime.combine(dia, horario))
+
+
+def doses_no_periodo(prescricoes, inicio, fim):
+    """Lista (data_hora, prescrição) das doses das prescrições ativas no período, em ordem de horário."""
+    doses = [
+        (momento, prescricao)
+        for prescricao in prescricoes if prescricao.ativo
+        for momento in expandir(prescricao, inicio, fim)
+    ]
+    doses.sort(key=lambda dose: (dose[0], dose[1].pk))
+    return doses
+
+
+def horario_mais_proximo(horarios, momento):
+    """Horário da lista ("HH:MM") mais próximo da hora local de 'momento'."""
+    if not horarios:
+        return None
+    local = timezone.localtime(momento) if timezone.is_aware(momento) else momento
+    minutos = local.hour * 60 + local.minute
+
+    def distancia(horario):
+        hora, minuto = map(int, horario.split(':'))
+        diferenca = abs(hora * 60 + minuto - minutos)
+        return min(diferenca, 24 * 60 - diferenca)
+    return min(horarios, key=distancia)
+
+
+class DiasDesde(Func):
+    """Dias inteiros entre a data da coluna e uma data fixa (dia - coluna)."""
+    function = 'DATEDIFF'
+    output_field = IntegerField()
+
+    def __init__(self, campo, dia):
+        super().__init__(Value(dia, output_field=DateField()), campo)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(', **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+
+def agendadas_no_dia(prescricoes, dia):
+    """Filtra o queryset de prescrições para as ativas com dose agendada no dia (mesmas regras de datas_agendadas)."""
+    Frequencia = prescricoes.model.FrequenciaChoices
+    dia_do_mes = ExtractDay('data_inicio')
+    if calendar.monthrange(dia.year, dia.month)[1] == dia.day:
+        no_dia_do_mes = Q(_dia_do_mes__gte=dia.day)   # Último dia do mês: inclui as de dias 29-31
+    else:
+        no_dia_do_mes = Q(_dia_do_mes=dia.day)
+    prescricoes = prescricoes.filter(
+        Q(data_fim__isnull=True) | Q(data_fim__gte=dia), ativo=True, data_inicio__lte=dia,
+    ).annotate(
+        _dias=DiasDesde('data_inicio', dia),
+        _dia_do_mes=dia_do_mes,
+        _no_dia_da_semana=F('dias_semana').bitand(1 << dia.weekday()),
+        _resto_dias=Mod(F('_dias'), F('intervalo')),
+        _resto_semanas=Mod((F('_dias') + ExtractIsoWeekDay('data_inicio') - 1) / 7, F('intervalo')),
+        _resto_meses=Mod(
+            Value(_indice_do_mes(dia)) - ExtractYear('data_inicio') * 12 - ExtractMonth('data_inicio') + 1,
+            F('intervalo'),
+        ),
+    )
+    return prescricoes.filter(
+        Q(frequencia=Frequencia.DIARIA, _no_dia_da_semana__gt=0, _resto_dias=0)
+        | Q(frequencia=Frequencia.SEMANAL, _no_dia_da_semana__gt=0, _resto_semanas=0)
+        | (Q(frequencia=Frequencia.MENSAL, _resto_meses=0) & no_dia_do_mes)
+    )
@@ -0,0 +1,318 @@
+# api/relatorios.py - Geração dos relatórios em PDF (modelo Relatorio) em segundo plano.
+#
+# A API só registra o pedido (situação 'Pendente'); o worker 'python manage.py gerar_relatorios'
+# reserva os pendentes de cada banco, um por vez, e grava o PDF página a página (api/pdf.py)
+# em um arquivo temporário, atualizando o progresso, antes de movê-lo para RELATORIOS_DIR.
+# A memória não cresce com o tamanho do lar: o MAR do grupo é lido em lotes de
+# RELATORIOS_IDOSOS_POR_LOTE idosos e os registros da ficha do idoso são lidos com iterator().
+#
+# impressao_digital() resume os dados que entram no PDF; um novo pedido do mesmo relatório com
+# a mesma impressão digital devolve o PDF já pronto (ver RelatorioViewSet.create).
+
+import calendar
+import datetime
+import hashlib
+import heapq
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .mar import COLUNA_DO_STATUS, grade_do_mes, mascara_dos_dias_passados
+from .models import ContatoParente, Grupo, Idoso, LogAdministracao, LogAdministracaoArquivado, Prescricao, Relatorio
+from .pdf import DocumentoPDF, Escritor
+from .shards import no_banco_do_grupo
+
+logger = logging.getLogger(__name__)
+
+# Mude ao alterar o layout dos PDFs: muda as impressões digitais e invalida os relatórios prontos
+VERSAO_DO_LAYOUT = 1
+
+LEGENDA_MAR = (
+    'A = administrada   R = recusada pelo paciente   P = pulada/esquecida   '
+    '- = agendada, sem registro   · = agendada (hoje ou adiante)'
+)
+SIMBOLO_DO_STATUS = {'administrado': 'A', 'recusado': 'R', 'pulado': 'P'}
+
+
+def limites_do_mes(mes):
+    """Primeiro e último dia do mês de 'mes'."""
+    inicio = mes.replace(day=1)
+    return inicio, inicio.replace(day=calendar.monthrange(inicio.year, inicio.month)[1])
+
+
+def impressao_digital(grupo_pk, tipo, mes, idoso_id=None):
+    """
+    SHA-256 dos dados que entram no relatório: cadastro dos idosos, prescrições, contatos
+    (na ficha) e os registros do mês. Os registros não são editados pela API, só criados ou
+    apagados, então bastam a contagem, o maior e a soma dos IDs, nas duas tabelas de logs.
+    """
+    inicio, fim = limites_do_mes(mes)
+    resumo = hashlib.sha256()
+
+    def incluir(*valores):
+        resumo.update(repr(valores).encode())
+
+    def incluir_linhas(consulta):
+        for linha in consulta.iterator(chunk_size=500):
+            incluir(linha)
+
+    incluir(VERSAO_DO_LAYOUT, tipo, inicio, Grupo.objects.filter(pk=grupo_pk).values_list('nome', flat=True).first())
+    if inicio <= timezone.localdate() <= fim:
+        incluir(timezone.localdate())   # No mês corrente, as doses sem registro mudam a cada dia
+    do_idoso = {'idoso__grupo_id': grupo_pk, **({'idoso_id': idoso_id} if idoso_id else {})}
+
+    idosos = Idoso.objects.filter(grupo_id=grupo_pk)
+    if idoso_id:
+        idosos = idosos.filter(pk=idoso_id)
+    incluir_linhas(idosos.order_by('pk').values_list(*[campo.attname for campo in Idoso._meta.concrete_fields]))
+    incluir_linhas(Prescricao.objects.filter(**do_idoso).order_by('pk').values_list(
+        *[campo.attname for campo in Prescricao._meta.concrete_fields], 'medicamento__catalogo__nome_marca',
+    ))
+    if tipo == Relatorio.Tipo.IDOSO:
+        incluir_linhas(ContatoParente.objects.filter(**do_idoso).order_by('pk').values_list(
+            *[campo.attname for campo in ContatoParente._meta.concrete_fields]
+        ))
+    comeco, termino = _periodo(inicio, fim)
+    totais = [0, 0, 0]
+    for tabela in (LogAdministracao, LogAdministracaoArquivado):
+        agregado = tabela.objects.filter(
+            **{f'prescricao__{campo}': valor for campo, valor in do_idoso.items()},
+            data_hora_administracao__gte=comeco, data_hora_administracao__lt=termino,
+        ).aggregate(total=Count('pk'), maior=Max('pk'), soma=Sum('pk'))
+        totais = [totais[0] + agregado['total'], max(totais[1], agregado['maior'] or 0), totais[2] + (agregado['soma'] or 0)]
+    incluir(*totais)    # Somados: arquivar um log (mesmo ID na outra tabela) não muda o relatório
+    return resumo.hexdigest()
+
+
+def _periodo(inicio, fim):
+    return (
+        timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min)),
+    )
+
+
+def tabela_mar(escritor, grade, indices):
+    """Grade do MAR (linhas 'indices' de grade_do_mes) como tabela: medicamento x dias do mês."""
+    linhas, total_dias = grade['linhas'], grade['dias']
+    inicio, fim = limites_do_mes(datetime.date.fromisoformat(f"{grade['mes']}-01"))
+    passados = mascara_dos_dias_passados(inicio, fim)
+    largura_dia = (escritor.largura_util - 150) / total_dias
+    colunas = [('Medicamento / dose / horário', 150), *[(str(dia), largura_dia) for dia in range(1, total_dias + 1)]]
+
+    def celulas(indice):
+        esperado = linhas['esperado'][indice]
+        valores = [f"{linhas['medicamento'][indice]} {linhas['dose'][indice]} {linhas['horario'][indice]}"]
+        for dia in range(total_dias):
+            bit = 1 << dia
+            simbolo = next((SIMBOLO_DO_STATUS[coluna] for coluna in COLUNA_DO_STATUS.values() if linhas[coluna][indice] & bit), '')
+            if not simbolo and esperado & bit:
+                simbolo = '-' if passados & bit else '·'
+            valores.append(simbolo)
+        return valores
+
+    escritor.tabela(colunas, (celulas(indice) for indice in indices), tamanho=6, alinhar_ao_centro=range(1, total_dias + 1))
+    contagem = {
+        coluna: sum(linhas[coluna][indice].bit_count() for indice in indices)
+        for coluna in ('esperado', *COLUNA_DO_STATUS.values())
+    }
+    escritor.espaco(4)
+    escritor.paragrafo(
+        f"Doses agendadas: {contagem['esperado']}   Administradas: {contagem['administrado']}   "
+        f"Recusadas: {contagem['recusado']}   Puladas: {contagem['pulado']}",
+        tamanho=8,
+    )
+    escritor.paragrafo(LEGENDA_MAR, tamanho=7)
+
+
+def escrever_mar(escritor, relatorio, progresso):
+    """Uma página (ou mais) por idoso, lendo a grade em lotes de idosos."""
+    idosos = Idoso.objects.filter(grupo_id=relatorio.grupo_id).order_by('nome_completo', 'pk')
+    if relatorio.idoso_id:
+        idosos = idosos.filter(pk=relatorio.idoso_id)
+    idosos = list(idosos.values_list('pk', 'nome_completo'))
+    tamanho_lote = settings.RELATORIOS_IDOSOS_POR_LOTE
+    for inicio in range(0, len(idosos), tamanho_lote):
+        lote = idosos[inicio:inicio + tamanho_lote]
+        grade = grade_do_mes(relatorio.grupo_id, relatorio.mes, [idoso_id for idoso_id, _ in lote])
+        indices_por_idoso = {}
+        for indice, idoso_id in enumerate(grade['linhas']['idoso_id']):
+            indices_por_idoso.setdefault(idoso_id, []).append(indice)
+        for idoso_id, nome in lote:
+            escritor.quebrar_pagina()
+            escritor.titulo(nome)
+            if idoso_id in indices_por_idoso:
+                tabela_mar(escritor, grade, indices_por_idoso[idoso_id])
+            else:
+                escritor.paragrafo('Nenhuma dose agendada ou registrada no mês.')
+        progresso(inicio + len(lote), len(idosos))
+    if not idosos:
+        escritor.titulo('Nenhum idoso cadastrado.')
+
+
+def escrever_ficha(escritor, relatorio, progresso):
+    """Cadastro, contatos, prescrições ativas, MAR e registros do mês de um idoso."""
+    idoso = Idoso.objects.get(pk=relatorio.idoso_id)
+    escritor.titulo(idoso.nome_completo, tamanho=15)
+    plano = idoso.plano_saude_outro if idoso.plano_saude == Idoso.OpcoesPlanoSaude.OUTRO else idoso.get_plano_saude_display()
+    escritor.campos([
+        ('Data de nascimento', f'{idoso.data_nascimento:%d/%m/%Y}'),
+        ('Gênero', idoso.get_genero_display()),
+        ('Peso', f'{idoso.peso} kg'),
+        ('CPF', idoso.cpf),
+        ('RG', idoso.rg),
+        ('Cartão SUS', idoso.cartao_sus),
+        ('Plano de saúde', f'{plano or "-"} ({idoso.numero_carteirinha_plano or "sem carteirinha"})' if idoso.possui_plano_saude else 'Não possui'),
+        ('Doenças', idoso.doencas),
+        ('Condições / alergias', idoso.condicoes),
+    ])
+    escritor.espaco()
+    escritor.titulo('Contatos', tamanho=11)
+    escritor.tabela(
+        [('Nome', 180), ('Parentesco', 80), ('Telefone', 90), ('E-mail', 165)],
+        ([contato.nome, contato.get_parentesco_display(), contato.telefone, contato.email] for contato in idoso.contatos.order_by('nome')),
+    )
+    progresso(1, 4)
+
+    escritor.espaco()
+    escritor.titulo('Prescrições ativas', tamanho=11)
+    prescricoes = idoso.prescricoes.filter(ativo=True).select_related('medicamento__catalogo').order_by('data_inicio', 'pk')
+    escritor.tabela(
+        [('Medicamento', 140), ('Dose', 55), ('Horários', 80), ('Frequência', 60), ('Vigência', 90), ('Instruções', 90)],
+        ([
+            prescricao.medicamento.nome_marca,
+            f'{prescricao.dose_valor} {prescricao.dose_unidade}',
+            ', '.join(prescricao.horarios),
+            prescricao.get_frequencia_display(),
+            f"{prescricao.data_inicio:%d/%m/%Y} a {prescricao.data_fim:%d/%m/%Y}" if prescricao.data_fim else f'desde {prescricao.data_inicio:%d/%m/%Y}',
+            prescricao.instrucoes,
+        ] for prescricao in prescricoes),
+    )
+    progresso(2, 4)
+
+    escritor.quebrar_pagina()
+    escritor.titulo(f'MAR de {relatorio.mes:%m/%Y}', tamanho=11)
+    grade = grade_do_mes(relatorio.grupo_id, relatorio.mes, [idoso.pk])
+    if grade['linhas']['idoso_id']:
+        tabela_mar(escritor, grade, range(len(grade['linhas']['idoso_id'])))
+    else:
+        escritor.paragrafo('Nenhuma dose agendada ou registrada no mês.')
+    progresso(3, 4)
+
+    escritor.espaco()
+    escritor.titulo(f'Registros de administração de {relatorio.mes:%m/%Y}', tamanho=11)
+    escritor.tabela(
+        [('Data e hora', 70), ('Medicamento', 130), ('Horário', 40), ('Status', 75), ('Responsável', 90), ('Observações', 110)],
+        registros_do_mes(idoso.pk, relatorio.mes),
+    )
+
+
+def registros_do_mes(idoso_id, mes):
+    """Linhas dos registros do mês (quentes e arquivados), em ordem de horário, lidas aos poucos."""
+    comeco, termino = _periodo(*limites_do_mes(mes))
+    campos = (
+        'data_hora_administracao', 'pk', 'prescricao__medicamento__catalogo__nome_marca', 'horario_dose',
+        'status', 'usuario_responsavel__nome_completo', 'observacoes',
+    )
+    status = dict(LogAdministracao.StatusDose.choices)
+    consultas = [
+        tabela.objects.filter(
+            prescricao__idoso_id=idoso_id, data_hora_administracao__gte=comeco, data_hora_administracao__lt=termino,
+        ).order_by('data_hora_administracao', 'pk').values_list(*campos).iterator(chunk_size=500)
+        for tabela in (LogAdministracaoArquivado, LogAdministracao)
+    ]
+    for momento, _, medicamento, horario, codigo, responsavel, observacoes in heapq.merge(*consultas, key=lambda linha: linha[:2]):
+        yield [
+            f'{timezone.localtime(momento):%d/%m %H:%M}', medicamento, horario.strftime('%H:%M') if horario else '',
+            status.get(codigo, codigo), responsavel or '', observacoes,
+        ]
+
+
+def escrever_relatorio(relatorio, arquivo, progresso):
+    """Grava o PDF do relatório no arquivo (binário), chamando progresso(feitos, total) ao avançar."""
+    grupo = Grupo.objects.get(pk=relatorio.grupo_id)
+    cabecalho = f'{grupo.nome} - {relatorio.get_tipo_display()} - {relatorio.mes:%m/%Y}'
+    documento = DocumentoPDF(arquivo, titulo=cabecalho)
+    escritor = Escritor(documento, cabecalho=cabecalho)
+    if relatorio.tipo == Relatorio.Tipo.MAR:
+        escrever_mar(escritor, relatorio, progresso)
+    else:
+        escrever_ficha(escritor, relatorio, progresso)
+    documento.fechar()
+
+
+def reservar(banco, agora=None):
+    """
+    Reserva o relatório mais antigo da fila do banco, marcando-o como 'Gerando', e o retorna
+    (ou None). Um 'Gerando' sem progresso há RELATORIOS_RESERVA segundos (worker interrompido)
+    volta a ser reservado.
+    """
+    agora = agora or timezone.now()
+    abandonados = Q(situacao=Relatorio.Situacao.GERANDO, atualizado_em__lt=agora - datetime.timedelta(seconds=settings.RELATORIOS_RESERVA))
+    with transaction.atomic(using=banco):
+        relatorio = (
+            Relatorio.objects.using(banco).filter(Q(situacao=Relatorio.Situacao.PENDENTE) | abandonados)
+            .select_for_update(skip_locked=True).order_by('criado_em', 'pk').first()
+        )
+        if relatorio is None:
+            return None
+        relatorio.situacao = Relatorio.Situacao.GERANDO
+        relatorio.progresso = 0
+        relatorio.save(update_fields=['situacao', 'progresso', 'atualizado_em'])
+    return relatorio
+
+
+def gerar(relatorio):
+    """Gera o PDF de um relatório reservado e o grava em RELATORIOS_DIR. Retorna True se deu certo."""
+    relatorios = Relatorio.objects.using(relatorio._state.db).filter(pk=relatorio.pk)
+
+    def progresso(feitos, total):
+        percentual = min(feitos * 100 // max(total, 1), 99)
+        if percentual != relatorio.progresso:   # Também renova a reserva (atualizado_em)
+            relatorio.progresso = percentual
+            relatorios.update(progresso=percentual, atualizado_em=timezone.now())
+
+    try:
+        with no_banco_do_grupo(relatorio.grupo_id):
+            impressao = impressao_digital(relatorio.grupo_id, relatorio.tipo, relatorio.mes, relatorio.idoso_id)
+            with tempfile.TemporaryFile() as temporario:
+                escrever_relatorio(relatorio, temporario, progresso)
+                tamanho = temporario.tell()
+                temporario.seek(0)
+                relatorio.arquivo.save(relatorio.nome_do_arquivo(), File(temporario), save=False)
+    except Exception as exc:    # Qualquer falha na geração fica registrada no relatório, sem derrubar o worker
+        logger.exception('Falha ao gerar o relatório %s', relatorio.pk)
+        relatorios.update(situacao=Relatorio.Situacao.FALHOU, erro=str(exc)[:255] or exc.__class__.__name__, atualizado_em=timezone.now())
+        return False
+    relatorios.update(
+        situacao=Relatorio.Situacao.PRONTO, progresso=100, impressao_digital=impressao, arquivo=relatorio.arquivo.name,
+        tamanho=tamanho, erro='', concluido_em=timezone.now(), atualizado_em=timezone.now(),
+    )
+    return True
+
+
+def gerar_pendentes(banco, limite=None):
+    """Gera os relatórios da fila do banco, um por vez, até esvaziá-la (ou até 'limite'). Retorna (prontos, falhas)."""
+    prontos = falhas = 0
+    while limite is None or prontos + falhas < limite:
+        relatorio = reservar(banco)
+        if relatorio is None:
+            break
+        if gerar(relatorio):
+            prontos += 1
+        else:
+            falhas += 1
+    return prontos, falhas
+
+
+def remover_antigos(banco, dias=None):
+    """Apaga os relatórios concluídos há mais de 'dias' (padrão: RELATORIOS_RETENCAO_DIAS), com os PDFs. Retorna quantos."""
+    corte = timezone.now() - datetime.timedelta(days=settings.RELATORIOS_RETENCAO_DIAS if dias is None else dias)
+    removidos, _ = Relatorio.objects.using(banco).filter(
+        situacao__in=[Relatorio.Situacao.PRONTO, Relatorio.Situacao.FALHOU], atualizado_em__lt=corte,
+    ).delete()   # Um a um, pelo sinal post_delete, os PDFs também são apagados
+    return removidos
@@ -0,0 +1,105 @@
+# api/renderers.py - Renderers e parsers plugáveis para a API.
+#
+# JSONRapidoRenderer/JSONRapidoParser usam o orjson quando ele está instalado e
+# caem para a implementação padrão do DRF caso contrário.
+# MessagePackRenderer/MessagePackParser oferecem um formato binário compacto para o
+# app móvel (Accept: application/x-msgpack ou ?format=msgpack) e só são habilitados
+# em settings.py se o pacote 'msgpack' estiver disponível.
+
+import datetime
+import decimal
+import uuid
+
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Dependência opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Dependência opcional
+    msgpack = None
+
+
+def converter_valor(obj):
+    """
+    Converte tipos que não são nativos de JSON/MessagePack.
+    Decimal vira string (como o DRF faz com COERCE_DECIMAL_TO_STRING), para não perder precisão.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        valor = obj.isoformat()
+        return valor[:-6] + 'Z' if valor.endswith('+00:00') else valor
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, Promise):    # Textos traduzíveis (gettext_lazy) das mensagens de erro
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Objeto do tipo {type(obj).__name__} não é serializável.')
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """Renderer JSON baseado no orjson, com suporte nativo a Decimal, UUID e datas."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opcoes |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=converter_valor, option=opcoes)
+
+
+class JSONRapidoParser(JSONParser):
+    """Parser JSON baseado no orjson."""
+    renderer_class = JSONRapidoRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON malformado - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer MessagePack: mesma estrutura do JSON, com menos bytes e decodificação mais barata no app."""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=converter_valor, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Parser para corpos de requisição enviados em MessagePack."""
+    media_type = 'application/x-msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError) as exc:
+            raise ParseError(f'MessagePack malformado - {exc}')
+
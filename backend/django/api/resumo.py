@@ -0,0 +1,87 @@
+# api/resumo.py - Resumo dos lares do usuário para a tela de seleção (SelecionarLar).
+#
+# Todos os contadores são calculados pelo banco com subconsultas correlacionadas:
+# uma consulta para a lista de grupos e uma a mais por shard que tenha grupos do
+# usuário, independentemente de quantos grupos ele participe.
+
+import datetime
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Grupo, Idoso, LogAdministracao, Medicamento, Membro, Prescricao
+from .recorrencia import agendadas_no_dia
+
+CONTADORES_DO_GRUPO = ('total_idosos', 'prescricoes_ativas', 'medicamentos_estoque_baixo', 'doses_pendentes_hoje')
+
+
+def contar_por_grupo(queryset, campo_grupo, agregado=None):
+    """
+    Subconsulta com o número de linhas do queryset que pertencem ao grupo da consulta externa
+    (ou, com 'agregado', o valor dele, ex: Sum('campo'), sobre essas linhas).
+    """
+    contagem = (
+        queryset.filter(**{campo_grupo: OuterRef('pk')})
+        .order_by()
+        .values(campo_grupo)
+        .annotate(total=agregado or Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(contagem, output_field=IntegerField()), Value(0))
+
+
+def prescricoes_do_dia(dia):
+    """Prescrições ativas com dose agendada no dia, conforme a recorrência (ver api/recorrencia.py)."""
+    return agendadas_no_dia(Prescricao.objects.visiveis(), dia)
+
+
+def anotar_contadores(grupos, dia=None):
+    """Anota em cada grupo os contadores de CONTADORES_DO_GRUPO, calculados no banco do queryset."""
+    dia = dia or timezone.localdate()
+    inicio = timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+    fim = inicio + datetime.timedelta(days=1)
+    registradas_no_dia = (
+        LogAdministracao.objects.filter(
+            prescricao=OuterRef('pk'), data_hora_administracao__gte=inicio, data_hora_administracao__lt=fim,
+        )
+        .order_by().values('prescricao').annotate(total=Count('pk')).values('total')
+    )
+    # Doses do dia ainda sem registro: horários da prescrição menos os registros do dia
+    doses_pendentes = prescricoes_do_dia(dia).annotate(pendentes=Greatest(
+        F('doses_por_dia') - Coalesce(Subquery(registradas_no_dia, output_field=IntegerField()), Value(0)), Value(0),
+    ))
+    return grupos.annotate(
+        total_idosos=contar_por_grupo(Idoso.objects.all(), 'grupo'),
+        prescricoes_ativas=contar_por_grupo(Prescricao.objects.visiveis().filter(ativo=True), 'idoso__grupo'),
+        medicamentos_estoque_baixo=contar_por_grupo(Medicamento.objects.filter(abaixo_minimo=True), 'grupo'),
+        doses_pendentes_hoje=contar_por_grupo(doses_pendentes, 'idoso__grupo', Sum('pendentes')),
+    )
+
+
+def resumo_dos_grupos(usuario):
+    """
+    Lista de dicionários (um por grupo do usuário) com os dados do cartão do lar e os contadores.
+    Os dados de grupos que estão em shards são contados no banco de cada shard.
+    """
+    grupos = anotar_contadores(Grupo.objects.filter(membros__user=usuario)).annotate(
+        total_membros=contar_por_grupo(Membro.objects.all(), 'grupo'),
+    )
+    resumo = list(grupos.order_by('nome').values(
+        'id', 'nome', 'cidade', 'estado', 'admin_id', 'banco', 'total_membros', *CONTADORES_DO_GRUPO,
+    ))
+
+    por_banco = defaultdict(list)
+    for grupo in resumo:
+        banco = grupo.pop('banco')
+        if banco != 'default':
+            por_banco[banco].append(grupo)
+    for banco, grupos_do_banco in por_banco.items():
+        contadores = anotar_contadores(
+            Grupo.objects.using(banco).filter(pk__in=[grupo['id'] for grupo in grupos_do_banco])
+        ).values('id', *CONTADORES_DO_GRUPO)
+        por_id = {linha.pop('id'): linha for linha in contadores}
+        for grupo in grupos_do_banco:
+            grupo.update(por_id.get(grupo['id'], dict.fromkeys(CONTADORES_DO_GRUPO, 0)))
+    return resumo
@@ -0,0 +1,144 @@
+# api/rondas.py - Planejamento das rondas de medicação de um turno entre os cuidadores.
+#
+# Para uma janela de turno [inicio, fim), expande as doses agendadas das prescrições ativas do
+# grupo (api/recorrencia.py), descarta as que já têm registro de administração e divide o restante
+# entre os cuidadores do turno, por idoso: todas as doses de um idoso no turno ficam com o mesmo
+# cuidador. A divisão respeita PerfilUsuario.responsaveis (o idoso vai para um dos seus responsáveis
+# que estiver no turno) e equilibra a carga: os idosos com mais doses são distribuídos primeiro,
+# sempre para o cuidador com menos doses até ali. São quatro consultas, qualquer que seja o
+# tamanho do lar (membros, responsáveis, prescrições e registros do turno).
+
+import datetime
+import heapq
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import LogAdministracao, Membro, PerfilUsuario, Prescricao
+from .recorrencia import doses_no_periodo
+
+# Duração do turno quando ?fim= não é informado, e a maior janela aceita
+TURNO_PADRAO_HORAS = 12
+TURNO_MAX_HORAS = 24
+
+
+def descrever_dose(momento, prescricao):
+    """Dose agendada como aparece na agenda e nas rondas."""
+    return {
+        'data_hora': momento.isoformat(),
+        'horario': timezone.localtime(momento).strftime('%H:%M'),
+        'prescricao_id': prescricao.pk,
+        'idoso_id': prescricao.idoso_id,
+        'idoso': prescricao.idoso.nome_completo,
+        'medicamento': prescricao.medicamento.nome_marca,
+        'dose_valor': str(prescricao.dose_valor),
+        'dose_unidade': prescricao.dose_unidade,
+    }
+
+
+def doses_pendentes(grupo_pk, inicio, fim):
+    """Doses (data_hora, prescrição) do grupo na janela [inicio, fim) que ainda não foram registradas."""
+    primeiro_dia, ultimo_dia = timezone.localdate(inicio), timezone.localdate(fim)
+    prescricoes = Prescricao.objects.visiveis().filter(idoso__grupo_id=grupo_pk, ativo=True).select_related('idoso', 'medicamento__catalogo')
+    doses = [
+        (momento, prescricao)
+        for momento, prescricao in doses_no_periodo(prescricoes, primeiro_dia, ultimo_dia)
+        if inicio <= momento < fim
+    ]
+    if not doses:
+        return doses
+    # Registros dos dias do turno, pela data local e pelo horário agendado a que correspondem
+    inicio_do_dia = timezone.make_aware(datetime.datetime.combine(primeiro_dia, datetime.time.min))
+    fim_do_dia = timezone.make_aware(datetime.datetime.combine(ultimo_dia + datetime.timedelta(days=1), datetime.time.min))
+    registradas = {
+        (prescricao_id, timezone.localdate(momento), horario.strftime('%H:%M'))
+        for prescricao_id, momento, horario in LogAdministracao.objects.filter(
+            prescricao__idoso__grupo_id=grupo_pk, horario_dose__isnull=False,
+            data_hora_administracao__gte=inicio_do_dia, data_hora_administracao__lt=fim_do_dia,
+        ).values_list('prescricao_id', 'data_hora_administracao', 'horario_dose')
+    }
+    return [
+        (momento, prescricao) for momento, prescricao in doses
+        if (prescricao.pk, timezone.localdate(momento), timezone.localtime(momento).strftime('%H:%M')) not in registradas
+    ]
+
+
+def cuidadores_do_grupo(grupo_pk, user_ids=None):
+    """Perfis dos membros do grupo (opcionalmente só os usuários informados), com o usuário carregado."""
+    vinculos = Membro.objects.filter(grupo_id=grupo_pk).select_related('perfil__user').order_by('perfil__user_id')
+    if user_ids is not None:
+        vinculos = vinculos.filter(perfil__user_id__in=user_ids)
+    return [vinculo.perfil for vinculo in vinculos]
+
+
+def dividir_por_idoso(carga_por_idoso, responsaveis_por_idoso, cuidadores):
+    """
+    Atribui cada idoso a um cuidador (IDs de perfil). carga_por_idoso: {idoso_id: doses};
+    responsaveis_por_idoso: {idoso_id: perfis responsáveis que estão no turno}.
+    Retorna ({idoso_id: perfil_id}, {perfil_id: doses}).
+    """
+    carga = {perfil_id: 0 for perfil_id in cuidadores}
+    atribuicao = {}
+    por_carga = sorted(carga_por_idoso, key=lambda idoso_id: (-carga_por_idoso[idoso_id], idoso_id))
+    # Primeiro os idosos com responsáveis no turno: cada um vai para o menos ocupado deles
+    livres = []
+    for idoso_id in por_carga:
+        responsaveis = responsaveis_por_idoso.get(idoso_id)
+        if not responsaveis:
+            livres.append(idoso_id)
+            continue
+        perfil_id = min(responsaveis, key=lambda perfil: (carga[perfil], perfil))
+        atribuicao[idoso_id] = perfil_id
+        carga[perfil_id] += carga_por_idoso[idoso_id]
+    # Depois os demais, do mais para o menos trabalhoso, sempre para o cuidador com menos doses
+    fila = [(doses, perfil_id) for perfil_id, doses in carga.items()]
+    heapq.heapify(fila)
+    for idoso_id in livres:
+        doses, perfil_id = heapq.heappop(fila)
+        atribuicao[idoso_id] = perfil_id
+        carga[perfil_id] = doses + carga_por_idoso[idoso_id]
+        heapq.heappush(fila, (carga[perfil_id], perfil_id))
+    return atribuicao, carga
+
+
+def planejar_ronda(grupo_pk, inicio, fim, cuidadores):
+    """
+    Lista de trabalho de cada cuidador (perfis de cuidadores_do_grupo) no turno [inicio, fim):
+    as doses pendentes dos idosos atribuídos a ele, em ordem de horário e de idoso.
+    """
+    doses = doses_pendentes(grupo_pk, inicio, fim)
+    carga_por_idoso = defaultdict(int)
+    for _, prescricao in doses:
+        carga_por_idoso[prescricao.idoso_id] += 1
+
+    perfis = {perfil.pk: perfil for perfil in cuidadores}
+    responsaveis_por_idoso = defaultdict(list)
+    if carga_por_idoso:
+        Responsaveis = PerfilUsuario.responsaveis.through
+        for idoso_id, perfil_id in Responsaveis.objects.filter(
+            idoso_id__in=list(carga_por_idoso), perfilusuario_id__in=list(perfis),
+        ).values_list('idoso_id', 'perfilusuario_id'):
+            responsaveis_por_idoso[idoso_id].append(perfil_id)
+    atribuicao, carga = dividir_por_idoso(carga_por_idoso, responsaveis_por_idoso, perfis)
+
+    idosos = defaultdict(list)
+    for idoso_id, perfil_id in sorted(atribuicao.items()):
+        idosos[perfil_id].append(idoso_id)
+    listas = defaultdict(list)
+    for momento, prescricao in sorted(doses, key=lambda dose: (dose[0], dose[1].idoso.nome_completo, dose[1].pk)):
+        listas[atribuicao[prescricao.idoso_id]].append(descrever_dose(momento, prescricao))
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'total_doses': len(doses),
+        'cuidadores': [
+            {
+                'user_id': perfil.user_id,
+                'nome_completo': perfil.user.nome_completo,
+                'total_doses': carga[perfil.pk],
+                'idosos': idosos[perfil.pk],
+                'doses': listas[perfil.pk],
+            }
+            for perfil in cuidadores
+        ],
+    }
@@ -1,10 +1,14 @@
 # api/serializers.py
 
+import datetime
+
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db.models import F
 from dj_rest_auth.serializers import LoginSerializer
 
 
@@ -13,10 +17,16 @@ from .models import (
     PerfilUsuario,
     Idoso,
     ContatoParente,
+    CatalogoMedicamento,
     Medicamento,
     Prescricao, 
-    LogAdministracao
+    LogAdministracao,
+    LogAdministracaoArquivado,
+    AlertaEstoque,
+    DocumentoBusca,
+    Relatorio,
 )
+from .interacoes import verificar_prescricao
 
 # Obtém o modelo de usuário ativo do Django.
 Usuario = get_user_model()
@@ -26,12 +36,126 @@ class ContatoParenteSerializer(serializers.ModelSerializer):
         model = ContatoParente
         exclude = ('idoso',)
 
+class CatalogoMedicamentoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CatalogoMedicamento
+        fields = ['id', *CatalogoMedicamento.CAMPOS]
+
 class MedicamentoSerializer(serializers.ModelSerializer):
+    """
+    Estoque do grupo, com os dados do produto (do catálogo global) no mesmo objeto.
+    O produto pode ser indicado por 'catalogo' (ex: escolhido no autocompletar) ou
+    pelos próprios campos; nesse caso o item do catálogo é localizado ou criado.
+    """
+    catalogo = serializers.PrimaryKeyRelatedField(queryset=CatalogoMedicamento.objects.all(), required=False)
+    nome_marca = serializers.CharField(max_length=200, required=False)
+    principio_ativo = serializers.CharField(max_length=200, allow_blank=True, required=False)
+    generico = serializers.BooleanField(required=False)
+    fabricante = serializers.CharField(max_length=100, allow_blank=True, required=False)
+    concentracao_valor = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True, required=False)
+    concentracao_unidade = serializers.ChoiceField(
+        choices=CatalogoMedicamento.OpcoesConcentracaoUnidade.choices, allow_null=True, required=False,
+    )
+    forma_farmaceutica = serializers.ChoiceField(choices=CatalogoMedicamento.OpcoesFormaFarmaceutica.choices, required=False)
+
     class Meta:
         model = Medicamento
-        fields = '__all__'
+        fields = [
+            'id', 'catalogo', *CatalogoMedicamento.CAMPOS,
+            'quantidade_estoque', 'estoque_minimo', 'dias_cobertura_minimo', 'consumo_diario', 'abaixo_minimo', 'grupo',
+        ]
         read_only_fields = ('grupo',)
 
+    def validate(self, data):
+        produto = {campo: data.pop(campo) for campo in CatalogoMedicamento.CAMPOS if campo in data}
+        self.dados_catalogo = None
+        if 'catalogo' in data:
+            catalogo_id = data['catalogo'].pk
+        elif produto or self.instance is None:
+            # Edição de algum dado do produto: o item do catálogo é outro (o atual é compartilhado)
+            atual = self.instance.catalogo if self.instance else None
+            dados = {campo: getattr(atual, campo) for campo in CatalogoMedicamento.CAMPOS} if atual else {}
+            dados.update(produto)
+            faltando = {campo: 'Este campo é obrigatório.' for campo in ('nome_marca', 'forma_farmaceutica') if not dados.get(campo)}
+            if faltando:
+                raise serializers.ValidationError(faltando)
+            self.dados_catalogo = dados
+            catalogo_id = CatalogoMedicamento.id_para(**dados)
+        else:
+            return data
+
+        view = self.context.get('view')
+        grupo_pk = view.kwargs.get('grupo_pk') if view else getattr(self.instance, 'grupo_id', None)
+        repetido = Medicamento.objects.filter(grupo_id=grupo_pk, catalogo_id=catalogo_id)
+        if self.instance is not None:
+            repetido = repetido.exclude(pk=self.instance.pk)
+        if repetido.exists():
+            raise serializers.ValidationError({'nome_marca': 'Este medicamento já está no estoque do grupo.'})
+        return data
+
+    def _resolver_catalogo(self, validated_data):
+        if self.dados_catalogo is not None:
+            validated_data['catalogo'] = CatalogoMedicamento.obter(**self.dados_catalogo)
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._resolver_catalogo(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._resolver_catalogo(validated_data))
+
+class AlertaEstoqueSerializer(serializers.ModelSerializer):
+    medicamento_nome = serializers.CharField(source='medicamento.nome_marca', read_only=True)
+
+    class Meta:
+        model = AlertaEstoque
+        fields = ['id', 'medicamento', 'medicamento_nome', 'motivo', 'quantidade_estoque', 'criado_em', 'resolvido_em']
+
+class MesField(serializers.Field):
+    """Mês no formato 'YYYY-MM' (guardado como a data do dia 1)."""
+    default_error_messages = {'invalido': 'Use o formato YYYY-MM.'}
+
+    def to_internal_value(self, data):
+        try:
+            return datetime.date.fromisoformat(f'{str(data)[:7]}-01')
+        except ValueError:
+            self.fail('invalido')
+
+    def to_representation(self, value):
+        return value.strftime('%Y-%m')
+
+class RelatorioSerializer(serializers.ModelSerializer):
+    mes = MesField()
+    idoso = serializers.PrimaryKeyRelatedField(queryset=Idoso.objects.all(), required=False, allow_null=True)
+    url_download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Relatorio
+        fields = ['id', 'tipo', 'idoso', 'mes', 'situacao', 'progresso', 'tamanho', 'erro', 'criado_em', 'concluido_em', 'url_download']
+        read_only_fields = ['situacao', 'progresso', 'tamanho', 'erro', 'criado_em', 'concluido_em']
+
+    def get_url_download(self, relatorio):
+        if relatorio.situacao != Relatorio.Situacao.PRONTO:
+            return None
+        return reverse(
+            'grupo-relatorios-download', kwargs={'grupo_pk': relatorio.grupo_id, 'pk': relatorio.pk},
+            request=self.context.get('request'),
+        )
+
+    def validate(self, data):
+        if data['tipo'] == Relatorio.Tipo.IDOSO and not data.get('idoso'):
+            raise serializers.ValidationError({'idoso': 'Informe o idoso da ficha.'})
+        return data
+
+class DocumentoBuscaSerializer(serializers.ModelSerializer):
+    idoso_nome = serializers.CharField(source='idoso.nome_completo', read_only=True)
+    trecho = serializers.CharField(read_only=True)
+    relevancia = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = DocumentoBusca
+        fields = ['tipo', 'objeto_id', 'idoso', 'idoso_nome', 'prescricao', 'titulo', 'trecho', 'relevancia']
+
 class PrescricaoSerializer(serializers.ModelSerializer):
     medicamento = MedicamentoSerializer(read_only=True)
     idoso = serializers.StringRelatedField(read_only=True)
@@ -42,42 +166,85 @@ class PrescricaoSerializer(serializers.ModelSerializer):
     medicamento_id = serializers.PrimaryKeyRelatedField(
         queryset=Medicamento.objects.all(), source='medicamento', write_only=True
     )
+    # Agenda compacta (ver api/recorrencia.py). Os clientes antigos continuam enviando
+    # horario_previsto e os dia_*; os novos podem enviar a lista de horários e a máscara.
+    horarios = serializers.ListField(child=serializers.TimeField(format='%H:%M'), required=False, allow_empty=False)
+    horario_previsto = serializers.TimeField(required=False)
+    dia_domingo = serializers.BooleanField(required=False)
+    dia_segunda = serializers.BooleanField(required=False)
+    dia_terca = serializers.BooleanField(required=False)
+    dia_quarta = serializers.BooleanField(required=False)
+    dia_quinta = serializers.BooleanField(required=False)
+    dia_sexta = serializers.BooleanField(required=False)
+    dia_sabado = serializers.BooleanField(required=False)
 
     class Meta:
         model = Prescricao
         fields = [
             'id', 'idoso', 'idoso_id', 'medicamento', 'medicamento_id',
-            'horario_previsto', 'dose_valor', 'dose_unidade', 'instrucoes', 'ativo',
-            'frequencia',
+            'horario_previsto', 'horarios', 'doses_por_dia', 'dose_valor', 'dose_unidade', 'instrucoes', 'ativo',
+            'frequencia', 'intervalo', 'data_inicio', 'data_fim', 'dias_semana',
             'dia_domingo', 'dia_segunda', 'dia_terca', 'dia_quarta',
             'dia_quinta', 'dia_sexta', 'dia_sabado'
         ]
 
-        def validate(self, data):
-            """
-            Verifica se o idoso e o medicamento pertencem ao grupo da URL.
-            """
-            # O grupo_pk é passado para o contexto do serializer pela view.
-            view = self.context.get('view')
-            grupo_pk = view.kwargs.get('grupo_pk') if view else None
+    def validate(self, data):
+        """
+        Verifica se o idoso e o medicamento pertencem ao grupo da URL.
+        """
+        # O grupo_pk é passado para o contexto do serializer pela view.
+        view = self.context.get('view')
+        grupo_pk = view.kwargs.get('grupo_pk') if view else None
+        
+        if not grupo_pk:
             
-            if not grupo_pk:
-                
-                raise serializers.ValidationError("A URL deve conter o ID do grupo.")
+            raise serializers.ValidationError("A URL deve conter o ID do grupo.")
+
+        # 'data' contém os objetos Idoso e Medicamento, validados pelo PrimaryKeyRelatedField.
+        idoso = data.get('idoso')
+        medicamento = data.get('medicamento')
+
+        # Verifica se o ID do grupo do idoso corresponde ao da URL.
+        if idoso and str(idoso.grupo_id) != str(grupo_pk):
+            raise serializers.ValidationError({'idoso_id': 'Este idoso não pertence ao grupo selecionado.'})
+
+        # Verifica se o ID do grupo do medicamento corresponde ao da URL.
+        if medicamento and str(medicamento.grupo_id) != str(grupo_pk):
+            raise serializers.ValidationError({'medicamento_id': 'Este medicamento não pertence ao estoque do grupo.'})
+
+        # Cliente antigo: horario_previsto sem a lista substitui só o primeiro horário da prescrição
+        if 'horarios' not in data and 'horario_previsto' in data:
+            horarios = list(self.instance.horarios) if self.instance else []
+            anterior = self.instance.horario_previsto.strftime('%H:%M') if self.instance else None
+            if anterior in horarios:
+                horarios.remove(anterior)
+            data['horarios'] = [data['horario_previsto'], *horarios]
+        if not self.instance and not data.get('horarios'):
+            raise serializers.ValidationError({'horarios': 'Informe ao menos um horário.'})
+
+        inicio = data.get('data_inicio', self.instance.data_inicio if self.instance else None)
+        fim = data.get('data_fim', self.instance.data_fim if self.instance else None)
+        if inicio and fim and fim < inicio:
+            raise serializers.ValidationError({'data_fim': 'O término deve ser igual ou posterior ao início.'})
 
-            # 'data' contém os objetos Idoso e Medicamento, validados pelo PrimaryKeyRelatedField.
-            idoso = data.get('idoso')
-            medicamento = data.get('medicamento')
-
-            # Verifica se o ID do grupo do idoso corresponde ao da URL.
-            if idoso and str(idoso.grupo.id) != grupo_pk:
-                raise serializers.ValidationError({'idoso_id': 'Este idoso não pertence ao grupo selecionado.'})
-
-            # Verifica se o ID do grupo do medicamento corresponde ao da URL.
-            if medicamento and str(medicamento.grupo.id) != grupo_pk:
-                raise serializers.ValidationError({'medicamento_id': 'Este medicamento não pertence ao estoque do grupo.'})
+        return data
 
-            return data
+    def create(self, validated_data):
+        prescricao = super().create(validated_data)
+        prescricao.alertas_interacao = verificar_prescricao(prescricao)
+        return prescricao
+
+    def update(self, instance, validated_data):
+        prescricao = super().update(instance, validated_data)
+        prescricao.alertas_interacao = verificar_prescricao(prescricao)
+        return prescricao
+
+    def to_representation(self, instance):
+        dados = super().to_representation(instance)
+        # Interações e duplicidades encontradas ao criar/editar (não impedem a gravação)
+        if hasattr(instance, 'alertas_interacao'):
+            dados['alertas_interacao'] = instance.alertas_interacao
+        return dados
 
 class LogAdministracaoSerializer(serializers.ModelSerializer):
     """
@@ -87,17 +254,22 @@ class LogAdministracaoSerializer(serializers.ModelSerializer):
     # Exibe o nome do usuário responsável em vez do ID.
     usuario_responsavel = serializers.StringRelatedField()
     prescricao = PrescricaoSerializer(read_only=True)
+    # Indica se o registro vem do histórico arquivado (LogAdministracaoArquivado).
+    arquivado = serializers.SerializerMethodField()
 
     class Meta:
         model = LogAdministracao
         # Define os campos a serem incluídos na serialização.
-        fields = ['id', 'data_hora_administracao', 'status', 'observacoes', 'usuario_responsavel', 'prescricao']
+        fields = ['id', 'data_hora_administracao', 'horario_dose', 'status', 'observacoes', 'usuario_responsavel', 'prescricao', 'arquivado']
+
+    def get_arquivado(self, obj):
+        return isinstance(obj, LogAdministracaoArquivado)
 
 
 class IdosoListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Idoso
-        fields = '__all__'
+        exclude = ('apagado_em',)
 
 class IdosoDetailSerializer(serializers.ModelSerializer):
     contatos = ContatoParenteSerializer(many=True, read_only=True)
@@ -105,7 +277,7 @@ class IdosoDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Idoso
-        exclude = ('grupo',)
+        exclude = ('grupo', 'apagado_em')
 
 class UsuarioSerializer(serializers.ModelSerializer):
     class Meta:
@@ -115,6 +287,8 @@ class UsuarioSerializer(serializers.ModelSerializer):
 class PerfilUsuarioSerializer(serializers.ModelSerializer):
     user = UsuarioSerializer(read_only=True)
     grupos = serializers.StringRelatedField(many=True, read_only=True)
+    # Papel (Membro.Papel) no grupo da listagem, anotado como 'papel' pela consulta
+    permissao = serializers.CharField(source='papel', read_only=True, default=None)
 
     class Meta:
         model = PerfilUsuario
@@ -186,7 +360,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         return data
 
 class GrupoSerializer(serializers.ModelSerializer):
-    membros = PerfilUsuarioSerializer(many=True, read_only=True)
+    membros = serializers.SerializerMethodField()
     admin = UsuarioSerializer(read_only=True)
     class Meta:
         model = Grupo
@@ -195,6 +369,14 @@ class GrupoSerializer(serializers.ModelSerializer):
             'cidade', 'estado', 'cep', 'nome_responsavel'
         ]
 
+    def get_membros(self, grupo):
+        # Cada membro com o seu papel neste grupo
+        perfis = (
+            PerfilUsuario.objects.filter(vinculos__grupo=grupo).annotate(papel=F('vinculos__papel'))
+            .select_related('user').prefetch_related('grupos', 'responsaveis').order_by('vinculos__entrou_em', 'pk')
+        )
+        return PerfilUsuarioSerializer(perfis, many=True, context=self.context).data
+
 class GrupoCreateSerializer(serializers.ModelSerializer):
     senha = serializers.CharField(write_only=True, required=True)
     class Meta:
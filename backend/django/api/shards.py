@@ -0,0 +1,132 @@
+# api/shards.py - Mapa de shards (Grupo.banco) e espelhamento dos dados globais.
+#
+# Cada Grupo guarda em 'banco' o alias do banco onde ficam os seus dados
+# (Idoso, Medicamento, Prescricao, LogAdministracao...). Usuários, tokens e grupos
+# vivem no banco global ('default'); para que as chaves estrangeiras dos shards
+# continuem válidas, as linhas globais referenciadas (o Grupo, seus membros e
+# respectivos perfis, os itens do catálogo de medicamentos) são espelhadas em cada
+# shard que as usa.
+
+import copy
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from .db_routers import definir_banco_do_grupo, restaurar_banco_do_grupo
+
+
+def _chave_mapa(grupo_pk):
+    return f'shard:{grupo_pk}'
+
+
+def localizar_grupo(grupo_pk):
+    """
+    Retorna (banco, em_migracao) do grupo, com cache de SHARD_MAPA_TTL segundos.
+    Grupos inexistentes ou IDs inválidos são tratados como pertencentes ao 'default'.
+    """
+    from .models import Grupo
+
+    if not settings.DATABASE_SHARDS or not grupo_pk:
+        return 'default', False
+    chave = _chave_mapa(grupo_pk)
+    valor = cache.get(chave)
+    if valor is None:
+        try:
+            valor = Grupo.todos.using('default').filter(pk=grupo_pk).values_list('banco', 'em_migracao').first()
+        except (ValidationError, ValueError):
+            valor = None
+        valor = tuple(valor) if valor else ('default', False)
+        cache.set(chave, valor, settings.SHARD_MAPA_TTL)
+    return valor
+
+
+def banco_do_grupo(grupo_pk):
+    return localizar_grupo(grupo_pk)[0]
+
+
+def esquecer_grupo(grupo_pk):
+    """Remove o grupo do cache do mapa de shards (após uma mudança de banco)."""
+    cache.delete(_chave_mapa(grupo_pk))
+
+
+@contextmanager
+def no_banco_do_grupo(grupo_pk):
+    """
+    Executa o bloco com os dados do grupo roteados para o seu shard.
+    Usado fora do ciclo de requisição (comandos de gerenciamento, workers).
+    """
+    token = definir_banco_do_grupo(banco_do_grupo(grupo_pk))
+    try:
+        yield
+    finally:
+        restaurar_banco_do_grupo(token)
+
+
+def _copiar_linha(instancia, banco):
+    """Grava uma cópia exata da linha no banco indicado (INSERT ou UPDATE), sem disparar efeitos dos signals."""
+    instancia.save_base(raw=True, using=banco)
+
+
+def espelhar_usuario(usuario, banco):
+    """Espelha um usuário e o seu perfil no shard. A senha não é copiada."""
+    from .models import PerfilUsuario
+
+    if banco == 'default':
+        return
+    copia = type(usuario).objects.using('default').get(pk=usuario.pk)
+    copia.password = make_password(None)
+    _copiar_linha(copia, banco)
+    perfil = PerfilUsuario.objects.using('default').filter(user_id=usuario.pk).first()
+    if perfil is not None:
+        _copiar_linha(perfil, banco)
+
+
+def espelhar_catalogo(catalogo, banco):
+    """Espelha um item do catálogo global de medicamentos no shard (o ID é o mesmo em todos os bancos)."""
+    if banco != 'default':
+        _copiar_linha(copy.copy(catalogo), banco)   # A cópia evita mudar o _state.db do objeto original
+
+
+def espelhar_grupo(grupo, banco=None, com_membros=True):
+    """Espelha o grupo (e, opcionalmente, o admin e os membros) no seu shard."""
+    from .models import Grupo, PerfilUsuario
+
+    banco = banco or grupo.banco
+    if banco == 'default':
+        return
+    espelhar_usuario(grupo.admin, banco)
+    _copiar_linha(Grupo.todos.using('default').get(pk=grupo.pk), banco)
+    if com_membros:
+        membros = PerfilUsuario.objects.using('default').filter(grupos=grupo).select_related('user')
+        for perfil in membros:
+            espelhar_usuario(perfil.user, banco)
+
+
+def tabelas_do_grupo(grupo):
+    """
+    Querysets (sem banco definido) com os dados do grupo, em ordem de dependência
+    das chaves estrangeiras: quem é referenciado vem antes. Inclui os idosos e
+    medicamentos apagados (exclusão lógica) que ainda não foram expurgados.
+    """
+    from .models import (
+        AlertaEstoque, ContatoParente, DocumentoBusca, EventoSaida, FarmaciaParceira, Idoso, LogAdministracao,
+        LogAdministracaoArquivado, Medicamento, PerfilUsuario, Prescricao, Relatorio,
+    )
+
+    return [
+        Idoso.todos.filter(grupo=grupo),
+        ContatoParente.objects.filter(idoso__grupo=grupo),
+        Medicamento.todos.filter(grupo=grupo),
+        AlertaEstoque.objects.filter(medicamento__grupo=grupo),
+        Prescricao.objects.filter(idoso__grupo=grupo),
+        LogAdministracao.objects.filter(prescricao__idoso__grupo=grupo),
+        LogAdministracaoArquivado.objects.filter(prescricao__idoso__grupo=grupo),
+        PerfilUsuario.responsaveis.through.objects.filter(idoso__grupo=grupo),
+        DocumentoBusca.objects.filter(grupo=grupo),
+        FarmaciaParceira.objects.filter(grupo=grupo),
+        EventoSaida.objects.filter(grupo=grupo),
+        Relatorio.objects.filter(grupo=grupo),
+    ]
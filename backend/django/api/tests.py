@@ -1,4 +1,49 @@
-from django.test import TestCase
+import calendar
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from asgiref.sync import sync_to_async
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .arquivo import arquivar_lote
+from .busca import buscar
+from .cache import versao_grupo
+from .checks import verificar_cache_das_replicas
+from .db_routers import ReplicaRouter
+from .exclusao import data_de_corte, expurgar_idoso, vencidos
+from .exportacao import ArquivoInvalido, Importacao, exportar
+from .interacoes import normalizar_principio, principios_de, verificar_grupo
+from .mar import grade_do_mes, mascara_esperada, mascaras_por_dia_da_semana
+from .middleware import ReplicaLeituraMiddleware
+from .models import (
+    CatalogoMedicamento, DocumentoBusca, EventoSaida, FarmaciaParceira, Grupo, Idoso, LogAdministracao, LogAdministracaoArquivado, Medicamento, Membro,
+    PerfilUsuario, Prescricao, Usuario,
+)
+from .outbox import entregar_pendentes, verificar_assinatura
+from .recorrencia import agendadas_no_dia, datas_agendadas
+from .resumo import resumo_dos_grupos
+from .rondas import dividir_por_idoso, doses_pendentes
+from .shards import no_banco_do_grupo, tabelas_do_grupo
 
 # Create your tests here.
 # É altamente recomendável adicionar testes unitários e de integração
@@ -9,4 +54,893 @@ from django.test import TestCase
 # - Criação e gestão de grupos (entrar com código, etc.)
 # - Permissões de acesso (admin vs. membro)
 # - Endpoints aninhados (criação de idosos, medicamentos em um grupo específico)
-# - Ações customizadas como 'administrar' medicamento e 'vincular_idoso'
\ No newline at end of file
+# - Ações customizadas como 'administrar' medicamento e 'vincular_idoso'
+
+
+class PerfilSQLiteConcorrenciaTests(unittest.TestCase):
+    """
+    Verifica o perfil de produção do SQLite (settings.SQLITE_PRAGMAS): várias threads
+    lendo e escrevendo ao mesmo tempo em um arquivo real, sem 'database is locked'.
+    O banco de testes padrão do SQLite fica em memória, por isso o teste registra um
+    alias temporário apontando para um arquivo, fora do controle do test runner.
+    """
+    alias = 'sqlite_concorrencia'
+    escritores = 4
+    incrementos = 50
+    leitores = 4
+    leituras = 200
+
+    @classmethod
+    def setUpClass(cls):
+        cls.diretorio = tempfile.TemporaryDirectory()
+        connections.settings[cls.alias] = {
+            **connections.settings['default'],
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.diretorio.name, 'concorrencia.sqlite3'),
+            'OPTIONS': {
+                'init_command': settings.SQLITE_PRAGMAS,
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            'CONN_MAX_AGE': 0,
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.alias].close()
+        del connections.settings[cls.alias]
+        cls.diretorio.cleanup()
+
+    def setUp(self):
+        if not settings.SQLITE_PERFIL_PRODUCAO:
+            self.skipTest('Perfil de produção do SQLite desativado.')
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE contador (id INTEGER PRIMARY KEY, valor INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO contador (id, valor) VALUES (1, 0)')
+        connections[self.alias].close()
+
+    def _em_thread(self, funcao, erros):
+        def executar():
+            try:
+                funcao()
+            except OperationalError as exc:
+                erros.append(exc)
+            finally:
+                connections[self.alias].close()
+        return threading.Thread(target=executar)
+
+    def _escrever(self):
+        # Leitura seguida de escrita na mesma transação, como em 'administrar'
+        for _ in range(self.incrementos):
+            with transaction.atomic(using=self.alias):
+                with connections[self.alias].cursor() as cursor:
+                    cursor.execute('SELECT valor FROM contador WHERE id = 1')
+                    valor = cursor.fetchone()[0]
+                    cursor.execute('UPDATE contador SET valor = %s WHERE id = 1', [valor + 1])
+
+    def _ler(self):
+        for _ in range(self.leituras):
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute('SELECT valor FROM contador WHERE id = 1')
+                cursor.fetchone()
+
+    def test_leituras_e_escritas_concorrentes_sem_lock(self):
+        erros = []
+        threads = [self._em_thread(self._escrever, erros) for _ in range(self.escritores)]
+        threads += [self._em_thread(self._ler, erros) for _ in range(self.leitores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(erros, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('SELECT valor FROM contador WHERE id = 1')
+            self.assertEqual(cursor.fetchone()[0], self.escritores * self.incrementos)
+
+
+class FarmaciaStub(BaseHTTPRequestHandler):
+    """Farmácia parceira local: guarda as entregas recebidas e responde com o próximo status da fila."""
+    recebidas = []
+    respostas = []
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers['Content-Length']))
+        self.recebidas.append((self.headers['X-Assinatura'], corpo))
+        self.send_response(self.respostas.pop(0) if self.respostas else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class EntregaDeEventosTests(TestCase):
+    """
+    Caixa de saída (EventoSaida) e worker de entrega (api/outbox.py) contra uma farmácia
+    parceira simulada por um servidor HTTP local.
+    """
+    segredo = 'segredo-da-farmacia'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), FarmaciaStub)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FarmaciaStub.recebidas = []
+        FarmaciaStub.respostas = []
+        admin = Usuario.objects.create_user('admin@outbox.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        FarmaciaParceira.objects.create(
+            grupo=self.grupo, nome='Farmácia', url=f'http://127.0.0.1:{self.servidor.server_port}/eventos', segredo=self.segredo,
+        )
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        self.medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        Prescricao.objects.create(idoso=idoso, medicamento=self.medicamento, horarios=['08:00', '20:00'])
+
+    def test_evento_gravado_na_transacao_da_mudanca(self):
+        self.assertEqual(
+            list(EventoSaida.objects.order_by('pk').values_list('tipo', flat=True)),
+            [EventoSaida.Tipo.ESTOQUE_MOVIMENTADO, EventoSaida.Tipo.PRESCRICAO_CRIADA],
+        )
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.medicamento.quantidade_estoque = 9
+            self.medicamento.save(update_fields=['quantidade_estoque'])
+            raise RuntimeError
+        self.assertEqual(EventoSaida.objects.count(), 2)    # Desfeito junto com a mudança
+
+    def test_entrega_em_lote_assinada(self):
+        resultado = entregar_pendentes('default')
+
+        self.assertEqual(resultado['entregues'], 2)
+        self.assertEqual(len(FarmaciaStub.recebidas), 1)    # Um único POST para os dois eventos
+        assinatura, corpo = FarmaciaStub.recebidas[0]
+        self.assertTrue(verificar_assinatura(self.segredo, assinatura, corpo))
+        self.assertFalse(verificar_assinatura('outro-segredo', assinatura, corpo))
+        eventos = json.loads(corpo)['eventos']
+        self.assertEqual(eventos[0]['dados']['quantidade_atual'], '10')
+        self.assertEqual(eventos[1]['dados']['horarios'], ['08:00', '20:00'])
+        self.assertFalse(EventoSaida.objects.exclude(situacao=EventoSaida.Situacao.ENTREGUE).exists())
+
+    def test_falha_agenda_nova_tentativa(self):
+        FarmaciaStub.respostas = [503]
+        resultado = entregar_pendentes('default')
+
+        self.assertEqual(resultado['falhas'], 2)
+        evento = EventoSaida.objects.first()
+        self.assertEqual((evento.situacao, evento.tentativas, evento.ultimo_erro), (EventoSaida.Situacao.PENDENTE, 1, 'HTTP 503'))
+        self.assertGreater(evento.proxima_tentativa, timezone.now())
+        # Um único horário para o lote: a nova tentativa volta em um POST só
+        self.assertEqual(len(set(EventoSaida.objects.values_list('proxima_tentativa', flat=True))), 1)
+        self.assertFalse(entregar_pendentes('default'))     # Ainda esperando: nada é enviado
+        self.assertEqual(len(FarmaciaStub.recebidas), 1)
+
+        resultado = entregar_pendentes('default', agora=timezone.now() + datetime.timedelta(seconds=settings.OUTBOX_ESPERA_BASE))
+        self.assertEqual(resultado['entregues'], 2)
+        self.assertEqual(len(FarmaciaStub.recebidas), 2)
+
+    @override_settings(OUTBOX_LOTE=1)
+    def test_lotes_seguintes_esperam_o_mesmo_horario(self):
+        FarmaciaStub.respostas = [503]
+        resultado = entregar_pendentes('default')
+
+        self.assertEqual((resultado['falhas'], resultado['adiados']), (1, 1))
+        self.assertEqual(len(set(EventoSaida.objects.values_list('proxima_tentativa', flat=True))), 1)
+
+
+class ExportacaoDeGrupoTests(TestCase):
+    """Exportação e importação de um grupo (api/exportacao.py): ida e volta com IDs novos."""
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user('admin@export.local', 'senha', nome_completo='Admin')
+        self.cuidador = Usuario.objects.create_user('cuidador@export.local', 'senha', nome_completo='Cuidador')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=self.admin, banco='default')
+        Membro.objects.create(perfil=self.admin.perfil, grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        Membro.objects.create(perfil=self.cuidador.perfil, grupo=self.grupo)
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        self.cuidador.perfil.responsaveis.add(idoso)
+        prescricao = Prescricao.objects.create(idoso=idoso, medicamento=medicamento, horarios=['08:00'], dose_valor='1.5')
+        agora = timezone.now()
+        LogAdministracao.objects.create(prescricao=prescricao, usuario_responsavel=self.cuidador, data_hora_administracao=agora)
+        LogAdministracaoArquivado.objects.create(
+            id=LogAdministracao.objects.create(prescricao=prescricao, data_hora_administracao=agora).pk,
+            prescricao=prescricao, data_hora_administracao=agora - datetime.timedelta(days=400), status='OK',
+        )
+        LogAdministracao.objects.filter(usuario_responsavel__isnull=True).delete()    # Já está no arquivo
+        self.arquivo = b''.join(exportar(self.grupo))
+
+    def test_ida_e_volta(self):
+        importacao = Importacao(io.BytesIO(self.arquivo))
+        novo = importacao.executar()
+
+        self.assertNotEqual(novo.pk, self.grupo.pk)
+        self.assertEqual(novo.admin, self.admin)
+        self.assertEqual(
+            set(Membro.objects.filter(grupo=novo).values_list('perfil__user__email', 'papel')),
+            {('admin@export.local', Membro.Papel.ADMIN), ('cuidador@export.local', Membro.Papel.MEMBRO)},
+        )
+        prescricao = Prescricao.objects.get(idoso__grupo=novo)
+        self.assertEqual(prescricao.dose_valor, decimal.Decimal('1.5'))
+        self.assertEqual(list(prescricao.logs_de_administracao.values_list('usuario_responsavel', flat=True)), [self.cuidador.pk])
+        self.assertEqual(prescricao.logs_arquivados.count(), 1)
+        self.assertTrue(self.cuidador.perfil.responsaveis.filter(grupo=novo).exists())
+        self.assertEqual(importacao.resumo()['ignorados'], 0)
+
+    def test_catalogo_do_arquivo_tem_o_id_recalculado(self):
+        # Arquivo forjado: o item do catálogo vem com outro ID e outro nome de busca
+        linhas = [json.loads(linha) for linha in gzip.decompress(self.arquivo).splitlines()]
+        secao = next(indice for indice, linha in enumerate(linhas) if isinstance(linha, dict) and linha.get('tabela') == 'api.catalogomedicamento')
+        campos = linhas[secao]['campos']
+        item = dict(zip(campos, linhas[secao + 1]))
+        forjado = str(uuid.uuid4())
+        item.update(id=forjado, nome_busca='outro produto')
+        linhas[secao + 1] = [item[campo] for campo in campos]
+        medicamentos = next(indice for indice, linha in enumerate(linhas) if isinstance(linha, dict) and linha.get('tabela') == 'api.medicamento')
+        linhas[medicamentos + 1][linhas[medicamentos]['campos'].index('catalogo_id')] = forjado
+        arquivo = gzip.compress(b'\n'.join(json.dumps(linha).encode() for linha in linhas))
+
+        novo = Importacao(io.BytesIO(arquivo)).executar()
+
+        self.assertFalse(CatalogoMedicamento.objects.filter(pk=forjado).exists())
+        catalogo = Medicamento.objects.get(grupo=novo).catalogo
+        self.assertEqual(catalogo.pk, CatalogoMedicamento.id_para(nome_marca='Losartana', forma_farmaceutica='COMP'))
+        self.assertEqual(catalogo.nome_busca, 'losartana')
+
+    def test_arquivo_truncado_nao_grava_nada(self):
+        grupos = Grupo.objects.count()
+        with self.assertRaises(ArquivoInvalido):
+            Importacao(io.BytesIO(self.arquivo[:len(self.arquivo) // 2])).executar()
+        self.assertEqual(Grupo.objects.count(), grupos)
+        self.assertEqual(Idoso.objects.count(), 1)
+
+
+class ArquivoDeLogsTests(TestCase):
+    """Arquivamento do histórico ('python manage.py arquivar_logs') e a listagem de /logs/ sobre as duas tabelas."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@arquivo.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        Membro.objects.create(perfil=admin.perfil, grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        prescricao = Prescricao.objects.create(idoso=idoso, medicamento=medicamento, horarios=['08:00'], dose_valor='1')
+        agora = timezone.now()
+        self.antigo, self.recente = (
+            LogAdministracao.objects.create(prescricao=prescricao, data_hora_administracao=agora - datetime.timedelta(days=dias))
+            for dias in (settings.LOG_ARQUIVO_DIAS + 5, 2)
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(admin)
+
+    def logs(self, dias):
+        inicio = (timezone.localdate() - datetime.timedelta(days=dias)).isoformat()
+        resposta = self.cliente.get(f'/api/grupos/{self.grupo.pk}/logs/', {'data_inicio': inicio})
+        return [log['id'] for log in resposta.json()['results']]
+
+    def test_arquivamento_respeita_o_corte_da_listagem(self):
+        call_command('arquivar_logs', stdout=io.StringIO())
+
+        self.assertEqual(list(LogAdministracaoArquivado.objects.values_list('pk', flat=True)), [self.antigo.pk])
+        self.assertEqual(list(LogAdministracao.objects.values_list('pk', flat=True)), [self.recente.pk])
+        # Um período depois do corte continua achando os logs recentes; um anterior junta o arquivo
+        self.assertEqual(self.logs(3), [self.recente.pk])
+        self.assertEqual(self.logs(settings.LOG_ARQUIVO_DIAS + 10), [self.recente.pk, self.antigo.pk])
+        # Não há como arquivar com outro corte, que esconderia logs da listagem
+        with self.assertRaises(TypeError):
+            call_command('arquivar_logs', dias=1)
+
+
+class BuscaTests(TestCase):
+    """Busca de texto completo nas anotações do grupo (api/busca.py)."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@busca.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        self.outro_grupo = Grupo.objects.create(nome='Outra casa', senha_hash='x', admin=admin, banco='default')
+        self.catalogo = CatalogoMedicamento.obter(nome_marca='Metformina', forma_farmaceutica='COMP')
+
+    def criar_idoso(self, nome, doencas, grupo=None):
+        return Idoso.objects.create(
+            grupo=grupo or self.grupo, nome_completo=nome, data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf=nome, cartao_sus=nome, doencas=doencas,
+        )
+
+    def titulos(self, consulta, **kwargs):
+        return [documento.titulo for documento in buscar(self.grupo.pk, consulta, **kwargs)]
+
+    def test_ranking_prefixo_e_isolamento_entre_grupos(self):
+        self.criar_idoso('Bia', 'Hipertensão arterial, artrose, catarata, osteoporose e diabetes controlada.')
+        self.criar_idoso('Ana', 'Diabetes tipo 2, diabetes descompensada.')
+        self.criar_idoso('Caio', 'Diabetes.', grupo=self.outro_grupo)
+
+        self.assertEqual(self.titulos('diabetes'), ['Ana', 'Bia'])
+        self.assertEqual(self.titulos('hipert'), ['Bia'])      # Por prefixo e sem acento
+        self.assertEqual(self.titulos('diabetes catarata'), ['Bia'])     # Todos os termos
+        self.assertEqual(self.titulos('"; DROP TABLE --'), [])
+        self.assertEqual(self.titulos(''), [])
+
+    def test_apagados_saem_antes_do_limite(self):
+        apagado = self.criar_idoso('Ana', 'Diabetes, diabetes, diabetes.')
+        self.criar_idoso('Bia', 'Diabetes controlada e catarata.')
+        medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=self.catalogo, quantidade_estoque=10)
+        Prescricao.objects.create(idoso=apagado, medicamento=medicamento, horarios=['08:00'], instrucoes='Diabetes: tomar após o café.')
+        outra = Medicamento.objects.create(
+            grupo=self.grupo, catalogo=CatalogoMedicamento.obter(nome_marca='Glifage', forma_farmaceutica='COMP'), quantidade_estoque=10,
+        )
+        Prescricao.objects.create(
+            idoso=Idoso.objects.get(nome_completo='Bia'), medicamento=outra, horarios=['08:00'], instrucoes='Diabetes: tomar no jantar.',
+        )
+        apagado.apagar()
+        outra.apagar()
+
+        # Os documentos mais relevantes são dos apagados: o limite ainda devolve o da Bia
+        self.assertEqual(self.titulos('diabetes', limite=1), ['Bia'])
+        self.assertEqual(self.titulos('diabetes'), ['Bia'])
+
+
+class InteracoesTests(TestCase):
+    """Interações e duplicidades entre as prescrições ativas de um idoso (api/interacoes.py)."""
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user('admin@interacoes.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=self.admin, banco='default')
+        Membro.objects.create(perfil=self.admin.perfil, grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        self.idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def medicamento(self, nome_marca, principio_ativo):
+        catalogo = CatalogoMedicamento.obter(nome_marca=nome_marca, principio_ativo=principio_ativo, forma_farmaceutica='COMP')
+        return Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=30)
+
+    def prescrever(self, medicamento):
+        resposta = self.cliente.post(f'/api/grupos/{self.grupo.pk}/prescricoes/', {
+            'idoso_id': self.idoso.pk, 'medicamento_id': medicamento.pk, 'horarios': ['08:00'], 'dose_valor': '1',
+        }, format='json')
+        self.assertEqual(resposta.status_code, 201, resposta.content)
+        return resposta.json()['alertas_interacao']
+
+    def test_normalizacao_dos_principios(self):
+        self.assertEqual(normalizar_principio('Carbonato de Lítio'), 'litio')
+        self.assertEqual(normalizar_principio('Cloridrato de Sertralina'), 'sertralina')
+        self.assertEqual(normalizar_principio('Fosfato de codeína'), 'codeina')
+        self.assertEqual(normalizar_principio('Sulfato ferroso'), 'sulfato ferroso')
+        self.assertNotEqual(normalizar_principio('Dinitrato de isossorbida'), normalizar_principio('Mononitrato de isossorbida'))
+        self.assertEqual(principios_de('Losartana potássica + Hidroclorotiazida'), {'losartana', 'hidroclorotiazida'})
+        self.assertEqual(principios_de('Amoxicilina/Clavulanato de potássio'), {'amoxicilina', 'clavulanato de potassio'})
+        self.assertEqual(principios_de(''), frozenset())
+
+    def test_alertas_ao_prescrever_e_na_reverificacao_do_grupo(self):
+        self.assertEqual(self.prescrever(self.medicamento('Clorana', 'Hidroclorotiazida')), [])
+        alertas = self.prescrever(self.medicamento('Carbolitium', 'Carbonato de lítio'))
+        self.assertEqual([(alerta['tipo'], alerta['gravidade'], alerta['medicamento']) for alerta in alertas], [('interacao', 'grave', 'Clorana')])
+        alertas = self.prescrever(self.medicamento('Zoloft', 'Cloridrato de sertralina'))
+        self.assertEqual(alertas, [])
+        alertas = self.prescrever(self.medicamento('Serenata', 'Sertralina'))
+        self.assertEqual([alerta['tipo'] for alerta in alertas], ['duplicidade'])
+
+        resposta = self.cliente.get(f'/api/grupos/{self.grupo.pk}/prescricoes/verificar-interacoes/')
+        idoso, = resposta.json()
+        self.assertEqual(idoso['idoso_id'], self.idoso.pk)
+        self.assertEqual(
+            sorted((alerta['tipo'], alerta['em_conflito_com']) for alerta in idoso['alertas']),
+            [('duplicidade', 'Serenata'), ('interacao', 'Carbolitium')],
+        )
+
+
+class ExclusaoLogicaTests(TestCase):
+    """Exclusão lógica de idosos (Idoso.apagar) e expurgo em lotes (api/exclusao.py)."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@exclusao.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        self.medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        self.idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        self.prescricao = Prescricao.objects.create(idoso=self.idoso, medicamento=self.medicamento, horarios=['08:00'], dose_valor='1')
+        for _ in range(3):
+            LogAdministracao.objects.create(prescricao=self.prescricao, data_hora_administracao=timezone.now())
+
+    def test_apagar_esconde_e_preserva_o_historico(self):
+        self.idoso.apagar()
+
+        self.assertFalse(Idoso.objects.filter(pk=self.idoso.pk).exists())
+        self.assertFalse(Prescricao.objects.filter(idoso=self.idoso, ativo=True).exists())
+        self.assertEqual(LogAdministracao.objects.filter(prescricao__idoso=self.idoso).count(), 3)
+        self.medicamento.refresh_from_db()
+        self.assertEqual(self.medicamento.consumo_diario, 0)
+        # O CPF fica livre para um novo cadastro (restrição única só entre os não apagados)
+        Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+
+    def test_expurgo_respeita_a_retencao(self):
+        self.idoso.apagar()
+        self.assertFalse(vencidos(Idoso, 'default', data_de_corte()).exists())
+
+        for idoso in vencidos(Idoso, 'default', data_de_corte(0)):
+            expurgar_idoso(idoso, tamanho_lote=2)
+        self.assertFalse(Idoso.todos.filter(pk=self.idoso.pk).exists())
+        self.assertFalse(LogAdministracao.objects.exists())
+        self.assertTrue(Medicamento.objects.filter(pk=self.medicamento.pk).exists())
+
+    def test_prescricoes_de_apagados_saem_das_rondas_do_resumo_e_das_interacoes(self):
+        Membro.objects.create(perfil=self.grupo.admin.perfil, grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        duplicados = [
+            Medicamento.objects.create(grupo=self.grupo, quantidade_estoque=10, catalogo=CatalogoMedicamento.obter(
+                nome_marca=marca, principio_ativo='Losartana potássica', forma_farmaceutica='COMP',
+            ))
+            for marca in ('Cozaar', 'Aradois')
+        ]
+        for medicamento in duplicados:
+            Prescricao.objects.create(idoso=self.idoso, medicamento=medicamento, horarios=['12:00'], dose_valor='1')
+        inicio_do_dia = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+        fim_do_dia = inicio_do_dia + datetime.timedelta(days=1)
+
+        def contadores():
+            resumo, = resumo_dos_grupos(self.grupo.admin)
+            pendentes = {prescricao.medicamento_id for _, prescricao in doses_pendentes(self.grupo.pk, inicio_do_dia, fim_do_dia)}
+            return resumo['prescricoes_ativas'], resumo['doses_pendentes_hoje'], pendentes, len(verificar_grupo(self.grupo.pk))
+
+        self.assertEqual(contadores(), (3, 2, {self.medicamento.pk, *(medicamento.pk for medicamento in duplicados)}, 1))
+        # Marcado direto no banco, sem passar por apagar() (que também desativaria as prescrições)
+        Medicamento.todos.filter(pk=duplicados[1].pk).update(apagado_em=timezone.now())
+        self.assertEqual(contadores(), (2, 1, {self.medicamento.pk, duplicados[0].pk}, 0))
+
+    async def test_views_assincronas_escondem_as_prescricoes_apagadas(self):
+        token = await Token.objects.acreate(user=self.grupo.admin)
+        cabecalho = {'Authorization': f'Token {token.key}'}
+        url = f'/api/async/grupos/{self.grupo.pk}'
+        await Membro.objects.acreate(perfil=await PerfilUsuario.objects.aget(user=self.grupo.admin), grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        await sync_to_async(self.medicamento.apagar)()
+
+        resposta = await self.async_client.get(f'{url}/prescricoes/', headers=cabecalho)
+        self.assertEqual(resposta.json(), [])
+        resposta = await self.async_client.get(f'{url}/prescricoes/{self.prescricao.pk}/', headers=cabecalho)
+        self.assertEqual(resposta.status_code, 404)
+        # O histórico de administração continua visível até o expurgo
+        resposta = await self.async_client.get(f'{url}/logs/', headers=cabecalho)
+        self.assertEqual(resposta.json()['count'], 3)
+
+
+@override_settings(DATABASE_SHARDS=['shard_teste'], SHARD_MAPA_TTL=0)
+class MoverGrupoTests(TestCase):
+    """Mudança de um grupo de banco com o sistema no ar ('python manage.py mover_grupo')."""
+    databases = {'default', 'shard_teste'}
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user('admin@mover.local', 'senha', nome_completo='Admin')
+        self.catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+
+    def criar_grupo(self, nome):
+        grupo = Grupo.objects.create(nome=nome, senha_hash='x', admin=self.admin, banco='default')
+        Membro.objects.create(perfil=self.admin.perfil, grupo=grupo, papel=Membro.Papel.ADMIN)
+        return grupo
+
+    def criar_idoso(self, grupo, nome, **campos):
+        with no_banco_do_grupo(grupo.pk):
+            return Idoso.objects.create(
+                grupo=grupo, nome_completo=nome, data_nascimento=datetime.date(1940, 1, 1), peso=60,
+                genero='F', cpf=nome, cartao_sus=nome, **campos,
+            )
+
+    def mover(self, grupo, durante_o_bloqueio=None):
+        """Roda o comando; 'durante_o_bloqueio' é chamado na primeira espera, com as escritas já bloqueadas."""
+        esperas = []
+
+        def esperar(segundos):
+            if not esperas and durante_o_bloqueio is not None:
+                durante_o_bloqueio()
+            esperas.append(segundos)
+
+        with mock.patch('api.management.commands.mover_grupo.time.sleep', esperar):
+            call_command('mover_grupo', str(grupo.pk), 'shard_teste', stdout=io.StringIO())
+        grupo.refresh_from_db()
+
+    def test_copia_sincronizacao_final_e_limpeza_da_origem(self):
+        grupo = self.criar_grupo('Casa')
+        ana = self.criar_idoso(grupo, 'Ana', doencas='Hipertensão')
+        bia = self.criar_idoso(grupo, 'Bia')
+        self.admin.perfil.responsaveis.add(ana)
+        FarmaciaParceira.objects.create(grupo=grupo, nome='Farmácia', url='http://farmacia.local/', segredo='s')
+        medicamento = Medicamento.objects.create(grupo=grupo, catalogo=self.catalogo, quantidade_estoque=10)
+        prescricao = Prescricao.objects.create(idoso=ana, medicamento=medicamento, horarios=['08:00'], dose_valor='1', instrucoes='Em jejum')
+        LogAdministracao.objects.create(prescricao=prescricao, observacoes='Tomou com água')
+        LogAdministracao.objects.create(prescricao=prescricao)
+
+        def durante_o_bloqueio():
+            # Escritas pela API recebem 503 enquanto o grupo está em migração
+            cliente = APIClient()
+            cliente.force_authenticate(self.admin)
+            resposta = cliente.post(f'/api/grupos/{grupo.pk}/idosos/', {'nome_completo': 'Caio'}, format='json')
+            self.assertEqual(resposta.status_code, 503)
+            # Mudanças feitas pouco antes do bloqueio, depois da cópia inicial
+            bia.delete()
+            Medicamento.objects.filter(pk=medicamento.pk).update(quantidade_estoque=7)
+            arquivar_lote('default', timezone.now() + datetime.timedelta(days=1), 100, grupo.pk)
+            LogAdministracao.objects.create(prescricao=prescricao)
+
+        self.mover(grupo, durante_o_bloqueio)
+
+        self.assertEqual((grupo.banco, grupo.em_migracao), ('shard_teste', False))
+        for queryset in tabelas_do_grupo(grupo):
+            self.assertFalse(queryset.using('default').exists(), queryset.model)
+        shard = 'shard_teste'
+        nova = Idoso.todos.using(shard).get(grupo=grupo)
+        self.assertEqual(nova.nome_completo, 'Ana')
+        self.assertEqual(Medicamento.todos.using(shard).get(grupo=grupo).quantidade_estoque, 7)
+        nova_prescricao = Prescricao.objects.using(shard).get(idoso=nova)
+        self.assertEqual(LogAdministracao.objects.using(shard).filter(prescricao=nova_prescricao).count(), 1)
+        arquivados = set(LogAdministracaoArquivado.objects.using(shard).filter(prescricao=nova_prescricao).values_list('pk', flat=True))
+        self.assertEqual(len(arquivados), 2)
+        documentos = dict(DocumentoBusca.objects.using(shard).filter(grupo=grupo).values_list('tipo', 'objeto_id'))
+        self.assertEqual(documentos[DocumentoBusca.Tipo.IDOSO], nova.pk)
+        self.assertEqual(documentos[DocumentoBusca.Tipo.PRESCRICAO], nova_prescricao.pk)
+        self.assertIn(documentos[DocumentoBusca.Tipo.LOG], arquivados)
+        self.assertEqual(EventoSaida.objects.using(shard).get(grupo=grupo, tipo=EventoSaida.Tipo.PRESCRICAO_CRIADA).dados['prescricao_id'], nova_prescricao.pk)
+        self.assertTrue(PerfilUsuario.responsaveis.through.objects.using(shard).filter(idoso=nova).exists())
+
+    def test_dois_grupos_no_mesmo_shard(self):
+        # Cada banco tem a sua sequência de IDs: o idoso de B tem no 'default' o mesmo ID que o segundo
+        # idoso de A recebeu no shard, e a cópia de B não pode sobrescrevê-lo
+        a, b = self.criar_grupo('A'), self.criar_grupo('B')
+        self.criar_idoso(a, 'Idoso 1 de A')
+        self.mover(a)
+        segundo_de_a = self.criar_idoso(a, 'Idoso 2 de A')
+        de_b = self.criar_idoso(b, 'Idoso de B')
+        self.assertEqual(segundo_de_a.pk, de_b.pk)
+
+        self.mover(b)
+
+        self.assertEqual(
+            set(Idoso.todos.using('shard_teste').values_list('nome_completo', 'grupo__nome')),
+            {('Idoso 1 de A', 'A'), ('Idoso 2 de A', 'A'), ('Idoso de B', 'B')},
+        )
+
+
+class CacheRespostaTests(TestCase):
+    """Respostas em cache por versão do grupo (api/cache.py)."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@cache.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        Membro.objects.create(perfil=admin.perfil, grupo=self.grupo, papel=Membro.Papel.ADMIN)
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        self.medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(admin)
+        self.url = f'/api/grupos/{self.grupo.pk}/medicamentos/'
+
+    def estoques(self):
+        resposta = self.cliente.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        return [item['quantidade_estoque'] for item in resposta.json()]
+
+    def test_versao_do_grupo_muda_so_depois_do_commit(self):
+        self.assertEqual(self.estoques(), ['10'])
+        versao = versao_grupo(self.grupo.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medicamento.quantidade_estoque = 4
+            self.medicamento.save()
+            # Antes do commit a versão não muda: o que for lido (e guardado) agora ainda
+            # pertence à versão antiga e será descartado no commit
+            self.assertEqual(versao_grupo(self.grupo.pk), versao)
+            self.assertEqual(self.estoques(), ['10'])
+
+        self.assertNotEqual(versao_grupo(self.grupo.pk), versao)
+        self.assertEqual(self.estoques(), ['4'])
+
+
+@override_settings(LIMITES_DE_TAXA_ATIVOS=True, LIMITES_DE_TAXA={**settings.LIMITES_DE_TAXA, 'login': '2/min'})
+class LimiteDeTaxaTests(TestCase):
+    """Limites de taxa por IP (api/throttling.py) atrás de um proxy reverso."""
+
+    def setUp(self):
+        caches[settings.CACHE_LIMITES].clear()
+
+    def login(self, email, encaminhado_para):
+        # O proxy (REMOTE_ADDR) acrescenta o IP real do cliente ao X-Forwarded-For recebido
+        return self.client.post(
+            '/api/auth/login/', {'email': email, 'password': 'errada'}, content_type='application/json',
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=encaminhado_para,
+        )
+
+    def test_x_forwarded_for_forjado_nao_renova_o_balde(self):
+        for tentativa in range(2):
+            self.assertNotEqual(self.login(f'{tentativa}@a.local', f'1.1.1.{tentativa}, 203.0.113.7').status_code, 429)
+        resposta = self.login('2@a.local', '1.1.1.2, 203.0.113.7')
+        self.assertEqual(resposta.status_code, 429)
+        # Outro cliente atrás do mesmo proxy tem o próprio balde
+        self.assertNotEqual(self.login('3@a.local', '198.51.100.9').status_code, 429)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_FIXACAO_SEGUNDOS=10)
+class ReplicaLeituraTests(SimpleTestCase):
+    """Leituras nas réplicas (api.db_routers.ReplicaRouter) e fixação no primário após uma escrita."""
+
+    def setUp(self):
+        caches['default'].clear()
+        # A "view" responde com o banco para onde o roteador mandaria uma leitura
+        self.middleware = ReplicaLeituraMiddleware(lambda request: HttpResponse(ReplicaRouter().db_for_read(Idoso)))
+        self.fabrica = RequestFactory()
+
+    def banco(self, metodo, token):
+        request = getattr(self.fabrica, metodo)('/api/grupos/', HTTP_AUTHORIZATION=f'Token {token}')
+        return self.middleware(request).content.decode()
+
+    def test_escritas_fixam_as_leituras_do_cliente_no_primario(self):
+        self.assertEqual(self.banco('get', 'a'), 'replica_1')
+        self.assertEqual(self.banco('post', 'a'), 'default')
+        self.assertEqual(self.banco('get', 'a'), 'default')
+        self.assertEqual(self.banco('get', 'b'), 'replica_1')    # Outros clientes continuam na réplica
+        self.assertEqual(ReplicaRouter().db_for_write(Idoso), 'default')
+        self.assertEqual(ReplicaRouter().db_for_read(Idoso), 'default')    # Fora de uma requisição
+
+    def test_replicas_exigem_cache_compartilhado(self):
+        self.assertEqual([erro.id for erro in verificar_cache_das_replicas(None)], ['api.E001'])
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}
+        with override_settings(CACHES={**settings.CACHES, 'default': redis}):
+            self.assertEqual(verificar_cache_das_replicas(None), [])
+
+
+class RecorrenciaTests(TestCase):
+    """A regra de recorrência em Python (datas_agendadas) e no banco (agendadas_no_dia) dão as mesmas datas."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@recorrencia.local', 'senha', nome_completo='Admin')
+        grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        self.medicamento = Medicamento.objects.create(grupo=grupo, catalogo=catalogo, quantidade_estoque=10)
+        self.idoso = Idoso.objects.create(
+            grupo=grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+
+    def prescricao(self, frequencia, data_inicio, **campos):
+        return Prescricao.objects.create(
+            idoso=self.idoso, medicamento=self.medicamento, horarios=['08:00'], frequencia=frequencia,
+            data_inicio=data_inicio, **campos,
+        )
+
+    def datas(self, prescricao, inicio, fim):
+        return list(datas_agendadas(prescricao, inicio, fim))
+
+    def test_python_e_banco_concordam(self):
+        Frequencia = Prescricao.FrequenciaChoices
+        DI, SE, ME = Frequencia.DIARIA, Frequencia.SEMANAL, Frequencia.MENSAL
+        prescricoes = [
+            self.prescricao(DI, datetime.date(2027, 1, 1)),
+            self.prescricao(DI, datetime.date(2027, 1, 2), intervalo=3),
+            self.prescricao(DI, datetime.date(2027, 1, 5), intervalo=2, dias_semana=0b0011111),
+            self.prescricao(DI, datetime.date(2027, 1, 1), intervalo=4, data_fim=datetime.date(2027, 2, 10)),
+            self.prescricao(SE, datetime.date(2027, 1, 6), dias_semana=0b0001001),
+            self.prescricao(SE, datetime.date(2027, 1, 6), intervalo=2, dias_semana=0b0001001),
+            self.prescricao(SE, datetime.date(2027, 1, 10), intervalo=3, dias_semana=0b1000001),
+            self.prescricao(ME, datetime.date(2027, 1, 31)),
+            self.prescricao(ME, datetime.date(2027, 1, 31), intervalo=2),
+            self.prescricao(ME, datetime.date(2027, 1, 29), intervalo=1),
+            self.prescricao(ME, datetime.date(2027, 3, 30), intervalo=3, data_fim=datetime.date(2027, 12, 31)),
+            self.prescricao(Frequencia.EVENTUAL, datetime.date(2027, 1, 1)),
+        ]
+        dia = datetime.date(2026, 12, 25)
+        while dia <= datetime.date(2028, 3, 31):
+            esperadas = {p.pk for p in prescricoes if self.datas(p, dia, dia)}
+            no_banco = set(agendadas_no_dia(Prescricao.objects.all(), dia).values_list('pk', flat=True))
+            self.assertEqual(no_banco, esperadas, dia)
+            dia += datetime.timedelta(days=1)
+
+    def test_datas_esperadas(self):
+        Frequencia = Prescricao.FrequenciaChoices
+        inicio, fim = datetime.date(2027, 1, 1), datetime.date(2028, 3, 31)
+        # Início no dia 31: último dia dos meses mais curtos (fevereiro bissexto incluído)
+        mensal = self.prescricao(Frequencia.MENSAL, datetime.date(2027, 1, 31))
+        self.assertEqual(self.datas(mensal, inicio, datetime.date(2027, 4, 30)), [
+            datetime.date(2027, 1, 31), datetime.date(2027, 2, 28), datetime.date(2027, 3, 31), datetime.date(2027, 4, 30),
+        ])
+        bimestral = self.prescricao(Frequencia.MENSAL, datetime.date(2027, 12, 31), intervalo=2)
+        self.assertEqual(self.datas(bimestral, inicio, fim), [datetime.date(2027, 12, 31), datetime.date(2028, 2, 29)])
+        # A cada 3 dias, até data_fim
+        diaria = self.prescricao(Frequencia.DIARIA, datetime.date(2027, 1, 1), intervalo=3, data_fim=datetime.date(2027, 1, 12))
+        self.assertEqual(self.datas(diaria, inicio, fim), [
+            datetime.date(2027, 1, 1), datetime.date(2027, 1, 4), datetime.date(2027, 1, 7), datetime.date(2027, 1, 10),
+        ])
+        # Segundas e quintas, semana sim, semana não, a partir da semana de uma quarta-feira
+        semanal = self.prescricao(Frequencia.SEMANAL, datetime.date(2027, 1, 6), intervalo=2, dias_semana=0b0001001)
+        self.assertEqual(self.datas(semanal, inicio, datetime.date(2027, 2, 5)), [
+            datetime.date(2027, 1, 7), datetime.date(2027, 1, 18), datetime.date(2027, 1, 21),
+            datetime.date(2027, 2, 1), datetime.date(2027, 2, 4),
+        ])
+
+
+class GradeDoMesTests(TestCase):
+    """Grade do MAR (api/mar.py): máscaras dos dias esperados e total de doses sem registro."""
+
+    def setUp(self):
+        admin = Usuario.objects.create_user('admin@mar.local', 'senha', nome_completo='Admin')
+        self.grupo = Grupo.objects.create(nome='Casa', senha_hash='x', admin=admin, banco='default')
+        catalogo = CatalogoMedicamento.obter(nome_marca='Losartana', forma_farmaceutica='COMP')
+        medicamento = Medicamento.objects.create(grupo=self.grupo, catalogo=catalogo, quantidade_estoque=10)
+        idoso = Idoso.objects.create(
+            grupo=self.grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='12345678901', cartao_sus='1',
+        )
+        prescricao = Prescricao.objects.create(
+            idoso=idoso, medicamento=medicamento, horarios=['08:00'], dose_valor='1', data_inicio=datetime.date(2027, 3, 1),
+        )
+        momento = timezone.make_aware(datetime.datetime(2027, 3, 2, 8, 5))
+        LogAdministracao.objects.create(prescricao=prescricao, data_hora_administracao=momento, horario_dose=datetime.time(8))
+
+    def test_mascara_das_diarias_igual_a_de_datas_agendadas(self):
+        vigencias = [
+            (datetime.date(2027, 1, 1), None),
+            (datetime.date(2027, 2, 10), None),
+            (datetime.date(2027, 1, 15), datetime.date(2027, 3, 20)),
+            (datetime.date(2027, 5, 31), datetime.date(2027, 6, 1)),
+        ]
+        for mascara in (0b1111111, 0b0000001, 0b0010101, 0b1100000):
+            for data_inicio, data_fim in vigencias:
+                prescricao = Prescricao(dias_semana=mascara, data_inicio=data_inicio, data_fim=data_fim)
+                for numero in range(1, 13):
+                    inicio = datetime.date(2027, numero, 1)
+                    total_dias = calendar.monthrange(2027, numero)[1]
+                    fim = inicio.replace(day=total_dias)
+                    esperado = sum(1 << (dia.day - 1) for dia in datas_agendadas(prescricao, inicio, fim))
+                    rapido = mascara_esperada(prescricao, inicio, fim, mascaras_por_dia_da_semana(inicio, total_dias))
+                    self.assertEqual(rapido, esperado, (mascara, data_inicio, data_fim, inicio))
+
+    def test_sem_registro_conta_so_os_dias_passados(self):
+        # Dose diária em março de 2027, registrada só no dia 2
+        for hoje, sem_registro in (
+            (datetime.date(2027, 2, 20), 0),     # Mês ainda não começou
+            (datetime.date(2027, 3, 1), 0),      # Hoje não conta
+            (datetime.date(2027, 3, 10), 8),     # Dias 1 e 3 a 9
+            (datetime.date(2027, 4, 5), 30),     # Mês inteiro, menos o dia 2
+        ):
+            with mock.patch('api.mar.timezone.localdate', return_value=hoje):
+                totais = grade_do_mes(self.grupo.pk, datetime.date(2027, 3, 1))['totais']
+            self.assertEqual((totais['esperadas'], totais['administrado'], totais['sem_registro']), (31, 1, sem_registro), hoje)
+
+
+class DivisaoDaRondaTests(SimpleTestCase):
+    """Divisão dos idosos entre os cuidadores do turno (api/rondas.py, dividir_por_idoso)."""
+
+    def test_idoso_fica_com_um_dos_responsaveis(self):
+        carga = {1: 9, 2: 1, 3: 1, 4: 1}
+        # O idoso 1 é o mais trabalhoso, mas só pode ir para o cuidador 20; o 2, para o menos ocupado entre 10 e 20
+        atribuicao, doses = dividir_por_idoso(carga, {1: [20], 2: [10, 20]}, [10, 20, 30])
+        self.assertEqual((atribuicao[1], atribuicao[2]), (20, 10))
+        self.assertEqual(set(atribuicao), set(carga))
+        self.assertEqual(doses[20], 9)
+        self.assertEqual(sum(doses.values()), sum(carga.values()))
+
+    def test_carga_equilibrada(self):
+        carga = {1: 5, 2: 4, 3: 3, 4: 3, 5: 2, 6: 1}
+        atribuicao, doses = dividir_por_idoso(carga, {}, [10, 20, 30])
+        self.assertEqual(doses, {10: 6, 20: 6, 30: 6})
+        for perfil_id, total in doses.items():
+            self.assertEqual(sum(carga[idoso] for idoso, perfil in atribuicao.items() if perfil == perfil_id), total)
+
+    def test_sem_idosos(self):
+        self.assertEqual(dividir_por_idoso({}, {}, [10, 20]), ({}, {10: 0, 20: 0}))
+
+
+class MigracaoRecorrenciaTests(TransactionTestCase):
+    """Migração 0011: dias da semana em máscara e fusão das prescrições que só diferiam no horário."""
+    antes = [('api', '0010_catalogo_medicamentos')]
+    depois = [('api', '0011_recorrencia_prescricoes')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.antes)
+        self.executor.loader.build_graph()
+
+    def tearDown(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+    def modelos(self, alvo):
+        apps = self.executor.loader.project_state(alvo).apps
+        return lambda nome: apps.get_model('api', nome)
+
+    def dados_antigos(self):
+        """Grupo, idoso e medicamento criados no esquema da 0010."""
+        modelo = self.modelos(self.antes)
+        fuso = timezone.get_current_timezone()
+        admin = modelo('Usuario').objects.create(email='admin@migracao.local', password='x', nome_completo='Admin')
+        grupo = modelo('Grupo').objects.create(nome='Casa', senha_hash='x', admin=admin)
+        modelo('Grupo').objects.filter(pk=grupo.pk).update(data_criacao=datetime.datetime(2026, 1, 10, 12, tzinfo=fuso))
+        idoso = modelo('Idoso').objects.create(
+            grupo=grupo, nome_completo='Maria', data_nascimento=datetime.date(1940, 1, 1), peso=60,
+            genero='F', cpf='1', cartao_sus='1',
+        )
+        catalogo = modelo('CatalogoMedicamento').objects.create(id=uuid.uuid4(), nome_marca='Losartana', nome_busca='losartana', forma_farmaceutica='COMP')
+        medicamento = modelo('Medicamento').objects.create(grupo=grupo, catalogo=catalogo)
+        return modelo, grupo, idoso, medicamento
+
+    def test_data_inicio_vem_do_primeiro_registro(self):
+        modelo, _, idoso, medicamento = self.dados_antigos()
+        fuso = timezone.get_current_timezone()
+        manha, noite, mensal = (
+            modelo('Prescricao').objects.create(idoso=idoso, medicamento=medicamento, horario_previsto=horario, frequencia=frequencia)
+            for horario, frequencia in (('08:00', 'DI'), ('20:00', 'DI'), ('08:00', 'ME'))
+        )
+        modelo('LogAdministracao').objects.create(prescricao=manha, data_hora_administracao=datetime.datetime(2026, 3, 5, 10, tzinfo=fuso))
+        modelo('LogAdministracaoArquivado').objects.create(
+            id=999, prescricao=noite, status='OK', data_hora_administracao=datetime.datetime(2026, 2, 14, 21, tzinfo=fuso),
+        )
+
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.depois)
+
+        Prescricao = self.modelos(self.depois)('Prescricao')
+        fundida = Prescricao.objects.get(pk=manha.pk)
+        self.assertEqual((fundida.horarios, fundida.data_inicio), (['08:00', '20:00'], datetime.date(2026, 2, 14)))
+        # Sem registros: a data de criação do grupo
+        self.assertEqual(Prescricao.objects.get(pk=mensal.pk).data_inicio, datetime.date(2026, 1, 10))
+
+    def test_fusao_leva_registros_e_documentos_para_a_prescricao_mantida(self):
+        modelo, grupo, idoso, medicamento = self.dados_antigos()
+        manha, noite = (
+            modelo('Prescricao').objects.create(idoso=idoso, medicamento=medicamento, horario_previsto=horario, instrucoes='Após a refeição')
+            for horario in ('08:00', '20:00')
+        )
+        agora = timezone.now()
+        log_manha = modelo('LogAdministracao').objects.create(prescricao=manha, data_hora_administracao=agora)
+        log_noite = modelo('LogAdministracao').objects.create(prescricao=noite, data_hora_administracao=agora)
+        arquivado = modelo('LogAdministracaoArquivado').objects.create(id=999, prescricao=noite, status='OK', data_hora_administracao=agora)
+        Documento = modelo('DocumentoBusca')
+        for prescricao in (manha, noite):
+            Documento.objects.create(
+                grupo=grupo, tipo='PRE', objeto_id=prescricao.pk, idoso=idoso, prescricao=prescricao,
+                titulo='Losartana', texto='Após a refeição',
+            )
+        documento_log = Documento.objects.create(
+            grupo=grupo, tipo='LOG', objeto_id=log_noite.pk, idoso=idoso, prescricao=noite, titulo='Losartana', texto='Tomou com água',
+        )
+
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.depois)
+
+        modelo = self.modelos(self.depois)
+        self.assertEqual(list(modelo('Prescricao').objects.values_list('pk', 'horarios')), [(manha.pk, ['08:00', '20:00'])])
+        registros = {log.pk: (log.prescricao_id, log.horario_dose) for log in modelo('LogAdministracao').objects.all()}
+        self.assertEqual(registros, {
+            log_manha.pk: (manha.pk, datetime.time(8)),
+            log_noite.pk: (manha.pk, datetime.time(20)),
+        })
+        arquivado = modelo('LogAdministracaoArquivado').objects.get(pk=arquivado.pk)
+        self.assertEqual((arquivado.prescricao_id, arquivado.horario_dose), (manha.pk, datetime.time(20)))
+        Documento = modelo('DocumentoBusca')
+        self.assertEqual(list(Documento.objects.filter(tipo='PRE').values_list('objeto_id', flat=True)), [manha.pk])
+        self.assertEqual(Documento.objects.get(pk=documento_log.pk).prescricao_id, manha.pk)
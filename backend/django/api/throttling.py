@@ -0,0 +1,108 @@
+# api/throttling.py - Limites de taxa (throttling) das rotas sensíveis a abuso.
+#
+# Cada escopo (login, registro, entrada com código, administrar) tem uma taxa em
+# settings.LIMITES_DE_TAXA no formato do DRF ('10/min'): um balde de 10 fichas que se
+# reabastece 10 vezes por minuto. Cada requisição gasta uma ficha de cada identidade
+# do escopo (IP, usuário, e-mail do login); se algum balde estiver vazio, a resposta é
+# 429 com Retry-After, antes de a view consultar o banco ou calcular o hash da senha.
+#
+# O cache do Django só oferece operações atômicas de add/incr, então o balde é contado
+# em janelas fixas do tamanho do período: o gasto estimado é o contador da janela atual
+# mais a fração ainda válida do contador da janela anterior (janela deslizante). Isso
+# limita a rajada à capacidade e o ritmo sustentado à taxa, sem leitura-modificação-escrita
+# e sem condição de corrida entre workers (com Redis, o contador é compartilhado por todos).
+# As requisições recusadas também gastam fichas: quem insiste continua bloqueado.
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODOS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def ler_taxa(taxa):
+    """'10/min' -> (10, 60): capacidade do balde e período de reabastecimento em segundos."""
+    fichas, periodo = taxa.split('/')
+    return int(fichas), PERIODOS[periodo.strip()[0]]
+
+
+def gastar_ficha(chave, capacidade, periodo, agora=None):
+    """
+    Gasta uma ficha do balde 'chave'. Devolve 0 se havia ficha, ou os segundos
+    até o balde voltar a ter uma.
+    """
+    cache = caches[settings.CACHE_LIMITES]
+    agora = time.time() if agora is None else agora
+    janela, resto = divmod(agora, periodo)
+    decorrido = resto / periodo
+    atual = f'limite:{chave}:{int(janela)}'
+    cache.add(atual, 0, timeout=periodo * 2 + 1)    # A janela ainda serve de 'anterior' para a próxima
+    try:
+        gastas = cache.incr(atual)
+    except ValueError:      # Expirou entre o add e o incr
+        cache.add(atual, 1, timeout=periodo * 2 + 1)
+        gastas = 1
+    anteriores = cache.get(f'limite:{chave}:{int(janela) - 1}', 0)
+    estimado = anteriores * (1 - decorrido) + gastas
+    if estimado <= capacidade:
+        return 0
+    if gastas > capacidade or not anteriores:
+        return periodo * (1 - decorrido)    # Só a próxima janela libera fichas
+    return periodo * (estimado - capacidade) / anteriores
+
+
+class LimiteDeTaxa(BaseThrottle):
+    """
+    Balde de fichas por escopo e identidade. As subclasses definem o 'escopo' (chave de
+    settings.LIMITES_DE_TAXA) e as 'identidades' contadas: 'ip', 'usuario' e/ou 'email'.
+    """
+    escopo = None
+    identidades = ('ip',)
+
+    def __init__(self):
+        self.espera = None
+
+    def chaves(self, request):
+        for identidade in self.identidades:
+            if identidade == 'ip':
+                yield f'ip:{self.get_ident(request)}'
+            elif identidade == 'usuario' and request.user and request.user.is_authenticated:
+                yield f'usuario:{request.user.pk}'
+            elif identidade == 'email':
+                email = request.data.get('email') if hasattr(request.data, 'get') else None
+                if isinstance(email, str) and email.strip():
+                    yield f'email:{email.strip().lower()}'
+
+    def allow_request(self, request, view):
+        if not settings.LIMITES_DE_TAXA_ATIVOS:
+            return True
+        capacidade, periodo = ler_taxa(settings.LIMITES_DE_TAXA[self.escopo])
+        esperas = [gastar_ficha(f'{self.escopo}:{chave}', capacidade, periodo) for chave in self.chaves(request)]
+        self.espera = max(esperas, default=0)
+        return not self.espera
+
+    def wait(self):
+        return self.espera
+
+
+class LimiteLogin(LimiteDeTaxa):
+    # Por IP e por conta atacada (adivinhação distribuída contra um mesmo e-mail)
+    escopo = 'login'
+    identidades = ('ip', 'email')
+
+
+class LimiteRegistro(LimiteDeTaxa):
+    escopo = 'registro'
+    identidades = ('ip',)
+
+
+class LimiteEntrarComCodigo(LimiteDeTaxa):
+    escopo = 'entrar_com_codigo'
+    identidades = ('usuario', 'ip')
+
+
+class LimiteAdministrar(LimiteDeTaxa):
+    escopo = 'administrar'
+    identidades = ('usuario',)
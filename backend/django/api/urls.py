@@ -6,20 +6,28 @@ from rest_framework_nested import routers
 # Importa as ViewSets da aplicação
 from .views import (
     UserRegistrationView,
+    LoginView,
     MyProfileView, 
     ChangePasswordView,
     GrupoViewSet,
     IdosoViewSet,
     MedicamentoViewSet,
+    AlertaEstoqueViewSet,
+    CatalogoMedicamentoViewSet,
     PrescricaoViewSet,
     UsuarioViewSet,
     LogAdministracaoViewSet,
+    BuscaViewSet,
+    RelatorioViewSet,
 )
+from . import views_async
 
 # 1. Criação do roteador principal (pai) para a entidade 'Grupo'.
 # Este roteador gerencia as URLs de nível superior para os grupos, como /grupos/ e /grupos/{pk}/.
 router = routers.DefaultRouter()
 router.register(r'grupos', GrupoViewSet, basename='grupo')
+# Catálogo global de medicamentos, com o autocompletar. URL gerada: /catalogo-medicamentos/autocompletar/?q=
+router.register(r'catalogo-medicamentos', CatalogoMedicamentoViewSet, basename='catalogo-medicamento')
 
 # 2. Criação de um roteador aninhado a partir do roteador de Grupos.
 # Isso permite criar URLs que representam a relação de um grupo com outras entidades.
@@ -34,17 +42,38 @@ grupos_router = routers.NestedDefaultRouter(router, r'grupos', lookup='grupo')
 grupos_router.register(r'idosos', IdosoViewSet, basename='grupo-idosos')
 # Registra a ViewSet de Medicamentos. URL gerada: /grupos/{grupo_pk}/medicamentos/
 grupos_router.register(r'medicamentos', MedicamentoViewSet, basename='grupo-medicamentos')
+# Registra a ViewSet (somente leitura) de Alertas de estoque. URL gerada: /grupos/{grupo_pk}/alertas-estoque/
+grupos_router.register(r'alertas-estoque', AlertaEstoqueViewSet, basename='grupo-alertas-estoque')
 # Registra a ViewSet de Prescrições. URL gerada: /grupos/{grupo_pk}/prescricoes/
 grupos_router.register(r'prescricoes', PrescricaoViewSet, basename='grupo-prescricoes')
 # Registra a ViewSet de Usuários para listar membros de um grupo. URL gerada: /grupos/{grupo_pk}/usuarios/
 grupos_router.register(r'usuarios', UsuarioViewSet, basename='grupo-usuarios')
 
 grupos_router.register(r'logs', LogAdministracaoViewSet, basename='grupo-logs')
+# Registra a busca de texto completo do grupo. URL gerada: /grupos/{grupo_pk}/busca/?q=...
+grupos_router.register(r'busca', BuscaViewSet, basename='grupo-busca')
+# Registra os relatórios em PDF (gerados em segundo plano). URLs geradas: /grupos/{grupo_pk}/relatorios/ e .../{pk}/download/
+grupos_router.register(r'relatorios', RelatorioViewSet, basename='grupo-relatorios')
+
+# 4. Versões assíncronas (somente leitura) dos recursos mais consultados, para rodar sob ASGI.
+# URLs geradas: /async/grupos/{grupo_pk}/idosos/, /async/grupos/{grupo_pk}/idosos/{pk}/, etc.
+async_urlpatterns = [
+    path('idosos/', views_async.listar_idosos, name='async-idosos-list'),
+    path('idosos/<int:pk>/', views_async.detalhar_idoso, name='async-idosos-detail'),
+    path('medicamentos/', views_async.listar_medicamentos, name='async-medicamentos-list'),
+    path('medicamentos/<int:pk>/', views_async.detalhar_medicamento, name='async-medicamentos-detail'),
+    path('prescricoes/', views_async.listar_prescricoes, name='async-prescricoes-list'),
+    path('prescricoes/<int:pk>/', views_async.detalhar_prescricao, name='async-prescricoes-detail'),
+    path('logs/', views_async.listar_logs, name='async-logs-list'),
+    path('logs/<int:pk>/', views_async.detalhar_log, name='async-logs-detail'),
+]
 
 # Lista principal de padrões de URL da API.
 urlpatterns = [
     # Rotas de Autenticação e Perfil de Usuário (não aninhadas)
     path('auth/register/', UserRegistrationView.as_view(), name='user-register'),
+    # Login com limite de tentativas (substitui o 'auth/login/' do dj-rest-auth, incluído abaixo)
+    path('auth/login/', LoginView.as_view(), name='rest_login'),
     path('auth/profile/', MyProfileView.as_view(), name='user-profile'),
     path('auth/password/change/', ChangePasswordView.as_view(), name='password-change'),
 
@@ -55,4 +84,6 @@ urlpatterns = [
     path('', include(router.urls)),
     # Inclui as URLs geradas pelo roteador aninhado (para /grupos/{grupo_pk}/recurso/)
     path('', include(grupos_router.urls)),
+    # Inclui as rotas assíncronas (para /async/grupos/{grupo_pk}/recurso/)
+    path('async/grupos/<uuid:grupo_pk>/', include(async_urlpatterns)),
 ]
\ No newline at end of file
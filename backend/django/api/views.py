@@ -1,15 +1,23 @@
 # api/views.py
+import datetime
+
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from rest_framework import mixins
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import check_password
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
-from django.utils.dateparse import parse_datetime
+from django.db.models import F, Q
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.contrib.auth import get_user_model
-from .models import Grupo, Idoso, Medicamento, PerfilUsuario, Prescricao, LogAdministracao
+from dj_rest_auth.views import LoginView as DjRestAuthLoginView
+from .models import Grupo, Idoso, Medicamento, Membro, PerfilUsuario, Prescricao, LogAdministracao, LogAdministracaoArquivado, AlertaEstoque, DocumentoBusca, CatalogoMedicamento, Relatorio
 from .serializers import (
     UserRegistrationSerializer,
     GrupoSerializer,
@@ -17,17 +25,57 @@ from .serializers import (
     IdosoListSerializer,
     IdosoDetailSerializer,
     MedicamentoSerializer,
+    AlertaEstoqueSerializer,
+    CatalogoMedicamentoSerializer,
+    DocumentoBuscaSerializer,
     PrescricaoSerializer,
     LogAdministracaoSerializer,
     PerfilUsuarioSerializer, 
+    RelatorioSerializer,
     UserProfileSerializer,
     ChangePasswordSerializer
 )
 from .permissions import IsGroupAdmin, IsGroupMember
+from .cache import CacheRespostaMixin
+from .db_routers import banco_atual
+from .arquivo import LogsCombinados, data_de_corte
+from .resumo import resumo_dos_grupos
+from .busca import buscar
+from .exportacao import ArquivoInvalido, Importacao, exportar
+from .interacoes import verificar_grupo
+from .mar import grade_do_mes
+from .recorrencia import AGENDA_MAX_DIAS, doses_no_periodo, horario_mais_proximo
+from .relatorios import impressao_digital
+from .rondas import TURNO_MAX_HORAS, TURNO_PADRAO_HORAS, cuidadores_do_grupo, descrever_dose, planejar_ronda
+from .throttling import LimiteAdministrar, LimiteEntrarComCodigo, LimiteLogin, LimiteRegistro
 
 Usuario = get_user_model()
 
 
+def ler_data(valor, parametro, fim=False):
+    """
+    Converte o filtro de período ('data_inicio'/'data_fim') em data/hora com fuso.
+    Aceita data ou data/hora ISO; uma data em 'data_fim' inclui o dia inteiro.
+    """
+    if not valor:
+        return None
+    momento = parse_datetime(valor)
+    if momento is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValidationError({parametro: 'Use o formato ISO (ex: YYYY-MM-DD ou YYYY-MM-DDTHH:MM:SSZ).'})
+        momento = datetime.datetime.combine(dia + datetime.timedelta(days=1) if fim else dia, datetime.time.min)
+    return timezone.make_aware(momento) if timezone.is_naive(momento) else momento
+
+
+def filtrar_periodo(logs, inicio, fim):
+    if inicio:
+        logs = logs.filter(data_hora_administracao__gte=inicio)
+    if fim:
+        logs = logs.filter(data_hora_administracao__lt=fim)
+    return logs
+
+
 class UserRegistrationView(generics.CreateAPIView):
     """
     View para registrar um novo usuário no sistema.
@@ -35,6 +83,15 @@ class UserRegistrationView(generics.CreateAPIView):
     """
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LimiteRegistro]
+
+
+class LoginView(DjRestAuthLoginView):
+    """
+    Login do dj-rest-auth com limite de tentativas por IP e por e-mail,
+    verificado antes do hash da senha (ver api/throttling.py).
+    """
+    throttle_classes = [LimiteLogin]
 
 
 class MyProfileView(generics.RetrieveUpdateAPIView):
@@ -101,7 +158,7 @@ class GrupoViewSet(viewsets.ModelViewSet):
         permission_classes = [permissions.IsAuthenticated]
         if self.action == 'retrieve':
             permission_classes = [permissions.IsAuthenticated, IsGroupMember]
-        elif self.action in ['update', 'partial_update', 'destroy', 'codigo_acesso', 'remover_membro']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'codigo_acesso', 'remover_membro', 'exportar']:
             permission_classes = [permissions.IsAuthenticated, IsGroupAdmin]
         return [permission() for permission in permission_classes]
 
@@ -122,14 +179,10 @@ class GrupoViewSet(viewsets.ModelViewSet):
         """
         Ações realizadas após a validação do serializer na criação de um grupo.
         - Define o usuário criador como o administrador do grupo.
-        - Adiciona o grupo ao perfil do usuário.
-        - Define a permissão do usuário como ADMIN.
+        - Adiciona o usuário ao grupo com o papel ADMIN.
         """
         grupo = serializer.save(admin=self.request.user)
-        perfil_usuario = PerfilUsuario.objects.get(user=self.request.user)
-        perfil_usuario.grupos.add(grupo)
-        perfil_usuario.permissao = PerfilUsuario.Permissao.ADMIN
-        perfil_usuario.save()
+        Membro.objects.create(perfil=self.request.user.perfil, grupo=grupo, papel=Membro.Papel.ADMIN)
 
     @action(detail=False, methods=['get'], url_path='meus-grupos')
     def meus_grupos(self, request):
@@ -144,6 +197,15 @@ class GrupoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(grupos, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='resumo')
+    def resumo(self, request):
+        """
+        Um cartão por grupo do usuário, com os contadores da tela de seleção de lar:
+        membros, idosos, prescrições ativas, medicamentos com estoque baixo e doses pendentes hoje.
+        URL: /api/grupos/resumo/
+        """
+        return Response(resumo_dos_grupos(request.user))
+
     @action(detail=True, methods=['get'], url_path='codigo-de-acesso')
     def codigo_acesso(self, request, pk=None):
         """
@@ -154,7 +216,7 @@ class GrupoViewSet(viewsets.ModelViewSet):
         grupo = self.get_object()
         return Response({'codigo_acesso': grupo.codigo_acesso})
     
-    @action(detail=False, methods=['post'], url_path='entrar-com-codigo')
+    @action(detail=False, methods=['post'], url_path='entrar-com-codigo', throttle_classes=[LimiteEntrarComCodigo])
     def entrar_com_codigo(self, request):
         """
         Ação para um usuário entrar em um grupo usando um código de acesso.
@@ -166,18 +228,13 @@ class GrupoViewSet(viewsets.ModelViewSet):
         
         try:
             grupo = Grupo.objects.get(codigo_acesso=codigo)
-        except Grupo.DoesNotExist:
+        except (Grupo.DoesNotExist, DjangoValidationError):    # Código que nem é um UUID válido
             return Response({'detail': 'Grupo com este código de acesso não encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
-        perfil_usuario = request.user.perfil
-        if grupo in perfil_usuario.grupos.all():
+        _, criado = Membro.objects.get_or_create(perfil=request.user.perfil, grupo=grupo)
+        if not criado:
             return Response({'detail': f'Você já é membro do grupo {grupo.nome}.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        perfil_usuario.grupos.add(grupo)
-        if not perfil_usuario.permissao:
-            perfil_usuario.permissao = PerfilUsuario.Permissao.MEMBRO
-        perfil_usuario.save()
-
         return Response({'detail': f'Bem-vindo ao grupo {grupo.nome}!'}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], url_path='remover-membro')
@@ -199,17 +256,44 @@ class GrupoViewSet(viewsets.ModelViewSet):
         
         if user_to_remove == request.user:
             return Response({'detail': 'O administrador não pode remover a si mesmo do grupo.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if grupo not in perfil_alvo.grupos.all():
-            return Response({'detail': 'Este usuário não é membro do grupo.'}, status=status.HTTP_400_BAD_REQUEST)
+        if user_to_remove.pk == grupo.admin_id:
+            return Response({'detail': 'O criador do grupo não pode ser removido.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        perfil_alvo.grupos.remove(grupo)
-        
-        if perfil_alvo.grupos.count() == 0:
-            perfil_alvo.permissao = PerfilUsuario.Permissao.MEMBRO
-            perfil_alvo.save()
+        removidos, _ = Membro.objects.filter(perfil=perfil_alvo, grupo=grupo).delete()
+        if not removidos:
+            return Response({'detail': 'Este usuário não é membro do grupo.'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'detail': f'Usuário {user_to_remove.nome_completo} removido do grupo.'}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='exportar')
+    def exportar(self, request, pk=None):
+        """
+        Baixa o grupo inteiro (idosos, estoque, prescrições, histórico e membros) em um arquivo
+        comprimido, gerado aos poucos enquanto é enviado (ver api/exportacao.py). Apenas o admin.
+        URL: /api/grupos/{pk}/exportar/
+        """
+        grupo = self.get_object()
+        resposta = StreamingHttpResponse(exportar(grupo), content_type='application/gzip')
+        resposta['Content-Disposition'] = f'attachment; filename="grupo-{grupo.pk}-{timezone.localdate():%Y-%m-%d}.jsonl.gz"'
+        return resposta
+
+    @action(detail=False, methods=['post'], url_path='importar')
+    def importar(self, request):
+        """
+        Cria um grupo a partir de um arquivo de /exportar/ (campo 'arquivo', multipart), com quem
+        envia como admin. Os membros são reconhecidos pelo e-mail entre as contas desta instalação.
+        URL: /api/grupos/importar/
+        """
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return Response({'arquivo': 'Envie o arquivo exportado.'}, status=status.HTTP_400_BAD_REQUEST)
+        importacao = Importacao(arquivo, admin=request.user)
+        try:
+            grupo = importacao.executar()
+        except ArquivoInvalido as exc:
+            return Response({'arquivo': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        dados = GrupoSerializer(grupo, context=self.get_serializer_context()).data
+        return Response({**dados, 'importacao': importacao.resumo()}, status=status.HTTP_201_CREATED)
     
     @transaction.atomic
     def destroy(self, request, *args, **kwargs):
@@ -220,6 +304,10 @@ class GrupoViewSet(viewsets.ModelViewSet):
         self.perform_destroy(grupo)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_destroy(self, instance):
+        # Exclusão lógica: resposta imediata; os dados são removidos pelo 'expurgar_apagados'
+        instance.apagar()
+
 # --- Views de Recursos do Grupo (Idosos, Medicamentos, etc.) ---
 
 class IdosoViewSet(viewsets.ModelViewSet):
@@ -237,55 +325,222 @@ class IdosoViewSet(viewsets.ModelViewSet):
         grupo_pk = self.kwargs.get('grupo_pk')
         grupo = get_object_or_404(Grupo, pk=grupo_pk)
         serializer.save(grupo=grupo)
+    def perform_destroy(self, instance):
+        # Exclusão lógica (ver Idoso.apagar); o histórico fica até o expurgo
+        instance.apagar()
 
-class MedicamentoViewSet(viewsets.ModelViewSet):
+class MedicamentoViewSet(CacheRespostaMixin, viewsets.ModelViewSet):
     serializer_class = MedicamentoSerializer
     permission_classes = [permissions.IsAuthenticated, IsGroupMember]
     pagination_class = None
     def get_queryset(self):
         grupo_pk = self.kwargs.get('grupo_pk')
         if grupo_pk:
-            return Medicamento.objects.filter(grupo_id=grupo_pk)
+            return Medicamento.objects.filter(grupo_id=grupo_pk).select_related('catalogo')
         return Medicamento.objects.none()
     def perform_create(self, serializer):
         grupo_pk = self.kwargs.get('grupo_pk')
         grupo = get_object_or_404(Grupo, pk=grupo_pk)
-        serializer.save(grupo=grupo)
+        # Na mesma transação do evento de movimentação de estoque (caixa de saída, ver EventoSaida)
+        with transaction.atomic(using=banco_atual()):
+            serializer.save(grupo=grupo)
+    def perform_update(self, serializer):
+        with transaction.atomic(using=banco_atual()):
+            serializer.save()
+    def perform_destroy(self, instance):
+        # Exclusão lógica (ver Medicamento.apagar); o histórico fica até o expurgo
+        instance.apagar()
+    @action(detail=False, methods=['get'], url_path='abaixo-do-minimo')
+    def abaixo_do_minimo(self, request, grupo_pk=None):
+        # Consulta servida pelo índice parcial medicamento_abaixo_min_idx
+        medicamentos = self.get_queryset().filter(abaixo_minimo=True)
+        return Response(self.get_serializer(medicamentos, many=True).data)
+
+class CatalogoMedicamentoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Catálogo global de medicamentos (somente leitura; os itens são criados ao cadastrar
+    o estoque de um grupo). /catalogo-medicamentos/autocompletar/?q=para busca pelo
+    início do nome, servida pelo índice de prefixo sobre 'nome_busca'.
+    """
+    serializer_class = CatalogoMedicamentoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = CatalogoMedicamento.objects.all()
+    limite_autocompletar = 20
+    @action(detail=False, methods=['get'], url_path='autocompletar')
+    def autocompletar(self, request):
+        prefixo = CatalogoMedicamento.normalizar(request.query_params.get('q', ''))
+        if not prefixo:
+            return Response([])
+        itens = self.get_queryset().filter(nome_busca__startswith=prefixo).order_by('nome_busca')
+        return Response(self.get_serializer(itens[:self.limite_autocompletar], many=True).data)
+
+class AlertaEstoqueViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Alertas de estoque baixo do grupo, abertos pelo próprio Medicamento ao cruzar
+    seu limite mínimo. Com ?abertos=1 lista apenas os alertas ainda não resolvidos.
+    """
+    serializer_class = AlertaEstoqueSerializer
+    permission_classes = [permissions.IsAuthenticated, IsGroupMember]
+    def get_queryset(self):
+        grupo_pk = self.kwargs.get('grupo_pk')
+        if grupo_pk:
+            alertas = AlertaEstoque.objects.filter(medicamento__grupo_id=grupo_pk, medicamento__apagado_em__isnull=True).select_related('medicamento__catalogo', 'medicamento__grupo')
+            if self.request.query_params.get('abertos') in ('1', 'true'):
+                alertas = alertas.filter(resolvido_em__isnull=True)
+            return alertas
+        return AlertaEstoque.objects.none()
 
-class PrescricaoViewSet(viewsets.ModelViewSet):
+class PrescricaoViewSet(CacheRespostaMixin, viewsets.ModelViewSet):
     serializer_class = PrescricaoSerializer
     permission_classes = [permissions.IsAuthenticated, IsGroupMember]
     pagination_class = None
     def get_queryset(self):
         grupo_pk = self.kwargs.get('grupo_pk')
         if grupo_pk:
-            return Prescricao.objects.filter(idoso__grupo_id=grupo_pk)
+            return Prescricao.objects.visiveis().filter(idoso__grupo_id=grupo_pk).select_related('medicamento__catalogo', 'idoso')
         return Prescricao.objects.none()
     def perform_create(self, serializer):
-        serializer.save()
+        # Na mesma transação do evento de nova prescrição (caixa de saída, ver EventoSaida)
+        with transaction.atomic(using=banco_atual()):
+            serializer.save()
+    @action(detail=False, methods=['get'], url_path='verificar-interacoes')
+    def verificar_interacoes(self, request, grupo_pk=None):
+        # Reverifica todas as prescrições ativas do grupo contra a base de interações
+        return Response(verificar_grupo(grupo_pk))
+    def _ler_dia(self, parametro, padrao):
+        valor = self.request.query_params.get(parametro)
+        if not valor:
+            return padrao
+        try:
+            dia = parse_date(valor)
+        except ValueError:
+            dia = None
+        if dia is None:
+            raise ValidationError({parametro: 'Use o formato ISO (ex: YYYY-MM-DD).'})
+        return dia
+    @action(detail=False, methods=['get'], url_path='agenda')
+    def agenda(self, request, grupo_pk=None):
+        # Doses agendadas do grupo entre ?inicio= e ?fim= (datas, inclusive; padrão: hoje), em ordem de horário
+        inicio = self._ler_dia('inicio', timezone.localdate())
+        fim = self._ler_dia('fim', inicio)
+        if fim < inicio or (fim - inicio).days >= AGENDA_MAX_DIAS:
+            raise ValidationError({'fim': f'O período deve ter de 1 a {AGENDA_MAX_DIAS} dias.'})
+        doses = doses_no_periodo(self.get_queryset().filter(ativo=True), inicio, fim)
+        return Response([descrever_dose(momento, prescricao) for momento, prescricao in doses])
+    @action(detail=False, methods=['get'], url_path='mar')
+    def mar(self, request, grupo_pk=None):
+        # Grade mensal de administração (MAR) do grupo em ?mes=YYYY-MM (padrão: mês atual); ?idoso= filtra um idoso
+        mes = request.query_params.get('mes')
+        try:
+            mes = datetime.date.fromisoformat(f'{mes}-01') if mes else timezone.localdate().replace(day=1)
+        except ValueError:
+            raise ValidationError({'mes': 'Use o formato YYYY-MM.'})
+        idoso_id = request.query_params.get('idoso')
+        if idoso_id is not None and not idoso_id.isdigit():
+            raise ValidationError({'idoso': 'Informe o ID do idoso.'})
+        return Response(grade_do_mes(grupo_pk, mes, [int(idoso_id)] if idoso_id else None))
+    @action(detail=False, methods=['get'], url_path='ronda')
+    def ronda(self, request, grupo_pk=None):
+        # Doses pendentes do turno entre ?inicio= e ?fim= (padrão: agora e TURNO_PADRAO_HORAS depois),
+        # divididas entre os cuidadores do turno (?cuidadores=IDs de usuário; padrão: todos os membros)
+        inicio = ler_data(request.query_params.get('inicio'), 'inicio') or timezone.now()
+        fim = ler_data(request.query_params.get('fim'), 'fim', fim=True) or inicio + datetime.timedelta(hours=TURNO_PADRAO_HORAS)
+        if fim <= inicio or fim - inicio > datetime.timedelta(hours=TURNO_MAX_HORAS):
+            raise ValidationError({'fim': f'O turno deve terminar depois do início e durar no máximo {TURNO_MAX_HORAS} horas.'})
+        user_ids = None
+        if request.query_params.get('cuidadores'):
+            try:
+                user_ids = {int(valor) for valor in request.query_params['cuidadores'].split(',') if valor.strip()}
+            except ValueError:
+                raise ValidationError({'cuidadores': 'Informe os IDs de usuário separados por vírgula.'})
+        cuidadores = cuidadores_do_grupo(grupo_pk, user_ids)
+        if not cuidadores or (user_ids is not None and len(cuidadores) != len(user_ids)):
+            raise ValidationError({'cuidadores': 'Informe ao menos um cuidador, e apenas membros do grupo.'})
+        return Response(planejar_ronda(grupo_pk, inicio, fim, cuidadores))
     
-    @action(detail=True, methods=['post'], url_path='administrar')
-    @transaction.atomic
+    @action(detail=True, methods=['post'], url_path='administrar', throttle_classes=[LimiteAdministrar])
     def administrar(self, request, pk=None, grupo_pk=None):
-        prescricao = self.get_object()
-        medicamento = prescricao.medicamento
-        dose = prescricao.dose_valor
-        if medicamento.quantidade_estoque < dose:
-            return Response({'error': 'Estoque insuficiente para administrar a dose.'}, status=status.HTTP_400_BAD_REQUEST)
-        medicamento.quantidade_estoque -= dose
-        medicamento.save()
-        log_data = {"prescricao": prescricao, "usuario_responsavel": request.user, "status": request.data.get('status', LogAdministracao.StatusDose.ADMINISTRADO), "observacoes": request.data.get('observacoes', '')}
-        custom_datetime_str = request.data.get('data_hora_administracao')
-        if custom_datetime_str:
-            try:
-                custom_datetime = parse_datetime(custom_datetime_str)
-                if not custom_datetime: raise ValueError
-                log_data['data_hora_administracao'] = custom_datetime
-            except (ValueError, TypeError):
-                return Response({'error': 'O formato de data_hora_administracao é inválido. Use o formato ISO (ex: YYYY-MM-DDTHH:MM:SSZ).'}, status=status.HTTP_400_BAD_REQUEST)
-        log = LogAdministracao.objects.create(**log_data)
-        log_serializer = LogAdministracaoSerializer(log)
-        return Response(log_serializer.data, status=status.HTTP_201_CREATED)
+        # A transação é aberta no banco (shard) onde estão os dados do grupo
+        with transaction.atomic(using=banco_atual()):
+            prescricao = self.get_object()
+            # Horário da agenda a que a dose corresponde (padrão: o mais próximo do momento da administração)
+            horario = str(request.data.get('horario') or '')[:5]
+            if horario and horario not in prescricao.horarios:
+                return Response({'error': 'O horário informado não está na agenda da prescrição.'}, status=status.HTTP_400_BAD_REQUEST)
+            medicamento = prescricao.medicamento
+            dose = prescricao.dose_valor
+            if medicamento.quantidade_estoque < dose:
+                return Response({'error': 'Estoque insuficiente para administrar a dose.'}, status=status.HTTP_400_BAD_REQUEST)
+            medicamento.quantidade_estoque -= dose
+            medicamento.save(update_fields=['quantidade_estoque'])    # Avalia o estoque mínimo (ver Medicamento.save)
+            log_data = {"prescricao": prescricao, "usuario_responsavel": request.user, "status": request.data.get('status', LogAdministracao.StatusDose.ADMINISTRADO), "observacoes": request.data.get('observacoes', '')}
+            custom_datetime_str = request.data.get('data_hora_administracao')
+            if custom_datetime_str:
+                try:
+                    custom_datetime = parse_datetime(custom_datetime_str)
+                    if not custom_datetime: raise ValueError
+                    log_data['data_hora_administracao'] = custom_datetime
+                except (ValueError, TypeError):
+                    return Response({'error': 'O formato de data_hora_administracao é inválido. Use o formato ISO (ex: YYYY-MM-DDTHH:MM:SSZ).'}, status=status.HTTP_400_BAD_REQUEST)
+            log_data['horario_dose'] = horario or horario_mais_proximo(
+                prescricao.horarios, log_data.get('data_hora_administracao', timezone.now()),
+            )
+            log = LogAdministracao.objects.create(**log_data)
+            log_serializer = LogAdministracaoSerializer(log)
+            return Response(log_serializer.data, status=status.HTTP_201_CREATED)
+
+class BuscaViewSet(viewsets.ViewSet):
+    """
+    Busca de texto completo nas doenças/condições dos idosos, instruções das prescrições
+    e observações dos registros de administração do grupo: /grupos/{grupo_pk}/busca/?q=termos.
+    Os resultados vêm ordenados por relevância (ver api/busca.py).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsGroupMember]
+    def list(self, request, grupo_pk=None):
+        consulta = request.query_params.get('q', '').strip()
+        if not consulta:
+            raise ValidationError({'q': 'Informe o texto a ser buscado.'})
+        documentos = buscar(grupo_pk, consulta)
+        return Response(DocumentoBuscaSerializer(documentos, many=True).data)
+
+class RelatorioViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Relatórios em PDF do grupo: MAR do mês (de todos os idosos ou de um) e ficha do idoso.
+    O POST só enfileira o pedido (202); o worker 'python manage.py gerar_relatorios' gera o PDF
+    e o progresso é acompanhado em GET .../{id}/. Se já houver um relatório igual pronto com
+    os mesmos dados (mesma impressão digital), ou na fila, ele é devolvido em vez de um novo.
+    """
+    serializer_class = RelatorioSerializer
+    permission_classes = [permissions.IsAuthenticated, IsGroupMember]
+    def get_queryset(self):
+        grupo_pk = self.kwargs.get('grupo_pk')
+        if grupo_pk:
+            return Relatorio.objects.filter(grupo_id=grupo_pk).order_by('-criado_em', '-pk')
+        return Relatorio.objects.none()
+    def create(self, request, grupo_pk=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        idoso = dados.get('idoso')
+        if idoso is not None and str(idoso.grupo_id) != str(grupo_pk):
+            raise ValidationError({'idoso': 'Idoso não encontrado neste grupo.'})
+        impressao = impressao_digital(grupo_pk, dados['tipo'], dados['mes'], idoso.pk if idoso else None)
+        existente = self.get_queryset().filter(tipo=dados['tipo'], idoso=idoso, mes=dados['mes']).filter(
+            Q(situacao__in=[Relatorio.Situacao.PENDENTE, Relatorio.Situacao.GERANDO])
+            | Q(situacao=Relatorio.Situacao.PRONTO, impressao_digital=impressao)
+        ).first()
+        if existente is not None:
+            pronto = existente.situacao == Relatorio.Situacao.PRONTO
+            return Response(self.get_serializer(existente).data, status=status.HTTP_200_OK if pronto else status.HTTP_202_ACCEPTED)
+        relatorio = serializer.save(grupo_id=grupo_pk, solicitado_por=request.user)
+        return Response(self.get_serializer(relatorio).data, status=status.HTTP_202_ACCEPTED)
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None, grupo_pk=None):
+        # O PDF é enviado em partes (FileResponse), sem ser lido inteiro para a memória
+        relatorio = self.get_object()
+        if relatorio.situacao != Relatorio.Situacao.PRONTO:
+            return Response({'error': 'O relatório ainda não está pronto.'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(relatorio.arquivo.open('rb'), as_attachment=True, filename=relatorio.nome_do_arquivo(), content_type='application/pdf')
 
 class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PerfilUsuarioSerializer
@@ -293,8 +548,11 @@ class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         grupo_pk = self.kwargs.get('grupo_pk')
         if grupo_pk:
-            grupo = get_object_or_404(Grupo, pk=grupo_pk)
-            return grupo.membros.all()
+            # O papel vem do mesmo vínculo usado no filtro (ver PerfilUsuarioSerializer.permissao)
+            return (
+                PerfilUsuario.objects.filter(vinculos__grupo_id=grupo_pk).annotate(papel=F('vinculos__papel'))
+                .select_related('user').order_by('vinculos__entrou_em', 'pk')
+            )
         return PerfilUsuario.objects.none()
     @action(detail=True, methods=['post'], url_path='vincular-idoso', permission_classes=[IsGroupMember])
     def vincular_idoso(self, request, pk=None, grupo_pk=None):
@@ -314,22 +572,55 @@ class UsuarioViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(self.get_serializer(perfil_usuario_alvo).data, status=status.HTTP_200_OK)
 
 class LogAdministracaoViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Histórico de administrações do grupo. Aceita os filtros ?data_inicio= e ?data_fim=
+    (data ou data/hora ISO). Quando data_inicio alcança o período arquivado
+    (settings.LOG_ARQUIVO_DIAS), os logs arquivados são incluídos na listagem.
+    """
     serializer_class = LogAdministracaoSerializer
     permission_classes = [permissions.IsAuthenticated, IsGroupMember]
     def get_queryset(self):
         grupo_pk = self.kwargs.get('grupo_pk')
         if grupo_pk:
-            return LogAdministracao.objects.filter(prescricao__idoso__grupo_id=grupo_pk).order_by('-data_hora_administracao')
+            logs = LogAdministracao.objects.filter(prescricao__idoso__grupo_id=grupo_pk).order_by('-data_hora_administracao')
+            return self._filtrar_periodo(logs.select_related('usuario_responsavel', 'prescricao__medicamento__catalogo', 'prescricao__idoso'))
         return LogAdministracao.objects.none()
+    def get_logs_arquivados(self):
+        grupo_pk = self.kwargs.get('grupo_pk')
+        arquivados = LogAdministracaoArquivado.objects.filter(prescricao__idoso__grupo_id=grupo_pk)
+        return arquivados.select_related('usuario_responsavel', 'prescricao__medicamento__catalogo', 'prescricao__idoso')
+    def _ler_data(self, parametro, fim=False):
+        return ler_data(self.request.query_params.get(parametro), parametro, fim=fim)
+    def _filtrar_periodo(self, logs):
+        return filtrar_periodo(logs, self._ler_data('data_inicio'), self._ler_data('data_fim', fim=True))
+    def list(self, request, *args, **kwargs):
+        logs = self.filter_queryset(self.get_queryset())
+        inicio = self._ler_data('data_inicio')
+        if inicio is not None and inicio < data_de_corte():
+            # O período pedido alcança o arquivo: junta as duas tabelas
+            logs = LogsCombinados(logs, self._filtrar_periodo(self.get_logs_arquivados()))
+        page = self.paginate_queryset(logs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(logs, many=True).data)
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # O log pode ter sido arquivado: busca pelo mesmo ID na tabela de arquivo
+            log = get_object_or_404(self.get_logs_arquivados(), pk=self.kwargs['pk'])
+            self.check_object_permissions(self.request, log)
+            return log
     def get_permissions(self):
         if self.action == 'destroy':
             return [permissions.IsAuthenticated(), IsGroupAdmin()]
         return super().get_permissions()
-    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
-        log = self.get_object()
-        medicamento = log.prescricao.medicamento
-        dose_devolvida = log.prescricao.dose_valor
-        medicamento.quantidade_estoque += dose_devolvida
-        medicamento.save()
-        return super().destroy(request, *args, **kwargs)
+        with transaction.atomic(using=banco_atual()):
+            log = self.get_object()
+            medicamento = log.prescricao.medicamento
+            dose_devolvida = log.prescricao.dose_valor
+            medicamento.quantidade_estoque += dose_devolvida
+            medicamento.save(update_fields=['quantidade_estoque'])
+            DocumentoBusca.remover(DocumentoBusca.Tipo.LOG, log.pk)
+            return super().destroy(request, *args, **kwargs)
\ No newline at end of file
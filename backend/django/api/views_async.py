@@ -0,0 +1,223 @@
+# api/views_async.py - Versões assíncronas dos endpoints de leitura mais usados.
+#
+# Servidas sob ASGI (config/asgi.py, ex: 'uvicorn config.asgi:application') em
+# /api/async/grupos/{grupo_pk}/..., com as mesmas respostas das ViewSets síncronas.
+# Enquanto uma consulta está no banco a requisição não prende um worker: o event
+# loop continua atendendo as demais conexões.
+#
+# O DRF não suporta views assíncronas, então a autenticação por Token, a permissão
+# de membro do grupo e a paginação são reimplementadas aqui; os serializers são os
+# mesmos, aplicados sobre objetos já carregados (select_related/prefetch_related),
+# para que a serialização não dispare consultas dentro do event loop.
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_safe
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, NotFound, ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .arquivo import LogsCombinados, data_de_corte
+from .models import Idoso, LogAdministracao, LogAdministracaoArquivado, Medicamento, Membro, Prescricao
+from .permissions import IsGroupMember
+from .renderers import JSONRapidoRenderer
+from .serializers import (
+    IdosoDetailSerializer,
+    IdosoListSerializer,
+    LogAdministracaoSerializer,
+    MedicamentoSerializer,
+    PrescricaoSerializer,
+)
+from .views import filtrar_periodo, ler_data
+
+TAMANHO_LOTE = 500  # chunk_size do aiterator() nas listagens sem paginação
+
+
+def resposta_json(dados, status=200):
+    return HttpResponse(JSONRapidoRenderer().render(dados), status=status, content_type='application/json')
+
+
+async def autenticar(request):
+    """
+    Equivalente assíncrono do TokenAuthentication: devolve o usuário do cabeçalho
+    'Authorization: Token <chave>', None sem cabeçalho, ou AuthenticationFailed.
+    """
+    partes = request.headers.get('Authorization', '').split()
+    if not partes or partes[0].lower() != 'token':
+        return None
+    if len(partes) != 2:
+        raise AuthenticationFailed('Cabeçalho de token inválido.')
+    try:
+        token = await Token.objects.select_related('user').aget(key=partes[1])
+    except Token.DoesNotExist:
+        raise AuthenticationFailed('Token inválido.')
+    if not token.user.is_active:
+        raise AuthenticationFailed('Usuário inativo ou excluído.')
+    return token.user
+
+
+def membro_do_grupo(view):
+    """
+    Equivalente assíncrono de [IsAuthenticated, IsGroupMember]: só chama a view se o
+    usuário do token for membro do grupo da URL. Aceita apenas GET/HEAD e, como as
+    views do DRF, dispensa o CSRF (a autenticação é por token).
+    """
+    @require_safe
+    @functools.wraps(view)
+    async def verificar(request, grupo_pk, **kwargs):
+        try:
+            usuario = await autenticar(request)
+        except AuthenticationFailed as exc:
+            usuario, detalhe = None, exc.detail
+        else:
+            detalhe = NotAuthenticated.default_detail
+        if usuario is None:
+            response = resposta_json({'detail': detalhe}, status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        membro = Membro.objects.filter(grupo_id=grupo_pk, perfil__user_id=usuario.pk, grupo__apagado_em__isnull=True)
+        if not await membro.aexists():
+            return resposta_json({'detail': IsGroupMember.message}, status=403)
+        request.user = usuario
+        try:
+            return await view(request, grupo_pk, **kwargs)
+        except ValidationError as exc:
+            return resposta_json(exc.detail, status=400)
+        except NotFound as exc:
+            return resposta_json({'detail': exc.detail}, status=404)
+        except ObjectDoesNotExist as exc:
+            # Mesma mensagem do get_object_or_404 usado pelas ViewSets
+            modelo = type(exc).__qualname__.split('.')[0]
+            return resposta_json({'detail': f'No {modelo} matches the given query.'}, status=404)
+    return csrf_exempt(verificar)
+
+
+async def listar(queryset, chunk_size=TAMANHO_LOTE):
+    return [objeto async for objeto in queryset.aiterator(chunk_size=chunk_size)]
+
+
+async def paginar(request, contar, buscar, serializer_class):
+    """
+    Mesma resposta do PageNumberPagination do DRF (count/next/previous/results).
+    'contar()' e 'buscar(inicio, fim)' são corrotinas que consultam o banco.
+    """
+    tamanho = api_settings.PAGE_SIZE
+    try:
+        pagina = int(request.GET.get('page', 1))
+        if pagina < 1:
+            raise ValueError
+    except ValueError:
+        raise NotFound('Página inválida.')
+    total = await contar()
+    inicio = (pagina - 1) * tamanho
+    if inicio >= total and pagina > 1:
+        raise NotFound('Página inválida.')
+    objetos = await buscar(inicio, inicio + tamanho)
+
+    url = request.build_absolute_uri()
+    proxima = replace_query_param(url, 'page', pagina + 1) if inicio + tamanho < total else None
+    if pagina == 1:
+        anterior = None
+    elif pagina == 2:
+        anterior = remove_query_param(url, 'page')
+    else:
+        anterior = replace_query_param(url, 'page', pagina - 1)
+    return {
+        'count': total,
+        'next': proxima,
+        'previous': anterior,
+        'results': serializer_class(objetos, many=True).data,
+    }
+
+
+def paginar_queryset(request, queryset, serializer_class):
+    return paginar(request, queryset.acount, lambda inicio, fim: listar(queryset[inicio:fim]), serializer_class)
+
+
+# --- Idosos ---
+
+@membro_do_grupo
+async def listar_idosos(request, grupo_pk):
+    idosos = Idoso.objects.filter(grupo_id=grupo_pk)
+    return resposta_json(await paginar_queryset(request, idosos, IdosoListSerializer))
+
+
+@membro_do_grupo
+async def detalhar_idoso(request, grupo_pk, pk):
+    idoso = await Idoso.objects.prefetch_related(
+        'contatos', Prefetch('prescricoes', queryset=Prescricao.objects.select_related('medicamento__catalogo')),
+    ).aget(pk=pk, grupo_id=grupo_pk)
+    return resposta_json(IdosoDetailSerializer(idoso).data)
+
+
+# --- Medicamentos (sem paginação, como MedicamentoViewSet) ---
+
+@membro_do_grupo
+async def listar_medicamentos(request, grupo_pk):
+    medicamentos = await listar(Medicamento.objects.filter(grupo_id=grupo_pk).select_related('catalogo'))
+    return resposta_json(MedicamentoSerializer(medicamentos, many=True).data)
+
+
+@membro_do_grupo
+async def detalhar_medicamento(request, grupo_pk, pk):
+    medicamento = await Medicamento.objects.select_related('catalogo').aget(pk=pk, grupo_id=grupo_pk)
+    return resposta_json(MedicamentoSerializer(medicamento).data)
+
+
+# --- Prescrições (sem paginação, como PrescricaoViewSet) ---
+
+def _prescricoes(grupo_pk):
+    return Prescricao.objects.visiveis().filter(idoso__grupo_id=grupo_pk).select_related('medicamento__catalogo', 'idoso')
+
+
+@membro_do_grupo
+async def listar_prescricoes(request, grupo_pk):
+    prescricoes = await listar(_prescricoes(grupo_pk))
+    return resposta_json(PrescricaoSerializer(prescricoes, many=True).data)
+
+
+@membro_do_grupo
+async def detalhar_prescricao(request, grupo_pk, pk):
+    prescricao = await _prescricoes(grupo_pk).aget(pk=pk)
+    return resposta_json(PrescricaoSerializer(prescricao).data)
+
+
+# --- Logs de administração (mesmos filtros e arquivo de LogAdministracaoViewSet) ---
+
+def _logs(modelo, grupo_pk):
+    # O histórico continua visível depois da exclusão lógica do idoso ou do medicamento,
+    # como em LogAdministracaoViewSet: some só no expurgo (api/exclusao.py)
+    return modelo.objects.filter(prescricao__idoso__grupo_id=grupo_pk).select_related(
+        'usuario_responsavel', 'prescricao__medicamento__catalogo', 'prescricao__idoso',
+    )
+
+
+@membro_do_grupo
+async def listar_logs(request, grupo_pk):
+    inicio = ler_data(request.GET.get('data_inicio'), 'data_inicio')
+    fim = ler_data(request.GET.get('data_fim'), 'data_fim', fim=True)
+    logs = filtrar_periodo(_logs(LogAdministracao, grupo_pk), inicio, fim).order_by('-data_hora_administracao')
+    if inicio is not None and inicio < data_de_corte():
+        # O período alcança o arquivo: a intercalação das duas tabelas é síncrona
+        combinados = LogsCombinados(logs, filtrar_periodo(_logs(LogAdministracaoArquivado, grupo_pk), inicio, fim))
+        dados = await paginar(
+            request, sync_to_async(combinados.count), sync_to_async(lambda a, b: combinados[a:b]),
+            LogAdministracaoSerializer,
+        )
+    else:
+        dados = await paginar_queryset(request, logs, LogAdministracaoSerializer)
+    return resposta_json(dados)
+
+
+@membro_do_grupo
+async def detalhar_log(request, grupo_pk, pk):
+    log = await _logs(LogAdministracao, grupo_pk).filter(pk=pk).afirst()
+    if log is None:
+        log = await _logs(LogAdministracaoArquivado, grupo_pk).aget(pk=pk)
+    return resposta_json(LogAdministracaoSerializer(log).data)
@@ -8,12 +8,21 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Para servir a API sob ASGI (necessário para as views assíncronas de /api/async/):
+    uvicorn config.asgi:application --host 0.0.0.0 --port 8000 --workers 4
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Faz na subida do worker o trabalho que a primeira requisição faria (ver api/inicializacao.py)
+if settings.AQUECER_NA_INICIALIZACAO:
+    from api.inicializacao import aquecer
+    aquecer(conexoes=False)
@@ -14,6 +14,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
 import dj_database_url
 from pathlib import Path
@@ -44,7 +45,6 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'dj_rest_auth',         
-    'dj_rest_auth.registration',
     'corsheaders',
     'api'
 ]
@@ -52,11 +52,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.ReplicaLeituraMiddleware',  # Leituras seguras nas réplicas (quando configuradas)
+    'api.middleware.ArquivosEstaticosMiddleware',  # WhiteNoise, também sob ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.PerfilamentoMiddleware',   # Perfilamento sob demanda (apenas is_staff)
+    'api.middleware.ShardMiddleware',   # Roteia os dados do grupo da URL para o seu shard
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,8 +97,114 @@ DATABASES = {             # DEPLOY
         conn_max_age=600
     )
 }
+
+# Réplicas de leitura opcionais, separadas por vírgula. Ex:
+#   DATABASE_REPLICA_URLS=postgres://leitura1/edoso,postgres://leitura2/edoso
+# Para testar localmente com dois arquivos SQLite:
+#   REDIS_URL=redis://localhost:6379 DATABASE_URL=sqlite:///primario.sqlite3 DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+#   (e 'python manage.py sincronizar_replica_sqlite' para copiar o primário para a réplica)
+# Exige REDIS_URL (cache compartilhado, ver api/checks.py): é nele que o ReplicaLeituraMiddleware
+# marca os clientes que acabaram de escrever, para que todos os workers leiam deles no primário.
+DATABASE_REPLICAS = []
+for indice, url in enumerate(filter(None, map(str.strip, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))), start=1):
+    DATABASES[f'replica_{indice}'] = {
+        **dj_database_url.parse(url, conn_max_age=600),
+        'TEST': {'MIRROR': 'default'},  # Nos testes, a réplica aponta para o banco primário
+    }
+    DATABASE_REPLICAS.append(f'replica_{indice}')
+
+# Shards opcionais para os dados dos grupos, no formato alias=url separados por vírgula. Ex:
+#   DATABASE_SHARD_URLS=shard_1=sqlite:///shard1.sqlite3,shard_2=sqlite:///shard2.sqlite3
+# Cada shard recebe o esquema completo ('python manage.py migrate --database shard_1').
+# Usuários e grupos ficam no 'default'; 'python manage.py mover_grupo' move um grupo entre bancos.
+DATABASE_SHARDS = []
+for item in filter(None, map(str.strip, os.environ.get('DATABASE_SHARD_URLS', '').split(','))):
+    alias, _, url = item.partition('=')
+    DATABASES[alias.strip()] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    DATABASE_SHARDS.append(alias.strip())
+
+# Os testes usam um shard a mais, registrado só por eles (ver config/testes.py)
+TEST_RUNNER = 'config.testes.ExecutorDeTestes'
+
+SHARD_NOVOS_GRUPOS = os.environ.get('SHARD_NOVOS_GRUPOS', 'default')   # Banco dos grupos criados a partir de agora
+SHARD_MAPA_TTL = int(os.environ.get('SHARD_MAPA_TTL', '5'))             # Segundos de cache do mapa grupo -> banco
+
+DATABASE_ROUTERS = ['api.db_routers.ShardRouter', 'api.db_routers.ReplicaRouter']
+
+# Perfil de produção para SQLite (lares pequenos rodando com o banco padrão):
+# WAL deixa leituras e escritas acontecerem ao mesmo tempo, 'transaction_mode' IMMEDIATE
+# pega o lock de escrita já no início das transações (evitando o "database is locked"
+# ao promover uma leitura para escrita) e 'timeout' faz a conexão esperar pelo lock.
+# Desative com SQLITE_PERFIL_PRODUCAO=0.
+SQLITE_PERFIL_PRODUCAO = os.environ.get('SQLITE_PERFIL_PRODUCAO', '1') == '1'
+SQLITE_PRAGMAS = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',            # Seguro com WAL; evita um fsync por transação
+    'PRAGMA mmap_size=268435456',           # 256 MB de leitura via mmap
+    'PRAGMA cache_size=-32000',             # ~32 MB de cache de páginas por conexão
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA foreign_keys=ON',
+])
+if SQLITE_PERFIL_PRODUCAO:
+    for banco in DATABASES.values():
+        if banco['ENGINE'] == 'django.db.backends.sqlite3':
+            banco.setdefault('OPTIONS', {}).update({
+                'init_command': SQLITE_PRAGMAS,
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('SQLITE_TIMEOUT', '20')),    # busy timeout, em segundos
+            })
+
+REPLICA_FIXACAO_SEGUNDOS = int(os.environ.get('REPLICA_FIXACAO_SEGUNDOS', '10'))  # Leituras no primário após uma escrita
  
 
+# Cache: memória local por padrão (LRU por processo). Com REDIS_URL definido, usa o Redis,
+# necessário quando há vários workers para que a invalidação por grupo valha para todos.
+# Sem ele, a versão do grupo (api/cache.py) é trocada só no worker que recebeu a escrita:
+# nos demais, as respostas guardadas continuam valendo até expirar, por isso duram poucos segundos.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'respostas': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'respostas',
+            'TIMEOUT': 60 * 60,
+        },
+        'limites': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'limites',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'edoso-padrao',
+        },
+        'respostas': {     # Respostas renderizadas (api.cache.CacheRespostaMixin)
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'edoso-respostas',
+            'TIMEOUT': int(os.environ.get('CACHE_RESPOSTAS_SEGUNDOS', '5')),   # Atraso máximo entre workers após uma escrita
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('CACHE_RESPOSTAS_MAX', '2000')),  # Acima disso, descarta as menos usadas (LRU)
+                'CULL_FREQUENCY': 10,
+            },
+        },
+        'limites': {       # Contadores dos limites de taxa (api.throttling), fora do descarte das respostas
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'edoso-limites',
+        },
+    }
+
+CACHE_RESPOSTAS = 'respostas'   # Alias do cache usado para as respostas serializadas
+CACHE_LIMITES = 'limites'       # Alias do cache usado pelos limites de taxa
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
@@ -126,12 +235,32 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Renderers/parsers: JSON via orjson (api.renderers) e, se o pacote 'msgpack' estiver
+# instalado, MessagePack para o app móvel (Accept: application/x-msgpack).
+RENDERER_CLASSES = ['api.renderers.JSONRapidoRenderer']
+PARSER_CLASSES = [
+    'api.renderers.JSONRapidoParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+]
+if importlib.util.find_spec('msgpack'):
+    RENDERER_CLASSES.append('api.renderers.MessagePackRenderer')
+    PARSER_CLASSES.append('api.renderers.MessagePackParser')
+if DEBUG:
+    RENDERER_CLASSES.append('rest_framework.renderers.BrowsableAPIRenderer')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication', 
     ),
+    'DEFAULT_RENDERER_CLASSES': RENDERER_CLASSES,
+    'DEFAULT_PARSER_CLASSES': PARSER_CLASSES,
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,  # Define o número padrão de itens por página
+    # Proxies reversos confiáveis na frente do Django (1 no Render). O IP do cliente usado nos limites
+    # de taxa é o que o último deles acrescentou ao X-Forwarded-For; o que o cliente manda antes é ignorado.
+    # Use 0 quando o Django recebe as conexões diretamente (o IP vem de REMOTE_ADDR).
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
 }
 
 
@@ -139,8 +268,6 @@ SITE_ID = 1
 
 AUTH_USER_MODEL = 'api.Usuario'
 
-ACCOUNT_EMAIL_VERIFICATION = 'none' 
-
 # CORS_ALLOWED_ORIGINS = [        # LOCAL
 #     'http://127.0.0.1:8000',
 #     'http://localhost:8000',
@@ -158,6 +285,11 @@ CORS_ALLOWED_ORIGINS = [            # DEPLOY
 CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
+    'x-perfilar',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'x-perfilamento-id',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -186,4 +318,48 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 REST_AUTH = {
     'LOGIN_SERIALIZER': 'api.serializers.CustomLoginSerializer',
-}
\ No newline at end of file
+}
+
+# Perfilamento sob demanda (api.middleware.PerfilamentoMiddleware)
+PERFILAMENTO_DIR = os.environ.get('PERFILAMENTO_DIR', BASE_DIR / 'perfilamentos')    # Onde os relatórios são gravados
+PERFILAMENTO_INTERVALO = float(os.environ.get('PERFILAMENTO_INTERVALO', '0.005'))     # Intervalo de amostragem em segundos
+
+# Arquivamento do histórico (python manage.py arquivar_logs)
+LOG_ARQUIVO_DIAS = int(os.environ.get('LOG_ARQUIVO_DIAS', '180'))   # Logs mais antigos que isso vão para a tabela de arquivo
+
+# Verificação de interações medicamentosas (api/interacoes.py)
+INTERACOES_ARQUIVO = os.environ.get('INTERACOES_ARQUIVO', str(BASE_DIR / 'api' / 'dados' / 'interacoes.json'))   # Base local de interações por princípio ativo
+
+# Inicialização dos workers (api/inicializacao.py e 'python manage.py startup_report')
+AQUECER_NA_INICIALIZACAO = os.environ.get('AQUECER_NA_INICIALIZACAO', '1') != '0'    # Aquece URLconf, DRF, serializers e conexões ao subir o worker
+
+# Limites de taxa por IP/usuário (api/throttling.py), no formato do DRF: 'fichas/período'
+LIMITES_DE_TAXA_ATIVOS = os.environ.get('LIMITES_DE_TAXA', '1') != '0'     # Desative (0) nos testes de carga, que registram muitos usuários do mesmo IP
+LIMITES_DE_TAXA = {
+    'login': os.environ.get('LIMITE_LOGIN', '10/min'),                          # Tentativas de login por IP e por e-mail
+    'registro': os.environ.get('LIMITE_REGISTRO', '5/hora'),                    # Cadastros de usuário por IP
+    'entrar_com_codigo': os.environ.get('LIMITE_ENTRAR_COM_CODIGO', '10/min'),  # Códigos de acesso tentados por usuário e por IP
+    'administrar': os.environ.get('LIMITE_ADMINISTRAR', '120/min'),             # Doses registradas por usuário
+}
+
+# Notificação das farmácias parceiras: caixa de saída (EventoSaida) e worker 'python manage.py entregar_eventos' (api/outbox.py)
+OUTBOX_LOTE = int(os.environ.get('OUTBOX_LOTE', '100'))                     # Eventos por requisição a uma farmácia
+OUTBOX_RODADA = int(os.environ.get('OUTBOX_RODADA', '1000'))                # Eventos reservados por banco a cada rodada do worker
+OUTBOX_INTERVALO = float(os.environ.get('OUTBOX_INTERVALO', '5'))           # Segundos entre as rodadas quando não há eventos
+OUTBOX_TIMEOUT = float(os.environ.get('OUTBOX_TIMEOUT', '10'))              # Timeout de cada entrega, em segundos
+OUTBOX_TENTATIVAS = int(os.environ.get('OUTBOX_TENTATIVAS', '10'))          # Depois disso o evento fica como 'Falhou'
+OUTBOX_ESPERA_BASE = int(os.environ.get('OUTBOX_ESPERA_BASE', '30'))        # Espera após a primeira falha (dobra a cada nova falha)
+OUTBOX_ESPERA_MAXIMA = int(os.environ.get('OUTBOX_ESPERA_MAXIMA', '3600'))  # Teto da espera entre tentativas
+OUTBOX_RESERVA = int(os.environ.get('OUTBOX_RESERVA', '300'))               # Segundos em que os eventos reservados por um worker ficam fora do alcance dos outros
+OUTBOX_RETENCAO_DIAS = int(os.environ.get('OUTBOX_RETENCAO_DIAS', '7'))     # Eventos entregues são apagados depois disso
+
+# Relatórios em PDF gerados em segundo plano: modelo Relatorio e worker 'python manage.py gerar_relatorios' (api/relatorios.py)
+RELATORIOS_DIR = os.environ.get('RELATORIOS_DIR', str(BASE_DIR / 'relatorios'))       # Onde os PDFs prontos são gravados
+RELATORIOS_INTERVALO = float(os.environ.get('RELATORIOS_INTERVALO', '5'))              # Segundos entre as verificações quando a fila está vazia
+RELATORIOS_RESERVA = int(os.environ.get('RELATORIOS_RESERVA', '600'))                  # Um relatório 'Gerando' sem progresso por esse tempo volta para a fila
+RELATORIOS_RETENCAO_DIAS = int(os.environ.get('RELATORIOS_RETENCAO_DIAS', '30'))       # Relatórios concluídos (e seus PDFs) são apagados depois disso
+RELATORIOS_IDOSOS_POR_LOTE = int(os.environ.get('RELATORIOS_IDOSOS_POR_LOTE', '50'))   # Idosos lidos por vez ao gerar o MAR de todo o grupo
+
+# Exclusão lógica de grupos, idosos e medicamentos e expurgo em lotes: 'python manage.py expurgar_apagados' (api/exclusao.py)
+EXCLUSAO_RETENCAO_DIAS = int(os.environ.get('EXCLUSAO_RETENCAO_DIAS', '30'))    # Os dados apagados pela API ficam no banco por esse tempo antes do expurgo
+EXCLUSAO_LOTE = int(os.environ.get('EXCLUSAO_LOTE', '1000'))                    # Linhas apagadas por transação no expurgo
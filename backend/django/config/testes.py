@@ -0,0 +1,20 @@
+# config/testes.py - Executor dos testes ('python manage.py test', ver TEST_RUNNER em settings.py).
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+# Banco a mais, só dos testes, para o destino do 'mover_grupo' (api.tests.MoverGrupoTests).
+# Não entra em DATABASE_SHARDS: os testes ligam o roteamento com override_settings.
+SHARD_DOS_TESTES = 'shard_teste'
+
+
+class ExecutorDeTestes(DiscoverRunner):
+    """DiscoverRunner que registra o shard dos testes antes de criar os bancos de teste (em memória)."""
+
+    def setup_databases(self, **kwargs):
+        if SHARD_DOS_TESTES not in connections.settings:
+            connections.settings[SHARD_DOS_TESTES] = connections.configure_settings({
+                'default': connections.settings['default'],
+                SHARD_DOS_TESTES: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            })[SHARD_DOS_TESTES]
+        return super().setup_databases(**kwargs)
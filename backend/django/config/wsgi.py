@@ -12,8 +12,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Faz na subida do worker o trabalho que a primeira requisição faria (ver api/inicializacao.py)
+# Com 'gunicorn --preload' este módulo roda no processo mestre, e as conexões abertas aqui seriam
+# herdadas pelos workers: nesse caso, use AQUECER_NA_INICIALIZACAO=0.
+if settings.AQUECER_NA_INICIALIZACAO:
+    from api.inicializacao import aquecer
+    aquecer()
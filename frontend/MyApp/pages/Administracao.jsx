@@ -61,6 +61,7 @@ export default function Administracao({ route, navigation }) {
                 data_hora_administracao: dataParaEnviar,
                 status: status,
                 observacoes: observacoes,
+                horario: prescricao.horario,  // Horário do cartão da agenda (undefined: o mais próximo)
             };
 
             await axios.post(`${baseURL}/api/grupos/${groupId}/prescricoes/${prescricao.id}/administrar/`, payload, {
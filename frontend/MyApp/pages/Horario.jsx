@@ -41,8 +41,10 @@ function Horario({ navigation }) {
     }, [])
   );
 
+  // Uma prescrição pode ter vários horários no dia: um cartão por horário
   const prescricoesDoDia = prescricoes.filter(p => p[DIAS_API[diaAtual]])
-                                     .sort((a, b) => a.horario_previsto.localeCompare(b.horario_previsto));
+                                     .flatMap(p => (p.horarios || [p.horario_previsto.substring(0, 5)]).map(horario => ({ ...p, horario })))
+                                     .sort((a, b) => a.horario.localeCompare(b.horario));
 
   const mudarDia = (incremento) => {
     let novoDia = (diaAtual + 7 + incremento) % 7;
@@ -54,7 +56,7 @@ function Horario({ navigation }) {
       try {
         const token = await AsyncStorage.getItem('authToken');
         const groupId = await AsyncStorage.getItem('selectedGroupId');
-        await axios.post(`${baseURL}/api/grupos/${groupId}/prescricoes/${prescricao.id}/administrar/`, {}, {
+        await axios.post(`${baseURL}/api/grupos/${groupId}/prescricoes/${prescricao.id}/administrar/`, { horario: prescricao.horario }, {
           headers: { 'Authorization': `Token ${token}` }
         });
         Alert.alert("Sucesso", `${prescricao.medicamento.nome_marca} administrado com sucesso!`);
@@ -95,8 +97,8 @@ function Horario({ navigation }) {
 
     return (
         prescricoesDoDia.map((p) => (
-            <View key={p.id} style={styles.medicationCard}>
-              <View style={styles.timeContainer}><Text style={styles.time}>{p.horario_previsto.substring(0, 5)}</Text></View>
+            <View key={`${p.id}-${p.horario}`} style={styles.medicationCard}>
+              <View style={styles.timeContainer}><Text style={styles.time}>{p.horario}</Text></View>
               <View style={styles.medicationInfo}>
                 <Text style={styles.medicationName}>{p.medicamento.nome_marca}</Text>
                 <Text style={styles.patientName}>Para: {p.idoso}</Text>
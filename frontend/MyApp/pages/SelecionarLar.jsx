@@ -35,7 +35,7 @@ export default function SelecionarLar({ navigation }) {
         navigation.navigate('Login');
         return;
       }
-      const response = await axios.get(`${baseURL}/api/grupos/meus-grupos/`, {
+      const response = await axios.get(`${baseURL}/api/grupos/resumo/`, {
         headers: { 'Authorization': `Token ${token}` }
       });
       setTodosLares(response.data);
@@ -65,7 +65,7 @@ export default function SelecionarLar({ navigation }) {
       const userDataString = await AsyncStorage.getItem('userData');
       if (!userDataString) throw new Error("Dados do usuário não encontrados. Faça o login novamente.");
       const currentUser = JSON.parse(userDataString);
-      const isUserAdmin = currentUser.id === lar.admin.id;
+      const isUserAdmin = currentUser.id === lar.admin_id;
       await AsyncStorage.setItem('selectedGroupId', lar.id.toString());
       await AsyncStorage.setItem('isCurrentUserAdmin', String(isUserAdmin));
       navigation.navigate('Main');
@@ -101,9 +101,23 @@ export default function SelecionarLar({ navigation }) {
       <View style={styles.larStats}>
         <View style={styles.statItem}>
           <Ionicons name="people-outline" size={16} color="#7f8c8d" />
-          <Text style={styles.statText}>{item.membros.length} Membro(s)</Text>
+          <Text style={styles.statText}>{item.total_membros} Membro(s)</Text>
+        </View>
+        <View style={styles.statItem}>
+          <Ionicons name="person-outline" size={16} color="#7f8c8d" />
+          <Text style={styles.statText}>{item.total_idosos} Idoso(s)</Text>
+        </View>
+        <View style={styles.statItem}>
+          <Ionicons name="time-outline" size={16} color={item.doses_pendentes_hoje > 0 ? '#e67e22' : '#7f8c8d'} />
+          <Text style={styles.statText}>{item.doses_pendentes_hoje} pendente(s) hoje</Text>
         </View>
       </View>
+      {item.medicamentos_estoque_baixo > 0 && (
+        <View style={styles.alertaEstoque}>
+          <Ionicons name="warning-outline" size={16} color="#e74c3c" />
+          <Text style={styles.alertaEstoqueTexto}>{item.medicamentos_estoque_baixo} medicamento(s) com estoque baixo</Text>
+        </View>
+      )}
     </TouchableOpacity>
   );
 
@@ -184,6 +198,8 @@ const styles = StyleSheet.create({
   larStats: { flexDirection: 'row', justifyContent: 'space-between', alignItems: 'center', marginTop: 8, paddingTop: 8, borderTopWidth: 1, borderTopColor: '#f0f0f0' },
   statItem: { flexDirection: 'row', alignItems: 'center' },
   statText: { marginLeft: 6, fontSize: 14, color: '#7f8c8d' },
+  alertaEstoque: { flexDirection: 'row', alignItems: 'center', marginTop: 8 },
+  alertaEstoqueTexto: { marginLeft: 6, fontSize: 13, color: '#e74c3c' },
   feedbackContainer: { flex: 1, justifyContent: 'center', alignItems: 'center', paddingHorizontal: 20 },
   errorText: { marginTop: 16, fontSize: 16, color: '#e74c3c', textAlign: 'center' },
   emptyText: { marginTop: 16, fontSize: 18, fontWeight: '600', color: '#7f8c8d', textAlign: 'center' },